@@ -0,0 +1,45 @@
+import argparse
+import time
+
+from benchmarks.snapshot_benchmark import build_dataset
+from cms.models import PostAnalyticsReport, SiteAnalyticsReport
+from cms.services.reporting import ReportEngine
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara o relatório de todos os sites, site a site e em lote."
+    )
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--posts-per-site", type=int, default=2)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    context = build_dataset(args.posts, args.posts_per_site)
+    sites = list(context.site_repo.iter_sites())
+    sample = sites[: min(len(sites), 200)]
+
+    # The old path: one scan of the entries per site (estimated from a sample).
+    start = time.perf_counter()
+    for site in sample:
+        entries = context.analytics_repo.get_site_entries(site.id)
+        SiteAnalyticsReport(entries, site).generate_metrics()
+        for post in context.post_repo.iter_site_posts(site):
+            post_entries = [e for e in entries if getattr(e, "post", None) is post]
+            PostAnalyticsReport(post_entries, post).generate_metrics()
+    per_site_time = (time.perf_counter() - start) * len(sites) / len(sample)
+
+    engine = ReportEngine(
+        context.post_repo, context.analytics_repo, max_workers=args.workers
+    )
+    start = time.perf_counter()
+    results = engine.generate(sites)
+    engine_time = time.perf_counter() - start
+
+    print(f"Sites: {len(sites)}, relatórios: {len(results)}")
+    print(f"Site a site (estimado): {per_site_time:.2f}s")
+    print(f"ReportEngine: {engine_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import random
+import threading
+import time
+from datetime import timedelta
+
+from cms.models import User, UserRole
+from cms.repository import UserRepository
+from cms.services.sessions import InvalidSessionError, SessionStore
+
+TTL = timedelta(hours=8)
+
+
+class FakeClock:
+    now: float
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def build_users(count: int) -> UserRepository:
+    repo = UserRepository()
+    for i in range(count):
+        repo.add_user(
+            User("Bench", str(i), f"u{i}@cms.com", f"u{i}", f"pwd{i}", UserRole.USER)
+        )
+    return repo
+
+
+def measure(name: str, operations: int, run):
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    print(f"{name}: {operations / seconds:,.0f} op/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede a criação, validação e expiração de sessões."
+    )
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--sessions", type=int, default=200_000)
+    parser.add_argument("--checks", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    user_repo = build_users(args.users)
+    users = user_repo.get_users()
+    clock = FakeClock()
+    store = SessionStore(ttl=TTL, clock=clock)
+    rnd = random.Random(0)
+
+    # Logins spread over one TTL, so the table reaches its steady-state size.
+    tokens: list[str] = []
+
+    def create():
+        step = TTL.total_seconds() / args.sessions
+        for i in range(args.sessions):
+            clock.now = i * step
+            tokens.append(store.create(users[i % len(users)]))
+
+    measure("Login (criar sessão)", args.sessions, create)
+    print(f"  sessões ativas: {len(store):,}")
+
+    sample = [rnd.choice(tokens) for _ in range(args.checks)]
+
+    def authenticate():
+        for token in sample:
+            store.authenticate(token)
+
+    measure("Validar token", args.checks, authenticate)
+
+    forged = [token[:-4] + "AAAA" for token in sample[: args.checks // 10]]
+
+    def reject():
+        for token in forged:
+            try:
+                store.authenticate(token)
+            except InvalidSessionError:
+                pass
+
+    measure("Rejeitar token forjado", len(forged), reject)
+
+    credentials = [(user.username, user.password) for user in users]
+
+    def validate():
+        for i in range(args.checks):
+            user_repo.validate_user(*credentials[i % len(credentials)])
+
+    measure("Referência: validate_user", args.checks, validate)
+
+    def authenticate_concurrently():
+        chunk = len(sample) // args.threads
+        workers = [
+            threading.Thread(
+                target=lambda part: [store.authenticate(t) for t in part],
+                args=(sample[i * chunk : (i + 1) * chunk],),
+            )
+            for i in range(args.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    measure(
+        f"Validar token ({args.threads} threads)",
+        args.checks,
+        authenticate_concurrently,
+    )
+
+    # A whole TTL later, every session expired: each login only removes a
+    # bounded number of them, and sweep() removes the rest.
+    clock.now += TTL.total_seconds() * 2
+    measure(
+        "Login após expiração",
+        1_000,
+        lambda: [store.create(users[0]) for _ in range(1_000)],
+    )
+    print(f"  sessões ativas: {len(store):,}")
+    measure("Varredura completa", 1, store.sweep)
+    print(f"  sessões ativas: {len(store):,}")
+
+    def logout():
+        for token in tokens:
+            store.logout(token)
+
+    measure("Logout", len(tokens), logout)
+
+
+if __name__ == "__main__":
+    main()
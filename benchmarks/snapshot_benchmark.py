@@ -0,0 +1,115 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from cms.models import (
+    Comment,
+    Content,
+    MediaBlock,
+    MediaFile,
+    MediaType,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    TextBlock,
+    User,
+    UserRole,
+)
+from cms.snapshot import load_snapshot_file, save_snapshot_file
+from cms.views.menu import AppContext
+
+TARGET_SIZE = 10 * 1024**3
+PARAGRAPH = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8
+
+
+def build_dataset(posts: int, posts_per_site: int = 100) -> AppContext:
+    context = AppContext()
+    language = context.lang_service.get_language_by_code("pt-br")
+
+    users = []
+    for i in range(max(posts // 50, 1)):
+        user = User("Bench", str(i), f"u{i}@cms.com", f"u{i}", "pwd", UserRole.USER)
+        context.user_repo.add_user(user)
+        users.append(user)
+
+    site = media = None
+    for i in range(posts):
+        user = users[i % len(users)]
+        if i % posts_per_site == 0:
+            site = Site(owner=user, name=f"Site {i}", description="Benchmark")
+            context.site_repo.add_site(site)
+            media = MediaFile(
+                uploader=user,
+                filename=f"img_{i}.jpg",
+                path=Path(f"/media/img_{i}.jpg"),
+                media_type=MediaType.IMAGE,
+                site=site,
+                width="1000",
+                height="1000",
+                duration=None,
+            )
+            context.media_repo.add_midia(media)
+
+        post = Post(poster=user, site=site)
+        post.add_content(
+            language.code,
+            Content(
+                title=f"Post {i}",
+                language=language,
+                body=[
+                    TextBlock(order=1, text=PARAGRAPH),
+                    MediaBlock(order=2, media=media, alt="Imagem"),
+                    TextBlock(order=3, text=PARAGRAPH),
+                ],
+            ),
+        )
+        context.post_repo.add_post(post)
+        context.comment_repo.add_comment(
+            Comment(post=post, commenter=user, body="Comentário de teste.")
+        )
+        context.analytics_repo.log(
+            PostAnalyticsEntry(user=user, site=site, post=post, action=PostAction.VIEW)
+        )
+
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede o tempo de snapshot e restore do estado do CMS."
+    )
+    parser.add_argument("--posts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    context = build_dataset(args.posts)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cms.snapshot"
+
+        start = time.perf_counter()
+        save_snapshot_file(context, path)
+        snapshot_time = time.perf_counter() - start
+
+        size = path.stat().st_size
+
+        start = time.perf_counter()
+        load_snapshot_file(path)
+        restore_time = time.perf_counter() - start
+
+    scale = TARGET_SIZE / size
+    print(f"Posts: {args.posts}")
+    print(f"Tamanho do snapshot: {size / 1024**2:.1f} MiB")
+    print(
+        f"Snapshot: {snapshot_time:.2f}s ({size / 1024**2 / snapshot_time:.1f} MiB/s)"
+    )
+    print(f"Restore: {restore_time:.2f}s ({size / 1024**2 / restore_time:.1f} MiB/s)")
+    print(
+        f"Estimativa para 10 GiB: snapshot {snapshot_time * scale / 60:.1f} min, "
+        f"restore {restore_time * scale / 60:.1f} min"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.snapshot_benchmark import build_dataset
+from cms.snapshot import save_snapshot_file
+
+# Runs in a fresh interpreter so module imports are part of the measurement.
+# The first prompt is printed right after Menu() returns.
+_MEASURE = """
+import sys, time
+start = time.perf_counter()
+from pathlib import Path
+from cms.views import Menu
+menu = Menu(Path(sys.argv[1]) if len(sys.argv) > 1 else None)
+first_prompt = time.perf_counter() - start
+menu.wait_for_data()
+print(first_prompt, time.perf_counter() - start)
+"""
+
+
+def measure(runs: int, snapshot: Path | None) -> tuple[float, float]:
+    prompt_times: list[float] = []
+    loaded_times: list[float] = []
+    args = [str(snapshot)] if snapshot else []
+
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _MEASURE, *args],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        prompt_times.append(float(output[0]))
+        loaded_times.append(float(output[1]))
+
+    return statistics.median(prompt_times), statistics.median(loaded_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede o tempo até o primeiro prompt do menu principal."
+    )
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    prompt, loaded = measure(args.runs, None)
+    print(f"populate(): primeiro prompt {prompt * 1000:.1f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "seed.snapshot"
+        save_snapshot_file(build_dataset(args.posts), path)
+
+        prompt, loaded = measure(args.runs, path)
+        print(
+            f"snapshot com {args.posts} posts: primeiro prompt {prompt * 1000:.1f}ms, "
+            f"dados carregados em {loaded * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
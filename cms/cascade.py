@@ -0,0 +1,211 @@
+from collections.abc import Callable, Iterator
+from itertools import islice
+from typing import TYPE_CHECKING
+
+from cms.models import AnalyticsEntry, MediaFile, Permission, Post, Site, User
+from cms.services.media_usage import MediaDeletePolicy
+
+if TYPE_CHECKING:
+    from cms.views.menu import AppContext
+
+# Most records removed per batch.
+BATCH_SIZE = 500
+
+type Steps = Iterator[int]
+type BatchListener = Callable[["DeletionJob"], None]
+
+
+# A deletion split in steps, each removing at most batch_size records and
+# yielding how many it removed. The steps find what is left through the
+# reverse indexes of the repositories, so the work is proportional to the
+# records of the account, and nothing else is kept: a job that stopped
+# halfway (or a crash, with the write-ahead log) is resumed by starting a new
+# job for the same site or user.
+class DeletionJob:
+    batch_size: int
+    deleted: int
+    done: bool
+    __steps: Steps
+
+    def __init__(self, steps: Steps, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+        self.deleted = 0
+        self.done = False
+        self.__steps = steps
+
+    # Runs steps until about batch_size records were removed; returns how many.
+    def run_batch(self) -> int:
+        removed = 0
+        while not self.done and removed < self.batch_size:
+            try:
+                removed += next(self.__steps)
+            except StopIteration:
+                self.done = True
+
+        self.deleted += removed
+        return removed
+
+    def run(self, on_batch: BatchListener | None = None) -> int:
+        while not self.done:
+            self.run_batch()
+            if on_batch:
+                on_batch(self)
+        return self.deleted
+
+
+# Deletes the site with its posts (and their comments, analytics and revision
+# histories), medias, analytics and permissions.
+def delete_site(
+    context: "AppContext", site: Site, batch_size: int = BATCH_SIZE
+) -> DeletionJob:
+    return DeletionJob(_site_steps(context, site, batch_size), batch_size)
+
+
+# Deletes the user's sites and everything the user created on other sites:
+# posts, comments (with the replies below them), medias, analytics entries
+# and roles. Posts elsewhere that show the user's medias lose those blocks.
+def delete_user(
+    context: "AppContext", user: User, batch_size: int = BATCH_SIZE
+) -> DeletionJob:
+    return DeletionJob(_user_steps(context, user, batch_size), batch_size)
+
+
+# Keeps everything the user created, under an anonymous account nobody can
+# log in to. Only the roles on other users' sites are revoked.
+def anonymize_user(
+    context: "AppContext", user: User, batch_size: int = BATCH_SIZE
+) -> DeletionJob:
+    return DeletionJob(_anonymize_steps(context, user, batch_size), batch_size)
+
+
+# Takes batches from a fresh iterator each time (the records taken are gone
+# by the next one) until there is none left.
+def _drain[T](
+    take: Callable[[], Iterator[T]],
+    delete: Callable[[list[T]], int],
+    batch_size: int,
+) -> Steps:
+    while batch := list(islice(take(), batch_size)):
+        removed = delete(batch)
+        if not removed:
+            return
+        yield removed
+
+
+def _site_steps(context: "AppContext", site: Site, batch_size: int) -> Steps:
+    post_repo = context.post_repo
+    for posts in _batches(
+        lambda: post_repo.iter_site_posts(site, include_scheduled=True), batch_size
+    ):
+        for post in posts:
+            yield from _post_steps(context, post, batch_size)
+
+    yield from _drain(
+        lambda: context.media_repo.iter_site_medias(site),
+        lambda medias: _delete_medias(context, medias),
+        batch_size,
+    )
+    yield from _drain(
+        lambda: context.analytics_repo.iter_site_entries(site),
+        lambda entries: _delete_entries(context, entries),
+        batch_size,
+    )
+    yield len(context.permission_repo.revoke_site_permissions(site))
+    context.site_repo.delete_site(site)
+    yield 1
+
+
+def _post_steps(context: "AppContext", post: Post, batch_size: int) -> Steps:
+    yield from _drain(
+        lambda: context.comment_repo.iter_post_comments(post),
+        lambda comments: len(context.comment_repo.delete_comments(comments)),
+        batch_size,
+    )
+    yield from _drain(
+        lambda: context.analytics_repo.iter_post_entries(post),
+        lambda entries: _delete_entries(context, entries),
+        batch_size,
+    )
+    yield from _drain(
+        lambda: context.permission_repo.iter_post_permissions(post),
+        lambda permissions: _revoke_permissions(context, permissions),
+        batch_size,
+    )
+    context.post_repo.delete_post(post)
+    context.revisions.forget_post(post)
+    yield 1
+
+
+def _user_steps(context: "AppContext", user: User, batch_size: int) -> Steps:
+    for sites in _batches(
+        lambda: iter(context.site_repo.get_user_sites(user)), batch_size
+    ):
+        for site in sites:
+            yield from _site_steps(context, site, batch_size)
+
+    for posts in _batches(lambda: context.post_repo.iter_user_posts(user), batch_size):
+        for post in posts:
+            yield from _post_steps(context, post, batch_size)
+
+    yield from _drain(
+        lambda: context.comment_repo.iter_user_comments(user),
+        lambda comments: len(context.comment_repo.delete_comments(comments)),
+        batch_size,
+    )
+    yield from _drain(
+        lambda: context.media_repo.iter_user_medias(user),
+        lambda medias: _delete_medias(context, medias),
+        batch_size,
+    )
+    yield from _drain(
+        lambda: context.analytics_repo.iter_user_entries(user),
+        lambda entries: _delete_entries(context, entries),
+        batch_size,
+    )
+    yield from _drain(
+        lambda: context.permission_repo.iter_user_permissions(user),
+        lambda permissions: _revoke_permissions(context, permissions),
+        batch_size,
+    )
+    context.user_repo.delete_user(user.id)
+    yield 1
+
+
+def _anonymize_steps(context: "AppContext", user: User, batch_size: int) -> Steps:
+    yield from _drain(
+        lambda: (
+            permission
+            for permission in context.permission_repo.iter_user_permissions(user)
+            if permission.site.owner.id != user.id
+        ),
+        lambda permissions: _revoke_permissions(context, permissions),
+        batch_size,
+    )
+    context.user_repo.anonymize_user(user)
+    yield 1
+
+
+# Like _drain, for records that are deleted one at a time through a cascade of
+# their own.
+def _batches[T](take: Callable[[], Iterator[T]], batch_size: int) -> Iterator[list[T]]:
+    while batch := list(islice(take(), batch_size)):
+        yield batch
+
+
+def _delete_medias(context: "AppContext", medias: list[MediaFile]) -> int:
+    for media in medias:
+        context.media_usage.delete_media(media, MediaDeletePolicy.DETACH)
+    return len(medias)
+
+
+def _delete_entries(context: "AppContext", entries: list[AnalyticsEntry]) -> int:
+    context.analytics_repo.delete_entries(entries)
+    return len(entries)
+
+
+def _revoke_permissions(context: "AppContext", permissions: list[Permission]) -> int:
+    for permission in permissions:
+        context.permission_repo.revoke_permission(
+            permission.user, permission.site, permission.post
+        )
+    return len(permissions)
@@ -0,0 +1,632 @@
+import argparse
+import json
+import re
+import sys
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TextIO
+
+from cms import cascade
+from cms.models import (
+    Capability,
+    Content,
+    ContentBlock,
+    MediaBlock,
+    MediaFile,
+    Permission,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    SiteRole,
+    SocialMedia,
+    TextBlock,
+    User,
+    UserRole,
+)
+from cms.populate import populate
+from cms.services.reporting import ReportEngine, write_reports
+from cms.snapshot import load_snapshot_file, save_snapshot_file
+from cms.utils import infer_media_type
+from cms.views.menu import AppContext
+from cms.wal import WriteAheadLog
+
+type Operation = dict[str, Any]
+type Handler = Callable[[Operation], list[dict[str, Any]]]
+
+BULK_BATCH_SIZE = 1000
+
+_markdown_media = re.compile(r"^!\[(?P<alt>[^\]]*)\]\(media:(?P<media_id>\d+)\)$")
+
+# Default of the operation fields that must be present.
+_REQUIRED: Any = object()
+
+
+class CommandError(Exception):
+    pass
+
+
+class BatchRunner:
+    context: AppContext
+    user: User
+    __pending_posts: list[Post]
+
+    def __init__(self, context: AppContext, user: User):
+        self.context = context
+        self.user = user
+        self.__pending_posts = []
+
+    def run(self, operation: Operation) -> list[dict[str, Any]]:
+        handler = self.__get_handler(operation)
+        return self.__store_pending_posts(handler) + handler(operation)
+
+    # A line that fails is reported and skipped; the posts of the lines before
+    # it are still stored, even when the stream itself fails.
+    def run_stream(self, lines: Iterable[str], out: TextIO) -> int:
+        errors = 0
+
+        try:
+            for line_number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+
+                try:
+                    operation = json.loads(line)
+                    handler = self.__get_handler(operation)
+                    # Written before the handler runs, so the ids of the stored
+                    # posts are reported even if the operation fails.
+                    self.__write_results(self.__store_pending_posts(handler), out)
+                    self.__write_results(handler(operation), out)
+                except Exception as e:
+                    errors += 1
+                    print(f"linha {line_number}: {e}", file=sys.stderr)
+
+                if len(self.__pending_posts) >= BULK_BATCH_SIZE:
+                    self.__write_results(self.flush(), out)
+        finally:
+            self.__write_results(self.flush(), out)
+
+        return errors
+
+    def __get_handler(self, operation: Operation) -> Handler:
+        if not isinstance(operation, dict):
+            raise CommandError(f"Operação inválida: {json.dumps(operation)}")
+
+        handlers: dict[str, Handler] = {
+            "create-site": self.create_site,
+            "create-post": self.create_post,
+            "import-media": self.import_media,
+            "grant-permission": self.grant_permission,
+            "revoke-permission": self.revoke_permission,
+            "report": self.report,
+            "log-view": self.log_view,
+            "delete-site": self.delete_site,
+            "delete-user": self.delete_user,
+            "anonymize-user": self.anonymize_user,
+        }
+
+        handler = handlers.get(self.__field(operation, "op", str, ""))
+        if not handler:
+            raise CommandError(f"Operação desconhecida: {operation.get('op')}")
+
+        return handler
+
+    # Only create-post is buffered: every other operation must see the posts
+    # created before it (a report counts them, a deleted site takes them
+    # along), so the pending ones are stored first.
+    def __store_pending_posts(self, handler: Handler) -> list[dict[str, Any]]:
+        if handler == self.create_post or not self.__pending_posts:
+            return []
+
+        return self.flush()
+
+    def flush(self) -> list[dict[str, Any]]:
+        posts, self.__pending_posts = self.__pending_posts, []
+        self.context.post_repo.add_posts(posts)
+
+        for post in posts:
+            self.context.analytics_repo.log(
+                SiteAnalyticsEntry(
+                    user=self.user,
+                    site=post.site,
+                    action=SiteAction.CREATE_POST,
+                    metadata={"post_id": str(post.id)},
+                )
+            )
+
+        return [{"op": "create-post", "id": post.id} for post in posts]
+
+    def create_site(self, operation: Operation) -> list[dict[str, Any]]:
+        site = Site(
+            owner=self.user,
+            name=self.__field(operation, "name", str),
+            description=self.__field(operation, "description", str, ""),
+        )
+        self.context.site_repo.add_site(site)
+        self.context.permission_repo.grant_permission(
+            Permission(user=self.user, site=site, role=SiteRole.OWNER)
+        )
+
+        return [{"op": "create-site", "id": site.id, "url": site.get_url()}]
+
+    def create_post(self, operation: Operation) -> list[dict[str, Any]]:
+        site = self.__get_managed_site(
+            self.__field(operation, "site_id", (int, str)), Capability.CREATE_POST
+        )
+
+        if "file" in operation:
+            path = Path(self.__field(operation, "file", str))
+            operation = {**read_post_file(path), **operation}
+
+        language = self.context.lang_service.get_language_by_code(
+            self.__field(operation, "language", str, "pt-br")
+        )
+        blocks = [
+            self.__build_block(site, order, block)
+            for order, block in enumerate(
+                self.__field(operation, "blocks", list, []), start=1
+            )
+        ]
+
+        post = Post(poster=self.user, site=site)
+        if scheduled_to := self.__field(operation, "scheduled_to", str, None):
+            post.scheduled_to = parse_datetime(scheduled_to)
+        post.add_content(
+            language.code,
+            Content(
+                title=self.__field(operation, "title", str),
+                body=blocks,
+                language=language,
+            ),
+        )
+
+        # Posts are only stored when the batch is flushed.
+        self.__pending_posts.append(post)
+        return []
+
+    def import_media(self, operation: Operation) -> list[dict[str, Any]]:
+        site = self.__get_managed_site(
+            self.__field(operation, "site_id", (int, str)), Capability.MANAGE_MEDIA
+        )
+        results: list[dict[str, Any]] = []
+
+        for filepath in self.__field(operation, "paths", list):
+            if not isinstance(filepath, str):
+                raise CommandError(f"Caminho inválido: {json.dumps(filepath)}")
+
+            path = Path(filepath)
+            if not path.is_file():
+                raise CommandError(f"Arquivo não encontrado: {filepath}")
+
+            media = MediaFile(
+                uploader=self.user,
+                filename=path.name,
+                path=path.resolve(),
+                media_type=infer_media_type(path.suffix),
+                site=site,
+                width=str(self.__field(operation, "width", (int, str), "1000")),
+                height=str(self.__field(operation, "height", (int, str), "1000")),
+                duration=self.__field(operation, "duration", (int, float), None),
+            )
+            self.context.media_repo.add_midia(media)
+            self.context.analytics_repo.log(
+                SiteAnalyticsEntry(
+                    user=self.user, site=site, action=SiteAction.UPLOAD_MEDIA
+                )
+            )
+            results.append({"op": "import-media", "id": media.id})
+
+        return results
+
+    # Without a post_id, the role applies to the whole site; with it, only to
+    # that post, replacing the site role there.
+    def grant_permission(self, operation: Operation) -> list[dict[str, Any]]:
+        site = self.__get_managed_site(
+            self.__field(operation, "site_id", (int, str)), Capability.MANAGE_ROLES
+        )
+        user = self.__get_user(self.__field(operation, "username", str))
+        post = self.__get_site_post(
+            site, self.__field(operation, "post_id", (int, str), None)
+        )
+
+        role_name = self.__field(operation, "role", str, SiteRole.EDITOR.name)
+        try:
+            role = SiteRole[role_name.upper()]
+        except KeyError:
+            raise CommandError(f"Papel desconhecido: {role_name}")
+
+        self.context.permission_repo.grant_permission(
+            Permission(user=user, site=site, role=role, post=post)
+        )
+        return [
+            {
+                "op": "grant-permission",
+                "site_id": site.id,
+                "user_id": user.id,
+                "role": role.name.lower(),
+                "post_id": post.id if post else None,
+            }
+        ]
+
+    def revoke_permission(self, operation: Operation) -> list[dict[str, Any]]:
+        site = self.__get_managed_site(
+            self.__field(operation, "site_id", (int, str)), Capability.MANAGE_ROLES
+        )
+        user = self.__get_user(self.__field(operation, "username", str))
+        post = self.__get_site_post(
+            site, self.__field(operation, "post_id", (int, str), None)
+        )
+
+        if not self.context.permission_repo.revoke_permission(user, site, post):
+            raise CommandError(f"{user.username} não tem papel no site {site.id}.")
+        return [{"op": "revoke-permission", "site_id": site.id, "user_id": user.id}]
+
+    # Imports visits from outside the CLI, e.g. from the web server log. The
+    # platform marks a visit that came through a shared link.
+    def log_view(self, operation: Operation) -> list[dict[str, Any]]:
+        post_id = self.__field(operation, "post_id", (int, str))
+        try:
+            post = self.context.post_repo.get_post_by_id(int(post_id))
+        except KeyError:
+            raise CommandError(f"Post não encontrado: {post_id}")
+
+        platform = self.__field(operation, "platform", str, None)
+        try:
+            entry = PostAnalyticsEntry(
+                user=self.user,
+                site=post.site,
+                post=post,
+                action=PostAction.VIEW,
+                platform=SocialMedia[platform.upper()] if platform else None,
+            )
+        except KeyError:
+            raise CommandError(f"Rede social desconhecida: {platform}")
+        if at := self.__field(operation, "at", str, None):
+            entry.created_at = parse_datetime(at)
+
+        self.context.analytics_repo.log(entry)
+        return [{"op": "log-view", "id": entry.id}]
+
+    # Without a site_id, reports every site the user manages (all of them for
+    # admins).
+    def report(self, operation: Operation) -> list[dict[str, Any]]:
+        if (
+            site_id := self.__field(operation, "site_id", (int, str), None)
+        ) is not None:
+            sites = [self.__get_managed_site(site_id, Capability.VIEW_ANALYTICS)]
+        else:
+            sites = [
+                site
+                for site in self.context.site_repo.iter_sites()
+                if self.context.permission_repo.has_permission(
+                    self.user, site, Capability.VIEW_ANALYTICS
+                )
+            ]
+
+        engine = ReportEngine(
+            self.context.post_repo,
+            self.context.analytics_repo,
+            max_workers=self.__field(operation, "workers", int, None),
+        )
+        return engine.generate(sites)
+
+    # Only the owner of the site or an admin.
+    def delete_site(self, operation: Operation) -> list[dict[str, Any]]:
+        site = self.__get_site(self.__field(operation, "site_id", (int, str)))
+        if site.owner.id != self.user.id and self.user.role != UserRole.ADMIN:
+            raise CommandError(f"Sem permissão para excluir o site {site.id}.")
+
+        job = cascade.delete_site(self.context, site, self.__batch_size(operation))
+        return [{"op": "delete-site", "id": site.id, "deleted": job.run()}]
+
+    # Users can delete or anonymize their own account; admins, any account.
+    def delete_user(self, operation: Operation) -> list[dict[str, Any]]:
+        user = self.__get_account(self.__field(operation, "username", str))
+        job = cascade.delete_user(self.context, user, self.__batch_size(operation))
+        return [{"op": "delete-user", "id": user.id, "deleted": job.run()}]
+
+    def anonymize_user(self, operation: Operation) -> list[dict[str, Any]]:
+        user = self.__get_account(self.__field(operation, "username", str))
+        job = cascade.anonymize_user(self.context, user, self.__batch_size(operation))
+        job.run()
+        return [{"op": "anonymize-user", "id": user.id, "username": user.username}]
+
+    def __get_account(self, username: str) -> User:
+        user = self.__get_user(username)
+        if user.id != self.user.id and self.user.role != UserRole.ADMIN:
+            raise CommandError(f"Sem permissão para alterar a conta {username}.")
+
+        return user
+
+    @staticmethod
+    def __batch_size(operation: Operation) -> int:
+        batch_size = int(
+            BatchRunner.__field(operation, "batch_size", (int, str), cascade.BATCH_SIZE)
+        )
+        if batch_size < 1:
+            raise CommandError("O tamanho do lote deve ser positivo.")
+
+        return batch_size
+
+    def __get_site(self, site_id: int) -> Site:
+        try:
+            return self.context.site_repo.get_site_by_id(int(site_id))
+        except KeyError:
+            raise CommandError(f"Site não encontrado: {site_id}")
+
+    def __get_managed_site(self, site_id: int, capability: Capability) -> Site:
+        site = self.__get_site(site_id)
+        if not self.context.permission_repo.has_permission(self.user, site, capability):
+            raise CommandError(f"Sem permissão para gerenciar o site {site.id}.")
+
+        return site
+
+    def __get_user(self, username: str) -> User:
+        user = self.context.user_repo.get_user_by_username(username)
+        if not user:
+            raise CommandError(f"Usuário não encontrado: {username}")
+
+        return user
+
+    def __get_site_post(self, site: Site, post_id: int | None) -> Post | None:
+        if post_id is None:
+            return None
+
+        try:
+            post = self.context.post_repo.get_post_by_id(int(post_id))
+        except KeyError:
+            raise CommandError(f"Post não encontrado: {post_id}")
+        if post.site.id != site.id:
+            raise CommandError(f"O post {post.id} não pertence ao site {site.id}.")
+
+        return post
+
+    def __build_block(self, site: Site, order: int, block: Any) -> ContentBlock:
+        if not isinstance(block, dict):
+            raise CommandError(f"Bloco inválido: {json.dumps(block)}")
+
+        block_type = self.__field(block, "type", str)
+        if block_type == "text":
+            return TextBlock(order=order, text=self.__field(block, "text", str))
+
+        if block_type == "media":
+            media_id = self.__field(block, "media_id", (int, str))
+            try:
+                media = self.context.media_repo.get_media_by_id(int(media_id))
+            except KeyError:
+                raise CommandError(f"Mídia não encontrada: {media_id}")
+            if media.site.id != site.id:
+                raise CommandError(
+                    f"A mídia {media.id} não pertence ao site {site.id}."
+                )
+
+            return MediaBlock(
+                order=order, media=media, alt=self.__field(block, "alt", str, "")
+            )
+
+        raise CommandError(f"Tipo de bloco desconhecido: {block_type}")
+
+    # Operations come from JSON written outside the CLI, so every field is
+    # checked before use. A default of None makes the field nullable.
+    @staticmethod
+    def __field(
+        operation: Operation,
+        name: str,
+        kind: type | tuple[type, ...],
+        default: Any = _REQUIRED,
+    ) -> Any:
+        value = operation.get(name, default)
+        if value is _REQUIRED:
+            raise CommandError(f"Campo obrigatório ausente: {name}")
+        if value is None and default is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, kind):
+            raise CommandError(f"Valor inválido para {name}: {json.dumps(value)}")
+
+        return value
+
+    @staticmethod
+    def __write_results(results: list[dict[str, Any]], out: TextIO):
+        out.writelines(json.dumps(result) + "\n" for result in results)
+
+
+# Markdown posts: the first "# " heading is the title, each paragraph becomes a
+# TextBlock and a line like ![alt](media:3) becomes a MediaBlock.
+def read_post_file(path: Path) -> Operation:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        operation = json.loads(text)
+        if not isinstance(operation, dict):
+            raise CommandError(f"Post inválido em {path}")
+        return operation
+
+    title = ""
+    blocks: list[dict[str, Any]] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+
+        media = _markdown_media.match(paragraph)
+        if paragraph.startswith("# ") and not title:
+            title = paragraph[2:].strip()
+        elif media:
+            blocks.append(
+                {
+                    "type": "media",
+                    "media_id": media["media_id"],
+                    "alt": media["alt"],
+                }
+            )
+        else:
+            blocks.append({"type": "text", "text": paragraph})
+
+    return {"title": title or path.stem, "blocks": blocks}
+
+
+# Timestamps with an offset are converted to local time, which is how every
+# datetime of the models is stored.
+def parse_datetime(value: str) -> datetime:
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo:
+        moment = moment.astimezone().replace(tzinfo=None)
+
+    return moment
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Operações em lote do CMS.")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument(
+        "--snapshot",
+        type=Path,
+        help="Carrega o estado deste snapshot (se existir) e o atualiza ao final.",
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        help="Diretório com checkpoint e write-ahead log; cada alteração é registrada.",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Particiona os dados dos sites entre este número de shards.",
+    )
+    commands = parser.add_subparsers(dest="op", required=True)
+
+    create_site = commands.add_parser("create-site")
+    create_site.add_argument("--name", required=True)
+    create_site.add_argument("--description", default="")
+
+    create_post = commands.add_parser("create-post")
+    create_post.add_argument("--site-id", type=int, required=True)
+    create_post.add_argument("--file", required=True, help="Arquivo .json ou .md")
+    create_post.add_argument("--language")
+    create_post.add_argument("--scheduled-to", help="Data ISO 8601")
+
+    import_media = commands.add_parser("import-media")
+    import_media.add_argument("--site-id", type=int, required=True)
+    import_media.add_argument("paths", nargs="+")
+
+    grant = commands.add_parser("grant-permission")
+    grant.add_argument("--site-id", type=int, required=True)
+    grant.add_argument("--user", dest="username_to_grant", required=True)
+    grant.add_argument(
+        "--role", choices=[r.name.lower() for r in SiteRole], default="editor"
+    )
+    grant.add_argument("--post-id", type=int, help="Papel apenas neste post")
+
+    revoke = commands.add_parser("revoke-permission")
+    revoke.add_argument("--site-id", type=int, required=True)
+    revoke.add_argument("--user", dest="username_to_grant", required=True)
+    revoke.add_argument("--post-id", type=int)
+
+    report = commands.add_parser("report")
+    report.add_argument("--site-id", type=int, help="Padrão: todos os sites")
+    report.add_argument("--format", choices=["json", "csv"], default="json")
+    report.add_argument("--workers", type=int, help="Processos para a contagem")
+
+    log_view = commands.add_parser("log-view")
+    log_view.add_argument("--post-id", type=int, required=True)
+    log_view.add_argument("--platform", choices=[m.name.lower() for m in SocialMedia])
+
+    delete_site = commands.add_parser(
+        "delete-site", help="Exclui o site com tudo o que há nele."
+    )
+    delete_site.add_argument("--site-id", type=int, required=True)
+    delete_site.add_argument("--batch-size", type=int, help="Registros por lote")
+
+    delete_user = commands.add_parser(
+        "delete-user", help="Exclui o usuário com tudo o que ele criou."
+    )
+    delete_user.add_argument("--user", dest="username_to_grant", required=True)
+    delete_user.add_argument("--batch-size", type=int, help="Registros por lote")
+
+    anonymize = commands.add_parser(
+        "anonymize-user", help="Apaga os dados pessoais e mantém o conteúdo."
+    )
+    anonymize.add_argument("--user", dest="username_to_grant", required=True)
+    anonymize.add_argument("--batch-size", type=int, help="Registros por lote")
+
+    commands.add_parser("bulk", help="Lê operações JSONL da entrada padrão.")
+
+    save = commands.add_parser(
+        "save-snapshot", help="Salva o estado atual (ex.: o seed de main.py)."
+    )
+    save.add_argument("--output", type=Path, required=True)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    wal: WriteAheadLog | None = None
+    if args.data_dir:
+        wal = WriteAheadLog(args.data_dir, shards=args.shards)
+        context = wal.context
+        if not wal.recovered:
+            populate(context)
+    elif args.snapshot and args.snapshot.exists():
+        context = load_snapshot_file(args.snapshot, args.shards)
+    else:
+        context = AppContext(args.shards)
+        populate(context)
+
+    try:
+        user = context.user_repo.validate_user(args.username, args.password)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    else:
+        status = _run_command(args, BatchRunner(context, user))
+    finally:
+        if wal:
+            wal.close()
+
+    if args.snapshot and args.op != "report":
+        save_snapshot_file(context, args.snapshot)
+
+    return status
+
+
+def _run_command(args: argparse.Namespace, runner: BatchRunner) -> int:
+    if args.op == "bulk":
+        return 1 if runner.run_stream(sys.stdin, sys.stdout) else 0
+
+    if args.op == "save-snapshot":
+        save_snapshot_file(runner.context, args.output)
+        return 0
+
+    operation: Operation = {
+        key: value
+        for key, value in vars(args).items()
+        if value is not None
+        and key not in ("username", "password", "snapshot", "data_dir", "shards")
+    }
+    if args.op in (
+        "grant-permission",
+        "revoke-permission",
+        "delete-user",
+        "anonymize-user",
+    ):
+        operation["username"] = operation.pop("username_to_grant")
+
+    try:
+        results = runner.run(operation) + runner.flush()
+    except (CommandError, ValueError, KeyError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if args.op == "report":
+        write_reports(results, args.format, sys.stdout)
+    else:
+        for result in results:
+            print(json.dumps(result))
+
+    return 0
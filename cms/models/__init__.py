@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from enum import Enum
+from enum import Enum, IntFlag, auto
 from pathlib import Path
 from abc import ABC, abstractmethod
 from typing import TypedDict
@@ -11,6 +11,43 @@ class UserRole(Enum):
     USER = 2
 
 
+class SiteRole(Enum):
+    OWNER = "Dono"
+    EDITOR = "Editor"
+    MODERATOR = "Moderador"
+    VIEWER = "Leitor"
+
+
+# What a role allows, as a bitset: checking one capability is a single AND.
+class Capability(IntFlag):
+    CREATE_POST = auto()
+    EDIT_POST = auto()
+    MANAGE_MEDIA = auto()
+    MODERATE_COMMENTS = auto()
+    VIEW_ANALYTICS = auto()
+    CONFIGURE_SITE = auto()
+    MANAGE_ROLES = auto()
+
+
+ROLE_CAPABILITIES: dict[SiteRole, Capability] = {
+    SiteRole.OWNER: Capability.CREATE_POST
+    | Capability.EDIT_POST
+    | Capability.MANAGE_MEDIA
+    | Capability.MODERATE_COMMENTS
+    | Capability.VIEW_ANALYTICS
+    | Capability.CONFIGURE_SITE
+    | Capability.MANAGE_ROLES,
+    SiteRole.EDITOR: Capability.CREATE_POST
+    | Capability.EDIT_POST
+    | Capability.MANAGE_MEDIA
+    | Capability.MODERATE_COMMENTS
+    | Capability.VIEW_ANALYTICS
+    | Capability.CONFIGURE_SITE,
+    SiteRole.MODERATOR: Capability.MODERATE_COMMENTS | Capability.VIEW_ANALYTICS,
+    SiteRole.VIEWER: Capability.VIEW_ANALYTICS,
+}
+
+
 class MediaType(Enum):
     IMAGE = 1
     VIDEO = 2
@@ -21,6 +58,7 @@ class SiteTemplateType(Enum):
     TOP_COMMENTS_FIRST = "Posts mais comentados"
     LATEST_POSTS = "Últimos posts"
     FOCUS_ON_MEDIA = "Galeria de mídia"
+    TRENDING = "Em alta"
 
 
 type LanguageCode = str
@@ -60,6 +98,11 @@ class User:
     role: UserRole
 
 
+# Host names of the sites and of their media, from the site's domain.
+SITE_HOST = "www.cms.{}.com.br"
+MEDIA_HOST = "www.cms-media.{}.com.br"
+
+
 @dataclass
 class Site:
     id: int = field(init=False)
@@ -67,19 +110,23 @@ class Site:
     name: str
     description: str
     template: SiteTemplateType = SiteTemplateType.LATEST_POSTS
+    # Bumped on every update, for compare-and-swap in the repositories.
+    version: int = field(init=False, default=0, compare=False)
 
     def get_domain(self) -> str:
         return self.name.lower().replace(" ", "-")
 
     def get_url(self) -> str:
-        domain = self.get_domain()
-        return f"https://www.cms.{domain}.com.br"
+        return f"https://{SITE_HOST.format(self.get_domain())}"
 
 
 @dataclass
 class Permission:
     user: User
     site: Site
+    role: SiteRole = SiteRole.EDITOR
+    # Per-post override: on this post the role replaces the one on the site.
+    post: "Post | None" = None
 
 
 @dataclass
@@ -93,11 +140,11 @@ class MediaFile(ABC):
     width: str
     height: str
     duration: float | None
+    version: int = field(init=False, default=0, compare=False)
 
     @property
     def url(self):
-        site_domain = self.site.get_domain()
-        return f"https://www.cms-media.{site_domain}.com.br/{self.filename}"
+        return f"https://{MEDIA_HOST.format(self.site.get_domain())}/{self.filename}"
 
     @property
     def dimension(self):
@@ -116,6 +163,9 @@ class ContentBlock(ABC):
     def get_content(self) -> str:
         pass
 
+    def get_medias(self) -> list[MediaFile]:
+        return []
+
 
 @dataclass
 class TextBlock(ContentBlock):
@@ -140,6 +190,9 @@ class MediaBlock(ContentBlock):
 
         return content
 
+    def get_medias(self) -> list[MediaFile]:
+        return [self.media]
+
 
 @dataclass
 class CaroulselBlock(ContentBlock):
@@ -149,6 +202,9 @@ class CaroulselBlock(ContentBlock):
     def get_content(self) -> str:
         return ""
 
+    def get_medias(self) -> list[MediaFile]:
+        return self.medias
+
 
 @dataclass
 class Content(ABC):
@@ -167,9 +223,18 @@ class Post:
     __content_by_language: dict[LanguageCode, Content] = field(
         init=False, default_factory=dict[LanguageCode, Content]
     )
+    __content_version: int = field(init=False, default=0)
 
     def add_content(self, lang: LanguageCode, content: Content):
         self.__content_by_language[lang] = content
+        self.__content_version += 1
+
+    @property
+    def content_version(self) -> int:
+        return self.__content_version
+
+    def has_language(self, lang: LanguageCode) -> bool:
+        return lang in self.__content_by_language
 
     @property
     def default_language(self) -> Language:
@@ -178,10 +243,16 @@ class Post:
         return next(iter(self.__content_by_language.values())).language
 
     def is_visible(self) -> bool:
-        return self.scheduled_to >= datetime.now()
+        return self.scheduled_to <= datetime.now()
 
-    def display_post(self, language: Language | None = None):
-        content = self.get_content_by_language(language)
+    def get_url(self) -> str:
+        return f"{self.site.get_url()}/?post={self.id}"
+
+    # The content comes from the caller (e.g. resolved by the content
+    # negotiator); without it, the default language is shown.
+    def display_post(self, content: Content | None = None):
+        if not content:
+            content = self.get_content_by_language()
 
         print(f"[{content.language.code}] ", content.title)
         print(f"Data de criação: {self.created_at}")
@@ -219,7 +290,7 @@ class Post:
             s += "\n" if len(block_to_display.get_content()) < SIZE_LIMIT else "...\n"
 
         s += "\n"
-        s += f"Veja o post completo em: {self.site.get_url()}\n"
+        s += f"Veja o post completo em: {self.get_url()}\n"
 
         return s
 
@@ -241,6 +312,9 @@ class Post:
 
         return self.__content_by_language[self.default_language.code].title
 
+    def get_contents(self) -> dict[LanguageCode, Content]:
+        return dict(self.__content_by_language)
+
     def get_languages(self) -> list[Language]:
         return [content.language for content in self.__content_by_language.values()]
 
@@ -248,6 +322,20 @@ class Post:
         return self.__content_by_language[self.default_language.code].body
 
 
+# Where a media is shown: a block of one language of a post.
+@dataclass
+class MediaUsage:
+    post: Post
+    language: LanguageCode
+    block: ContentBlock
+
+
+class ModerationStatus(Enum):
+    APPROVED = "Aprovado"
+    HELD = "Aguardando moderação"
+    REJECTED = "Rejeitado"
+
+
 @dataclass
 class Comment:
     id: int = field(init=False)
@@ -255,12 +343,32 @@ class Comment:
     commenter: User
     body: str
     created_at: datetime = field(default_factory=datetime.now)
+    parent: "Comment | None" = field(default=None, repr=False, compare=False)
+    status: ModerationStatus = field(default=ModerationStatus.APPROVED, compare=False)
+    # Materialized path: ids from the thread root down to this comment, set
+    # by the repository when the comment is stored.
+    path: tuple[int, ...] = field(init=False, default=(), compare=False)
+
+    @property
+    def depth(self) -> int:
+        return len(self.path) - 1
+
+    @property
+    def thread_id(self) -> int:
+        return self.path[0]
+
+
+class CommentSort(Enum):
+    NEWEST = "Mais recentes"
+    MOST_REPLIED = "Mais respondidos"
 
 
 @dataclass(kw_only=True)
 class AnalyticsEntry(ABC):
     id: int = field(init=False)
-    user: User
+    # None for what the system does by itself, like publishing a scheduled
+    # post.
+    user: User | None
     created_at: datetime = field(default_factory=datetime.now)
     metadata: dict[str, str] = field(default_factory=dict[str, str])
 
@@ -268,11 +376,15 @@ class AnalyticsEntry(ABC):
     def display_log(self):
         pass
 
+    def get_username(self) -> str:
+        return self.user.username if self.user else "sistema"
+
 
 class SiteAction(Enum):
     ACCESS = 1
     CREATE_POST = 2
     UPLOAD_MEDIA = 3
+    PUBLISH_POST = 4
 
 
 @dataclass(kw_only=True)
@@ -282,7 +394,7 @@ class SiteAnalyticsEntry(AnalyticsEntry):
 
     def display_log(self):
         print(
-            f"{self.site.name} - {self.user.username}@{self.created_at.strftime('%Y-%m-%d %H:%M:%S')} - {str(self.action)}"
+            f"{self.site.name} - {self.get_username()}@{self.created_at.strftime('%Y-%m-%d %H:%M:%S')} - {str(self.action)}"
         )
 
 
@@ -292,33 +404,76 @@ class PostAction(Enum):
     SHARE = 3
 
 
+class SocialMedia(Enum):
+    TWITTER = "Twitter"
+    FACEBOOK = "Facebook"
+    INSTAGRAM = "Instagram"
+
+
 @dataclass(kw_only=True)
 class PostAnalyticsEntry(AnalyticsEntry):
     site: Site
     post: Post
     action: PostAction
+    # For a SHARE, where the post was shared (and in which language). For a
+    # VIEW, the platform the visitor came from through a shared link.
+    platform: SocialMedia | None = None
+    language: LanguageCode | None = None
 
     def display_log(self):
         print(f"{self.site.name} - {self.post.get_default_title()[:40]}")
+        via = f" ({self.platform.value})" if self.platform else ""
         print(
-            f"  {self.user.username}@{self.created_at.strftime('%Y-%m-%d %H:%M:%S')} - {str(self.action)}"
+            f"  {self.get_username()}@{self.created_at.strftime('%Y-%m-%d %H:%M:%S')} - {str(self.action)}{via}"
         )
 
 
 ReportItem = TypedDict("ReportItem", {"name": str, "value": str})
 ReportSection = TypedDict("ReportSection", {"title": str, "items": list[ReportItem]})
 
+type ActionCounts = dict[SiteAction | PostAction, int]
+
 
 # The ideia here is to create a generic function that prints the report not caring
 # if it is from a site or from a post. It just knows the basic structure of a report
 @dataclass
 class AnalyticsReport(ABC):
     entries: list[AnalyticsEntry]
+    # Pre-aggregated counts (e.g. from the reporting engine) take the place of
+    # the entries when given.
+    counts: ActionCounts | None = field(default=None, kw_only=True)
+    # Distinct users per action, usually estimated by the repository sketches.
+    # Without it they are counted exactly from the entries.
+    unique_users: ActionCounts | None = field(default=None, kw_only=True)
 
     @abstractmethod
     def generate_metrics(self) -> list[ReportSection]:
         pass
 
+    def get_action_counts(self) -> ActionCounts:
+        if self.counts is None:
+            self.counts = {}
+            for entry in self.entries:
+                if isinstance(entry, (SiteAnalyticsEntry, PostAnalyticsEntry)):
+                    self.counts[entry.action] = self.counts.get(entry.action, 0) + 1
+
+        return self.counts
+
+    def get_unique_users(self, action: SiteAction | PostAction) -> int:
+        if self.unique_users is None:
+            self.unique_users = {}
+            users: dict[SiteAction | PostAction, set[int]] = {}
+            for entry in self.entries:
+                if (
+                    isinstance(entry, (SiteAnalyticsEntry, PostAnalyticsEntry))
+                    and entry.user
+                ):
+                    users.setdefault(entry.action, set()).add(entry.user.id)
+            for entry_action, ids in users.items():
+                self.unique_users[entry_action] = len(ids)
+
+        return self.unique_users.get(action, 0)
+
 
 @dataclass
 class SiteAnalyticsReport(AnalyticsReport):
@@ -331,6 +486,10 @@ class SiteAnalyticsReport(AnalyticsReport):
                 "items": [
                     {"name": "Nome", "value": self.site.name},
                     {"name": "Acessos ao site", "value": str(self.get_site_accesses())},
+                    {
+                        "name": "Visitantes únicos",
+                        "value": str(self.get_unique_users(SiteAction.ACCESS)),
+                    },
                     {
                         "name": "Posts criados",
                         "value": str(self.get_site_post_creation_count()),
@@ -348,6 +507,10 @@ class SiteAnalyticsReport(AnalyticsReport):
                         "name": "Visualizações totais",
                         "value": str(self.get_site_total_post_views()),
                     },
+                    {
+                        "name": "Leitores únicos",
+                        "value": str(self.get_unique_users(PostAction.VIEW)),
+                    },
                     {
                         "name": "Comentários totais",
                         "value": str(self.get_site_total_post_comments()),
@@ -370,13 +533,7 @@ class SiteAnalyticsReport(AnalyticsReport):
         return self._get_site_info_by_action(SiteAction.UPLOAD_MEDIA)
 
     def _get_site_info_by_action(self, action: SiteAction) -> int:
-        return len(
-            [
-                entry
-                for entry in self.entries
-                if isinstance(entry, SiteAnalyticsEntry) and entry.action == action
-            ]
-        )
+        return self.get_action_counts().get(action, 0)
 
     def get_site_total_post_views(self) -> int:
         return self._get_site_total_post_info_by_action(PostAction.VIEW)
@@ -388,13 +545,7 @@ class SiteAnalyticsReport(AnalyticsReport):
         return self._get_site_total_post_info_by_action(PostAction.COMMENT)
 
     def _get_site_total_post_info_by_action(self, action: PostAction) -> int:
-        return len(
-            [
-                entry
-                for entry in self.entries
-                if isinstance(entry, PostAnalyticsEntry) and entry.action == action
-            ]
-        )
+        return self.get_action_counts().get(action, 0)
 
 
 @dataclass
@@ -407,6 +558,10 @@ class PostAnalyticsReport(AnalyticsReport):
                 "title": "Interações com os Posts",
                 "items": [
                     {"name": "Visualizações", "value": str(self.get_post_views())},
+                    {
+                        "name": "Leitores únicos",
+                        "value": str(self.get_unique_users(PostAction.VIEW)),
+                    },
                     {"name": "Comentários", "value": str(self.get_post_comments())},
                     {"name": "Compartilhamentos", "value": str(self.get_post_shares())},
                 ],
@@ -423,10 +578,4 @@ class PostAnalyticsReport(AnalyticsReport):
         return self._get_post_info_by_action(PostAction.COMMENT)
 
     def _get_post_info_by_action(self, action: PostAction) -> int:
-        return len(
-            [
-                entry
-                for entry in self.entries
-                if isinstance(entry, PostAnalyticsEntry) and entry.action == action
-            ]
-        )
+        return self.get_action_counts().get(action, 0)
@@ -11,6 +11,7 @@ from cms.models import (
     Site,
     SiteAction,
     SiteAnalyticsEntry,
+    SiteRole,
     TextBlock,
     User,
     UserRole,
@@ -51,7 +52,9 @@ def populate(context: AppContext):
         owner=admin, name="Meu blog", description="Meus pensamentos e dia-a-dia."
     )
     context.site_repo.add_site(site)
-    context.permission_repo.grant_permission(Permission(user=admin, site=site))
+    context.permission_repo.grant_permission(
+        Permission(user=admin, site=site, role=SiteRole.OWNER)
+    )
     _populate_medias(context, admin, site)
     post1 = Post(poster=admin, site=site)
     post1.add_content(
@@ -141,7 +144,9 @@ def populate(context: AppContext):
     )
 
     comment1_post1 = Comment(post=post1, commenter=user1, body="Nice post bro.")
-    comment2_post1 = Comment(post=post1, commenter=user2, body="Thanks!")
+    comment2_post1 = Comment(
+        post=post1, commenter=user2, body="Thanks!", parent=comment1_post1
+    )
     comment3_post1 = Comment(post=post1, commenter=user2, body="A second comment!")
     context.comment_repo.add_comment(comment1_post1)
     context.comment_repo.add_comment(comment2_post1)
@@ -1,10 +1,27 @@
-from datetime import datetime
-from typing import Iterator
+import bisect
+import heapq
+import re
+import secrets
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from datetime import date, datetime
+from enum import Enum
 from itertools import count
+from typing import Any
+
 from cms.models import (
+    ROLE_CAPABILITIES,
+    ActionCounts,
     AnalyticsEntry,
+    Capability,
     Comment,
+    CommentSort,
+    Content,
+    LanguageCode,
+    MediaBlock,
     MediaFile,
+    MediaUsage,
+    ModerationStatus,
     Permission,
     Post,
     PostAction,
@@ -12,33 +29,150 @@ from cms.models import (
     Site,
     SiteAction,
     SiteAnalyticsEntry,
+    SiteRole,
+    SiteTemplateType,
+    SocialMedia,
     User,
+    UserRole,
 )
+from cms.sketches import HyperLogLog
+
+
+class Mutation(Enum):
+    ADD_USER = 1
+    DELETE_USER = 2
+    ADD_SITE = 3
+    GRANT_PERMISSION = 4
+    ADD_MEDIA = 5
+    REMOVE_MEDIA = 6
+    ADD_POST = 7
+    ADD_CONTENT = 8
+    ADD_COMMENT = 9
+    LOG = 10
+    UPDATE_SITE_TEMPLATE = 11
+    SET_COMMENT_STATUS = 12
+    REVOKE_PERMISSION = 13
+    DELETE_SITE = 14
+    DELETE_POST = 15
+    DELETE_COMMENTS = 16
+    DELETE_ENTRIES = 17
+    ANONYMIZE_USER = 18
+    REVOKE_SITE_PERMISSIONS = 19
+
+
+type MutationListener = Callable[[Mutation, Any], None]
+
+LOCK_STRIPES = 64
+
+
+class VersionConflictError(ValueError):
+    pass
+
+
+# Raised when a new site or media would take a URL that is already in use.
+class RouteConflictError(ValueError):
+    pass
+
+
+# One label of a host name (accented letters are fine in IDNs).
+DOMAIN_PATTERN = re.compile(r"[\w-]+")
+
+
+def check_domain(domain: str, sites_by_domain: dict[str, Site]):
+    if not DOMAIN_PATTERN.fullmatch(domain):
+        raise ValueError(f"O nome do site não forma um domínio válido: {domain!r}.")
+    if domain in sites_by_domain:
+        raise RouteConflictError(f"O domínio {domain} já está em uso por outro site.")
+
+
+def check_media_filename(media: MediaFile, existing: MediaFile | None):
+    if existing:
+        raise RouteConflictError(
+            f"Já existe uma mídia com o nome {media.filename} neste site."
+        )
+
+
+def check_version(entity: str, current: int, expected: int | None):
+    if expected is not None and current != expected:
+        raise VersionConflictError(
+            f"{entity} foi alterado(a) por outro usuário enquanto você editava "
+            f"(versão atual {current}, esperada {expected})."
+        )
+
+
+# Compare-and-swap updates only lock the stripe of the entity they change, so
+# writers of different entities never wait on each other and there is no
+# global lock to contend on.
+class StripedLock:
+    __locks: list[threading.Lock]
+
+    def __init__(self, stripes: int = LOCK_STRIPES):
+        self.__locks = [threading.Lock() for _ in range(stripes)]
+
+    def for_id(self, entity_id: int) -> threading.Lock:
+        return self.__locks[entity_id % len(self.__locks)]
 
 
-class UserRepository:
+# Removes one record from a reverse index (key -> records by id), dropping the
+# key once it has none left.
+def pop_indexed(index: dict[int, dict[int, Any]], key: int, record_id: int):
+    records = index.get(key)
+    if records is not None:
+        records.pop(record_id, None)
+        if not records:
+            del index[key]
+
+
+# Lets durability layers (e.g. the write-ahead log) observe every change made
+# through the public repository API. restore_* methods are not observed.
+class ObservableRepository:
+    __mutation_listeners: list[MutationListener]
+
+    def __init__(self):
+        self.__mutation_listeners = []
+
+    def watch(self, listener: MutationListener):
+        self.__mutation_listeners.append(listener)
+
+    def _notify(self, mutation: Mutation, payload: Any):
+        for listener in self.__mutation_listeners:
+            listener(mutation, payload)
+
+
+class UserRepository(ObservableRepository):
     __users: dict[int, User]
+    __ids_by_username: dict[str, int]
     __id_counter: Iterator[int]
 
     def __init__(self):
+        super().__init__()
         self.__users = {}
+        self.__ids_by_username = {}
         self.__id_counter = count(1)
 
     def add_user(self, user: User) -> int:
-        user_id = next(self.__id_counter)
-        user.id = user_id
-        self.__users.update({user_id: user})
-        return user_id
+        user.id = next(self.__id_counter)
+        self.__store_user(user)
+        self._notify(Mutation.ADD_USER, user)
+        return user.id
+
+    def restore_user(self, user: User):
+        self.__store_user(user)
+        self.__id_counter = count(user.id + 1)
+
+    def __store_user(self, user: User):
+        self.__users.update({user.id: user})
+        self.__ids_by_username.setdefault(user.username, user.id)
 
     def get_users(self) -> list[User]:
         return list(self.__users.values())
 
+    def get_user_by_username(self, username: str) -> User | None:
+        user_id = self.__ids_by_username.get(username)
+        return self.__users.get(user_id) if user_id else None
+
     def validate_user(self, username: str, password: str) -> User:
-        selected_user = None
-        for user in self.__users.values():
-            if user.username == username:
-                selected_user = user
-                break
+        selected_user = self.get_user_by_username(username)
 
         if not selected_user:
             raise ValueError("Credenciais inválidas.")
@@ -48,31 +182,235 @@ class UserRepository:
 
         return selected_user
 
+    # Only removes the account: cms.cascade removes what refers to it first.
     def delete_user(self, user_id: int):
-        self.__users.pop(user_id)
+        user = self.__users.pop(user_id)
+        if self.__ids_by_username.get(user.username) == user_id:
+            self.__ids_by_username.pop(user.username)
+        self._notify(Mutation.DELETE_USER, user)
+
+    # Erases the personal data of the account but keeps it, so everything it
+    # created stays in place. Nobody can log in to it afterwards.
+    def anonymize_user(self, user: User):
+        if self.__ids_by_username.get(user.username) == user.id:
+            self.__ids_by_username.pop(user.username)
 
+        user.first_name = "Usuário"
+        user.last_name = "anônimo"
+        user.email = ""
+        user.username = f"anonimo-{user.id}"
+        user.password = secrets.token_urlsafe(32)
+        user.role = UserRole.USER
+        self.__ids_by_username.setdefault(user.username, user.id)
+        self._notify(Mutation.ANONYMIZE_USER, user)
 
-class AnalyticsRepository:
+
+type AnalyticsListener = Callable[[AnalyticsEntry], None]
+# (site id, post id or 0 for the whole site) -> action -> day -> sketch
+type UniqueUsersSketches = dict[
+    tuple[int, int], dict[SiteAction | PostAction, dict[date, HyperLogLog]]
+]
+
+
+# Entries are also indexed by user, site and post, so deleting the entries of
+# one of them touches only those.
+class AnalyticsRepository(ObservableRepository):
     __entries: dict[int, AnalyticsEntry]
+    __entries_by_user: dict[int, dict[int, AnalyticsEntry]]
+    __entries_by_site: dict[int, dict[int, AnalyticsEntry]]
+    __entries_by_post: dict[int, dict[int, AnalyticsEntry]]
+    __listeners: list[AnalyticsListener]
+    __unique_users: UniqueUsersSketches
+    __platform_counts: dict[tuple[int, PostAction], dict[SocialMedia, int]]
+    # (site id, action) -> post id -> entries, kept up to date as entries are
+    # logged and deleted, so ranking a site's posts reads no entries at all.
+    __post_counts: dict[tuple[int, PostAction], dict[int, int]]
     __id_counter: Iterator[int]
+    __lock: threading.Lock
 
     def __init__(self):
+        super().__init__()
         self.__entries = {}
+        self.__entries_by_user = {}
+        self.__entries_by_site = {}
+        self.__entries_by_post = {}
+        self.__listeners = []
+        self.__unique_users = {}
+        self.__platform_counts = {}
+        self.__post_counts = {}
         self.__id_counter = count(1)
+        self.__lock = threading.Lock()
+
+    def subscribe(self, listener: AnalyticsListener):
+        self.__listeners.append(listener)
 
     def log(self, entry: AnalyticsEntry) -> int:
-        entry_id = next(self.__id_counter)
-        entry.id = entry_id
-        self.__entries.update({entry_id: entry})
-        return entry_id
+        entry.id = next(self.__id_counter)
+        self.__store_entry(entry)
+        self._notify(Mutation.LOG, entry)
+        return entry.id
+
+    def restore_entry(self, entry: AnalyticsEntry):
+        self.__store_entry(entry)
+        self.__id_counter = count(entry.id + 1)
+
+    def iter_entries(self) -> Iterator[AnalyticsEntry]:
+        return iter(self.__entries.values())
+
+    def __store_entry(self, entry: AnalyticsEntry):
+        with self.__lock:
+            self.__entries.update({entry.id: entry})
+            if entry.user:
+                self.__entries_by_user.setdefault(entry.user.id, {})[entry.id] = entry
+            if isinstance(entry, (SiteAnalyticsEntry, PostAnalyticsEntry)):
+                self.__entries_by_site.setdefault(entry.site.id, {})[entry.id] = entry
+            if isinstance(entry, PostAnalyticsEntry):
+                self.__entries_by_post.setdefault(entry.post.id, {})[entry.id] = entry
+        self.__count_unique_user(entry)
+
+        if isinstance(entry, PostAnalyticsEntry):
+            counts = self.__post_counts.setdefault((entry.site.id, entry.action), {})
+            counts[entry.post.id] = counts.get(entry.post.id, 0) + 1
+
+        if isinstance(entry, PostAnalyticsEntry) and entry.platform:
+            counts = self.__platform_counts.setdefault(
+                (entry.post.id, entry.action), {}
+            )
+            counts[entry.platform] = counts.get(entry.platform, 0) + 1
+
+        for listener in self.__listeners:
+            listener(entry)
+
+    def get_site_entries(self, site_id: int) -> list[AnalyticsEntry]:
+        return list(self.__entries_by_site.get(site_id, {}).values())
+
+    def iter_user_entries(self, user: User) -> Iterator[AnalyticsEntry]:
+        return iter(self.__entries_by_user.get(user.id, {}).values())
+
+    def iter_site_entries(self, site: Site) -> Iterator[AnalyticsEntry]:
+        return iter(self.__entries_by_site.get(site.id, {}).values())
+
+    def iter_post_entries(self, post: Post) -> Iterator[AnalyticsEntry]:
+        return iter(self.__entries_by_post.get(post.id, {}).values())
+
+    # The unique-user sketches of a site or post are dropped with its last
+    # entry; until then they still count deleted users (sketches cannot
+    # forget a single user). Returns the entries that were still stored.
+    def delete_entries(self, entries: list[AnalyticsEntry]) -> list[AnalyticsEntry]:
+        with self.__lock:
+            entries = [e for e in entries if self.__entries.pop(e.id, None)]
+            for entry in entries:
+                self.__unindex_entry(entry)
+        self._notify(Mutation.DELETE_ENTRIES, entries)
+        return entries
+
+    def __unindex_entry(self, entry: AnalyticsEntry):
+        if entry.user:
+            pop_indexed(self.__entries_by_user, entry.user.id, entry.id)
+        if not isinstance(entry, (SiteAnalyticsEntry, PostAnalyticsEntry)):
+            return
+
+        pop_indexed(self.__entries_by_site, entry.site.id, entry.id)
+        if entry.site.id not in self.__entries_by_site:
+            self.__unique_users.pop((entry.site.id, 0), None)
+        if not isinstance(entry, PostAnalyticsEntry):
+            return
+
+        pop_indexed(self.__entries_by_post, entry.post.id, entry.id)
+        if entry.post.id not in self.__entries_by_post:
+            self.__unique_users.pop((entry.site.id, entry.post.id), None)
+
+        post_counts = self.__post_counts.get((entry.site.id, entry.action))
+        if post_counts and post_counts.get(entry.post.id):
+            post_counts[entry.post.id] -= 1
+            if not post_counts[entry.post.id]:
+                del post_counts[entry.post.id]
+
+        counts = self.__platform_counts.get((entry.post.id, entry.action))
+        if entry.platform and counts:
+            counts[entry.platform] -= 1
+            if not counts[entry.platform]:
+                del counts[entry.platform]
 
     def show_logs(self, limit: int = 5):
-        entries = sorted(
-            [e for e in self.__entries.values()], key=lambda x: x.created_at
-        )
-        for entry in entries[-limit:]:
+        for entry in self.get_latest_entries(limit):
             entry.display_log()
 
+    def get_latest_entries(self, limit: int) -> list[AnalyticsEntry]:
+        return heapq.nlargest(
+            limit, self.__entries.values(), key=lambda x: x.created_at
+        )[::-1]
+
+    def pop_site(self, site_id: int) -> list[AnalyticsEntry]:
+        with self.__lock:
+            entries = self.get_site_entries(site_id)
+            for entry in entries:
+                self.__entries.pop(entry.id)
+                self.__unindex_entry(entry)
+
+        for key in [key for key in self.__unique_users if key[0] == site_id]:
+            self.__unique_users.pop(key)
+        for action in PostAction:
+            self.__post_counts.pop((site_id, action), None)
+        for entry in entries:
+            if isinstance(entry, PostAnalyticsEntry):
+                self.__platform_counts.pop((entry.post.id, entry.action), None)
+        return entries
+
+    # Shares per platform, or visits that came through a shared link.
+    def get_post_platform_counts(
+        self, post_id: int, action: PostAction
+    ) -> dict[SocialMedia, int]:
+        return dict(self.__platform_counts.get((post_id, action), {}))
+
+    # Distinct users per action for a site (post_id=0) or one of its posts,
+    # merged over the daily buckets between start and end (inclusive).
+    def get_unique_users(
+        self,
+        site_id: int,
+        post_id: int = 0,
+        start: date | None = None,
+        end: date | None = None,
+    ) -> ActionCounts:
+        sketches = self.get_unique_users_sketches(site_id, post_id, start, end)
+        return {action: sketch.count() for action, sketch in sketches.items()}
+
+    def get_unique_users_sketches(
+        self,
+        site_id: int,
+        post_id: int = 0,
+        start: date | None = None,
+        end: date | None = None,
+    ) -> dict[SiteAction | PostAction, HyperLogLog]:
+        merged: dict[SiteAction | PostAction, HyperLogLog] = {}
+
+        for action, days in self.__unique_users.get((site_id, post_id), {}).items():
+            for day, sketch in days.items():
+                if (start and day < start) or (end and day > end):
+                    continue
+                if action in merged:
+                    merged[action].merge(sketch)
+                else:
+                    merged[action] = sketch.copy()
+
+        return merged
+
+    def __count_unique_user(self, entry: AnalyticsEntry):
+        if (
+            not isinstance(entry, (SiteAnalyticsEntry, PostAnalyticsEntry))
+            or not entry.user
+        ):
+            return
+
+        keys = [(entry.site.id, 0)]
+        if isinstance(entry, PostAnalyticsEntry):
+            keys.append((entry.site.id, entry.post.id))
+
+        day = entry.created_at.date()
+        for key in keys:
+            days = self.__unique_users.setdefault(key, {}).setdefault(entry.action, {})
+            days.setdefault(day, HyperLogLog()).add(entry.user.id)
+
     def get_site_accesses(self, site_id: int) -> int:
         return self._get_site_info_by_action(site_id, SiteAction.ACCESS)
 
@@ -86,10 +424,8 @@ class AnalyticsRepository:
         return len(
             [
                 entry
-                for entry in self.__entries.values()
-                if isinstance(entry, SiteAnalyticsEntry)
-                and entry.action == action
-                and site_id == entry.site.id
+                for entry in self.__entries_by_site.get(site_id, {}).values()
+                if isinstance(entry, SiteAnalyticsEntry) and entry.action == action
             ]
         )
 
@@ -105,15 +441,7 @@ class AnalyticsRepository:
     def _get_site_total_post_info_by_action(
         self, site_id: int, action: PostAction
     ) -> int:
-        return len(
-            [
-                entry
-                for entry in self.__entries.values()
-                if isinstance(entry, PostAnalyticsEntry)
-                and entry.action == action
-                and site_id == entry.site.id
-            ]
-        )
+        return sum(self.__post_counts.get((site_id, action), {}).values())
 
     def get_post_views(self, post_id: int) -> int:
         return self._get_post_info_by_action(post_id, PostAction.VIEW)
@@ -124,129 +452,832 @@ class AnalyticsRepository:
     def get_post_comments(self, post_id: int) -> int:
         return self._get_post_info_by_action(post_id, PostAction.COMMENT)
 
+    def get_site_post_counts(self, site_id: int, action: PostAction) -> dict[int, int]:
+        return dict(self.__post_counts.get((site_id, action), {}))
+
     def _get_post_info_by_action(self, post_id: int, action: PostAction) -> int:
         return len(
             [
                 entry
-                for entry in self.__entries.values()
-                if isinstance(entry, PostAnalyticsEntry)
-                and entry.action == action
-                and post_id == entry.post.id
+                for entry in self.__entries_by_post.get(post_id, {}).values()
+                if isinstance(entry, PostAnalyticsEntry) and entry.action == action
             ]
         )
 
 
-class SiteRepository:
+# Sites are also indexed by domain, which routes an incoming host name to its
+# site in O(1); the domain is derived from the name, so it is checked when the
+# site is created.
+class SiteRepository(ObservableRepository):
     __sites: dict[int, Site]
+    __sites_by_domain: dict[str, Site]
+    __sites_by_owner: dict[int, dict[int, Site]]
     __id_counter: Iterator[int]
+    __locks: StripedLock
+    __domain_lock: threading.Lock
 
     def __init__(self):
+        super().__init__()
         self.__sites = {}
+        self.__sites_by_domain = {}
+        self.__sites_by_owner = {}
         self.__id_counter = count(1)
+        self.__locks = StripedLock()
+        self.__domain_lock = threading.Lock()
 
     def add_site(self, site: Site) -> int:
-        site_id = next(self.__id_counter)
-        site.id = site_id
-        self.__sites.update({site_id: site})
+        with self.__domain_lock:
+            check_domain(site.get_domain(), self.__sites_by_domain)
+            site_id = next(self.__id_counter)
+            site.id = site_id
+            self.__store_site(site)
+        self._notify(Mutation.ADD_SITE, site)
         return site_id
 
+    # With expected_version, fails instead of overwriting a change made since
+    # the caller read the site.
+    def update_template(
+        self,
+        site: Site,
+        template: SiteTemplateType,
+        expected_version: int | None = None,
+    ):
+        with self.__locks.for_id(site.id):
+            check_version("O site", site.version, expected_version)
+            site.template = template
+            site.version += 1
+            self._notify(Mutation.UPDATE_SITE_TEMPLATE, site)
+
+    def restore_site(self, site: Site):
+        self.__store_site(site)
+        self.__id_counter = count(site.id + 1)
+
+    # Older data may hold clashing domains: the first site keeps the domain.
+    def __store_site(self, site: Site):
+        self.__sites.update({site.id: site})
+        self.__sites_by_domain.setdefault(site.get_domain(), site)
+        self.__sites_by_owner.setdefault(site.owner.id, {})[site.id] = site
+
+    def get_site_by_domain(self, domain: str) -> Site | None:
+        return self.__sites_by_domain.get(domain)
+
     def get_sites(self) -> list[Site]:
         return [site for site in self.__sites.values()]
 
+    def get_site_by_id(self, site_id: int) -> Site:
+        return self.__sites[site_id]
+
+    def iter_sites(self) -> Iterator[Site]:
+        return iter(self.__sites.values())
+
     def get_user_sites(self, user: User) -> list[Site]:
-        return [site for site in self.__sites.values() if site.owner.id == user.id]
+        return list(self.__sites_by_owner.get(user.id, {}).values())
+
+    # Only removes the site itself: cms.cascade removes its content first.
+    def delete_site(self, site: Site):
+        with self.__domain_lock:
+            self.pop_site(site.id)
+        self._notify(Mutation.DELETE_SITE, site)
+
+    def pop_site(self, site_id: int) -> Site:
+        site = self.__sites.pop(site_id)
+        if self.__sites_by_domain.get(site.get_domain()) is site:
+            del self.__sites_by_domain[site.get_domain()]
+        pop_indexed(self.__sites_by_owner, site.owner.id, site.id)
+        return site
+
+
+# The owner of a site always keeps the owner role on it, on every post too: a
+# post override would replace it there.
+def check_owner_role(
+    user: User, site: Site, role: SiteRole | None, post: Post | None = None
+):
+    if user.id != site.owner.id:
+        return
+    if post:
+        raise ValueError("O dono do site não pode ter um papel por post.")
+    if role != SiteRole.OWNER:
+        raise ValueError("O dono do site não pode perder o papel de dono.")
 
 
-class PermissionRepository:
-    __permissions: dict[tuple[int, int], Permission]
+ADMIN_CAPABILITIES = ROLE_CAPABILITIES[SiteRole.OWNER].value
+
+# (user id, site id, post id or 0 for the whole site)
+type PermissionKey = tuple[int, int, int]
+
+
+def permission_key(user: User, site: Site, post: Post | None = None) -> PermissionKey:
+    return user.id, site.id, post.id if post else 0
+
+
+# Capabilities of one user, compiled from all of their grants into plain int
+# bitsets (bit operations on IntFlag members are far slower).
+class CompiledAccess:
+    sites: dict[int, int]
+    # Only the posts with an override.
+    posts: dict[int, int]
 
     def __init__(self):
+        self.sites = {}
+        self.posts = {}
+
+
+class PermissionRepository(ObservableRepository):
+    __permissions: dict[PermissionKey, Permission]
+    __user_keys: dict[int, set[PermissionKey]]
+    __site_keys: dict[int, set[PermissionKey]]
+    # Only the keys of post overrides.
+    __post_keys: dict[int, set[PermissionKey]]
+    # Compiled lazily on the first check and dropped whenever the user's grants
+    # change, so a check is a dict lookup plus a bit test.
+    __access: dict[int, CompiledAccess]
+    __lock: threading.Lock
+
+    def __init__(self):
+        super().__init__()
         self.__permissions = {}
+        self.__user_keys = {}
+        self.__site_keys = {}
+        self.__post_keys = {}
+        self.__access = {}
+        self.__lock = threading.Lock()
 
     def grant_permission(self, permission: Permission):
-        self.__permissions.update(
-            {(permission.user.id, permission.site.id): permission}
+        check_owner_role(
+            permission.user, permission.site, permission.role, permission.post
         )
+        key = permission_key(permission.user, permission.site, permission.post)
+        with self.__lock:
+            self.__permissions[key] = permission
+            self.__user_keys.setdefault(permission.user.id, set()).add(key)
+            self.__site_keys.setdefault(permission.site.id, set()).add(key)
+            if permission.post:
+                self.__post_keys.setdefault(permission.post.id, set()).add(key)
+            self.__access.pop(permission.user.id, None)
+        self._notify(Mutation.GRANT_PERMISSION, permission)
+
+    def revoke_permission(
+        self, user: User, site: Site, post: Post | None = None
+    ) -> Permission | None:
+        if not post:
+            check_owner_role(user, site, None)
+        key = permission_key(user, site, post)
+        with self.__lock:
+            permission = self.__permissions.pop(key, None)
+            if not permission:
+                return None
+            self.__forget_key(key)
+        self._notify(Mutation.REVOKE_PERMISSION, permission)
+        return permission
+
+    # Every grant on the site and its posts, the owner's included: only for
+    # when the site itself is being deleted.
+    def revoke_site_permissions(self, site: Site) -> list[Permission]:
+        with self.__lock:
+            permissions = self.__pop_site_keys(site.id)
+        self._notify(Mutation.REVOKE_SITE_PERMISSIONS, site)
+        return permissions
 
-    def has_permission(self, user: User, site: Site) -> bool:
-        return True if self.__permissions.get((user.id, site.id)) else False
+    def iter_permissions(self) -> Iterator[Permission]:
+        return iter(self.__permissions.values())
+
+    def get_site_permissions(self, site: Site) -> list[Permission]:
+        keys = self.__site_keys.get(site.id, ())
+        return [self.__permissions[key] for key in list(keys)]
+
+    def iter_user_permissions(self, user: User) -> Iterator[Permission]:
+        return self.__iter_keys(self.__user_keys.get(user.id, ()))
+
+    def iter_post_permissions(self, post: Post) -> Iterator[Permission]:
+        return self.__iter_keys(self.__post_keys.get(post.id, ()))
+
+    # Over a copy of the keys, so the permissions can be revoked meanwhile.
+    def __iter_keys(self, keys: Iterable[PermissionKey]) -> Iterator[Permission]:
+        return (
+            permission
+            for key in list(keys)
+            if (permission := self.__permissions.get(key))
+        )
+
+    def get_role(
+        self, user: User, site: Site, post: Post | None = None
+    ) -> SiteRole | None:
+        permission = self.__permissions.get(permission_key(user, site, post))
+        return permission.role if permission else None
+
+    def get_capabilities(
+        self, user: User, site: Site, post: Post | None = None
+    ) -> Capability:
+        return Capability(self.__get_mask(user, site, post))
+
+    def has_permission(
+        self,
+        user: User,
+        site: Site,
+        capability: Capability,
+        post: Post | None = None,
+    ) -> bool:
+        bits = capability.value
+        return self.__get_mask(user, site, post) & bits == bits
 
     def get_not_managers(self, site: Site, repo: UserRepository) -> list[User]:
-        has_permission = [
+        has_role = {
             permission.user.id
-            for permission in self.__permissions.values()
-            if permission.site.id == site.id
-        ]
+            for permission in self.get_site_permissions(site)
+            if not permission.post
+        }
         users = repo.get_users()
 
-        return [user for user in users if user.id not in has_permission]
+        return [user for user in users if user.id not in has_role]
+
+    def pop_site(self, site_id: int) -> list[Permission]:
+        with self.__lock:
+            return self.__pop_site_keys(site_id)
+
+    def __pop_site_keys(self, site_id: int) -> list[Permission]:
+        keys = self.__site_keys.get(site_id, set()).copy()
+        permissions = [self.__permissions.pop(key) for key in keys]
+        for key in keys:
+            self.__forget_key(key)
+        return permissions
+
+    def __forget_key(self, key: PermissionKey):
+        user_id, site_id, post_id = key
+        for index, index_key in (
+            (self.__user_keys, user_id),
+            (self.__site_keys, site_id),
+            (self.__post_keys, post_id),
+        ):
+            keys = index.get(index_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[index_key]
+        self.__access.pop(user_id, None)
 
+    # Admins can do everything on every site. On a post with an override, the
+    # override replaces the site role.
+    def __get_mask(self, user: User, site: Site, post: Post | None) -> int:
+        if user.role == UserRole.ADMIN:
+            return ADMIN_CAPABILITIES
 
-class PostRepository:
+        access = self.__access.get(user.id) or self.__compile(user)
+        if post:
+            mask = access.posts.get(post.id)
+            if mask is not None:
+                return mask
+        return access.sites.get(site.id, 0)
+
+    def __compile(self, user: User) -> CompiledAccess:
+        with self.__lock:
+            access = CompiledAccess()
+            for key in self.__user_keys.get(user.id, ()):
+                permission = self.__permissions[key]
+                mask = ROLE_CAPABILITIES[permission.role].value
+                if permission.post:
+                    access.posts[permission.post.id] = mask
+                else:
+                    access.sites[permission.site.id] = mask
+            self.__access[user.id] = access
+            return access
+
+
+# (post id, language, position of the block in the content)
+type BlockKey = tuple[int, LanguageCode, int]
+
+
+# Besides the posts, keeps a reverse index from each media to the blocks that
+# show it, updated whenever a content is stored or replaced, so finding where
+# a media is used costs one lookup instead of a scan of every post. Posts are
+# also indexed by site and by poster, scheduled ones included.
+class PostRepository(ObservableRepository):
     __posts: dict[int, Post]
+    __posts_by_site: dict[int, dict[int, Post]]
+    __posts_by_poster: dict[int, dict[int, Post]]
+    __visible_posts_by_site: dict[int, dict[int, Post]]
+    __scheduled_posts: list[tuple[datetime, int]]
+    __media_usages: dict[int, dict[BlockKey, MediaUsage]]
+    # (post id, language) -> number of MediaBlocks in that content.
+    __media_blocks: dict[tuple[int, LanguageCode], int]
     __id_counter: Iterator[int]
+    __locks: StripedLock
+    __usages_lock: threading.Lock
 
     def __init__(self):
+        super().__init__()
         self.__posts = {}
+        self.__posts_by_site = {}
+        self.__posts_by_poster = {}
+        self.__visible_posts_by_site = {}
+        self.__scheduled_posts = []
+        self.__media_usages = {}
+        self.__media_blocks = {}
         self.__id_counter = count(1)
+        self.__locks = StripedLock()
+        self.__usages_lock = threading.Lock()
 
     def add_post(self, post: Post) -> int:
-        post_id = next(self.__id_counter)
-        post.id = post_id
-        self.__posts.update({post_id: post})
-        return post_id
+        post.id = next(self.__id_counter)
+        self.__store_post(post)
+        self._notify(Mutation.ADD_POST, post)
+        return post.id
+
+    # Post.content_version is the version stamp of a post: contents are the
+    # only part of it that changes.
+    def add_content(
+        self,
+        post: Post,
+        lang: LanguageCode,
+        content: Content,
+        expected_version: int | None = None,
+    ):
+        with self.__locks.for_id(post.id):
+            check_version("O post", post.content_version, expected_version)
+            self.__replace_content(post, lang, content)
+            self._notify(Mutation.ADD_CONTENT, (post, lang, content))
+
+    def restore_post(self, post: Post):
+        self.__store_post(post)
+        self.__id_counter = count(post.id + 1)
+
+    def restore_content(self, post: Post, lang: LanguageCode, content: Content):
+        with self.__locks.for_id(post.id):
+            self.__replace_content(post, lang, content)
+
+    def __replace_content(self, post: Post, lang: LanguageCode, content: Content):
+        previous = post.get_contents().get(lang)
+        post.add_content(lang, content)
+        with self.__usages_lock:
+            if previous:
+                self.__unindex_content(post, lang, previous)
+            self.__index_content(post, lang, content)
+
+    def iter_posts(self) -> Iterator[Post]:
+        return iter(self.__posts.values())
+
+    def get_post_by_id(self, post_id: int) -> Post:
+        return self.__posts[post_id]
+
+    def __store_post(self, post: Post):
+        self.__posts.update({post.id: post})
+        self.__posts_by_site.setdefault(post.site.id, {})[post.id] = post
+        self.__posts_by_poster.setdefault(post.poster.id, {})[post.id] = post
+        with self.__usages_lock:
+            for lang, content in post.get_contents().items():
+                self.__index_content(post, lang, content)
+
+        if post.is_visible():
+            self.__index_visible_post(post)
+        else:
+            heapq.heappush(self.__scheduled_posts, (post.scheduled_to, post.id))
+
+    def add_posts(self, posts: Iterable[Post]) -> list[int]:
+        return [self.add_post(post) for post in posts]
 
     def get_site_posts(self, site: Site) -> list[Post]:
-        posts: list[Post] = []
-        now = datetime.now()
-        for post in self.__posts.values():
-            if post.site.id == site.id and post.scheduled_to < now:
-                posts.append(post)
+        return list(self.__visible_posts_by_site.get(site.id, {}).values())
+
+    def iter_site_posts(
+        self, site: Site, include_scheduled: bool = False
+    ) -> Iterator[Post]:
+        posts = (
+            self.__posts_by_site if include_scheduled else self.__visible_posts_by_site
+        )
+        return iter(posts.get(site.id, {}).values())
+
+    def iter_user_posts(self, user: User) -> Iterator[Post]:
+        return iter(self.__posts_by_poster.get(user.id, {}).values())
+
+    # The scheduled entry of a deleted post stays in the heap and is skipped
+    # when it comes due.
+    def delete_post(self, post: Post):
+        with self.__locks.for_id(post.id):
+            if self.__posts.pop(post.id, None) is None:
+                return
+            self.__unindex_post(post)
+            self._notify(Mutation.DELETE_POST, post)
+
+    def __unindex_post(self, post: Post):
+        pop_indexed(self.__posts_by_site, post.site.id, post.id)
+        pop_indexed(self.__posts_by_poster, post.poster.id, post.id)
+        pop_indexed(self.__visible_posts_by_site, post.site.id, post.id)
+        with self.__usages_lock:
+            for lang, content in post.get_contents().items():
+                self.__unindex_content(post, lang, content)
+
+    def publish_due_posts(self, now: datetime | None = None) -> list[Post]:
+        if not now:
+            now = datetime.now()
+
+        published: list[Post] = []
+        while self.__scheduled_posts and self.__scheduled_posts[0][0] <= now:
+            _, post_id = heapq.heappop(self.__scheduled_posts)
+            post = self.__posts.get(post_id)
+            if not post:
+                continue
+            self.__index_visible_post(post)
+            published.append(post)
+
+        return published
+
+    def get_next_publication(self) -> datetime | None:
+        if not self.__scheduled_posts:
+            return None
+        return self.__scheduled_posts[0][0]
+
+    def __index_visible_post(self, post: Post):
+        self.__visible_posts_by_site.setdefault(post.site.id, {})[post.id] = post
 
+    # Blocks that show the media, in every language of every post.
+    def get_media_usages(self, media: MediaFile) -> list[MediaUsage]:
+        return list(self.__media_usages.get(media.id, {}).values())
+
+    def get_media_usage_count(self, media: MediaFile) -> int:
+        return len(self.__media_usages.get(media.id, ()))
+
+    def has_media_block(self, post: Post, lang: LanguageCode) -> bool:
+        return (post.id, lang) in self.__media_blocks
+
+    def __index_content(self, post: Post, lang: LanguageCode, content: Content):
+        media_blocks = sum(isinstance(block, MediaBlock) for block in content.body)
+        if media_blocks:
+            self.__media_blocks[(post.id, lang)] = media_blocks
+
+        for position, block in enumerate(content.body):
+            for media in block.get_medias():
+                self.__media_usages.setdefault(media.id, {})[
+                    (post.id, lang, position)
+                ] = MediaUsage(post, lang, block)
+
+    def __unindex_content(self, post: Post, lang: LanguageCode, content: Content):
+        self.__media_blocks.pop((post.id, lang), None)
+        for position, block in enumerate(content.body):
+            for media in block.get_medias():
+                usages = self.__media_usages.get(media.id)
+                if usages is None:
+                    continue
+                usages.pop((post.id, lang, position), None)
+                if not usages:
+                    del self.__media_usages[media.id]
+
+    # Removes and returns every post of a site, scheduled ones included.
+    def pop_site(self, site_id: int) -> list[Post]:
+        posts = list(self.__posts_by_site.get(site_id, {}).values())
+        for post in posts:
+            self.__posts.pop(post.id)
+            self.__unindex_post(post)
+
+        self.__scheduled_posts = [
+            item for item in self.__scheduled_posts if item[1] in self.__posts
+        ]
+        heapq.heapify(self.__scheduled_posts)
         return posts
 
 
-class CommentRepository:
+def check_reply(comment: Comment):
+    if comment.parent and comment.parent.post.id != comment.post.id:
+        raise ValueError("A resposta deve ser do mesmo post do comentário.")
+
+
+# Reply tree of one post. Every comment keeps the count of replies below it,
+# updated along its materialized path, and the threads (top-level comments)
+# are kept in creation order and in a list sorted by reply count, so a page of
+# threads in either order is a slice.
+class CommentTree:
+    comments: dict[int, Comment]
+    threads: list[int]
+    children: dict[int, list[int]]
+    reply_counts: dict[int, int]
+    # (-replies, -id) of each thread: most replied first, newest on ties.
+    ranking: list[tuple[int, int]]
+
+    def __init__(self):
+        self.comments = {}
+        self.threads = []
+        self.children = {}
+        self.reply_counts = {}
+        self.ranking = []
+
+    def add(self, comment: Comment):
+        if comment.parent:
+            comment.path = (*comment.parent.path, comment.id)
+            CommentTree.__insert(
+                self.children.setdefault(comment.parent.id, []), comment.id
+            )
+            self.__count_reply(comment)
+        else:
+            comment.path = (comment.id,)
+            CommentTree.__insert(self.threads, comment.id)
+            bisect.insort(self.ranking, (0, -comment.id))
+
+        self.comments[comment.id] = comment
+        self.reply_counts[comment.id] = 0
+
+    # Ids only arrive out of order when a held comment is approved late.
+    @staticmethod
+    def __insert(ids: list[int], comment_id: int):
+        if ids and comment_id < ids[-1]:
+            bisect.insort(ids, comment_id)
+        else:
+            ids.append(comment_id)
+
+    def __count_reply(self, comment: Comment):
+        self.__rerank(comment.path[0], 1)
+        for ancestor_id in comment.path[:-1]:
+            self.reply_counts[ancestor_id] += 1
+
+    def __rerank(self, thread_id: int, delta: int):
+        replies = self.reply_counts[thread_id]
+        self.ranking.pop(bisect.bisect_left(self.ranking, (-replies, -thread_id)))
+        bisect.insort(self.ranking, (-replies - delta, -thread_id))
+
+    # Removes the comment with every reply below it; their paths are cleared.
+    def remove(self, comment: Comment):
+        removed = [comment.id]
+        for comment_id in removed:
+            removed.extend(self.children.get(comment_id, ()))
+
+        *ancestors, _ = comment.path
+        if ancestors:
+            siblings = self.children[ancestors[-1]]
+            siblings.pop(bisect.bisect_left(siblings, comment.id))
+            if not siblings:
+                del self.children[ancestors[-1]]
+            self.__rerank(ancestors[0], -len(removed))
+            for ancestor_id in ancestors:
+                self.reply_counts[ancestor_id] -= len(removed)
+        else:
+            self.threads.pop(bisect.bisect_left(self.threads, comment.id))
+            replies = self.reply_counts[comment.id]
+            self.ranking.pop(bisect.bisect_left(self.ranking, (-replies, -comment.id)))
+
+        for comment_id in removed:
+            self.comments.pop(comment_id).path = ()
+            self.children.pop(comment_id, None)
+            del self.reply_counts[comment_id]
+
+    def get_threads(self, sort: CommentSort, offset: int, limit: int) -> list[Comment]:
+        if sort == CommentSort.MOST_REPLIED:
+            keys = self.ranking[offset : offset + limit]
+            return [self.comments[-comment_id] for _, comment_id in keys]
+
+        end = max(len(self.threads) - offset, 0)
+        ids = self.threads[max(end - limit, 0) : end]
+        return [self.comments[comment_id] for comment_id in reversed(ids)]
+
+
+# Only approved comments enter the reply trees; held ones wait in a queue
+# until a moderator decides. A comment rejected after being approved stays in
+# its tree (so its replies keep their place) and is shown as removed. Every
+# comment, whatever its status, is also indexed by post, by commenter and
+# under its parent.
+class CommentRepository(ObservableRepository):
     __comments: dict[int, Comment]
+    __comments_by_post: dict[int, dict[int, Comment]]
+    __comments_by_commenter: dict[int, dict[int, Comment]]
+    __replies: dict[int, dict[int, Comment]]
+    __held: dict[int, Comment]
+    __trees: dict[int, CommentTree]
     __id_counter: Iterator[int]
 
     def __init__(self):
+        super().__init__()
         self.__comments = {}
+        self.__comments_by_post = {}
+        self.__comments_by_commenter = {}
+        self.__replies = {}
+        self.__held = {}
+        self.__trees = {}
         self.__id_counter = count(1)
 
     def add_comment(self, comment: Comment) -> int:
+        check_reply(comment)
         comment_id = next(self.__id_counter)
         comment.id = comment_id
-        self.__comments.update({comment_id: comment})
+        self.__store_comment(comment)
+        self._notify(Mutation.ADD_COMMENT, comment)
         return comment_id
 
+    def restore_comment(self, comment: Comment):
+        self.__store_comment(comment)
+        self.__id_counter = count(comment.id + 1)
+
+    def __store_comment(self, comment: Comment):
+        self.__comments.update({comment.id: comment})
+        self.__comments_by_post.setdefault(comment.post.id, {})[comment.id] = comment
+        self.__comments_by_commenter.setdefault(comment.commenter.id, {})[
+            comment.id
+        ] = comment
+        if comment.parent:
+            self.__replies.setdefault(comment.parent.id, {})[comment.id] = comment
+        if comment.status == ModerationStatus.APPROVED:
+            self.__add_to_tree(comment)
+        elif comment.status == ModerationStatus.HELD:
+            self.__held[comment.id] = comment
+
+    def __add_to_tree(self, comment: Comment):
+        # The parent may be out of the tree when it was moderated after being
+        # replied to (e.g. when restoring a snapshot): it goes back in, shown
+        # as removed, so the reply keeps its place.
+        if comment.parent and not comment.parent.path:
+            self.__add_to_tree(comment.parent)
+        self.__trees.setdefault(comment.post.id, CommentTree()).add(comment)
+
+    def set_comment_status(self, comment: Comment, status: ModerationStatus):
+        comment.status = status
+        self.__held.pop(comment.id, None)
+
+        if status == ModerationStatus.HELD:
+            self.__held[comment.id] = comment
+        elif status == ModerationStatus.APPROVED and not comment.path:
+            self.__add_to_tree(comment)
+
+        self._notify(Mutation.SET_COMMENT_STATUS, comment)
+
+    def get_held_comments(self, site: Site) -> list[Comment]:
+        return [c for c in self.__held.values() if c.post.site.id == site.id]
+
+    def iter_comments(self) -> Iterator[Comment]:
+        return iter(self.__comments.values())
+
+    # Every comment of the post, whatever its status.
+    def iter_post_comments(self, post: Post) -> Iterator[Comment]:
+        return iter(self.__comments_by_post.get(post.id, {}).values())
+
+    def iter_user_comments(self, user: User) -> Iterator[Comment]:
+        return iter(self.__comments_by_commenter.get(user.id, {}).values())
+
+    # Deletes the comments with all the replies below them (a reply cannot
+    # outlive its parent) and returns everything deleted.
+    def delete_comments(self, comments: list[Comment]) -> list[Comment]:
+        comments = [c for c in comments if c.id in self.__comments]
+        deleted: list[Comment] = []
+        pending = list(comments)
+        while pending:
+            comment = pending.pop()
+            if self.__comments.pop(comment.id, None) is None:
+                continue
+            deleted.append(comment)
+            pending.extend(self.__replies.get(comment.id, {}).values())
+            self.__forget_comment(comment)
+
+        self._notify(Mutation.DELETE_COMMENTS, comments)
+        return deleted
+
+    def __forget_comment(self, comment: Comment):
+        self.__held.pop(comment.id, None)
+        pop_indexed(self.__comments_by_post, comment.post.id, comment.id)
+        pop_indexed(self.__comments_by_commenter, comment.commenter.id, comment.id)
+        if comment.parent:
+            pop_indexed(self.__replies, comment.parent.id, comment.id)
+
+        tree = self.__trees.get(comment.post.id)
+        if tree and comment.id in tree.comments:
+            tree.remove(comment)
+            if not tree.comments:
+                del self.__trees[comment.post.id]
+
     def get_post_comments(self, post: Post) -> list[Comment]:
-        return [
-            comment
-            for comment in self.__comments.values()
-            if comment.post.id == post.id
-        ]
+        tree = self.__trees.get(post.id)
+        return list(tree.comments.values()) if tree else []
+
+    def get_comment_count(self, post: Post) -> int:
+        tree = self.__trees.get(post.id)
+        return len(tree.comments) if tree else 0
+
+    def get_thread_count(self, post: Post) -> int:
+        tree = self.__trees.get(post.id)
+        return len(tree.threads) if tree else 0
+
+    def get_threads(
+        self,
+        post: Post,
+        sort: CommentSort = CommentSort.NEWEST,
+        offset: int = 0,
+        limit: int = 10,
+    ) -> list[Comment]:
+        tree = self.__trees.get(post.id)
+        return tree.get_threads(sort, offset, limit) if tree else []
+
+    # Direct replies, oldest first.
+    def get_replies(
+        self, comment: Comment, offset: int = 0, limit: int = 10
+    ) -> list[Comment]:
+        tree = self.__trees[comment.post.id]
+        ids = tree.children.get(comment.id, [])[offset : offset + limit]
+        return [tree.comments[reply_id] for reply_id in ids]
+
+    def get_direct_reply_count(self, comment: Comment) -> int:
+        return len(self.__trees[comment.post.id].children.get(comment.id, []))
+
+    # All replies below the comment, at any depth.
+    def get_reply_count(self, comment: Comment) -> int:
+        return self.__trees[comment.post.id].reply_counts[comment.id]
+
+    # Removes and returns every comment of the posts (those of a site being
+    # moved, as returned by PostRepository.pop_site), oldest first per post.
+    def pop_posts(self, posts: list[Post]) -> list[Comment]:
+        comments: list[Comment] = []
+        for post in posts:
+            self.__trees.pop(post.id, None)
+            comments.extend(self.__comments_by_post.pop(post.id, {}).values())
+
+        for comment in comments:
+            self.__comments.pop(comment.id)
+            self.__held.pop(comment.id, None)
+            pop_indexed(self.__comments_by_commenter, comment.commenter.id, comment.id)
+            self.__replies.pop(comment.id, None)
+        return comments
 
 
-class MediaRepository:
+# The filename is the path of the media's URL, so it is unique per site.
+class MediaRepository(ObservableRepository):
     __medias: dict[int, MediaFile]
+    __medias_by_site: dict[int, dict[int, MediaFile]]
+    __medias_by_uploader: dict[int, dict[int, MediaFile]]
+    # (site id, filename)
+    __medias_by_path: dict[tuple[int, str], MediaFile]
     __id_counter: Iterator[int]
+    __locks: StripedLock
 
     def __init__(self):
+        super().__init__()
         self.__medias = {}
+        self.__medias_by_site = {}
+        self.__medias_by_uploader = {}
+        self.__medias_by_path = {}
         self.__id_counter = count(1)
+        self.__locks = StripedLock()
 
     def add_midia(self, media: MediaFile) -> int:
-        media_id = next(self.__id_counter)
-        media.id = media_id
-        self.__medias.update({media_id: media})
-        return media_id
+        with self.__locks.for_id(media.site.id):
+            check_media_filename(
+                media, self.get_media_by_filename(media.site, media.filename)
+            )
+            media.id = next(self.__id_counter)
+            self.__store_media(media)
+        self._notify(Mutation.ADD_MEDIA, media)
+        return media.id
+
+    def restore_media(self, media: MediaFile):
+        self.__store_media(media)
+        self.__id_counter = count(media.id + 1)
+
+    def iter_medias(self) -> Iterator[MediaFile]:
+        return iter(self.__medias.values())
+
+    def __store_media(self, media: MediaFile):
+        self.__medias.update({media.id: media})
+        self.__medias_by_site.setdefault(media.site.id, {}).update({media.id: media})
+        self.__medias_by_uploader.setdefault(media.uploader.id, {})[media.id] = media
+        self.__medias_by_path.setdefault((media.site.id, media.filename), media)
+
+    def __forget_path(self, media: MediaFile):
+        path = (media.site.id, media.filename)
+        if self.__medias_by_path.get(path) is media:
+            del self.__medias_by_path[path]
+        pop_indexed(self.__medias_by_uploader, media.uploader.id, media.id)
 
     def get_site_medias(self, site: Site) -> list[MediaFile]:
-        return [media for media in self.__medias.values() if media.site.id == site.id]
+        return list(self.iter_site_medias(site))
+
+    def iter_site_medias(self, site: Site) -> Iterator[MediaFile]:
+        return iter(self.__medias_by_site.get(site.id, {}).values())
+
+    def iter_user_medias(self, user: User) -> Iterator[MediaFile]:
+        return iter(self.__medias_by_uploader.get(user.id, {}).values())
+
+    def has_site_medias(self, site: Site) -> bool:
+        return bool(self.__medias_by_site.get(site.id))
 
     def get_media_by_id(self, media_id: int) -> MediaFile:
         return self.__medias[media_id]
 
-    def remove_media(self, media_id: int):
-        self.__medias.pop(media_id)
+    def get_media_by_filename(self, site: Site, filename: str) -> MediaFile | None:
+        return self.__medias_by_path.get((site.id, filename))
+
+    def remove_media(
+        self, media_id: int, expected_version: int | None = None
+    ) -> MediaFile:
+        with self.__locks.for_id(media_id):
+            media = self.__medias.get(media_id)
+            if not media:
+                raise VersionConflictError(
+                    f"A mídia {media_id} já foi removida por outro usuário."
+                )
+            check_version("A mídia", media.version, expected_version)
+
+            self.__medias.pop(media_id)
+            self.__medias_by_site[media.site.id].pop(media_id)
+            self.__forget_path(media)
+            media.version += 1
+            self._notify(Mutation.REMOVE_MEDIA, media)
+
+        return media
+
+    def pop_site(self, site_id: int) -> list[MediaFile]:
+        medias = list(self.__medias_by_site.pop(site_id, {}).values())
+        for media in medias:
+            self.__medias.pop(media.id)
+            self.__forget_path(media)
+        return medias
@@ -0,0 +1,122 @@
+from cms.models import Content, LanguageCode, Post
+from cms.services.languages import LanguageService
+
+type FallbackChains = dict[LanguageCode, list[LanguageCode]]
+type ResolutionTable = dict[LanguageCode, Content]
+
+DEFAULT_FALLBACK_CHAINS: FallbackChains = {
+    "pt-br": ["pt", "en-us"],
+    "pt": ["pt-br", "en-us"],
+    "es": ["pt-br", "en-us"],
+    "en-us": [],
+    "zh": ["ja", "en-us"],
+    "ja": ["zh", "en-us"],
+}
+
+
+def parse_accept_language(header: str) -> list[str]:
+    ranked: list[tuple[float, int, str]] = []
+
+    for i, part in enumerate(header.split(",")):
+        tag, _, params = part.strip().partition(";")
+        tag = tag.strip()
+        if not tag or tag == "*":
+            continue
+
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+
+        if quality > 0:
+            ranked.append((-quality, i, tag))
+
+    return [tag for _, _, tag in sorted(ranked)]
+
+
+# For every post, the best Content for each supported language is computed once
+# (following the fallback chains) and cached until the post gets new content.
+# Serving a post in a given locale is then a single dict lookup. Languages whose
+# chain finds no content are left out, so the next preference gets its turn
+# before falling back to the post's default content.
+class ContentNegotiator:
+    __lang_service: LanguageService
+    __fallback_chains: FallbackChains
+    __tables: dict[int, tuple[int, ResolutionTable]]
+
+    def __init__(
+        self,
+        lang_service: LanguageService,
+        fallback_chains: FallbackChains | None = None,
+    ):
+        self.__lang_service = lang_service
+        self.__fallback_chains = (
+            fallback_chains if fallback_chains is not None else DEFAULT_FALLBACK_CHAINS
+        )
+        self.__tables = {}
+
+    def resolve(self, post: Post, preferences: list[str]) -> Content:
+        codes = self.__normalize_preferences(preferences)
+
+        for code in codes:
+            if post.has_language(code):
+                return post.get_content_by_language(
+                    self.__lang_service.get_language_by_code(code)
+                )
+
+        table = self.get_resolution_table(post)
+        for code in codes:
+            content = table.get(code)
+            if content:
+                return content
+
+        return post.get_content_by_language()
+
+    def resolve_header(self, post: Post, accept_language: str) -> Content:
+        return self.resolve(post, parse_accept_language(accept_language))
+
+    def get_resolution_table(self, post: Post) -> ResolutionTable:
+        cached = self.__tables.get(post.id)
+        if cached and cached[0] == post.content_version:
+            return cached[1]
+
+        table = self.__compile(post)
+        self.__tables[post.id] = (post.content_version, table)
+        return table
+
+    def forget(self, post: Post):
+        self.__tables.pop(post.id, None)
+
+    def __compile(self, post: Post) -> ResolutionTable:
+        table: ResolutionTable = {}
+
+        for lang in self.__lang_service.supported_languages:
+            for code in [lang.code, *self.__fallback_chains.get(lang.code, [])]:
+                if post.has_language(code):
+                    table[lang.code] = post.get_content_by_language(
+                        self.__lang_service.get_language_by_code(code)
+                    )
+                    break
+
+        return table
+
+    def __normalize_preferences(self, preferences: list[str]) -> list[LanguageCode]:
+        codes: list[LanguageCode] = []
+
+        for tag in preferences:
+            try:
+                lang = self.__lang_service.get_language_by_code(tag)
+            except ValueError:
+                # e.g. "en-gb" is not registered, but its primary subtag "en" is.
+                try:
+                    lang = self.__lang_service.get_language_by_code(tag.split("-")[0])
+                except ValueError:
+                    continue
+
+            if lang.code not in codes:
+                codes.append(lang.code)
+
+        return codes
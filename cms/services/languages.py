@@ -1,38 +1,90 @@
+import json
+from collections.abc import Mapping
+from functools import cache
+from pathlib import Path
+from types import MappingProxyType
+
 from cms.models import Language, LanguageCode, Post
 
+LANGUAGES_FILE = Path(__file__).resolve().parent.parent / "data" / "languages.json"
+
+
+# Immutable table built once per data file. Every code and alias is normalized
+# the same way as Language.is_language, so a lookup is a single dict access.
+class LanguageRegistry:
+    __languages: tuple[Language, ...]
+    __by_code: Mapping[LanguageCode, Language]
+
+    def __init__(self, languages: list[Language]):
+        by_code: dict[LanguageCode, Language] = {}
+        for lang in languages:
+            for code in [lang.code, *lang.aliases]:
+                key = LanguageRegistry.normalize(code)
+                if by_code.get(key, lang) != lang:
+                    raise ValueError(f"Duplicated language code: {code}")
+                by_code[key] = lang
+
+        self.__languages = tuple(languages)
+        self.__by_code = MappingProxyType(by_code)
+
+    @staticmethod
+    def normalize(code: LanguageCode) -> LanguageCode:
+        return code.lower().strip()
+
+    @staticmethod
+    def load(path: Path) -> "LanguageRegistry":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        return LanguageRegistry(
+            [
+                Language(
+                    name=item["name"],
+                    code=item["code"],
+                    aliases=item.get("aliases", []),
+                )
+                for item in data
+            ]
+        )
+
+    @property
+    def languages(self) -> tuple[Language, ...]:
+        return self.__languages
+
+    def get(self, code: LanguageCode) -> Language | None:
+        return self.__by_code.get(LanguageRegistry.normalize(code))
+
+
+@cache
+def get_language_registry(path: Path = LANGUAGES_FILE) -> LanguageRegistry:
+    return LanguageRegistry.load(path)
+
 
 class LanguageService:
-    __supported_languages: list[Language]
-
-    def __init__(self):
-        self.__supported_languages = [
-            Language(
-                name="Português Brasileiro", code="pt-br", aliases=["ptbr", "pt", "br"]
-            ),
-            Language(
-                name="Inglês", code="en-us", aliases=["en-us", "enus", "en", "us"]
-            ),
-            Language(name="Espanhol", code="es"),
-            Language(name="Chinês", code="zh"),
-            Language(name="Japonês", code="ja"),
-        ]
+    __registry: LanguageRegistry
+
+    def __init__(self, registry: LanguageRegistry | None = None):
+        self.__registry = registry if registry else get_language_registry()
+
+    @property
+    def supported_languages(self) -> list[Language]:
+        return list(self.__registry.languages)
 
     def get_language_by_code(self, code: LanguageCode) -> Language:
-        for lang in self.__supported_languages:
-            if lang.is_language(code):
-                return lang
+        lang = self.__registry.get(code)
+        if not lang:
+            raise ValueError("Language not found.")
 
-        raise ValueError("Language not found.")
+        return lang
 
     def get_missing_languages(self, post: Post) -> list[Language]:
+        post_codes = {lang.code for lang in post.get_languages()}
         return [
-            lang
-            for lang in self.__supported_languages
-            if lang not in post.get_languages()
+            lang for lang in self.__registry.languages if lang.code not in post_codes
         ]
 
     def select_from_supported_languages(self) -> Language | None:
-        return LanguageService.select_language(self.__supported_languages)
+        return LanguageService.select_language(self.supported_languages)
 
     @staticmethod
     def select_language(languages: list[Language]) -> Language | None:
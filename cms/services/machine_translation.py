@@ -0,0 +1,166 @@
+import hashlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from cms.models import (
+    CaroulselBlock,
+    Content,
+    ContentBlock,
+    Language,
+    LanguageCode,
+    MediaBlock,
+    Post,
+    TextBlock,
+)
+
+type MemoryKey = tuple[str, LanguageCode]
+
+
+class TranslationEngine(ABC):
+    @abstractmethod
+    def translate_batch(
+        self, texts: list[str], source: Language, target: Language
+    ) -> list[str]:
+        pass
+
+
+# Deterministic stand-in used while no real provider is configured (and in tests):
+# it only tags the text with the target language code.
+class LocalTranslationEngine(TranslationEngine):
+    def translate_batch(
+        self, texts: list[str], source: Language, target: Language
+    ) -> list[str]:
+        return [f"[{target.code}] {text}" if text else text for text in texts]
+
+
+class TranslationMemory:
+    __entries: dict[MemoryKey, str]
+
+    def __init__(self):
+        self.__entries = {}
+
+    @staticmethod
+    def make_key(text: str, target: Language) -> MemoryKey:
+        return (hashlib.sha256(text.encode()).hexdigest(), target.code)
+
+    def get(self, text: str, target: Language) -> str | None:
+        return self.__entries.get(TranslationMemory.make_key(text, target))
+
+    def put(self, text: str, target: Language, translation: str):
+        self.__entries[TranslationMemory.make_key(text, target)] = translation
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+
+class MachineTranslator:
+    __engine: TranslationEngine
+    __memory: TranslationMemory
+    __batch_size: int
+    __max_workers: int
+
+    def __init__(
+        self,
+        engine: TranslationEngine,
+        memory: TranslationMemory | None = None,
+        batch_size: int = 32,
+        max_workers: int = 4,
+    ):
+        self.__engine = engine
+        self.__memory = memory if memory else TranslationMemory()
+        self.__batch_size = batch_size
+        self.__max_workers = max_workers
+
+    @property
+    def memory(self) -> TranslationMemory:
+        return self.__memory
+
+    def translate_post(self, post: Post, targets: list[Language]) -> list[Content]:
+        original = post.get_content_by_language()
+        texts = MachineTranslator._collect_texts(original)
+
+        translations = self.translate_texts(texts, original.language, targets)
+
+        return [
+            MachineTranslator._build_content(
+                original, target, translations[target.code]
+            )
+            for target in targets
+        ]
+
+    def translate_texts(
+        self, texts: list[str], source: Language, targets: list[Language]
+    ) -> dict[LanguageCode, dict[str, str]]:
+        unique_texts = list(dict.fromkeys(texts))
+        translations: dict[LanguageCode, dict[str, str]] = {}
+        jobs: list[tuple[Language, list[str]]] = []
+
+        for target in targets:
+            translated = translations.setdefault(target.code, {})
+            missing: list[str] = []
+            for text in unique_texts:
+                cached = self.__memory.get(text, target)
+                if cached is None:
+                    missing.append(text)
+                else:
+                    translated[text] = cached
+
+            for i in range(0, len(missing), self.__batch_size):
+                jobs.append((target, missing[i : i + self.__batch_size]))
+
+        if not jobs:
+            return translations
+
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as pool:
+            results = pool.map(
+                lambda job: self.__engine.translate_batch(job[1], source, job[0]),
+                jobs,
+            )
+
+            # The memory is only written from this thread, so it needs no lock.
+            for (target, batch), translated_batch in zip(jobs, results):
+                for text, translation in zip(batch, translated_batch):
+                    self.__memory.put(text, target, translation)
+                    translations[target.code][text] = translation
+
+        return translations
+
+    @staticmethod
+    def _collect_texts(content: Content) -> list[str]:
+        texts = [content.title]
+        for block in content.body:
+            if isinstance(block, TextBlock):
+                texts.append(block.text)
+            elif isinstance(block, (MediaBlock, CaroulselBlock)):
+                texts.append(block.alt)
+
+        return texts
+
+    @staticmethod
+    def _build_content(
+        original: Content, target: Language, translations: dict[str, str]
+    ) -> Content:
+        blocks: list[ContentBlock] = []
+        for block in original.body:
+            if isinstance(block, TextBlock):
+                blocks.append(
+                    TextBlock(order=block.order, text=translations[block.text])
+                )
+            elif isinstance(block, MediaBlock):
+                blocks.append(
+                    MediaBlock(
+                        order=block.order,
+                        media=block.media,
+                        alt=translations[block.alt],
+                    )
+                )
+            elif isinstance(block, CaroulselBlock):
+                blocks.append(
+                    CaroulselBlock(
+                        order=block.order,
+                        medias=list(block.medias),
+                        alt=translations[block.alt],
+                    )
+                )
+
+        return Content(title=translations[original.title], body=blocks, language=target)
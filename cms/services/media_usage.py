@@ -0,0 +1,127 @@
+from dataclasses import replace
+from enum import Enum
+
+from cms.models import (
+    CaroulselBlock,
+    ContentBlock,
+    LanguageCode,
+    MediaBlock,
+    MediaFile,
+    MediaUsage,
+    Post,
+    User,
+)
+from cms.repository import MediaRepository, PostRepository, check_version
+from cms.services.revisions import PostEditor, RevisionStore
+
+
+class MediaDeletePolicy(Enum):
+    RESTRICT = "Não deletar se estiver em uso"
+    DETACH = "Remover a mídia dos posts que a usam"
+    REPLACE = "Substituir por outra mídia nos posts que a usam"
+
+
+class MediaInUseError(ValueError):
+    usages: list[MediaUsage]
+
+    def __init__(self, media: MediaFile, usages: list[MediaUsage]):
+        self.usages = usages
+        super().__init__(
+            f"A mídia {media.filename} está em uso em {len(usages)} bloco(s) de post."
+        )
+
+
+# Deleting a media through here never leaves blocks pointing at it: the posts
+# that use it are found through the reverse index of the post repository and
+# rewritten through a PostEditor, as any other edit (so they show up in the
+# revision history and drop the home feeds). The media is only removed once
+# no content uses it anymore.
+class MediaUsageService:
+    __post_repo: PostRepository
+    __media_repo: MediaRepository
+    __revisions: RevisionStore
+
+    def __init__(
+        self,
+        post_repo: PostRepository,
+        media_repo: MediaRepository,
+        revisions: RevisionStore,
+    ):
+        self.__post_repo = post_repo
+        self.__media_repo = media_repo
+        self.__revisions = revisions
+
+    def get_usages(self, media: MediaFile) -> list[MediaUsage]:
+        return self.__post_repo.get_media_usages(media)
+
+    def get_usage_count(self, media: MediaFile) -> int:
+        return self.__post_repo.get_media_usage_count(media)
+
+    # Returns how many contents were rewritten, as revisions of the author
+    # (None for a system job). Raises MediaInUseError with RESTRICT, and
+    # VersionConflictError if the media or one of the posts changed since read.
+    def delete_media(
+        self,
+        media: MediaFile,
+        policy: MediaDeletePolicy = MediaDeletePolicy.RESTRICT,
+        replacement: MediaFile | None = None,
+        expected_version: int | None = None,
+        author: User | None = None,
+    ) -> int:
+        if policy == MediaDeletePolicy.REPLACE:
+            check_replacement(media, replacement)
+        else:
+            replacement = None
+
+        usages = self.get_usages(media)
+        if usages and policy == MediaDeletePolicy.RESTRICT:
+            raise MediaInUseError(media, usages)
+        check_version("A mídia", media.version, expected_version)
+
+        contents: dict[tuple[int, LanguageCode], Post] = {}
+        for usage in usages:
+            contents[(usage.post.id, usage.language)] = usage.post
+
+        for (_, lang), post in contents.items():
+            editor = PostEditor(post, lang, self.__post_repo, self.__revisions)
+            editor.blocks = [
+                new_block
+                for block in editor.blocks
+                if (new_block := swap_media(block, media, replacement))
+            ]
+            editor.save(author)
+
+        self.__media_repo.remove_media(media.id, expected_version)
+        return len(contents)
+
+
+def check_replacement(media: MediaFile, replacement: MediaFile | None):
+    if (
+        not replacement
+        or replacement.id == media.id
+        or replacement.site.id != media.site.id
+    ):
+        raise ValueError("Escolha outra mídia do mesmo site para a substituição.")
+
+
+# The block without the media (None if nothing is left of it), or with the
+# replacement in its place. Blocks are copied, never changed: older revisions
+# share them.
+def swap_media(
+    block: ContentBlock, media: MediaFile, replacement: MediaFile | None
+) -> ContentBlock | None:
+    if isinstance(block, MediaBlock) and block.media.id == media.id:
+        return replace(block, media=replacement) if replacement else None
+
+    if isinstance(block, CaroulselBlock) and any(
+        m.id == media.id for m in block.medias
+    ):
+        # A carousel that already shows the replacement keeps a single copy.
+        medias: list[MediaFile] = []
+        for current in block.medias:
+            current = replacement if current.id == media.id else current
+            if current and all(current.id != kept.id for kept in medias):
+                medias.append(current)
+        return replace(block, medias=medias) if medias else None
+
+    return block
@@ -0,0 +1,378 @@
+import json
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain, islice
+from pathlib import Path
+
+from cms.models import Comment, LanguageCode, ModerationStatus
+
+BANNED_TERMS_FILE = (
+    Path(__file__).resolve().parent.parent / "data" / "banned_terms.json"
+)
+# Terms under this key apply to every language.
+ALL_LANGUAGES = "*"
+
+MAX_LINKS = 2
+MAX_UPPERCASE_RATIO = 0.7
+MIN_LETTERS_FOR_UPPERCASE = 12
+MAX_REPEATED_CHARS = 8
+
+WORD_CACHE_SIZE = 1 << 16
+
+# Below this many comments the re-moderation runs in the current process.
+PARTITION_SIZE = 20_000
+
+# A normalized comment is a sequence of tokens: words for languages that
+# separate them with spaces, characters for the others.
+type Tokens = Sequence[str]
+type Normalizer = Callable[[str], Tokens]
+type TermDictionary = dict[str, dict[str, list[str]]]
+# (term as written in the dictionary, action)
+type TermMatch = tuple[str, ModerationStatus]
+# (match, first token, token after the last)
+type TermSpan = tuple[TermMatch, int, int]
+# (comment id, body, language, current status)
+type CommentRow = tuple[int, str, LanguageCode, ModerationStatus]
+
+_SEVERITY = {
+    ModerationStatus.APPROVED: 0,
+    ModerationStatus.HELD: 1,
+    ModerationStatus.REJECTED: 2,
+}
+_ACTIONS = {"hold": ModerationStatus.HELD, "reject": ModerationStatus.REJECTED}
+
+_LINK = re.compile(r"https?://|www\.", re.IGNORECASE)
+_REPEATED = re.compile(rf"(.)\1{{{MAX_REPEATED_CHARS - 1},}}")
+_COMBINING_MARKS = re.compile("[\u0300-\u036f]+")
+_REPEATED_LETTERS = re.compile(r"(.)\1+")
+_SEPARATORS = re.compile(r"[\W_]+")
+_LEET = str.maketrans("0134578@$", "oieastbas")
+
+
+_normalizer_map: dict[LanguageCode, Normalizer] = {}
+
+
+def register_normalizer(
+    *codes: LanguageCode,
+) -> Callable[[Normalizer], Normalizer]:
+    def decorator(normalizer: Normalizer) -> Normalizer:
+        for code in codes:
+            _normalizer_map[code] = normalizer
+        return normalizer
+
+    return decorator
+
+
+# Accents, case, leetspeak, repeated letters and punctuation are folded, so
+# "Idiiiota", "1d10ta", "i.d.i.o.t.a" and "I D I O T A" all become the word
+# "idiota". Words are folded one at a time through a cache: comments reuse a
+# small vocabulary, so most words cost a single lookup.
+@register_normalizer("pt-br", "en-us", "es")
+def normalize_latin(text: str) -> Tokens:
+    words = list(chain.from_iterable(map(_fold_latin_word, text.split())))
+    return _join_spaced_letters(words)
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def _fold_latin_word(word: str) -> tuple[str, ...]:
+    word = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", word))
+    word = _REPEATED_LETTERS.sub(r"\1", word.casefold().translate(_LEET))
+    parts = _SEPARATORS.split(word)
+    # "i.d.i.o.t.a" is one word spelled out; "bom,gostei" is two.
+    if len(parts) > 2 and all(len(part) <= 1 for part in parts):
+        return ("".join(parts),)
+    return tuple(part for part in parts if part)
+
+
+def _join_spaced_letters(words: list[str]) -> list[str]:
+    joined: list[str] = []
+    letters: list[str] = []
+    for word in [*words, ""]:
+        if len(word) == 1:
+            letters.append(word)
+            continue
+
+        if len(letters) >= 3:
+            joined.append("".join(letters))
+        else:
+            joined.extend(letters)
+        letters = []
+        if word:
+            joined.append(word)
+
+    return joined
+
+
+# No spaces between words: every character is a token. NFKC folds full-width
+# and half-width forms.
+@register_normalizer("zh", "ja")
+def normalize_cjk(text: str) -> Tokens:
+    return _SEPARATORS.sub("", unicodedata.normalize("NFKC", text).casefold())
+
+
+# Without a dictionary, a change of script is the only reliable word boundary
+# in CJK text: "バカ" in "夏のバカンス" runs on into more katakana, so it is a
+# piece of another word. Chinese has no such changes between hanzi, so a term
+# inside a run of them is just as ambiguous.
+def _is_cjk_word(tokens: Tokens, start: int, end: int) -> bool:
+    return (start == 0 or _script(tokens[start - 1]) != _script(tokens[start])) and (
+        end == len(tokens) or _script(tokens[end - 1]) != _script(tokens[end])
+    )
+
+
+def _script(char: str) -> int:
+    code = ord(char)
+    if 0x3040 <= code <= 0x309F:
+        return 1  # hiragana
+    if 0x30A0 <= code <= 0x30FF or 0x31F0 <= code <= 0x31FF:
+        return 2  # katakana
+    if 0x3400 <= code <= 0x9FFF or 0xF900 <= code <= 0xFAFF:
+        return 3  # han
+    return 0
+
+
+def get_normalizer(lang: LanguageCode) -> Normalizer:
+    return _normalizer_map.get(lang, normalize_latin)
+
+
+# Aho-Corasick automaton over the tokens of all terms of a language, with the
+# failure links folded into the transition table (a DFA): scanning a comment
+# is one dict lookup per token, however many terms there are. Terms only
+# match whole tokens, so "idiota" does not match "idiotas".
+class TermMatcher:
+    __transitions: list[dict[str, int]]
+    __outputs: list[tuple[tuple[TermMatch, int], ...]]
+
+    def __init__(self, terms: Iterable[tuple[Tokens, TermMatch]]):
+        goto: list[dict[str, int]] = [{}]
+        outputs: list[list[tuple[TermMatch, int]]] = [[]]
+
+        for tokens, match in terms:
+            state = 0
+            for token in tokens:
+                if token not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][token] = len(goto) - 1
+                state = goto[state][token]
+            outputs[state].append((match, len(tokens)))
+
+        fail = [0] * len(goto)
+        transitions: list[dict[str, int]] = [{} for _ in goto]
+        transitions[0] = dict(goto[0])
+        queue = deque(goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            transitions[state] = {**transitions[fail[state]], **goto[state]}
+            outputs[state].extend(outputs[fail[state]])
+            for token, child in goto[state].items():
+                fail[child] = transitions[fail[state]].get(token, 0)
+                queue.append(child)
+
+        self.__transitions = transitions
+        self.__outputs = [tuple(output) for output in outputs]
+
+    def find(self, tokens: Tokens) -> list[TermMatch]:
+        return [match for match, _, _ in self.find_spans(tokens)]
+
+    def find_spans(self, tokens: Tokens) -> list[TermSpan]:
+        transitions = self.__transitions
+        outputs = self.__outputs
+        found: list[TermSpan] = []
+
+        state = 0
+        for end, token in enumerate(tokens, start=1):
+            state = transitions[state].get(token, 0)
+            for match, length in outputs[state]:
+                found.append((match, end - length, end))
+
+        return found
+
+
+# Pluggable model scoring how likely a comment is spam or abuse, from 0 to 1.
+class CommentClassifier(ABC):
+    @abstractmethod
+    def score(self, text: str, lang: LanguageCode) -> float:
+        pass
+
+
+@dataclass
+class ModerationResult:
+    status: ModerationStatus = ModerationStatus.APPROVED
+    reasons: list[str] = field(default_factory=list[str])
+
+    def escalate(self, status: ModerationStatus, reason: str):
+        if _SEVERITY[status] > _SEVERITY[self.status]:
+            self.status = status
+        self.reasons.append(reason)
+
+
+# Runs every comment through the banned-term dictionary, the link and spam
+# heuristics and, when configured, a classifier. The most severe outcome wins.
+class CommentModerator:
+    __terms: TermDictionary
+    __classifier: CommentClassifier | None
+    __hold_score: float
+    __reject_score: float
+    __matchers: dict[LanguageCode, TermMatcher]
+
+    def __init__(
+        self,
+        terms: TermDictionary,
+        classifier: CommentClassifier | None = None,
+        hold_score: float = 0.5,
+        reject_score: float = 0.9,
+    ):
+        self.__terms = terms
+        self.__classifier = classifier
+        self.__hold_score = hold_score
+        self.__reject_score = reject_score
+        self.__matchers = {}
+
+    @staticmethod
+    def load(
+        path: Path = BANNED_TERMS_FILE, classifier: CommentClassifier | None = None
+    ) -> "CommentModerator":
+        with open(path, encoding="utf-8") as f:
+            return CommentModerator(json.load(f), classifier)
+
+    def moderate(self, body: str, lang: LanguageCode) -> ModerationResult:
+        result = ModerationResult()
+        if not body.strip():
+            result.escalate(ModerationStatus.REJECTED, "Comentário vazio")
+            return result
+
+        normalize = get_normalizer(lang)
+        tokens = normalize(body)
+        for (term, action), start, end in self.__get_matcher(lang).find_spans(tokens):
+            if (
+                action == ModerationStatus.REJECTED
+                and normalize is normalize_cjk
+                and not _is_cjk_word(tokens, start, end)
+            ):
+                # Maybe an ordinary word containing the term: a person decides.
+                result.escalate(
+                    ModerationStatus.HELD, f"Termo proibido dentro de palavra: '{term}'"
+                )
+            else:
+                result.escalate(action, f"Termo proibido: '{term}'")
+
+        # The heuristics below run a cheap test first and only scan the whole
+        # comment when it could fail: most comments never do.
+        if "://" in body or "www." in body.casefold():
+            links = len(_LINK.findall(body))
+            if links > MAX_LINKS:
+                result.escalate(ModerationStatus.HELD, f"{links} links")
+
+        uppercase = sum(map(str.isupper, body))
+        if uppercase >= MIN_LETTERS_FOR_UPPERCASE * MAX_UPPERCASE_RATIO:
+            letters = sum(map(str.isalpha, body))
+            if (
+                letters >= MIN_LETTERS_FOR_UPPERCASE
+                and uppercase / letters > MAX_UPPERCASE_RATIO
+            ):
+                result.escalate(ModerationStatus.HELD, "Excesso de maiúsculas")
+
+        if any(
+            _REPEATED.search(word)
+            for word in body.split()
+            if len(word) >= MAX_REPEATED_CHARS
+        ):
+            result.escalate(ModerationStatus.HELD, "Caracteres repetidos")
+
+        if self.__classifier:
+            score = self.__classifier.score(body, lang)
+            if score >= self.__reject_score:
+                result.escalate(
+                    ModerationStatus.REJECTED, f"Classificador: {score:.2f}"
+                )
+            elif score >= self.__hold_score:
+                result.escalate(ModerationStatus.HELD, f"Classificador: {score:.2f}")
+
+        return result
+
+    # Comments have no language of their own: the post's default is used.
+    def moderate_comment(self, comment: Comment) -> ModerationResult:
+        result = self.moderate(comment.body, comment.post.default_language.code)
+        comment.status = result.status
+        return result
+
+    # Runs the current rules over stored comments and returns the ones whose
+    # status would change. Large batches are split across a process pool; only
+    # the changes travel back.
+    def remoderate(
+        self, comments: Iterable[Comment], max_workers: int | None = None
+    ) -> list[tuple[Comment, ModerationResult]]:
+        by_id = {comment.id: comment for comment in comments}
+        rows = [
+            (
+                comment.id,
+                comment.body,
+                comment.post.default_language.code,
+                comment.status,
+            )
+            for comment in by_id.values()
+        ]
+
+        partitions = list(_partition(rows))
+        if len(partitions) <= 1:
+            results = [moderate_rows(partition, self) for partition in partitions]
+        else:
+            with ProcessPoolExecutor(
+                max_workers, initializer=_init_worker, initargs=(self,)
+            ) as executor:
+                results = list(executor.map(moderate_rows, partitions))
+
+        return [
+            (by_id[comment_id], result)
+            for partial in results
+            for comment_id, result in partial
+        ]
+
+    def __get_matcher(self, lang: LanguageCode) -> TermMatcher:
+        matcher = self.__matchers.get(lang)
+        if not matcher:
+            normalize = get_normalizer(lang)
+            matcher = TermMatcher(
+                (normalize(term), (term, _ACTIONS[action]))
+                for key in (ALL_LANGUAGES, lang)
+                for action, terms in self.__terms.get(key, {}).items()
+                for term in terms
+            )
+            self.__matchers[lang] = matcher
+        return matcher
+
+
+_worker_moderator: CommentModerator | None = None
+
+
+def _init_worker(moderator: CommentModerator):
+    global _worker_moderator
+    _worker_moderator = moderator
+
+
+def moderate_rows(
+    rows: list[CommentRow], moderator: CommentModerator | None = None
+) -> list[tuple[int, ModerationResult]]:
+    moderator = moderator or _worker_moderator
+    if not moderator:
+        raise ValueError("Moderador não inicializado.")
+    changes: list[tuple[int, ModerationResult]] = []
+    for comment_id, body, lang, status in rows:
+        result = moderator.moderate(body, lang)
+        if result.status != status:
+            changes.append((comment_id, result))
+    return changes
+
+
+def _partition(rows: list[CommentRow]) -> Iterator[list[CommentRow]]:
+    iterator = iter(rows)
+    while partition := list(islice(iterator, PARTITION_SIZE)):
+        yield partition
@@ -16,12 +16,18 @@ from cms.repository import MediaRepository
 
 
 class PostBuilder:
-    def __init__(self, site: Site, poster: User, media_repo: MediaRepository):
+    def __init__(
+        self,
+        site: Site,
+        poster: User,
+        media_repo: MediaRepository,
+        lang_service: LanguageService,
+    ):
         self.__site = site
         self.__poster = poster
         self.__media_repo = media_repo
         self.__blocks: list[ContentBlock] = []
-        self.__lang_service = LanguageService()
+        self.__lang_service = lang_service
 
     def build_post(self) -> Post:
         language = self.__lang_service.select_from_supported_languages()
@@ -0,0 +1,43 @@
+from collections.abc import Callable
+from datetime import datetime
+
+from cms.models import Post, SiteAction, SiteAnalyticsEntry
+from cms.repository import AnalyticsRepository, PostRepository
+
+type PublishListener = Callable[[Post], None]
+
+
+# Scheduled posts wait in a min-heap inside the PostRepository (O(log n) insert).
+# Each tick only peeks at the heap top, so it is cheap enough to run on every
+# menu redraw; the work is proportional to the number of posts being published.
+# A publication is logged as done by the system, not by the poster, and the
+# listeners (e.g. the home feeds) are told about each published post.
+class PostScheduler:
+    __post_repo: PostRepository
+    __analytics_repo: AnalyticsRepository
+    __listeners: list[PublishListener]
+
+    def __init__(self, post_repo: PostRepository, analytics_repo: AnalyticsRepository):
+        self.__post_repo = post_repo
+        self.__analytics_repo = analytics_repo
+        self.__listeners = []
+
+    def subscribe(self, listener: PublishListener):
+        self.__listeners.append(listener)
+
+    def tick(self, now: datetime | None = None) -> list[Post]:
+        published = self.__post_repo.publish_due_posts(now)
+
+        for post in published:
+            self.__analytics_repo.log(
+                SiteAnalyticsEntry(
+                    user=None,
+                    site=post.site,
+                    action=SiteAction.PUBLISH_POST,
+                    metadata={"post_id": str(post.id)},
+                )
+            )
+            for listener in self.__listeners:
+                listener(post)
+
+        return published
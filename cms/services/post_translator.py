@@ -1,12 +1,17 @@
 from cms.models import MediaBlock, Post, ContentBlock, Content, TextBlock
+from cms.repository import PostRepository, VersionConflictError
 from cms.services.languages import LanguageService
+from cms.services.machine_translation import MachineTranslator
 
 
 class PostTranslator:
-    def __init__(self, post: Post):
+    def __init__(
+        self, post: Post, lang_service: LanguageService, post_repo: PostRepository
+    ):
         self.__post = post
+        self.__post_repo = post_repo
         self.__original_language = post.default_language
-        self.__lang_service = LanguageService()
+        self.__lang_service = lang_service
 
     def translate(self):
         missing_langs = self.__lang_service.get_missing_languages(self.__post)
@@ -15,6 +20,7 @@ class PostTranslator:
         if not target_language:
             return
 
+        version = self.__post.content_version
         original_content = self.__post.get_content_by_language()
         translated_blocks: list[ContentBlock] = []
 
@@ -53,6 +59,45 @@ class PostTranslator:
             language=target_language,
         )
 
-        self.__post.add_content(target_language.code, translated_content)
-        print(f"Tradução para '{target_language}' adicionada ao post.")
+        try:
+            self.__post_repo.add_content(
+                self.__post,
+                target_language.code,
+                translated_content,
+                expected_version=version,
+            )
+            print(f"Tradução para '{target_language}' adicionada ao post.")
+        except VersionConflictError as e:
+            print(e)
+            print("A tradução não foi salva; traduza a versão atual do post.")
+
+        input("Clique Enter para voltar.")
+
+    def translate_automatically(self, translator: MachineTranslator):
+        missing_langs = self.__lang_service.get_missing_languages(self.__post)
+
+        if not missing_langs:
+            input(
+                "O post já está traduzido para todos os idiomas. Clique Enter para voltar."
+            )
+            return
+
+        # Each translation bumps the version, so the expected one follows along;
+        # any other change to the post stops the remaining translations.
+        version = self.__post.content_version
+        for content in translator.translate_post(self.__post, missing_langs):
+            try:
+                self.__post_repo.add_content(
+                    self.__post,
+                    content.language.code,
+                    content,
+                    expected_version=version,
+                )
+            except VersionConflictError as e:
+                print(e)
+                break
+
+            version += 1
+            print(f"Tradução para '{content.language}' adicionada ao post.")
+
         input("Clique Enter para voltar.")
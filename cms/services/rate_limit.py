@@ -0,0 +1,191 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from enum import Enum
+
+# Past this many tracked keys per limit, the least recently seen is dropped
+# (and starts over with a full allowance).
+MAX_KEYS = 100_000
+
+type Clock = Callable[[], float]
+
+
+class RateLimitedAction(Enum):
+    LOGIN = "login"
+    COMMENT = "comentário"
+    VIEW = "visualização"
+
+
+class RateLimitExceededError(ValueError):
+    retry_after: float
+
+    def __init__(self, action: RateLimitedAction, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            f"Limite de {action.value} atingido. "
+            f"Tente novamente em {math.ceil(retry_after)}s."
+        )
+
+
+# State per key, kept in access order: the entries idle the longest are at the
+# front, so expired ones are swept from there as new keys arrive. An entry is
+# only dropped once it carries no information (a full bucket, an empty window),
+# so expiry never changes a decision. Every operation is O(1) amortized.
+class RateLimit(ABC):
+    __ttl: float
+    __max_keys: int
+    __states: OrderedDict[Hashable, list[float]]
+    __lock: threading.Lock
+
+    def __init__(self, ttl: float, max_keys: int):
+        self.__ttl = ttl
+        self.__max_keys = max_keys
+        self.__states = OrderedDict()
+        self.__lock = threading.Lock()
+
+    # Counts one hit for the key. Returns 0 if it is allowed, otherwise the
+    # seconds until it would be (the hit is then not counted).
+    def hit(self, key: Hashable, now: float) -> float:
+        with self.__lock:
+            state = self.__states.get(key)
+            if state is None:
+                self.__expire(now)
+                state = self._new_state(now)
+                self.__states[key] = state
+            else:
+                self.__states.move_to_end(key)
+            return self._take(state, now)
+
+    def reset(self, key: Hashable):
+        with self.__lock:
+            self.__states.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self.__states)
+
+    def __expire(self, now: float):
+        states = self.__states
+        while states:
+            state = next(iter(states.values()))
+            if now - state[-1] < self.__ttl and len(states) < self.__max_keys:
+                break
+            states.popitem(last=False)
+
+    # The last item of the state is the time of the last counted hit.
+    @abstractmethod
+    def _new_state(self, now: float) -> list[float]:
+        pass
+
+    # Same contract as hit().
+    @abstractmethod
+    def _take(self, state: list[float], now: float) -> float:
+        pass
+
+
+# Allows bursts of up to capacity hits; the bucket refills completely in
+# per_seconds.
+# State: [tokens, last hit].
+class TokenBucket(RateLimit):
+    __capacity: float
+    __rate: float
+
+    def __init__(self, capacity: int, per_seconds: float, max_keys: int = MAX_KEYS):
+        super().__init__(per_seconds, max_keys)
+        self.__capacity = capacity
+        self.__rate = capacity / per_seconds
+
+    def _new_state(self, now: float) -> list[float]:
+        return [self.__capacity, now]
+
+    def _take(self, state: list[float], now: float) -> float:
+        tokens = min(self.__capacity, state[0] + (now - state[1]) * self.__rate)
+        if tokens < 1:
+            return (1 - tokens) / self.__rate
+        state[0] = tokens - 1
+        state[1] = now
+        return 0
+
+
+# At most limit hits in any window of the given length, approximated from the
+# counts of the current and previous fixed windows: the previous one is
+# weighted by how much of it still overlaps the sliding window.
+# State: [window start, current count, previous count, last hit].
+class SlidingWindow(RateLimit):
+    __limit: int
+    __window: float
+
+    def __init__(self, limit: int, window: float, max_keys: int = MAX_KEYS):
+        super().__init__(2 * window, max_keys)
+        self.__limit = limit
+        self.__window = window
+
+    def _new_state(self, now: float) -> list[float]:
+        return [now - now % self.__window, 0, 0, now]
+
+    def _take(self, state: list[float], now: float) -> float:
+        window = self.__window
+        start = now - now % window
+        if start != state[0]:
+            state[2] = state[1] if start - state[0] == window else 0
+            state[0] = start
+            state[1] = 0
+
+        previous, room = state[2], self.__limit - 1 - state[1]
+        if room < 0:
+            # Nothing fits until the next window, where the current count
+            # becomes the previous one.
+            start, previous, room = start + window, state[1], self.__limit - 1
+        # The hit fits once the previous window's weight shrinks to room.
+        wait = start - now
+        if previous > room:
+            wait += window * (1 - room / previous)
+        if wait > 0:
+            return wait
+
+        state[1] += 1
+        state[3] = now
+        return 0
+
+
+def default_limits() -> dict[RateLimitedAction, RateLimit]:
+    return {
+        # Keyed by username: 5 attempts in 5 minutes, cleared on success.
+        RateLimitedAction.LOGIN: SlidingWindow(5, 300),
+        # Keyed by (user, site): bursts of 5 comments, then one every 12 s.
+        RateLimitedAction.COMMENT: TokenBucket(5, 60),
+        # Keyed by (user, site, post or 0 for the site itself): reopening a
+        # post or site counts as a single view for at least 30 minutes.
+        RateLimitedAction.VIEW: SlidingWindow(1, 1800),
+    }
+
+
+class RateLimiter:
+    __limits: dict[RateLimitedAction, RateLimit]
+    __clock: Clock
+
+    def __init__(
+        self,
+        limits: dict[RateLimitedAction, RateLimit] | None = None,
+        clock: Clock = time.monotonic,
+    ):
+        self.__limits = limits if limits is not None else default_limits()
+        self.__clock = clock
+
+    def allow(self, action: RateLimitedAction, *key: Hashable) -> bool:
+        limit = self.__limits.get(action)
+        return limit is None or limit.hit(key, self.__clock()) == 0
+
+    def acquire(self, action: RateLimitedAction, *key: Hashable):
+        limit = self.__limits.get(action)
+        if limit is not None:
+            retry_after = limit.hit(key, self.__clock())
+            if retry_after:
+                raise RateLimitExceededError(action, retry_after)
+
+    def reset(self, action: RateLimitedAction, *key: Hashable):
+        limit = self.__limits.get(action)
+        if limit is not None:
+            limit.reset(key)
@@ -0,0 +1,187 @@
+import csv
+import json
+import os
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import chain, islice
+from typing import Any, TextIO
+
+from cms.models import (
+    ActionCounts,
+    AnalyticsEntry,
+    AnalyticsReport,
+    PostAction,
+    PostAnalyticsEntry,
+    PostAnalyticsReport,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    SiteAnalyticsReport,
+)
+from cms.repository import AnalyticsRepository, PostRepository
+
+# (site id, post id or 0, entry kind, action value): plain ints, so partitions
+# are cheap to send to the worker processes.
+type EntryRow = tuple[int, int, int, int]
+type ReportResult = dict[str, Any]
+
+SITE_ENTRY = 0
+POST_ENTRY = 1
+
+# Below this many entries the counting is done in the current process; starting
+# the pool would cost more than it saves.
+PARTITION_SIZE = 200_000
+
+
+def count_rows(rows: list[EntryRow]) -> Counter[EntryRow]:
+    return Counter(rows)
+
+
+def entry_row(entry: AnalyticsEntry) -> EntryRow | None:
+    if isinstance(entry, PostAnalyticsEntry):
+        return (entry.site.id, entry.post.id, POST_ENTRY, entry.action.value)
+    if isinstance(entry, SiteAnalyticsEntry):
+        return (entry.site.id, 0, SITE_ENTRY, entry.action.value)
+    return None
+
+
+# Builds the reports of many sites (and all of their posts) from a single pass
+# over their analytics entries, instead of one scan per site and metric. The
+# entries are read from the per-site indexes, split in partitions that are
+# counted by a process pool and the partial counts are merged here.
+class ReportEngine:
+    __post_repo: PostRepository
+    __analytics_repo: AnalyticsRepository
+    __max_workers: int | None
+    __partition_size: int
+
+    def __init__(
+        self,
+        post_repo: PostRepository,
+        analytics_repo: AnalyticsRepository,
+        max_workers: int | None = None,
+        partition_size: int = PARTITION_SIZE,
+    ):
+        self.__post_repo = post_repo
+        self.__analytics_repo = analytics_repo
+        self.__max_workers = max_workers
+        self.__partition_size = partition_size
+
+    def generate(self, sites: Iterable[Site]) -> list[ReportResult]:
+        sites = list(sites)
+        site_counts, post_counts = self.__count_actions(
+            list({site.id: site for site in sites}.values())
+        )
+
+        results: list[ReportResult] = []
+        for site in sites:
+            reports: list[AnalyticsReport] = [
+                SiteAnalyticsReport(
+                    [],
+                    site,
+                    counts=site_counts.get(site.id, {}),
+                    unique_users=self.__analytics_repo.get_unique_users(site.id),
+                )
+            ]
+            for post in self.__post_repo.iter_site_posts(site):
+                reports.append(
+                    PostAnalyticsReport(
+                        [],
+                        post,
+                        counts=post_counts.get(post.id, {}),
+                        unique_users=self.__analytics_repo.get_unique_users(
+                            site.id, post.id
+                        ),
+                    )
+                )
+
+            for report in reports:
+                results.append(
+                    {
+                        "op": "report",
+                        "site_id": site.id,
+                        "post_id": report.post.id
+                        if isinstance(report, PostAnalyticsReport)
+                        else None,
+                        "sections": report.generate_metrics(),
+                    }
+                )
+
+        return results
+
+    def __count_actions(
+        self, sites: list[Site]
+    ) -> tuple[dict[int, ActionCounts], dict[int, ActionCounts]]:
+        site_counts: dict[int, ActionCounts] = {}
+        post_counts: dict[int, ActionCounts] = {}
+
+        for (site_id, post_id, kind, value), n in self.__count_rows(sites).items():
+            if kind == POST_ENTRY:
+                action: SiteAction | PostAction = PostAction(value)
+                counts = post_counts.setdefault(post_id, {})
+                counts[action] = counts.get(action, 0) + n
+            else:
+                action = SiteAction(value)
+
+            counts = site_counts.setdefault(site_id, {})
+            counts[action] = counts.get(action, 0) + n
+
+        return site_counts, post_counts
+
+    # Partitions are built as the pool asks for them: at most two per worker
+    # (one being counted, one queued) are held in memory at a time.
+    def __count_rows(self, sites: list[Site]) -> Counter[EntryRow]:
+        partitions = self.__partition(sites)
+        first = next(partitions, [])
+        second = next(partitions, None)
+        if second is None:
+            return count_rows(first)
+
+        total: Counter[EntryRow] = Counter()
+        in_flight = 2 * (self.__max_workers or os.process_cpu_count() or 1)
+        pending: set[Future[Counter[EntryRow]]] = set()
+        with ProcessPoolExecutor(self.__max_workers) as executor:
+            for partition in chain([first, second], partitions):
+                if len(pending) >= in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        total.update(future.result())
+                pending.add(executor.submit(count_rows, partition))
+
+            for future in wait(pending).done:
+                total.update(future.result())
+
+        return total
+
+    def __partition(self, sites: list[Site]) -> Iterator[list[EntryRow]]:
+        rows = (
+            row
+            for site in sites
+            for entry in self.__analytics_repo.iter_site_entries(site)
+            if (row := entry_row(entry))
+        )
+        while partition := list(islice(rows, self.__partition_size)):
+            yield partition
+
+
+def write_reports(results: list[ReportResult], fmt: str, out: TextIO):
+    if fmt == "json":
+        json.dump(results, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+        return
+
+    writer = csv.writer(out)
+    writer.writerow(["site_id", "post_id", "section", "name", "value"])
+    for result in results:
+        for section in result["sections"]:
+            for item in section["items"]:
+                writer.writerow(
+                    [
+                        result["site_id"],
+                        result.get("post_id") or "",
+                        section["title"],
+                        item["name"],
+                        item["value"],
+                    ]
+                )
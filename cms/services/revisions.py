@@ -0,0 +1,281 @@
+import threading
+from collections.abc import Hashable
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime
+from difflib import SequenceMatcher
+from enum import Enum
+from typing import Any
+
+from cms.models import (
+    Content,
+    ContentBlock,
+    Language,
+    LanguageCode,
+    MediaFile,
+    Post,
+    User,
+)
+from cms.repository import PostRepository
+
+# Every KEYFRAME_INTERVAL revisions the full block list is kept, so rebuilding
+# any revision applies at most KEYFRAME_INTERVAL - 1 deltas.
+KEYFRAME_INTERVAL = 16
+
+
+class BlockOperation(Enum):
+    INSERT = 1
+    DELETE = 2
+    REPLACE = 3
+
+
+@dataclass(frozen=True)
+class BlockDelta:
+    operation: BlockOperation
+    index: int
+    block: ContentBlock | None = None
+
+
+@dataclass
+class Keyframe:
+    title: str
+    blocks: tuple[ContentBlock, ...]
+
+
+@dataclass
+class Revision:
+    number: int
+    # None when the content was replaced outside the editor (e.g. a new
+    # translation of the same language) or by a system job.
+    author: User | None
+    created_at: datetime
+    # Only set when the revision changed the title.
+    title: str | None
+    deltas: list[BlockDelta]
+    keyframe: Keyframe | None = None
+
+
+def _block_key(block: ContentBlock) -> Hashable:
+    # Blocks are compared by content: the order field changes whenever a block
+    # is inserted above, and medias are compared by id (they are not hashable).
+    def key(value: Any) -> Hashable:
+        if isinstance(value, list):
+            return tuple(key(item) for item in value)
+        if isinstance(value, MediaFile):
+            return (MediaFile, value.id)
+        return value
+
+    return (type(block),) + tuple(
+        key(getattr(block, f.name)) for f in fields(block) if f.name != "order"
+    )
+
+
+# The deltas are emitted from the end of the list to the start, so applying them
+# in sequence never shifts the index of a pending one.
+def diff_blocks(old: list[ContentBlock], new: list[ContentBlock]) -> list[BlockDelta]:
+    matcher = SequenceMatcher(
+        None, [_block_key(b) for b in old], [_block_key(b) for b in new], False
+    )
+    deltas: list[BlockDelta] = []
+
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == "equal":
+            continue
+
+        common = min(i2 - i1, j2 - j1)
+        for k in range(common):
+            deltas.append(BlockDelta(BlockOperation.REPLACE, i1 + k, new[j1 + k]))
+        for _ in range(i2 - i1 - common):
+            deltas.append(BlockDelta(BlockOperation.DELETE, i1 + common))
+        for k in range(common, j2 - j1):
+            deltas.append(BlockDelta(BlockOperation.INSERT, i1 + k, new[j1 + k]))
+
+    return deltas
+
+
+def apply_deltas(blocks: list[ContentBlock], deltas: list[BlockDelta]):
+    for delta in deltas:
+        if delta.operation == BlockOperation.INSERT and delta.block:
+            blocks.insert(delta.index, delta.block)
+        elif delta.operation == BlockOperation.REPLACE and delta.block:
+            blocks[delta.index] = delta.block
+        elif delta.operation == BlockOperation.DELETE:
+            del blocks[delta.index]
+
+
+def renumber(blocks: list[ContentBlock]) -> list[ContentBlock]:
+    return [
+        block if block.order == i else replace(block, order=i)
+        for i, block in enumerate(blocks, start=1)
+    ]
+
+
+# History of one language of a post. Only the blocks that changed are stored
+# in each revision (blocks themselves are shared, never copied), plus a
+# keyframe of block references every KEYFRAME_INTERVAL revisions.
+class RevisionHistory:
+    lock: threading.Lock
+    __language: Language
+    __revisions: list[Revision]
+    __latest: Content
+
+    def __init__(self, author: User, content: Content, created_at: datetime):
+        self.lock = threading.Lock()
+        self.__language = content.language
+        self.__latest = content
+        self.__revisions = [
+            Revision(
+                number=0,
+                author=author,
+                created_at=created_at,
+                title=content.title,
+                deltas=[],
+                keyframe=Keyframe(content.title, tuple(content.body)),
+            )
+        ]
+
+    @property
+    def revisions(self) -> list[Revision]:
+        return list(self.__revisions)
+
+    def get_latest(self) -> Content:
+        return self.__latest
+
+    def has_changes(self, content: Content) -> bool:
+        return content.title != self.__latest.title or bool(
+            diff_blocks(self.__latest.body, content.body)
+        )
+
+    def commit(self, author: User | None, content: Content) -> Revision | None:
+        deltas = diff_blocks(self.__latest.body, content.body)
+        title = content.title if content.title != self.__latest.title else None
+        if not deltas and title is None:
+            return None
+
+        number = len(self.__revisions)
+        revision = Revision(number, author, datetime.now(), title, deltas)
+        if number % KEYFRAME_INTERVAL == 0:
+            revision.keyframe = Keyframe(content.title, tuple(content.body))
+
+        self.__revisions.append(revision)
+        self.__latest = content
+        return revision
+
+    def get_revision(self, number: int) -> Content:
+        if not 0 <= number < len(self.__revisions):
+            raise ValueError(f"Revisão inexistente: {number}")
+        if number == len(self.__revisions) - 1:
+            return self.__latest
+
+        base = self.__revisions[number - number % KEYFRAME_INTERVAL]
+        if not base.keyframe:
+            raise ValueError(f"Keyframe ausente na revisão {base.number}")
+
+        title = base.keyframe.title
+        blocks = list(base.keyframe.blocks)
+        for revision in self.__revisions[base.number + 1 : number + 1]:
+            apply_deltas(blocks, revision.deltas)
+            title = revision.title or title
+
+        return Content(title=title, body=renumber(blocks), language=self.__language)
+
+    def diff(self, old: int, new: int) -> list[BlockDelta]:
+        return diff_blocks(self.get_revision(old).body, self.get_revision(new).body)
+
+
+# Histories only live in memory. The write-ahead log and the snapshots keep the
+# latest content of each language (the WAL writes it whole on every save), so
+# after a restart every history starts over from that content as revision 0.
+class RevisionStore:
+    __histories: dict[tuple[int, LanguageCode], RevisionHistory]
+
+    def __init__(self):
+        self.__histories = {}
+
+    # Posts created before editing existed start their history from the
+    # current content; contents replaced outside the editor since the last
+    # read are recorded as a revision without author.
+    def get_history(self, post: Post, lang: LanguageCode) -> RevisionHistory:
+        content = post.get_contents()[lang]
+        history = self.__histories.get((post.id, lang))
+        if not history:
+            history = RevisionHistory(post.poster, content, post.created_at)
+            self.__histories[(post.id, lang)] = history
+        elif history.get_latest() is not content:
+            with history.lock:
+                if history.get_latest() is not content:
+                    history.commit(None, content)
+
+        return history
+
+    def forget_post(self, post: Post):
+        for lang in post.get_contents():
+            self.__histories.pop((post.id, lang), None)
+
+
+# Block-level editing of one language of a post. Changes are kept in a draft
+# until save(), which stores only the delta as a new revision. The save fails
+# with VersionConflictError if the post changed after the draft was started.
+@dataclass
+class PostEditor:
+    post: Post
+    lang: LanguageCode
+    post_repo: PostRepository
+    revisions: RevisionStore
+    title: str = field(init=False)
+    blocks: list[ContentBlock] = field(init=False)
+    version: int = field(init=False)
+
+    def __post_init__(self):
+        self.discard()
+
+    def set_title(self, title: str):
+        self.title = title
+
+    def insert_block(self, index: int, block: ContentBlock):
+        self.blocks.insert(index, block)
+
+    def replace_block(self, index: int, block: ContentBlock):
+        self.blocks[index] = block
+
+    def delete_block(self, index: int):
+        del self.blocks[index]
+
+    def move_block(self, index: int, new_index: int):
+        self.blocks.insert(new_index, self.blocks.pop(index))
+
+    def discard(self):
+        self.version = self.post.content_version
+        latest = self.__history.get_latest()
+        self.title = latest.title
+        self.blocks = list(latest.body)
+
+    def save(self, author: User | None) -> Revision | None:
+        history = self.__history
+        content = Content(
+            title=self.title,
+            body=renumber(self.blocks),
+            language=history.get_latest().language,
+        )
+
+        with history.lock:
+            if not history.has_changes(content):
+                return None
+
+            self.post_repo.add_content(
+                self.post, self.lang, content, expected_version=self.version
+            )
+            revision = history.commit(author, content)
+
+        self.version = self.post.content_version
+        self.blocks = list(content.body)
+        return revision
+
+    def restore(self, number: int, author: User) -> Revision | None:
+        content = self.__history.get_revision(number)
+        self.title = content.title
+        self.blocks = list(content.body)
+        return self.save(author)
+
+    @property
+    def __history(self) -> RevisionHistory:
+        return self.revisions.get_history(self.post, self.lang)
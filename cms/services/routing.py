@@ -0,0 +1,69 @@
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from cms.models import MEDIA_HOST, SITE_HOST, MediaFile, Post, Site
+from cms.repository import MediaRepository, PostRepository, SiteRepository
+
+type Resource = Site | Post | MediaFile
+
+
+# The part of host that fills the {} of the pattern, if host matches it.
+def match_host(host: str, pattern: str) -> str | None:
+    prefix, _, suffix = pattern.partition("{}")
+    if (
+        len(host) > len(prefix) + len(suffix)
+        and host.startswith(prefix)
+        and host.endswith(suffix)
+    ):
+        return host[len(prefix) : len(host) - len(suffix)]
+    return None
+
+
+# Maps the URLs built by Site.get_url, Post.get_url and MediaFile.url (share
+# links included) back to what they point to, with one lookup in the routing
+# indexes kept by the repositories.
+class UrlResolver:
+    __site_repo: SiteRepository
+    __post_repo: PostRepository
+    __media_repo: MediaRepository
+
+    def __init__(
+        self,
+        site_repo: SiteRepository,
+        post_repo: PostRepository,
+        media_repo: MediaRepository,
+    ):
+        self.__site_repo = site_repo
+        self.__post_repo = post_repo
+        self.__media_repo = media_repo
+
+    def resolve(self, url: str) -> Resource | None:
+        try:
+            parts = urlsplit(url.strip())
+        except ValueError:
+            return None
+        # hostname comes lower-cased.
+        host = parts.hostname or ""
+
+        if domain := match_host(host, MEDIA_HOST):
+            site = self.__site_repo.get_site_by_domain(domain)
+            filename = unquote(parts.path.removeprefix("/"))
+            if not site or not filename:
+                return None
+            return self.__media_repo.get_media_by_filename(site, filename)
+
+        domain = match_host(host, SITE_HOST)
+        site = self.__site_repo.get_site_by_domain(domain) if domain else None
+        if not site or parts.path not in ("", "/"):
+            return None
+
+        post_id = parse_qs(parts.query).get("post")
+        if not post_id:
+            return site
+        return self.__get_site_post(site, post_id[0])
+
+    def __get_site_post(self, site: Site, post_id: str) -> Post | None:
+        try:
+            post = self.__post_repo.get_post_by_id(int(post_id))
+        except (ValueError, KeyError):
+            return None
+        return post if post.site.id == site.id else None
@@ -0,0 +1,182 @@
+import hashlib
+import hmac
+import math
+import secrets
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+
+from cms.models import User
+from cms.repository import Mutation
+
+DEFAULT_TTL = timedelta(hours=8)
+# Width of each slot of the timing wheel: expired sessions are swept at most
+# this late (they are rejected on lookup right away).
+WHEEL_RESOLUTION = 60.0
+# Most expired sessions removed per login, so no login pays for a big sweep.
+SWEEP_BUDGET = 256
+SIGNATURE_BYTES = 16
+
+type Clock = Callable[[], float]
+
+
+class InvalidSessionError(ValueError):
+    def __init__(self):
+        super().__init__("Sessão inválida ou expirada. Faça login novamente.")
+
+
+@dataclass
+class Session:
+    id: str
+    user: User
+    created_at: float
+    expires_at: float
+
+
+# Tokens are "<session id>.<MAC of the id>": a forged or mistyped token is
+# rejected by the signature before touching the session table, and a valid one
+# costs one MAC over a few bytes plus a dict lookup; the password is never
+# checked again. Sessions expire through a hashed timing wheel: each one is
+# filed in the slot of its expiry time, and the slots that have passed are
+# dropped whole, so expiring costs O(1) per session.
+class SessionStore:
+    __secret: bytes
+    __ttl: float
+    __clock: Clock
+    __sessions: dict[str, Session]
+    __user_sessions: dict[int, set[str]]
+    __wheel: dict[int, list[str]]
+    __swept_slot: int
+    __lock: threading.Lock
+
+    def __init__(
+        self,
+        secret: bytes | None = None,
+        ttl: timedelta = DEFAULT_TTL,
+        clock: Clock = time.monotonic,
+    ):
+        # With a random secret, tokens die with the process, as the sessions do.
+        self.__secret = secret or secrets.token_bytes(32)
+        self.__ttl = ttl.total_seconds()
+        self.__clock = clock
+        self.__sessions = {}
+        self.__user_sessions = {}
+        self.__wheel = {}
+        self.__swept_slot = self.__slot(clock())
+        self.__lock = threading.Lock()
+
+    # Sessions of deleted or anonymized users are revoked.
+    def on_user_mutation(self, mutation: Mutation, payload: Any):
+        if mutation in (Mutation.DELETE_USER, Mutation.ANONYMIZE_USER):
+            self.revoke_user(payload)
+
+    def create(self, user: User) -> str:
+        now = self.__clock()
+        session = Session(
+            id=secrets.token_urlsafe(16),
+            user=user,
+            created_at=now,
+            expires_at=now + self.__ttl,
+        )
+
+        with self.__lock:
+            self.__sweep(now)
+            self.__sessions[session.id] = session
+            self.__user_sessions.setdefault(user.id, set()).add(session.id)
+            self.__wheel.setdefault(self.__slot(session.expires_at), []).append(
+                session.id
+            )
+
+        return f"{session.id}.{self.__sign(session.id)}"
+
+    def authenticate(self, token: str) -> User:
+        return self.get_session(token).user
+
+    def get_session(self, token: str) -> Session:
+        session_id = self.__verify(token)
+        session = self.__sessions.get(session_id) if session_id else None
+        if not session or session.expires_at <= self.__clock():
+            raise InvalidSessionError()
+
+        return session
+
+    def logout(self, token: str):
+        session_id = self.__verify(token)
+        if session_id:
+            with self.__lock:
+                self.__remove(session_id)
+
+    # Ends every session of the user, e.g. after a password leak.
+    def revoke_user(self, user: User) -> int:
+        with self.__lock:
+            session_ids = self.__user_sessions.pop(user.id, set())
+            for session_id in session_ids:
+                self.__sessions.pop(session_id, None)
+            return len(session_ids)
+
+    def get_user_sessions(self, user: User) -> list[Session]:
+        now = self.__clock()
+        return [
+            session
+            for session_id in self.__user_sessions.get(user.id, ())
+            if (session := self.__sessions.get(session_id)) and session.expires_at > now
+        ]
+
+    def __len__(self) -> int:
+        return len(self.__sessions)
+
+    # Removes every expired session at once (logins only remove a few).
+    def sweep(self):
+        with self.__lock:
+            self.__sweep(self.__clock(), math.inf)
+
+    def __sweep(self, now: float, budget: float = SWEEP_BUDGET):
+        # A slot is only dropped once all of it is in the past.
+        current = self.__slot(now) - 1
+        if current - self.__swept_slot > len(self.__wheel):
+            # After a long idle period, jump to the first filled slot.
+            first = min(self.__wheel, default=current + 1)
+            self.__swept_slot = max(self.__swept_slot, min(first, current + 1) - 1)
+
+        while self.__swept_slot < current and budget > 0:
+            slot = self.__swept_slot + 1
+            expired = self.__wheel.get(slot, [])
+            while expired and budget > 0:
+                self.__remove(expired.pop())
+                budget -= 1
+            if expired:
+                return
+            self.__wheel.pop(slot, None)
+            self.__swept_slot = slot
+
+    def __remove(self, session_id: str):
+        session = self.__sessions.pop(session_id, None)
+        if not session:
+            return
+
+        user_sessions = self.__user_sessions.get(session.user.id)
+        if user_sessions is not None:
+            user_sessions.discard(session_id)
+            if not user_sessions:
+                del self.__user_sessions[session.user.id]
+
+    # Returns the session id if the token's signature is valid.
+    def __verify(self, token: str) -> str | None:
+        session_id, _, signature = token.partition(".")
+        expected = self.__sign(session_id)
+        if hmac.compare_digest(signature.encode(), expected.encode()):
+            return session_id
+        return None
+
+    # Keyed BLAKE2b is a MAC on its own, and cheaper than HMAC-SHA256.
+    def __sign(self, session_id: str) -> str:
+        return hashlib.blake2b(
+            session_id.encode(), key=self.__secret, digest_size=SIGNATURE_BYTES
+        ).hexdigest()
+
+    @staticmethod
+    def __slot(moment: float) -> int:
+        return int(moment // WHEEL_RESOLUTION)
@@ -0,0 +1,84 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from cms.models import (
+    AnalyticsEntry,
+    PostAction,
+    PostAnalyticsEntry,
+    ReportSection,
+    SocialMedia,
+)
+
+
+@dataclass
+class ShareFunnel:
+    platform: SocialMedia
+    # Distinct (user, post) pairs that reached each stage.
+    readers: int = 0
+    sharers: int = 0
+    # Visits that came through a link shared on the platform.
+    return_visits: int = 0
+
+    def get_share_rate(self) -> float:
+        return self.sharers / self.readers if self.readers else 0.0
+
+    def get_return_rate(self) -> float:
+        return self.return_visits / self.sharers if self.sharers else 0.0
+
+
+# view -> share -> return visit, per platform, in one pass over the log. The
+# entries must come in the order they were logged (as iter_entries yields
+# them): a share only counts after a view of the same post by the same user,
+# and a return visit only after the post was shared on that platform.
+def compute_share_funnels(
+    entries: Iterable[AnalyticsEntry], site_id: int | None = None
+) -> dict[SocialMedia, ShareFunnel]:
+    funnels = {platform: ShareFunnel(platform) for platform in SocialMedia}
+    readers: set[tuple[int, int]] = set()
+    sharers: set[tuple[int, int, SocialMedia]] = set()
+    shared_posts: set[tuple[int, SocialMedia]] = set()
+
+    for entry in entries:
+        if not isinstance(entry, PostAnalyticsEntry) or not entry.user:
+            continue
+        if site_id is not None and entry.site.id != site_id:
+            continue
+
+        reader = (entry.user.id, entry.post.id)
+        if entry.action == PostAction.VIEW:
+            if entry.platform and (entry.post.id, entry.platform) in shared_posts:
+                funnels[entry.platform].return_visits += 1
+            elif not entry.platform and reader not in readers:
+                readers.add(reader)
+                for funnel in funnels.values():
+                    funnel.readers += 1
+
+        elif entry.action == PostAction.SHARE and entry.platform:
+            shared_posts.add((entry.post.id, entry.platform))
+            sharer = (*reader, entry.platform)
+            if reader in readers and sharer not in sharers:
+                sharers.add(sharer)
+                funnels[entry.platform].sharers += 1
+
+    return funnels
+
+
+def funnel_sections(funnels: dict[SocialMedia, ShareFunnel]) -> list[ReportSection]:
+    return [
+        {
+            "title": f"Funil de compartilhamento - {funnel.platform.value}",
+            "items": [
+                {"name": "Leitores", "value": str(funnel.readers)},
+                {
+                    "name": "Compartilharam",
+                    "value": f"{funnel.sharers} ({funnel.get_share_rate():.1%})",
+                },
+                {
+                    "name": "Visitas de retorno",
+                    "value": f"{funnel.return_visits} "
+                    f"({funnel.get_return_rate():.1f} por compartilhamento)",
+                },
+            ],
+        }
+        for funnel in funnels.values()
+    ]
@@ -1,28 +1,55 @@
 from abc import ABC, abstractmethod
+from collections.abc import Callable
 from dataclasses import dataclass
-from typing import Type
-from cms.models import MediaBlock, Post, Site, SiteTemplateType
-from cms.repository import PostRepository, AnalyticsRepository
+from enum import Enum
+from typing import TYPE_CHECKING, Any, ClassVar
+
+from cms.models import (
+    AnalyticsEntry,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    SiteTemplateType,
+)
+from cms.repository import AnalyticsRepository, Mutation, PostRepository
+
+if TYPE_CHECKING:
+    from cms.services.trending import TrendingScores
+
+
+class FeedEvent(Enum):
+    POSTS = 1
+    VIEWS = 2
+    COMMENTS = 3
+    SHARES = 4
+    MEDIA = 5
 
 
 @dataclass
 class SiteTemplate(ABC):
+    # Events that can change the result of select_posts. The home feed of a site
+    # is only recomputed when one of them happens.
+    data_needs: ClassVar[frozenset[FeedEvent]] = frozenset({FeedEvent.POSTS})
+    feed_size: ClassVar[int] = 3
+
     site: Site
     post_repo: PostRepository
     analytics_repo: AnalyticsRepository
+    trending: "TrendingScores | None" = None
 
     @abstractmethod
     def select_posts(self) -> list[Post]:
         pass
 
-    def display(self):
+    def display(self, posts: list[Post]):
         print(f"<========== {self.site.name} ==========>")
         print(self.site.description)
         print(" ")
 
-        posts = self.select_posts()
-
-        for post in posts[:3]:
+        for post in posts[: self.feed_size]:
             self.display_post(post)
 
         print(" ")
@@ -31,36 +58,65 @@ class SiteTemplate(ABC):
         post.display_post_short()
 
 
+_template_map: dict[SiteTemplateType, type[SiteTemplate]] = {}
+
+
+def register_site_template(
+    template_type: SiteTemplateType,
+) -> Callable[[type[SiteTemplate]], type[SiteTemplate]]:
+    def decorator(template_cls: type[SiteTemplate]) -> type[SiteTemplate]:
+        _template_map[template_type] = template_cls
+        return template_cls
+
+    return decorator
+
+
+@register_site_template(SiteTemplateType.TOP_POSTS_FIRST)
 class TopPostsFirstTemplate(SiteTemplate):
+    data_needs = frozenset({FeedEvent.POSTS, FeedEvent.VIEWS})
+
     def select_posts(self):
+        views = self.analytics_repo.get_site_post_counts(self.site.id, PostAction.VIEW)
         return sorted(
             self.post_repo.get_site_posts(self.site),
-            key=lambda p: self.analytics_repo.get_post_views(p.id),
+            key=lambda p: views.get(p.id, 0),
             reverse=True,
         )
 
 
+@register_site_template(SiteTemplateType.TOP_COMMENTS_FIRST)
 class TopCommentsFirstTemplate(SiteTemplate):
+    data_needs = frozenset({FeedEvent.POSTS, FeedEvent.COMMENTS})
+
     def select_posts(self):
+        comments = self.analytics_repo.get_site_post_counts(
+            self.site.id, PostAction.COMMENT
+        )
         return sorted(
             self.post_repo.get_site_posts(self.site),
-            key=lambda p: self.analytics_repo.get_post_comments(p.id),
+            key=lambda p: comments.get(p.id, 0),
             reverse=True,
         )
 
 
+@register_site_template(SiteTemplateType.FOCUS_ON_MEDIA)
 class FocusOnMediaTemplate(SiteTemplate):
+    data_needs = frozenset({FeedEvent.POSTS, FeedEvent.MEDIA})
+
+    # The post repository counts the MediaBlocks of every content as it is
+    # stored, so no post body is read here.
     def select_posts(self):
         return [
             p
             for p in self.post_repo.get_site_posts(self.site)
-            if any(isinstance(b, MediaBlock) for b in p.get_default_body())
+            if self.post_repo.has_media_block(p, p.default_language.code)
         ]
 
     def display_post(self, post: Post):
         post.display_first_post_image()
 
 
+@register_site_template(SiteTemplateType.LATEST_POSTS)
 class LatestPostsTemplate(SiteTemplate):
     def select_posts(self):
         return sorted(
@@ -70,21 +126,130 @@ class LatestPostsTemplate(SiteTemplate):
         )
 
 
-_template_map: dict[SiteTemplateType, Type[SiteTemplate]] = {
-    SiteTemplateType.TOP_POSTS_FIRST: TopPostsFirstTemplate,
-    SiteTemplateType.TOP_COMMENTS_FIRST: TopCommentsFirstTemplate,
-    SiteTemplateType.LATEST_POSTS: LatestPostsTemplate,
-    SiteTemplateType.FOCUS_ON_MEDIA: FocusOnMediaTemplate,
-}
+@register_site_template(SiteTemplateType.TRENDING)
+class TrendingTemplate(SiteTemplate):
+    data_needs = frozenset(
+        {FeedEvent.POSTS, FeedEvent.VIEWS, FeedEvent.COMMENTS, FeedEvent.SHARES}
+    )
+
+    # Decay scales every score by the same factor, so the order only changes
+    # when new events arrive and the cached feed stays valid in between.
+    def select_posts(self):
+        # The scores are shared by every site: each TrendingScores subscribes
+        # to the analytics repository, so one per template would never go away.
+        if not self.trending:
+            raise ValueError("TrendingTemplate needs the shared TrendingScores.")
+
+        posts = {p.id: p for p in self.post_repo.iter_site_posts(self.site)}
+        top = self.trending.get_top_posts(self.site, self.feed_size)
+        selected = [posts[post_id] for post_id, _ in top if post_id in posts]
+
+        # Sites with little activity are completed with the latest posts.
+        for post in sorted(posts.values(), key=lambda p: p.created_at, reverse=True):
+            if len(selected) >= self.feed_size:
+                break
+            if post not in selected:
+                selected.append(post)
+
+        return selected
 
 
 def build_site_template(
     site: Site,
     post_repo: PostRepository,
     analytics_repo: AnalyticsRepository,
+    trending: "TrendingScores | None" = None,
 ) -> SiteTemplate:
     template_cls = _template_map.get(site.template)
     if not template_cls:
         raise ValueError(f"Unknown template: {site.template}")
 
-    return template_cls(site, post_repo, analytics_repo)
+    return template_cls(site, post_repo, analytics_repo, trending)
+
+
+_site_action_events: dict[SiteAction, FeedEvent] = {
+    SiteAction.CREATE_POST: FeedEvent.POSTS,
+    SiteAction.UPLOAD_MEDIA: FeedEvent.MEDIA,
+}
+
+_post_action_events: dict[PostAction, FeedEvent] = {
+    PostAction.VIEW: FeedEvent.VIEWS,
+    PostAction.COMMENT: FeedEvent.COMMENTS,
+    PostAction.SHARE: FeedEvent.SHARES,
+}
+
+
+@dataclass
+class HomeFeed:
+    template: SiteTemplate
+    posts: list[Post]
+
+
+# Keeps the materialized home page of each site. Analytics entries are the
+# change feed: an entry only drops the cached feed when the site's template
+# declared that kind of event in its data_needs. A deleted or newly published
+# post or a new content (from the editor, a restored revision, a translation
+# or a media deletion) always drops the feed of its site.
+class HomeFeedService:
+    __post_repo: PostRepository
+    __analytics_repo: AnalyticsRepository
+    __trending: "TrendingScores | None"
+    __feeds: dict[int, HomeFeed]
+
+    def __init__(
+        self,
+        post_repo: PostRepository,
+        analytics_repo: AnalyticsRepository,
+        trending: "TrendingScores | None" = None,
+    ):
+        self.__post_repo = post_repo
+        self.__analytics_repo = analytics_repo
+        self.__trending = trending
+        self.__feeds = {}
+        analytics_repo.subscribe(self._on_analytics_entry)
+        post_repo.watch(self._on_post_mutation)
+
+    def get_feed(self, site: Site) -> HomeFeed:
+        feed = self.__feeds.get(site.id)
+        if feed and type(feed.template) is _template_map.get(site.template):
+            return feed
+
+        template = build_site_template(
+            site, self.__post_repo, self.__analytics_repo, self.__trending
+        )
+        feed = HomeFeed(template, template.select_posts()[: template.feed_size])
+        self.__feeds[site.id] = feed
+        return feed
+
+    def display(self, site: Site):
+        feed = self.get_feed(site)
+        feed.template.display(feed.posts)
+
+    def notify(self, site: Site, event: FeedEvent):
+        feed = self.__feeds.get(site.id)
+        if feed and event in feed.template.data_needs:
+            self.__feeds.pop(site.id)
+
+    # A scheduled post that became visible, whatever the template.
+    def on_post_published(self, post: Post):
+        self.__feeds.pop(post.site.id, None)
+
+    def _on_post_mutation(self, mutation: Mutation, payload: Any):
+        if mutation == Mutation.DELETE_POST:
+            self.__feeds.pop(payload.site.id, None)
+            if self.__trending:
+                self.__trending.forget_post(payload)
+        elif mutation == Mutation.ADD_CONTENT:
+            post, _, _ = payload
+            self.__feeds.pop(post.site.id, None)
+
+    def _on_analytics_entry(self, entry: AnalyticsEntry):
+        if isinstance(entry, SiteAnalyticsEntry):
+            event = _site_action_events.get(entry.action)
+        elif isinstance(entry, PostAnalyticsEntry):
+            event = _post_action_events.get(entry.action)
+        else:
+            return
+
+        if event:
+            self.notify(entry.site, event)
@@ -1,8 +1,7 @@
 import re
-from enum import Enum
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
-from typing import Type
+from typing import ClassVar, Type
 
 from cms.models import (
     Post,
@@ -12,17 +11,14 @@ from cms.models import (
     MediaBlock,
     CaroulselBlock,
     MediaType,
+    SocialMedia,
 )
 
 
-class SocialMedia(Enum):
-    TWITTER = "Twitter"
-    FACEBOOK = "Facebook"
-    INSTAGRAM = "Instagram"
-
-
 @dataclass
 class SocialMediaPost(ABC):
+    platform: ClassVar[SocialMedia]
+
     original_post: Post
     language: Language
 
@@ -42,6 +38,10 @@ class SocialMediaPost(ABC):
     def get_media_recommendation(self) -> str:
         pass
 
+    # Visits through this link are attributed to the platform (return visits).
+    def get_share_link(self) -> str:
+        return f"{self.original_post.get_url()}&ref={self.platform.name.lower()}"
+
     def _get_post_content(self) -> Content:
         return self.original_post.get_content_by_language(self.language)
 
@@ -128,6 +128,8 @@ class SocialMediaPost(ABC):
 
 @dataclass
 class FacebookPost(SocialMediaPost):
+    platform = SocialMedia.FACEBOOK
+
     def get_character_limit(self) -> int:
         return 63206
 
@@ -140,9 +142,7 @@ class FacebookPost(SocialMediaPost):
         suggested_text = f"📢 {content.title}\n\n"
         suggested_text += self._get_text_content_to_display()
         suggested_text += f"✍️ Por: {self.original_post.poster.first_name} {self.original_post.poster.last_name}\n"
-        suggested_text += (
-            f"🔗 Leia o artigo completo em: {self.original_post.site.get_url()}\n\n"
-        )
+        suggested_text += f"🔗 Leia o artigo completo em: {self.get_share_link()}\n\n"
         suggested_text += (
             f"#{self.original_post.site.name.replace(' ', '').replace('-', '')} "
         )
@@ -168,6 +168,8 @@ class FacebookPost(SocialMediaPost):
 
 @dataclass
 class InstagramPost(SocialMediaPost):
+    platform = SocialMedia.INSTAGRAM
+
     def get_character_limit(self) -> int:
         return 2200
 
@@ -219,6 +221,8 @@ class InstagramPost(SocialMediaPost):
 
 @dataclass
 class TwitterPost(SocialMediaPost):
+    platform = SocialMedia.TWITTER
+
     def get_character_limit(self) -> int:
         return 280
 
@@ -230,7 +234,7 @@ class TwitterPost(SocialMediaPost):
 
         available_chars = self.get_character_limit()
 
-        link = f" {self.original_post.site.get_url()}"
+        link = f" {self.get_share_link()}"
         hashtags = f" #{self.original_post.site.name.replace(' ', '').replace('-', '')} #{content.language.code}"
         reserved_chars = len(link) + len(hashtags) + 10
 
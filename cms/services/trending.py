@@ -0,0 +1,115 @@
+import heapq
+import math
+from datetime import datetime, timedelta
+from typing import Any
+
+from cms.models import AnalyticsEntry, Post, PostAction, PostAnalyticsEntry, Site
+from cms.repository import AnalyticsRepository, Mutation
+
+DEFAULT_HALF_LIFE = timedelta(hours=24)
+DEFAULT_WEIGHTS: dict[PostAction, float] = {
+    PostAction.VIEW: 1.0,
+    PostAction.COMMENT: 3.0,
+    PostAction.SHARE: 5.0,
+}
+
+# Stored scores grow like e^(rate * t); past this exponent they are rescaled.
+RESCALE_EXPONENT = 500.0
+# What is left of a score after taking back an entry, relative to the entry,
+# below which it is only rounding error.
+RESIDUE = 1e-9
+
+
+# Every event adds its weight to the post's score, and the score halves every
+# half_life. Instead of decaying all scores as time passes, an event at time t
+# adds weight * e^(rate * (t - epoch)): every stored score is the real score
+# times the same factor e^(rate * (now - epoch)), so the ranking can be read
+# directly and each event costs O(1). A deleted entry takes back the same
+# amount, so the score is what it would be had the entry never been logged.
+class TrendingScores:
+    __rate: float
+    __weights: dict[PostAction, float]
+    __epoch: datetime
+    __scores_by_site: dict[int, dict[int, float]]
+
+    def __init__(
+        self,
+        analytics_repo: AnalyticsRepository,
+        half_life: timedelta = DEFAULT_HALF_LIFE,
+        weights: dict[PostAction, float] | None = None,
+    ):
+        self.__rate = math.log(2) / half_life.total_seconds()
+        self.__weights = weights if weights is not None else DEFAULT_WEIGHTS
+        self.__epoch = datetime.now()
+        self.__scores_by_site = {}
+
+        for entry in analytics_repo.iter_entries():
+            self.record(entry)
+        analytics_repo.subscribe(self.record)
+        analytics_repo.watch(self._on_analytics_mutation)
+
+    def record(self, entry: AnalyticsEntry):
+        if not isinstance(entry, PostAnalyticsEntry):
+            return
+
+        weight = self.__weights.get(entry.action, 0.0)
+        if not weight:
+            return
+
+        exponent = self.__exponent(entry.created_at)
+        if exponent > RESCALE_EXPONENT:
+            self.__rescale(entry.created_at)
+            exponent = 0.0
+
+        scores = self.__scores_by_site.setdefault(entry.site.id, {})
+        scores[entry.post.id] = scores.get(entry.post.id, 0.0) + weight * math.exp(
+            exponent
+        )
+
+    def forget(self, entry: AnalyticsEntry):
+        if not isinstance(entry, PostAnalyticsEntry):
+            return
+
+        weight = self.__weights.get(entry.action, 0.0)
+        scores = self.__scores_by_site.get(entry.site.id, {})
+        if not weight or entry.post.id not in scores:
+            return
+
+        added = weight * math.exp(self.__exponent(entry.created_at))
+        score = scores[entry.post.id] - added
+        if score > added * RESIDUE:
+            scores[entry.post.id] = score
+        else:
+            del scores[entry.post.id]
+
+    def get_score(self, site: Site, post_id: int, now: datetime | None = None) -> float:
+        stored = self.__scores_by_site.get(site.id, {}).get(post_id, 0.0)
+        return stored * math.exp(-self.__exponent(now or datetime.now()))
+
+    def get_top_posts(
+        self, site: Site, k: int, now: datetime | None = None
+    ) -> list[tuple[int, float]]:
+        scores = self.__scores_by_site.get(site.id, {})
+        decay = math.exp(-self.__exponent(now or datetime.now()))
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(post_id, score * decay) for post_id, score in top]
+
+    def forget_post(self, post: Post):
+        self.__scores_by_site.get(post.site.id, {}).pop(post.id, None)
+
+    def _on_analytics_mutation(self, mutation: Mutation, payload: Any):
+        if mutation == Mutation.DELETE_ENTRIES:
+            for entry in payload:
+                self.forget(entry)
+
+    def __exponent(self, moment: datetime) -> float:
+        return self.__rate * (moment - self.__epoch).total_seconds()
+
+    def __rescale(self, new_epoch: datetime):
+        factor = math.exp(-self.__exponent(new_epoch))
+        for scores in self.__scores_by_site.values():
+            for post_id in scores:
+                scores[post_id] *= factor
+
+        self.__epoch = new_epoch
@@ -0,0 +1,750 @@
+import bisect
+import hashlib
+import threading
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import chain
+
+from cms.models import (
+    AnalyticsEntry,
+    Capability,
+    Comment,
+    CommentSort,
+    Content,
+    LanguageCode,
+    MediaFile,
+    MediaUsage,
+    ModerationStatus,
+    Permission,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    SiteRole,
+    SocialMedia,
+    User,
+)
+from cms.repository import (
+    AnalyticsListener,
+    AnalyticsRepository,
+    CommentRepository,
+    MediaRepository,
+    Mutation,
+    PermissionRepository,
+    PostRepository,
+    SiteRepository,
+    UserRepository,
+    VersionConflictError,
+    check_domain,
+    check_media_filename,
+    check_reply,
+)
+from cms.sketches import HyperLogLog
+
+VIRTUAL_NODES = 64
+
+
+def group_by_site[T](
+    records: list[T], get_site_id: Callable[[T], int]
+) -> dict[int, list[T]]:
+    groups: dict[int, list[T]] = {}
+    for record in records:
+        groups.setdefault(get_site_id(record), []).append(record)
+    return groups
+
+
+# Consistent hashing: each shard owns VIRTUAL_NODES points of the ring and a
+# site belongs to the first point after its hash. Adding a shard only moves the
+# sites that fall right before its points, about 1/N of them.
+class ShardRing:
+    __points: list[int]
+    __owners: dict[int, str]
+
+    def __init__(self):
+        self.__points = []
+        self.__owners = {}
+
+    def add(self, name: str):
+        for i in range(VIRTUAL_NODES):
+            point = self.__hash(f"{name}#{i}")
+            bisect.insort(self.__points, point)
+            self.__owners[point] = name
+
+    def get_shard_name(self, site_id: int) -> str:
+        if not self.__points:
+            raise ValueError("Nenhum shard configurado.")
+
+        i = bisect.bisect(self.__points, self.__hash(str(site_id)))
+        return self.__owners[self.__points[i % len(self.__points)]]
+
+    @staticmethod
+    def __hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+@dataclass
+class Shard:
+    name: str
+    site_repo: SiteRepository = field(default_factory=SiteRepository)
+    post_repo: PostRepository = field(default_factory=PostRepository)
+    comment_repo: CommentRepository = field(default_factory=CommentRepository)
+    media_repo: MediaRepository = field(default_factory=MediaRepository)
+    analytics_repo: AnalyticsRepository = field(default_factory=AnalyticsRepository)
+    permission_repo: PermissionRepository = field(default_factory=PermissionRepository)
+
+
+# Ids stay global across shards, so records keep their id when a site moves.
+class IdSequence:
+    __last_id: int
+
+    def __init__(self):
+        self.__last_id = 0
+
+    def next(self) -> int:
+        self.__last_id += 1
+        return self.__last_id
+
+    def observe(self, restored_id: int):
+        self.__last_id = max(self.__last_id, restored_id)
+
+
+# Partitions sites, with their posts, comments, medias, permissions and
+# analytics, across shards by site id. Every site has a placement; the ring only
+# decides where new sites go and where existing ones should be moved to.
+class ShardRouter:
+    lock: threading.RLock
+    __ring: ShardRing
+    __shards: dict[str, Shard]
+    __placements: dict[int, str]
+    __post_sites: dict[int, int]
+    __media_sites: dict[int, int]
+    __rebalancer: threading.Thread | None
+
+    def __init__(self, shard_count: int = 2):
+        self.lock = threading.RLock()
+        self.__ring = ShardRing()
+        self.__shards = {}
+        self.__placements = {}
+        self.__post_sites = {}
+        self.__media_sites = {}
+        self.__rebalancer = None
+
+        for _ in range(shard_count):
+            self.__create_shard()
+
+    @property
+    def shards(self) -> list[Shard]:
+        return list(self.__shards.values())
+
+    def get_site_shard(self, site_id: int) -> Shard:
+        name = self.__placements.get(site_id)
+        if not name:
+            raise KeyError(site_id)
+        return self.__shards[name]
+
+    def place_site(self, site_id: int) -> Shard:
+        name = self.__placements.setdefault(
+            site_id, self.__ring.get_shard_name(site_id)
+        )
+        return self.__shards[name]
+
+    def get_post_shard(self, post_id: int) -> Shard:
+        return self.get_site_shard(self.__post_sites[post_id])
+
+    def get_media_shard(self, media_id: int) -> Shard:
+        return self.get_site_shard(self.__media_sites[media_id])
+
+    def index_post(self, post: Post):
+        self.__post_sites[post.id] = post.site.id
+
+    def index_media(self, media: MediaFile):
+        self.__media_sites[media.id] = media.site.id
+
+    def forget_media(self, media_id: int):
+        self.__media_sites.pop(media_id, None)
+
+    def forget_post(self, post_id: int):
+        self.__post_sites.pop(post_id, None)
+
+    def forget_site(self, site_id: int):
+        self.__placements.pop(site_id, None)
+
+    def get_placements(self) -> dict[str, int]:
+        sites = {name: 0 for name in self.__shards}
+        for name in self.__placements.values():
+            sites[name] += 1
+        return sites
+
+    def add_shard(self, background: bool = True) -> Shard:
+        with self.lock:
+            shard = self.__create_shard()
+
+        if background:
+            self.__rebalancer = threading.Thread(target=self.rebalance, daemon=True)
+            self.__rebalancer.start()
+        else:
+            self.rebalance()
+
+        return shard
+
+    def wait_rebalance(self):
+        if self.__rebalancer:
+            self.__rebalancer.join()
+            self.__rebalancer = None
+
+    # Online: sites are moved one at a time, each under the router lock, so the
+    # other sites keep taking writes while the new shard fills up. Reads never
+    # block; only the site being moved can briefly look incomplete.
+    def rebalance(self) -> int:
+        moved = 0
+        for site_id in list(self.__placements):
+            with self.lock:
+                source = self.get_site_shard(site_id)
+                target = self.__shards[self.__ring.get_shard_name(site_id)]
+                if source is not target:
+                    self.__move_site(site_id, source, target)
+                    moved += 1
+
+        return moved
+
+    def __move_site(self, site_id: int, source: Shard, target: Shard):
+        target.site_repo.restore_site(source.site_repo.pop_site(site_id))
+        for permission in source.permission_repo.pop_site(site_id):
+            target.permission_repo.grant_permission(permission)
+        for media in source.media_repo.pop_site(site_id):
+            target.media_repo.restore_media(media)
+        posts = source.post_repo.pop_site(site_id)
+        for post in posts:
+            target.post_repo.restore_post(post)
+        for comment in source.comment_repo.pop_posts(posts):
+            target.comment_repo.restore_comment(comment)
+        for entry in source.analytics_repo.pop_site(site_id):
+            target.analytics_repo.restore_entry(entry)
+
+        self.__placements[site_id] = target.name
+
+    def __create_shard(self) -> Shard:
+        shard = Shard(f"shard-{len(self.__shards)}")
+        self.__shards[shard.name] = shard
+        self.__ring.add(shard.name)
+        return shard
+
+
+# Domains must be unique across all shards, so the domain index lives here.
+class ShardedSiteRepository(SiteRepository):
+    __router: ShardRouter
+    __ids: IdSequence
+    __sites_by_domain: dict[str, Site]
+
+    def __init__(self, router: ShardRouter):
+        super().__init__()
+        self.__router = router
+        self.__ids = IdSequence()
+        self.__sites_by_domain = {}
+
+    def add_site(self, site: Site) -> int:
+        with self.__router.lock:
+            check_domain(site.get_domain(), self.__sites_by_domain)
+            site.id = self.__ids.next()
+            self.__store_site(site)
+        self._notify(Mutation.ADD_SITE, site)
+        return site.id
+
+    def restore_site(self, site: Site):
+        self.__ids.observe(site.id)
+        self.__store_site(site)
+
+    def __store_site(self, site: Site):
+        self.__router.place_site(site.id).site_repo.restore_site(site)
+        self.__sites_by_domain.setdefault(site.get_domain(), site)
+
+    def get_site_by_domain(self, domain: str) -> Site | None:
+        return self.__sites_by_domain.get(domain)
+
+    def get_sites(self) -> list[Site]:
+        return sorted(self.iter_sites(), key=lambda s: s.id)
+
+    def get_site_by_id(self, site_id: int) -> Site:
+        return self.__router.get_site_shard(site_id).site_repo.get_site_by_id(site_id)
+
+    def iter_sites(self) -> Iterator[Site]:
+        return chain.from_iterable(
+            shard.site_repo.iter_sites() for shard in self.__router.shards
+        )
+
+    def get_user_sites(self, user: User) -> list[Site]:
+        return sorted(
+            chain.from_iterable(
+                shard.site_repo.get_user_sites(user) for shard in self.__router.shards
+            ),
+            key=lambda s: s.id,
+        )
+
+    def delete_site(self, site: Site):
+        with self.__router.lock:
+            self.__router.get_site_shard(site.id).site_repo.delete_site(site)
+            if self.__sites_by_domain.get(site.get_domain()) is site:
+                del self.__sites_by_domain[site.get_domain()]
+            self.__router.forget_site(site.id)
+        self._notify(Mutation.DELETE_SITE, site)
+
+
+class ShardedPermissionRepository(PermissionRepository):
+    __router: ShardRouter
+
+    def __init__(self, router: ShardRouter):
+        super().__init__()
+        self.__router = router
+
+    def grant_permission(self, permission: Permission):
+        with self.__router.lock:
+            shard = self.__router.get_site_shard(permission.site.id)
+            shard.permission_repo.grant_permission(permission)
+        self._notify(Mutation.GRANT_PERMISSION, permission)
+
+    def iter_permissions(self) -> Iterator[Permission]:
+        return chain.from_iterable(
+            shard.permission_repo.iter_permissions() for shard in self.__router.shards
+        )
+
+    def revoke_permission(
+        self, user: User, site: Site, post: Post | None = None
+    ) -> Permission | None:
+        with self.__router.lock:
+            shard = self.__router.get_site_shard(site.id)
+            permission = shard.permission_repo.revoke_permission(user, site, post)
+        if permission:
+            self._notify(Mutation.REVOKE_PERMISSION, permission)
+        return permission
+
+    def revoke_site_permissions(self, site: Site) -> list[Permission]:
+        with self.__router.lock:
+            shard = self.__router.get_site_shard(site.id)
+            permissions = shard.permission_repo.revoke_site_permissions(site)
+        self._notify(Mutation.REVOKE_SITE_PERMISSIONS, site)
+        return permissions
+
+    def get_site_permissions(self, site: Site) -> list[Permission]:
+        shard = self.__router.get_site_shard(site.id)
+        return shard.permission_repo.get_site_permissions(site)
+
+    def iter_user_permissions(self, user: User) -> Iterator[Permission]:
+        return chain.from_iterable(
+            shard.permission_repo.iter_user_permissions(user)
+            for shard in self.__router.shards
+        )
+
+    def iter_post_permissions(self, post: Post) -> Iterator[Permission]:
+        shard = self.__router.get_site_shard(post.site.id)
+        return shard.permission_repo.iter_post_permissions(post)
+
+    def get_role(
+        self, user: User, site: Site, post: Post | None = None
+    ) -> SiteRole | None:
+        shard = self.__router.get_site_shard(site.id)
+        return shard.permission_repo.get_role(user, site, post)
+
+    def get_capabilities(
+        self, user: User, site: Site, post: Post | None = None
+    ) -> Capability:
+        shard = self.__router.get_site_shard(site.id)
+        return shard.permission_repo.get_capabilities(user, site, post)
+
+    def has_permission(
+        self,
+        user: User,
+        site: Site,
+        capability: Capability,
+        post: Post | None = None,
+    ) -> bool:
+        shard = self.__router.get_site_shard(site.id)
+        return shard.permission_repo.has_permission(user, site, capability, post)
+
+    def get_not_managers(self, site: Site, repo: UserRepository) -> list[User]:
+        shard = self.__router.get_site_shard(site.id)
+        return shard.permission_repo.get_not_managers(site, repo)
+
+
+class ShardedPostRepository(PostRepository):
+    __router: ShardRouter
+    __ids: IdSequence
+
+    def __init__(self, router: ShardRouter):
+        super().__init__()
+        self.__router = router
+        self.__ids = IdSequence()
+
+    def add_post(self, post: Post) -> int:
+        with self.__router.lock:
+            post.id = self.__ids.next()
+            self.__store_post(post)
+        self._notify(Mutation.ADD_POST, post)
+        return post.id
+
+    def restore_post(self, post: Post):
+        self.__ids.observe(post.id)
+        self.__store_post(post)
+
+    # The shard holding the post keeps its media usages.
+    def add_content(
+        self,
+        post: Post,
+        lang: LanguageCode,
+        content: Content,
+        expected_version: int | None = None,
+    ):
+        shard = self.__router.get_post_shard(post.id)
+        shard.post_repo.add_content(post, lang, content, expected_version)
+        self._notify(Mutation.ADD_CONTENT, (post, lang, content))
+
+    def restore_content(self, post: Post, lang: LanguageCode, content: Content):
+        shard = self.__router.get_post_shard(post.id)
+        shard.post_repo.restore_content(post, lang, content)
+
+    # Posts normally use the media of their own site, but nothing enforces it.
+    def get_media_usages(self, media: MediaFile) -> list[MediaUsage]:
+        return [
+            usage
+            for shard in self.__router.shards
+            for usage in shard.post_repo.get_media_usages(media)
+        ]
+
+    def has_media_block(self, post: Post, lang: LanguageCode) -> bool:
+        shard = self.__router.get_post_shard(post.id)
+        return shard.post_repo.has_media_block(post, lang)
+
+    def get_media_usage_count(self, media: MediaFile) -> int:
+        return sum(
+            shard.post_repo.get_media_usage_count(media)
+            for shard in self.__router.shards
+        )
+
+    def iter_posts(self) -> Iterator[Post]:
+        return chain.from_iterable(
+            shard.post_repo.iter_posts() for shard in self.__router.shards
+        )
+
+    def get_post_by_id(self, post_id: int) -> Post:
+        shard = self.__router.get_post_shard(post_id)
+        return shard.post_repo.get_post_by_id(post_id)
+
+    def get_site_posts(self, site: Site) -> list[Post]:
+        return self.__router.get_site_shard(site.id).post_repo.get_site_posts(site)
+
+    def iter_site_posts(
+        self, site: Site, include_scheduled: bool = False
+    ) -> Iterator[Post]:
+        shard = self.__router.get_site_shard(site.id)
+        return shard.post_repo.iter_site_posts(site, include_scheduled)
+
+    def iter_user_posts(self, user: User) -> Iterator[Post]:
+        return chain.from_iterable(
+            shard.post_repo.iter_user_posts(user) for shard in self.__router.shards
+        )
+
+    def delete_post(self, post: Post):
+        with self.__router.lock:
+            try:
+                shard = self.__router.get_post_shard(post.id)
+            except KeyError:
+                return
+            shard.post_repo.delete_post(post)
+            self.__router.forget_post(post.id)
+        self._notify(Mutation.DELETE_POST, post)
+
+    def publish_due_posts(self, now: datetime | None = None) -> list[Post]:
+        with self.__router.lock:
+            return [
+                post
+                for shard in self.__router.shards
+                for post in shard.post_repo.publish_due_posts(now)
+            ]
+
+    def get_next_publication(self) -> datetime | None:
+        publications = [
+            publication
+            for shard in self.__router.shards
+            if (publication := shard.post_repo.get_next_publication())
+        ]
+        return min(publications, default=None)
+
+    def __store_post(self, post: Post):
+        self.__router.index_post(post)
+        self.__router.get_site_shard(post.site.id).post_repo.restore_post(post)
+
+
+class ShardedCommentRepository(CommentRepository):
+    __router: ShardRouter
+    __ids: IdSequence
+
+    def __init__(self, router: ShardRouter):
+        super().__init__()
+        self.__router = router
+        self.__ids = IdSequence()
+
+    def add_comment(self, comment: Comment) -> int:
+        check_reply(comment)
+        with self.__router.lock:
+            comment.id = self.__ids.next()
+            shard = self.__router.get_site_shard(comment.post.site.id)
+            shard.comment_repo.restore_comment(comment)
+        self._notify(Mutation.ADD_COMMENT, comment)
+        return comment.id
+
+    def restore_comment(self, comment: Comment):
+        self.__ids.observe(comment.id)
+        shard = self.__router.get_site_shard(comment.post.site.id)
+        shard.comment_repo.restore_comment(comment)
+
+    def iter_comments(self) -> Iterator[Comment]:
+        return chain.from_iterable(
+            shard.comment_repo.iter_comments() for shard in self.__router.shards
+        )
+
+    def get_post_comments(self, post: Post) -> list[Comment]:
+        return self.__post_shard(post).comment_repo.get_post_comments(post)
+
+    def get_comment_count(self, post: Post) -> int:
+        return self.__post_shard(post).comment_repo.get_comment_count(post)
+
+    def get_thread_count(self, post: Post) -> int:
+        return self.__post_shard(post).comment_repo.get_thread_count(post)
+
+    def get_threads(
+        self,
+        post: Post,
+        sort: CommentSort = CommentSort.NEWEST,
+        offset: int = 0,
+        limit: int = 10,
+    ) -> list[Comment]:
+        shard = self.__post_shard(post)
+        return shard.comment_repo.get_threads(post, sort, offset, limit)
+
+    def get_replies(
+        self, comment: Comment, offset: int = 0, limit: int = 10
+    ) -> list[Comment]:
+        shard = self.__post_shard(comment.post)
+        return shard.comment_repo.get_replies(comment, offset, limit)
+
+    def get_direct_reply_count(self, comment: Comment) -> int:
+        shard = self.__post_shard(comment.post)
+        return shard.comment_repo.get_direct_reply_count(comment)
+
+    def get_reply_count(self, comment: Comment) -> int:
+        return self.__post_shard(comment.post).comment_repo.get_reply_count(comment)
+
+    def set_comment_status(self, comment: Comment, status: ModerationStatus):
+        with self.__router.lock:
+            shard = self.__post_shard(comment.post)
+            shard.comment_repo.set_comment_status(comment, status)
+        self._notify(Mutation.SET_COMMENT_STATUS, comment)
+
+    def get_held_comments(self, site: Site) -> list[Comment]:
+        shard = self.__router.get_site_shard(site.id)
+        return shard.comment_repo.get_held_comments(site)
+
+    def iter_post_comments(self, post: Post) -> Iterator[Comment]:
+        return self.__post_shard(post).comment_repo.iter_post_comments(post)
+
+    def iter_user_comments(self, user: User) -> Iterator[Comment]:
+        return chain.from_iterable(
+            shard.comment_repo.iter_user_comments(user)
+            for shard in self.__router.shards
+        )
+
+    # Replies live in the shard of their post, as the comments they answer.
+    def delete_comments(self, comments: list[Comment]) -> list[Comment]:
+        deleted: list[Comment] = []
+        with self.__router.lock:
+            for site_id, site_comments in group_by_site(
+                comments, lambda c: c.post.site.id
+            ).items():
+                shard = self.__router.get_site_shard(site_id)
+                deleted.extend(shard.comment_repo.delete_comments(site_comments))
+        self._notify(Mutation.DELETE_COMMENTS, comments)
+        return deleted
+
+    def __post_shard(self, post: Post) -> Shard:
+        return self.__router.get_site_shard(post.site.id)
+
+
+class ShardedMediaRepository(MediaRepository):
+    __router: ShardRouter
+    __ids: IdSequence
+
+    def __init__(self, router: ShardRouter):
+        super().__init__()
+        self.__router = router
+        self.__ids = IdSequence()
+
+    def add_midia(self, media: MediaFile) -> int:
+        with self.__router.lock:
+            check_media_filename(
+                media, self.get_media_by_filename(media.site, media.filename)
+            )
+            media.id = self.__ids.next()
+            self.__store_media(media)
+        self._notify(Mutation.ADD_MEDIA, media)
+        return media.id
+
+    def restore_media(self, media: MediaFile):
+        self.__ids.observe(media.id)
+        self.__store_media(media)
+
+    def iter_medias(self) -> Iterator[MediaFile]:
+        return chain.from_iterable(
+            shard.media_repo.iter_medias() for shard in self.__router.shards
+        )
+
+    def iter_site_medias(self, site: Site) -> Iterator[MediaFile]:
+        return self.__router.get_site_shard(site.id).media_repo.iter_site_medias(site)
+
+    def has_site_medias(self, site: Site) -> bool:
+        return self.__router.get_site_shard(site.id).media_repo.has_site_medias(site)
+
+    def iter_user_medias(self, user: User) -> Iterator[MediaFile]:
+        return chain.from_iterable(
+            shard.media_repo.iter_user_medias(user) for shard in self.__router.shards
+        )
+
+    def get_media_by_id(self, media_id: int) -> MediaFile:
+        shard = self.__router.get_media_shard(media_id)
+        return shard.media_repo.get_media_by_id(media_id)
+
+    def get_media_by_filename(self, site: Site, filename: str) -> MediaFile | None:
+        shard = self.__router.get_site_shard(site.id)
+        return shard.media_repo.get_media_by_filename(site, filename)
+
+    def remove_media(
+        self, media_id: int, expected_version: int | None = None
+    ) -> MediaFile:
+        with self.__router.lock:
+            try:
+                shard = self.__router.get_media_shard(media_id)
+            except KeyError:
+                raise VersionConflictError(
+                    f"A mídia {media_id} já foi removida por outro usuário."
+                ) from None
+
+            media = shard.media_repo.remove_media(media_id, expected_version)
+            self.__router.forget_media(media_id)
+        self._notify(Mutation.REMOVE_MEDIA, media)
+        return media
+
+    def __store_media(self, media: MediaFile):
+        self.__router.index_media(media)
+        self.__router.get_site_shard(media.site.id).media_repo.restore_media(media)
+
+
+class ShardedAnalyticsRepository(AnalyticsRepository):
+    __router: ShardRouter
+    __ids: IdSequence
+    __listeners: list[AnalyticsListener]
+
+    def __init__(self, router: ShardRouter):
+        super().__init__()
+        self.__router = router
+        self.__ids = IdSequence()
+        self.__listeners = []
+
+    def subscribe(self, listener: AnalyticsListener):
+        self.__listeners.append(listener)
+
+    def log(self, entry: AnalyticsEntry) -> int:
+        with self.__router.lock:
+            entry.id = self.__ids.next()
+            self.__store_entry(entry)
+        self._notify(Mutation.LOG, entry)
+        return entry.id
+
+    def restore_entry(self, entry: AnalyticsEntry):
+        self.__ids.observe(entry.id)
+        self.__store_entry(entry)
+
+    def iter_entries(self) -> Iterator[AnalyticsEntry]:
+        return chain.from_iterable(
+            shard.analytics_repo.iter_entries() for shard in self.__router.shards
+        )
+
+    def get_site_entries(self, site_id: int) -> list[AnalyticsEntry]:
+        return self.__site_analytics(site_id).get_site_entries(site_id)
+
+    def iter_user_entries(self, user: User) -> Iterator[AnalyticsEntry]:
+        return chain.from_iterable(
+            shard.analytics_repo.iter_user_entries(user)
+            for shard in self.__router.shards
+        )
+
+    def iter_site_entries(self, site: Site) -> Iterator[AnalyticsEntry]:
+        return self.__site_analytics(site.id).iter_site_entries(site)
+
+    def iter_post_entries(self, post: Post) -> Iterator[AnalyticsEntry]:
+        return self.__site_analytics(post.site.id).iter_post_entries(post)
+
+    def delete_entries(self, entries: list[AnalyticsEntry]) -> list[AnalyticsEntry]:
+        deleted: list[AnalyticsEntry] = []
+        with self.__router.lock:
+            for site_id, site_entries in group_by_site(
+                entries, lambda e: e.site.id
+            ).items():
+                analytics = self.__site_analytics(site_id)
+                deleted.extend(analytics.delete_entries(site_entries))
+        self._notify(Mutation.DELETE_ENTRIES, deleted)
+        return deleted
+
+    # Scatter-gather: each shard returns its own latest entries and only those
+    # are merged.
+    def get_latest_entries(self, limit: int) -> list[AnalyticsEntry]:
+        entries = [
+            entry
+            for shard in self.__router.shards
+            for entry in shard.analytics_repo.get_latest_entries(limit)
+        ]
+        return sorted(entries, key=lambda x: x.created_at)[-limit:]
+
+    def get_site_post_counts(self, site_id: int, action: PostAction) -> dict[int, int]:
+        return self.__site_analytics(site_id).get_site_post_counts(site_id, action)
+
+    def get_post_platform_counts(
+        self, post_id: int, action: PostAction
+    ) -> dict[SocialMedia, int]:
+        analytics = self.__router.get_post_shard(post_id).analytics_repo
+        return analytics.get_post_platform_counts(post_id, action)
+
+    def get_unique_users_sketches(
+        self,
+        site_id: int,
+        post_id: int = 0,
+        start: date | None = None,
+        end: date | None = None,
+    ) -> dict[SiteAction | PostAction, HyperLogLog]:
+        analytics = self.__site_analytics(site_id)
+        return analytics.get_unique_users_sketches(site_id, post_id, start, end)
+
+    def _get_site_info_by_action(self, site_id: int, action: SiteAction) -> int:
+        analytics = self.__site_analytics(site_id)
+        return analytics._get_site_info_by_action(site_id, action)
+
+    def _get_site_total_post_info_by_action(
+        self, site_id: int, action: PostAction
+    ) -> int:
+        analytics = self.__site_analytics(site_id)
+        return analytics._get_site_total_post_info_by_action(site_id, action)
+
+    def _get_post_info_by_action(self, post_id: int, action: PostAction) -> int:
+        analytics = self.__router.get_post_shard(post_id).analytics_repo
+        return analytics._get_post_info_by_action(post_id, action)
+
+    def __site_analytics(self, site_id: int) -> AnalyticsRepository:
+        return self.__router.get_site_shard(site_id).analytics_repo
+
+    def __store_entry(self, entry: AnalyticsEntry):
+        if not isinstance(entry, (SiteAnalyticsEntry, PostAnalyticsEntry)):
+            raise TypeError(f"Registro sem site: {entry}")
+
+        self.__site_analytics(entry.site.id).restore_entry(entry)
+        for listener in self.__listeners:
+            listener(entry)
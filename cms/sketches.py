@@ -0,0 +1,94 @@
+import math
+from array import array
+from hashlib import blake2b
+
+# 2**10 one-byte registers: 1 KiB per sketch, ~3% standard error.
+DEFAULT_PRECISION = 10
+
+
+# Estimates how many distinct values were added using a fixed amount of memory.
+# Two sketches with the same precision can be merged, e.g. to go from daily
+# buckets to a month, or to combine the sketches of different shards.
+# A new sketch is sparse and exact: it keeps the 8-byte hash of each distinct
+# value and only switches to registers once the hashes would take as much
+# memory, so the many sketches that only see a handful of users stay small.
+class HyperLogLog:
+    precision: int
+    __hashes: array[int]
+    __registers: bytearray | None
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError("A precisão deve estar entre 4 e 16.")
+
+        self.precision = precision
+        self.__hashes = array("Q")
+        self.__registers = None
+
+    def add(self, value: object):
+        # A stable hash, so sketches built in different processes can be merged.
+        digest = blake2b(str(value).encode(), digest_size=8).digest()
+        self.__add_hash(int.from_bytes(digest, "big"))
+
+    def merge(self, other: "HyperLogLog"):
+        if other.precision != self.precision:
+            raise ValueError(
+                "Não é possível combinar sketches de precisões diferentes."
+            )
+
+        if other.__registers is None:
+            for h in other.__hashes:
+                self.__add_hash(h)
+            return
+
+        registers = self.__densify()
+        self.__registers = bytearray(map(max, registers, other.__registers))
+
+    def count(self) -> int:
+        if self.__registers is None:
+            return len(self.__hashes)
+
+        m = len(self.__registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-r for r in self.__registers)
+
+        # Small range correction: with empty registers left, linear counting is
+        # far more accurate.
+        zeros = self.__registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return round(estimate)
+
+    def copy(self) -> "HyperLogLog":
+        sketch = HyperLogLog(self.precision)
+        sketch.__hashes = array("Q", self.__hashes)
+        if self.__registers is not None:
+            sketch.__registers = bytearray(self.__registers)
+        return sketch
+
+    def __add_hash(self, h: int):
+        if self.__registers is None:
+            if h in self.__hashes:
+                return
+
+            self.__hashes.append(h)
+            if len(self.__hashes) * self.__hashes.itemsize < 1 << self.precision:
+                return
+            self.__densify()
+            return
+
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        self.__registers[index] = max(self.__registers[index], rank)
+
+    # Moves the exact hashes into registers; from then on the sketch estimates.
+    def __densify(self) -> bytearray:
+        if self.__registers is None:
+            hashes, self.__hashes = self.__hashes, array("Q")
+            self.__registers = bytearray(1 << self.precision)
+            for h in hashes:
+                self.__add_hash(h)
+
+        return self.__registers
@@ -0,0 +1,741 @@
+import mmap
+import struct
+import threading
+import zlib
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+from cms.models import (
+    AnalyticsEntry,
+    CaroulselBlock,
+    Comment,
+    Content,
+    ContentBlock,
+    LanguageCode,
+    MediaBlock,
+    MediaFile,
+    MediaType,
+    ModerationStatus,
+    Permission,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    SiteRole,
+    SiteTemplateType,
+    SocialMedia,
+    TextBlock,
+    User,
+    UserRole,
+)
+
+if TYPE_CHECKING:
+    from cms.views.menu import AppContext
+
+# File layout: MAGIC followed by records. Each record is a varint with the
+# payload size, a payload holding a list [record type, *fields] and the CRC-32
+# of the size and payload. Objects reference each other by id, and records are
+# written in dependency order, so restoring only needs the records that were
+# already read.
+MAGIC = b"CMSSNAP\x03"
+CHUNK_SIZE = 1 << 20
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_float = struct.Struct("<d")
+_crc = struct.Struct("<I")
+
+_NONE, _TRUE, _FALSE, _INT, _FLOAT, _STR, _LIST, _DATETIME = range(8)
+
+
+class RecordType(Enum):
+    USER = 1
+    SITE = 2
+    PERMISSION = 3
+    MEDIA = 4
+    DELETED_MEDIA = 5
+    POST = 6
+    COMMENT = 7
+    SITE_ENTRY = 8
+    POST_ENTRY = 9
+    # Only found in the write-ahead log.
+    CONTENT = 10
+    REMOVE_MEDIA = 11
+    DELETE_USER = 12
+    SITE_TEMPLATE = 13
+    COMMENT_STATUS = 14
+    REVOKE_PERMISSION = 15
+    DELETE_SITE = 16
+    DELETE_POST = 17
+    DELETE_COMMENTS = 18
+    DELETE_ENTRIES = 19
+    ANONYMIZE_USER = 20
+    REVOKE_SITE_PERMISSIONS = 21
+
+
+type Record = tuple[RecordType, list[Any]]
+
+
+class BlockKind(Enum):
+    TEXT = 1
+    MEDIA = 2
+    CAROUSEL = 3
+
+
+def _write_varint(buf: bytearray, n: int):
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+# Signed values are zigzag encoded (0, -1, 1, -2, ...) so small negative
+# numbers stay short.
+def _zigzag(n: int) -> int:
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def _unzigzag(n: int) -> int:
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+def _read_varint(data: bytes | bytearray, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode(buf: bytearray, value: Any):
+    if value is None:
+        buf.append(_NONE)
+    elif value is True:
+        buf.append(_TRUE)
+    elif value is False:
+        buf.append(_FALSE)
+    elif isinstance(value, int):
+        buf.append(_INT)
+        _write_varint(buf, _zigzag(value))
+    elif isinstance(value, float):
+        buf.append(_FLOAT)
+        buf += _float.pack(value)
+    elif isinstance(value, str):
+        data = value.encode()
+        buf.append(_STR)
+        _write_varint(buf, len(data))
+        buf += data
+    elif isinstance(value, datetime):
+        # The CMS keeps naive local times; aware ones are converted to them.
+        if value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        buf.append(_DATETIME)
+        _write_varint(buf, _zigzag((value - _EPOCH) // _MICROSECOND))
+    elif isinstance(value, (list, tuple)):
+        buf.append(_LIST)
+        _write_varint(buf, len(value))
+        for item in value:
+            _encode(buf, item)
+    else:
+        raise ValueError(f"Cannot encode {type(value)} in a snapshot.")
+
+
+def _decode(data: bytes | bytearray, pos: int) -> tuple[Any, int]:
+    tag = data[pos]
+    pos += 1
+
+    if tag == _NONE:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _INT:
+        n, pos = _read_varint(data, pos)
+        return _unzigzag(n), pos
+    if tag == _FLOAT:
+        return _float.unpack_from(data, pos)[0], pos + _float.size
+    if tag == _STR:
+        size, pos = _read_varint(data, pos)
+        return bytes(data[pos : pos + size]).decode(), pos + size
+    if tag == _DATETIME:
+        n, pos = _read_varint(data, pos)
+        return _EPOCH + _unzigzag(n) * _MICROSECOND, pos
+    if tag == _LIST:
+        size, pos = _read_varint(data, pos)
+        items: list[Any] = []
+        for _ in range(size):
+            item, pos = _decode(data, pos)
+            items.append(item)
+        return items, pos
+
+    raise ValueError(f"Invalid snapshot value tag: {tag}")
+
+
+def encode_record(record_type: RecordType, fields: list[Any]) -> bytearray:
+    payload = bytearray()
+    _encode(payload, [record_type.value, *fields])
+
+    record = bytearray()
+    _write_varint(record, len(payload))
+    record += payload
+    record += _crc.pack(zlib.crc32(record))
+    return record
+
+
+# Any damage (a torn or zeroed write, flipped bits) raises ValueError: the
+# checksum must match and the payload must decode to exactly its size.
+def decode_record(data: bytes | bytearray, pos: int) -> tuple[Record, int]:
+    try:
+        size, start = _read_varint(data, pos)
+    except IndexError:
+        raise ValueError("Snapshot truncado.")
+    end = start + size
+    if end + _crc.size > len(data):
+        raise ValueError("Snapshot truncado.")
+
+    (checksum,) = _crc.unpack_from(data, end)
+    if zlib.crc32(data[pos:end]) != checksum:
+        raise ValueError(f"Registro corrompido na posição {pos}.")
+
+    try:
+        record, decoded_end = _decode(data, start)
+        record_type = RecordType(record[0])
+    except (IndexError, TypeError, struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Registro corrompido na posição {pos}: {e}")
+    if decoded_end != end:
+        raise ValueError(f"Registro corrompido na posição {pos}.")
+
+    return (record_type, record[1:]), end + _crc.size
+
+
+class SnapshotWriter:
+    __stream: BinaryIO
+    __chunk: bytearray
+    __chunk_size: int
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = CHUNK_SIZE):
+        self.__stream = stream
+        self.__chunk = bytearray(MAGIC)
+        self.__chunk_size = chunk_size
+
+    def write(self, record_type: RecordType, fields: list[Any]):
+        self.__chunk += encode_record(record_type, fields)
+
+        if len(self.__chunk) >= self.__chunk_size:
+            self.flush()
+
+    def flush(self):
+        self.__stream.write(self.__chunk)
+        self.__chunk = bytearray()
+
+
+def iter_records(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Record]:
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Arquivo não é um snapshot do CMS.")
+
+    buffer = bytearray()
+    pos = 0
+    eof = False
+
+    while True:
+        try:
+            size, start = _read_varint(buffer, pos)
+            complete = start + size + _crc.size <= len(buffer)
+        except IndexError:
+            complete = False
+
+        if not complete:
+            if eof:
+                if pos < len(buffer):
+                    raise ValueError("Snapshot truncado.")
+                return
+
+            # Only the unread tail is kept, so memory stays around one chunk.
+            del buffer[:pos]
+            pos = 0
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        record, pos = decode_record(buffer, pos)
+        yield record
+
+
+def iter_mapped_records(path: Path) -> Iterator[Record]:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Arquivo não é um snapshot do CMS.")
+
+        # The OS pages the file in on demand; records are decoded straight from
+        # the mapping without copying it into Python buffers first.
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = len(MAGIC)
+            while pos < len(data):
+                record, pos = decode_record(data, pos)
+                yield record
+
+
+def _metadata_fields(metadata: dict[str, str]) -> list[str]:
+    return [item for pair in metadata.items() for item in pair]
+
+
+def _media_fields(media: MediaFile) -> list[Any]:
+    return [
+        media.id,
+        media.uploader.id,
+        media.filename,
+        str(media.path),
+        media.media_type.value,
+        media.site.id,
+        media.width,
+        media.height,
+        media.duration,
+    ]
+
+
+def _block_fields(block: ContentBlock) -> list[Any]:
+    if isinstance(block, TextBlock):
+        return [BlockKind.TEXT.value, block.order, block.text]
+    if isinstance(block, MediaBlock):
+        return [BlockKind.MEDIA.value, block.order, block.media.id, block.alt]
+    if isinstance(block, CaroulselBlock):
+        return [
+            BlockKind.CAROUSEL.value,
+            block.order,
+            [media.id for media in block.medias],
+            block.alt,
+        ]
+
+    raise ValueError(f"Tipo de bloco não suportado: {type(block)}")
+
+
+def user_record(user: User) -> Record:
+    return RecordType.USER, [
+        user.id,
+        user.first_name,
+        user.last_name,
+        user.email,
+        user.username,
+        user.password,
+        user.role.value,
+    ]
+
+
+def site_record(site: Site) -> Record:
+    return RecordType.SITE, [
+        site.id,
+        site.owner.id,
+        site.name,
+        site.description,
+        site.template.name,
+    ]
+
+
+def permission_record(permission: Permission) -> Record:
+    return RecordType.PERMISSION, [
+        permission.user.id,
+        permission.site.id,
+        permission.role.name,
+        permission.post.id if permission.post else 0,
+    ]
+
+
+def media_record(media: MediaFile) -> Record:
+    return RecordType.MEDIA, _media_fields(media)
+
+
+def deleted_media_records(content: Content, known_medias: set[int]) -> list[Record]:
+    records: list[Record] = []
+    for block in content.body:
+        # Blocks may still point to media removed from the library.
+        for media in block.get_medias():
+            if media.id not in known_medias:
+                records.append((RecordType.DELETED_MEDIA, _media_fields(media)))
+                known_medias.add(media.id)
+
+    return records
+
+
+def content_fields(lang_key: LanguageCode, content: Content) -> list[Any]:
+    return [
+        lang_key,
+        content.title,
+        content.language.code,
+        [_block_fields(block) for block in content.body],
+    ]
+
+
+def post_records(post: Post, known_medias: set[int]) -> list[Record]:
+    records: list[Record] = []
+    contents: list[Any] = []
+    for lang_key, content in post.get_contents().items():
+        records.extend(deleted_media_records(content, known_medias))
+        contents.append(content_fields(lang_key, content))
+
+    records.append(
+        (
+            RecordType.POST,
+            [
+                post.id,
+                post.poster.id,
+                post.site.id,
+                post.scheduled_to,
+                post.created_at,
+                contents,
+            ],
+        )
+    )
+    return records
+
+
+def comment_record(comment: Comment) -> Record:
+    return RecordType.COMMENT, [
+        comment.id,
+        comment.post.id,
+        comment.commenter.id,
+        comment.body,
+        comment.created_at,
+        comment.parent.id if comment.parent else None,
+        comment.status.name,
+    ]
+
+
+def entry_record(entry: AnalyticsEntry) -> Record:
+    fields = [
+        entry.id,
+        entry.user.id if entry.user else None,
+        entry.created_at,
+        _metadata_fields(entry.metadata),
+    ]
+    if isinstance(entry, SiteAnalyticsEntry):
+        return RecordType.SITE_ENTRY, fields + [entry.site.id, entry.action.value]
+    if isinstance(entry, PostAnalyticsEntry):
+        return RecordType.POST_ENTRY, fields + [
+            entry.site.id,
+            entry.post.id,
+            entry.action.value,
+            entry.platform.name if entry.platform else None,
+            entry.language,
+        ]
+
+    raise ValueError(f"Tipo de registro de analytics não suportado: {type(entry)}")
+
+
+def write_snapshot(context: "AppContext", stream: BinaryIO):
+    writer = SnapshotWriter(stream)
+
+    for user in context.user_repo.get_users():
+        writer.write(*user_record(user))
+
+    for site in context.site_repo.iter_sites():
+        writer.write(*site_record(site))
+
+    known_medias: set[int] = set()
+    for media in context.media_repo.iter_medias():
+        writer.write(*media_record(media))
+        known_medias.add(media.id)
+
+    for post in context.post_repo.iter_posts():
+        for record in post_records(post, known_medias):
+            writer.write(*record)
+
+    # After the posts, which per-post overrides refer to.
+    for permission in context.permission_repo.iter_permissions():
+        writer.write(*permission_record(permission))
+
+    for comment in context.comment_repo.iter_comments():
+        writer.write(*comment_record(comment))
+
+    for entry in context.analytics_repo.iter_entries():
+        writer.write(*entry_record(entry))
+
+    writer.flush()
+
+
+class SnapshotRestorer:
+    context: "AppContext"
+    users: dict[int, User]
+    sites: dict[int, Site]
+    medias: dict[int, MediaFile]
+    posts: dict[int, Post]
+    comments: dict[int, Comment]
+    entries: dict[int, AnalyticsEntry]
+
+    def __init__(self, context: "AppContext"):
+        self.context = context
+        self.users = {}
+        self.sites = {}
+        self.medias = {}
+        self.posts = {}
+        self.comments = {}
+        self.entries = {}
+
+    def restore(self, record_type: RecordType, fields: list[Any]):
+        handlers = {
+            RecordType.USER: self.__restore_user,
+            RecordType.SITE: self.__restore_site,
+            RecordType.PERMISSION: self.__restore_permission,
+            RecordType.MEDIA: self.__restore_media,
+            RecordType.DELETED_MEDIA: self.__restore_deleted_media,
+            RecordType.POST: self.__restore_post,
+            RecordType.COMMENT: self.__restore_comment,
+            RecordType.SITE_ENTRY: self.__restore_site_entry,
+            RecordType.POST_ENTRY: self.__restore_post_entry,
+            RecordType.CONTENT: self.__restore_content,
+            RecordType.REMOVE_MEDIA: self.__restore_media_removal,
+            RecordType.DELETE_USER: self.__restore_user_deletion,
+            RecordType.SITE_TEMPLATE: self.__restore_site_template,
+            RecordType.COMMENT_STATUS: self.__restore_comment_status,
+            RecordType.REVOKE_PERMISSION: self.__restore_permission_revocation,
+            RecordType.DELETE_SITE: self.__restore_site_deletion,
+            RecordType.DELETE_POST: self.__restore_post_deletion,
+            RecordType.DELETE_COMMENTS: self.__restore_comments_deletion,
+            RecordType.DELETE_ENTRIES: self.__restore_entries_deletion,
+            RecordType.ANONYMIZE_USER: self.__restore_user_anonymization,
+            RecordType.REVOKE_SITE_PERMISSIONS: self.__restore_site_revocation,
+        }
+        handlers[record_type](fields)
+
+    def __restore_user(self, fields: list[Any]):
+        user = User(*fields[1:6], role=UserRole(fields[6]))
+        user.id = fields[0]
+        self.users[user.id] = user
+        self.context.user_repo.restore_user(user)
+
+    def __restore_site(self, fields: list[Any]):
+        site = Site(
+            owner=self.users[fields[1]],
+            name=fields[2],
+            description=fields[3],
+            template=SiteTemplateType[fields[4]],
+        )
+        site.id = fields[0]
+        self.sites[site.id] = site
+        self.context.site_repo.restore_site(site)
+
+    def __restore_permission(self, fields: list[Any]):
+        user = self.users[fields[0]]
+        site = self.sites[fields[1]]
+        # Older snapshots only have managers: the site owner and editors.
+        if len(fields) > 2:
+            role = SiteRole[fields[2]]
+        else:
+            role = SiteRole.OWNER if site.owner.id == user.id else SiteRole.EDITOR
+        post = self.posts[fields[3]] if len(fields) > 3 and fields[3] else None
+
+        self.context.permission_repo.grant_permission(
+            Permission(user=user, site=site, role=role, post=post)
+        )
+
+    def __restore_permission_revocation(self, fields: list[Any]):
+        self.context.permission_repo.revoke_permission(
+            self.users[fields[0]],
+            self.sites[fields[1]],
+            self.posts[fields[2]] if fields[2] else None,
+        )
+
+    def __restore_media(self, fields: list[Any]):
+        self.context.media_repo.restore_media(self.__restore_deleted_media(fields))
+
+    def __restore_deleted_media(self, fields: list[Any]) -> MediaFile:
+        media = MediaFile(
+            uploader=self.users[fields[1]],
+            filename=fields[2],
+            path=Path(fields[3]),
+            media_type=MediaType(fields[4]),
+            site=self.sites[fields[5]],
+            width=fields[6],
+            height=fields[7],
+            duration=fields[8],
+        )
+        media.id = fields[0]
+        self.medias[media.id] = media
+        return media
+
+    def __restore_comment(self, fields: list[Any]):
+        comment = Comment(
+            post=self.posts[fields[1]],
+            commenter=self.users[fields[2]],
+            body=fields[3],
+            created_at=fields[4],
+            # Older snapshots have no parent and status fields.
+            parent=self.comments[fields[5]] if len(fields) > 5 and fields[5] else None,
+            status=ModerationStatus[fields[6]]
+            if len(fields) > 6
+            else ModerationStatus.APPROVED,
+        )
+        comment.id = fields[0]
+        self.comments[comment.id] = comment
+        self.context.comment_repo.restore_comment(comment)
+
+    def __restore_site_entry(self, fields: list[Any]):
+        entry = SiteAnalyticsEntry(
+            **self.__entry_kwargs(fields),
+            site=self.sites[fields[4]],
+            action=SiteAction(fields[5]),
+        )
+        entry.id = fields[0]
+        self.entries[entry.id] = entry
+        self.context.analytics_repo.restore_entry(entry)
+
+    def __restore_post_entry(self, fields: list[Any]):
+        entry = PostAnalyticsEntry(
+            **self.__entry_kwargs(fields),
+            site=self.sites[fields[4]],
+            post=self.posts[fields[5]],
+            action=PostAction(fields[6]),
+            # Older snapshots have no platform/language fields.
+            platform=SocialMedia[fields[7]] if len(fields) > 7 and fields[7] else None,
+            language=fields[8] if len(fields) > 8 else None,
+        )
+        entry.id = fields[0]
+        self.entries[entry.id] = entry
+        self.context.analytics_repo.restore_entry(entry)
+
+    def __restore_content(self, fields: list[Any]):
+        lang_key, content = self.__build_content(fields[1:])
+        self.context.post_repo.restore_content(self.posts[fields[0]], lang_key, content)
+
+    def __restore_media_removal(self, fields: list[Any]):
+        self.context.media_repo.remove_media(fields[0])
+
+    def __restore_user_deletion(self, fields: list[Any]):
+        self.context.user_repo.delete_user(fields[0])
+
+    def __restore_user_anonymization(self, fields: list[Any]):
+        self.context.user_repo.anonymize_user(self.users[fields[0]])
+
+    def __restore_site_deletion(self, fields: list[Any]):
+        self.context.site_repo.delete_site(self.sites.pop(fields[0]))
+
+    def __restore_site_revocation(self, fields: list[Any]):
+        self.context.permission_repo.revoke_site_permissions(self.sites[fields[0]])
+
+    def __restore_post_deletion(self, fields: list[Any]):
+        self.context.post_repo.delete_post(self.posts.pop(fields[0]))
+
+    # The fields are the comments asked for; their replies go with them.
+    def __restore_comments_deletion(self, fields: list[Any]):
+        comments = [self.comments[comment_id] for comment_id in fields]
+        for comment in self.context.comment_repo.delete_comments(comments):
+            self.comments.pop(comment.id, None)
+
+    def __restore_entries_deletion(self, fields: list[Any]):
+        self.context.analytics_repo.delete_entries(
+            [self.entries.pop(entry_id) for entry_id in fields]
+        )
+
+    def __restore_site_template(self, fields: list[Any]):
+        self.sites[fields[0]].template = SiteTemplateType[fields[1]]
+
+    def __restore_comment_status(self, fields: list[Any]):
+        self.context.comment_repo.set_comment_status(
+            self.comments[fields[0]], ModerationStatus[fields[1]]
+        )
+
+    def __restore_post(self, fields: list[Any]):
+        post = Post(
+            poster=self.users[fields[1]],
+            site=self.sites[fields[2]],
+            scheduled_to=fields[3],
+            created_at=fields[4],
+        )
+        post.id = fields[0]
+
+        for content_data in fields[5]:
+            post.add_content(*self.__build_content(content_data))
+
+        self.posts[post.id] = post
+        self.context.post_repo.restore_post(post)
+
+    def __build_content(self, fields: list[Any]) -> tuple[LanguageCode, Content]:
+        lang_key, title, language_code, blocks = fields
+        return lang_key, Content(
+            title=title,
+            body=[self.__restore_block(block) for block in blocks],
+            language=self.context.lang_service.get_language_by_code(language_code),
+        )
+
+    def __restore_block(self, fields: list[Any]) -> ContentBlock:
+        kind = BlockKind(fields[0])
+        if kind == BlockKind.TEXT:
+            return TextBlock(order=fields[1], text=fields[2])
+        if kind == BlockKind.MEDIA:
+            return MediaBlock(
+                order=fields[1], media=self.medias[fields[2]], alt=fields[3]
+            )
+
+        return CaroulselBlock(
+            order=fields[1],
+            medias=[self.medias[media_id] for media_id in fields[2]],
+            alt=fields[3],
+        )
+
+    def __entry_kwargs(self, fields: list[Any]) -> dict[str, Any]:
+        metadata = fields[3]
+        return {
+            "user": self.users[fields[1]] if fields[1] is not None else None,
+            "created_at": fields[2],
+            "metadata": dict(zip(metadata[::2], metadata[1::2])),
+        }
+
+
+def restore_snapshot(context: "AppContext", stream: BinaryIO):
+    restorer = SnapshotRestorer(context)
+    for record_type, fields in iter_records(stream):
+        restorer.restore(record_type, fields)
+
+
+def restore_snapshot_file(context: "AppContext", path: Path):
+    restorer = SnapshotRestorer(context)
+    for record_type, fields in iter_mapped_records(path):
+        restorer.restore(record_type, fields)
+
+
+def save_snapshot_file(context: "AppContext", path: Path):
+    with open(path, "wb") as f:
+        write_snapshot(context, f)
+
+
+def load_snapshot_file(path: Path, shards: int = 1) -> "AppContext":
+    from cms.views.menu import AppContext
+
+    context = AppContext(shards)
+    restore_snapshot_file(context, path)
+    return context
+
+
+# Restores a snapshot while the first prompt is already on screen. Callers must
+# wait() before touching the repositories.
+class SnapshotLoader(threading.Thread):
+    __context: "AppContext"
+    __path: Path
+    __error: Exception | None
+
+    def __init__(self, context: "AppContext", path: Path):
+        super().__init__(daemon=True)
+        self.__context = context
+        self.__path = path
+        self.__error = None
+
+    def run(self):
+        try:
+            restore_snapshot_file(self.__context, self.__path)
+        except Exception as e:
+            self.__error = e
+
+    def wait(self):
+        self.join()
+        if self.__error:
+            raise self.__error
@@ -2,7 +2,11 @@ from datetime import datetime
 from enum import Enum
 from typing import Type, TypeVar
 
-from cms.models import MediaType
+from cms.models import MediaType, ReportSection
+
+
+def clear_screen():
+    print("\033[2J\033[H", end="", flush=True)
 
 
 def read_datetime_from_cli() -> datetime:
@@ -55,3 +59,14 @@ def select_enum(enum_cls: Type[E], prompt: str = "Escolha uma opção:") -> E |
             continue
 
         return list(enum_cls)[selected_option - 1]
+
+
+def display_report(sections: list[ReportSection]):
+    for i, section in enumerate(sections):
+        if i > 0:
+            print(" ")
+        print(
+            f"=== {section['title']} ===" if i == 0 else f"--- {section['title']} ---"
+        )
+        for item in section["items"]:
+            print(f"{item['name']}: {item['value']}")
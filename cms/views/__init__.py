@@ -1,27 +1,67 @@
-import os
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 from cms.models import User, UserRole
-from cms.views.logged_menu import LoggedMenu
+from cms.services.rate_limit import RateLimitedAction, RateLimitExceededError
+from cms.utils import clear_screen
 from cms.views.menu import AbstractMenu, AppContext, MenuOptions
-from cms.populate import populate
+
+# Only one of populate, the snapshot loader and the write-ahead log is used by
+# a run, so each is imported by the code path that needs it.
+if TYPE_CHECKING:
+    from cms.snapshot import SnapshotLoader
+    from cms.wal import WriteAheadLog
 
 
 class Menu(AbstractMenu):
     context: AppContext
+    __loader: "SnapshotLoader | None"
+    __wal: "WriteAheadLog | None"
+    session_token: str | None
 
-    def __init__(self):
+    def __init__(self, snapshot: Path | None = None, data_dir: Path | None = None):
         self.context = AppContext()
+        self.__loader = None
+        self.__wal = None
+        self.session_token = None
+
+        if data_dir:
+            from cms.wal import WriteAheadLog
+
+            self.__wal = WriteAheadLog(data_dir)
+            self.context = self.__wal.context
+            if not self.__wal.recovered:
+                self.__populate()
+        elif snapshot:
+            from cms.snapshot import SnapshotLoader
+
+            self.__loader = SnapshotLoader(self.context, snapshot)
+            self.__loader.start()
+        else:
+            self.__populate()
+
+    def __populate(self):
+        from cms.populate import populate
+
         populate(self.context)
 
+    def wait_for_data(self):
+        if self.__loader:
+            self.__loader.wait()
+            self.__loader = None
+
     def show(self):
         try:
             self._main_menu()
         except KeyboardInterrupt:
             print("\nSaindo.")
+        finally:
+            if self.__wal:
+                self.__wal.close()
 
     def _main_menu(self):
         while True:
-            os.system("clear")
+            clear_screen()
             print("CMS\n")
 
             options: list[MenuOptions] = [
@@ -52,10 +92,11 @@ class Menu(AbstractMenu):
                 print("Opção inválida.\n")
                 continue
 
-            os.system("clear")
+            clear_screen()
             options[selected_option - 1]["function"]()
 
     def create_user(self):
+        self.wait_for_data()
         first_name = input("Digite seu primeiro nome: ")
         last_name = input("Digite seu último nome: ")
         email = input("Digite seu email: ")
@@ -68,16 +109,35 @@ class Menu(AbstractMenu):
         input("Usuário Criado! Clique Enter para voltar ao menu.")
 
     def login(self):
+        # The logged area pulls in every menu and service module, so it is only
+        # imported once someone actually logs in.
+        from cms.views.logged_menu import LoggedMenu
+
+        self.wait_for_data()
         while True:
             username = input("Username: ")
             password = input("Senha: ")
 
+            # Failed attempts count against the username, so guessing a
+            # password is throttled no matter where the attempts come from.
+            limiter = self.context.rate_limiter
             try:
+                limiter.acquire(RateLimitedAction.LOGIN, username)
                 user = self.context.user_repo.validate_user(username, password)
-                LoggedMenu(self.context, user).show()
+                limiter.reset(RateLimitedAction.LOGIN, username)
                 break
+            except RateLimitExceededError as e:
+                clear_screen()
+                print(f"{e}\n")
             except ValueError:
-                os.system("clear")
+                clear_screen()
                 print("Credenciais Inválidas!\n")
 
+        # Logging out of the menu ends the session.
+        self.session_token = self.context.sessions.create(user)
         self.logged_user = user
+        try:
+            LoggedMenu(self.context, user).show()
+        finally:
+            self.context.sessions.logout(self.session_token)
+            self.session_token = None
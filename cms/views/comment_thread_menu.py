@@ -0,0 +1,224 @@
+from cms.models import (
+    Comment,
+    CommentSort,
+    ModerationStatus,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    User,
+)
+from cms.services.moderation import ModerationResult
+from cms.services.rate_limit import RateLimitedAction, RateLimitExceededError
+from cms.utils import clear_screen
+from cms.views.menu import AbstractMenu, AppContext
+
+THREADS_PER_PAGE = 10
+# Only this much of each thread is drawn; deeper or longer branches are
+# expanded on demand, so a screen costs the same however big the post is.
+PREVIEW_DEPTH = 2
+PREVIEW_REPLIES = 3
+
+
+# Every new comment goes through the rate limit and moderation first: rejected
+# ones are not stored, held ones wait for a manager and only count once
+# approved. Raises RateLimitExceededError when the user is flooding the site.
+def add_comment(
+    context: AppContext,
+    user: User,
+    post: Post,
+    body: str,
+    parent: Comment | None = None,
+) -> ModerationResult:
+    context.rate_limiter.acquire(RateLimitedAction.COMMENT, user.id, post.site.id)
+    comment = Comment(post=post, commenter=user, body=body, parent=parent)
+    result = context.moderator.moderate_comment(comment)
+    if result.status == ModerationStatus.REJECTED:
+        return result
+
+    context.comment_repo.add_comment(comment)
+    if result.status == ModerationStatus.APPROVED:
+        log_comment(context, comment)
+    return result
+
+
+def log_comment(context: AppContext, comment: Comment):
+    metadata = {"comment_id": str(comment.id)}
+    if comment.parent:
+        metadata["parent_id"] = str(comment.parent.id)
+
+    context.analytics_repo.log(
+        PostAnalyticsEntry(
+            user=comment.commenter,
+            site=comment.post.site,
+            post=comment.post,
+            action=PostAction.COMMENT,
+            metadata=metadata,
+        )
+    )
+
+
+# A comment only counts in analytics the first time it is published: one taken
+# down by "Remoderar" and approved again already has its place in the thread.
+def set_comment_status(context: AppContext, comment: Comment, status: ModerationStatus):
+    first_publication = status == ModerationStatus.APPROVED and not comment.path
+    context.comment_repo.set_comment_status(comment, status)
+    if first_publication:
+        log_comment(context, comment)
+
+
+def display_moderation_result(result: ModerationResult):
+    if result.status == ModerationStatus.REJECTED:
+        print("Comentário rejeitado pela moderação:")
+    elif result.status == ModerationStatus.HELD:
+        print("Comentário enviado para análise de um gerente do site:")
+    else:
+        print("Comentário publicado.")
+
+    for reason in result.reasons:
+        print(f"  - {reason}")
+
+
+class CommentThreadMenu(AbstractMenu):
+    context: AppContext
+    logged_user: User
+    selected_post: Post
+
+    def __init__(self, context: AppContext, logged_user: User, selected_post: Post):
+        self.context = context
+        self.logged_user = logged_user
+        self.selected_post = selected_post
+
+    def show(self):
+        self.__browse(None)
+
+    # Without focus, lists the threads of the post; with it, the comment and
+    # a page of its direct replies.
+    def __browse(self, focus: Comment | None):
+        repo = self.context.comment_repo
+        sort = CommentSort.NEWEST
+        page = 0
+        notice = ""
+
+        while True:
+            clear_screen()
+            rows: list[Comment] = []
+            offset = page * THREADS_PER_PAGE
+
+            if focus:
+                self.__render(focus, 0, 0, rows)
+                print(" ")
+                total = repo.get_direct_reply_count(focus)
+                comments = repo.get_replies(focus, offset, THREADS_PER_PAGE)
+                indent = 1
+            else:
+                print(
+                    f"Comentários ({repo.get_comment_count(self.selected_post)}) - "
+                    f"ordenados por: {sort.value}"
+                )
+                print(" ")
+                total = repo.get_thread_count(self.selected_post)
+                comments = repo.get_threads(
+                    self.selected_post, sort, offset, THREADS_PER_PAGE
+                )
+                indent = 0
+
+            for comment in comments:
+                self.__render(comment, indent, PREVIEW_DEPTH, rows)
+                print(" ")
+
+            if notice:
+                print(notice)
+                notice = ""
+
+            has_next_page = offset + THREADS_PER_PAGE < total
+            print(f"Página {page + 1}")
+            if has_next_page:
+                print("n. Próxima página")
+            if page > 0:
+                print("p. Página anterior")
+            if not focus:
+                print("o. Alternar ordenação")
+                print("c. Novo comentário")
+            print("<número>. Abrir comentário e suas respostas")
+            print("r <número>. Responder comentário")
+            print("0. Voltar")
+            print(" ")
+
+            command = input("Digite um comando: ").strip().lower()
+
+            if command == "0":
+                return
+
+            if command == "n" and has_next_page:
+                page += 1
+            elif command == "p" and page > 0:
+                page -= 1
+            elif command == "o" and not focus:
+                sort = (
+                    CommentSort.MOST_REPLIED
+                    if sort == CommentSort.NEWEST
+                    else CommentSort.NEWEST
+                )
+                page = 0
+            elif command == "c" and not focus:
+                self.__write(None)
+            elif command.startswith("r"):
+                parent = self.__select_row(command[1:], rows)
+                if parent:
+                    self.__write(parent)
+                else:
+                    notice = "Comentário inválido."
+            elif selected := self.__select_row(command, rows):
+                self.__browse(selected)
+            else:
+                notice = "Opção inválida."
+
+    def __render(self, comment: Comment, indent: int, depth: int, rows: list[Comment]):
+        repo = self.context.comment_repo
+        rows.append(comment)
+        number = len(rows)
+        pad = "    " * indent
+
+        replies = repo.get_reply_count(comment)
+        count = f" ({replies} respostas)" if replies else ""
+        print(
+            f"{pad}[{number}] {comment.commenter.username} @ "
+            f"{comment.created_at.strftime('%Y-%m-%d %H:%M')}{count}"
+        )
+        if comment.status == ModerationStatus.APPROVED:
+            print(f"{pad}    {comment.body}")
+        else:
+            print(f"{pad}    [comentário removido pela moderação]")
+
+        direct = repo.get_direct_reply_count(comment)
+        shown = repo.get_replies(comment, 0, PREVIEW_REPLIES) if depth else []
+        for reply in shown:
+            self.__render(reply, indent + 1, depth - 1, rows)
+
+        if direct > len(shown):
+            print(
+                f"{pad}    ... +{direct - len(shown)} resposta(s); "
+                f"abra [{number}] para ver"
+            )
+
+    def __select_row(self, command: str, rows: list[Comment]) -> Comment | None:
+        try:
+            index = int(command.strip()) - 1
+        except ValueError:
+            return None
+        return rows[index] if 0 <= index < len(rows) else None
+
+    def __write(self, parent: Comment | None):
+        if parent:
+            print(f"Respondendo a {parent.commenter.username}: {parent.body}")
+        body = input("Digite seu comentário: ").strip()
+        if body:
+            try:
+                result = add_comment(
+                    self.context, self.logged_user, self.selected_post, body, parent
+                )
+            except RateLimitExceededError as e:
+                print(e)
+            else:
+                display_moderation_result(result)
+            input("Clique Enter para voltar.")
@@ -1,12 +1,17 @@
-import os
+from collections.abc import Iterable
+
+from cms import cascade
 from cms.models import (
     Permission,
     Site,
     SiteAction,
     SiteAnalyticsEntry,
+    SiteRole,
     User,
     UserRole,
 )
+from cms.services.rate_limit import RateLimitedAction
+from cms.utils import clear_screen
 from cms.views.menu import AbstractMenu, AppContext, MenuOptions
 from cms.views.site_menu import SiteMenu
 
@@ -25,12 +30,17 @@ class LoggedMenu(AbstractMenu):
             {"message": "Criar um site", "function": self.create_site},
             {"message": "Selecionar um site", "function": self.select_site},
             {"message": "Listar sites do usuário", "function": self.show_user_sites},
+            {"message": "Excluir um site", "function": self.delete_site},
         ]
 
         if self.logged_user.role == UserRole.ADMIN:
             options.extend(
                 [
                     {"message": "Ver logs do sistema", "function": self.show_logs},
+                    {
+                        "message": "Excluir ou anonimizar usuário",
+                        "function": self.delete_user,
+                    },
                 ]
             )
 
@@ -42,7 +52,7 @@ class LoggedMenu(AbstractMenu):
 
     def show_logs(self):
         try:
-            os.system("clear")
+            clear_screen()
             limit = int(
                 input("Insira a quantidade de logs que deseja ver (ou 0 para voltar): ")
             )
@@ -70,28 +80,39 @@ class LoggedMenu(AbstractMenu):
         site_name = input("Diga o nome do seu site: ")
         description = input("Informe uma descrição breve para o site: ")
         site = Site(owner=self.logged_user, name=site_name, description=description)
-        self.context.site_repo.add_site(site)
-        permission = Permission(user=self.logged_user, site=site)
+        try:
+            self.context.site_repo.add_site(site)
+        except ValueError as e:
+            print(e)
+            input("Clique Enter para voltar ao menu e tentar outro nome.")
+            return
+        permission = Permission(user=self.logged_user, site=site, role=SiteRole.OWNER)
         self.context.permission_repo.grant_permission(permission)
 
-        input("Site criado. Clique Enter para voltar ao menu.")
+        print(f"Site criado em {site.get_url()}")
+        input("Clique Enter para voltar ao menu.")
 
     def select_site(self):
-        sites: list[Site] = self.context.site_repo.get_sites()
-
         def execute_for_option(selected_site: Site):
-            self.context.analytics_repo.log(
-                SiteAnalyticsEntry(
-                    user=self.logged_user,
-                    site=selected_site,
-                    action=SiteAction.ACCESS,
+            # Post 0 stands for the whole site.
+            if self.context.rate_limiter.allow(
+                RateLimitedAction.VIEW, self.logged_user.id, selected_site.id, 0
+            ):
+                self.context.analytics_repo.log(
+                    SiteAnalyticsEntry(
+                        user=self.logged_user,
+                        site=selected_site,
+                        action=SiteAction.ACCESS,
+                    )
                 )
-            )
 
             SiteMenu(self.context, self.logged_user, selected_site).show()
 
         LoggedMenu.prompt_generic(
-            sites, "Sites disponíveis", execute_for_option, lambda m: m.name
+            self.context.site_repo.iter_sites,
+            "Sites disponíveis",
+            execute_for_option,
+            lambda m: m.name,
         )
 
     def show_user_sites(self):
@@ -104,3 +125,50 @@ class LoggedMenu(AbstractMenu):
 
         print(" ")
         input("Clique Enter para voltar ao Menu.")
+
+    # Owners can delete their sites; admins, any site.
+    def delete_site(self):
+        def execute_for_option(selected_site: Site):
+            answer = input(
+                f"Excluir {selected_site.name} com todos os posts, comentários, "
+                "mídias e registros? (s/n): "
+            )
+            if answer.strip().lower() != "s":
+                return
+
+            run_job(cascade.delete_site(self.context, selected_site))
+            input("Site excluído. Clique Enter para voltar.")
+
+        def sites() -> Iterable[Site]:
+            if self.logged_user.role == UserRole.ADMIN:
+                return self.context.site_repo.iter_sites()
+            return self.context.site_repo.get_user_sites(self.logged_user)
+
+        LoggedMenu.prompt_generic(
+            sites, "Qual site deseja excluir?", execute_for_option, lambda m: m.name
+        )
+
+    def delete_user(self):
+        username = input("Username do usuário: ").strip()
+        user = self.context.user_repo.get_user_by_username(username)
+        if not user:
+            input("Usuário não encontrado. Clique Enter para voltar.")
+            return
+        if user.id == self.logged_user.id:
+            input("Você não pode excluir a própria conta. Clique Enter para voltar.")
+            return
+
+        print("1. Excluir a conta e tudo o que o usuário criou")
+        print("2. Anonimizar a conta, mantendo o conteúdo")
+        print("0. Voltar")
+        option = input("Digite o número da opção: ").strip()
+        if option == "1":
+            run_job(cascade.delete_user(self.context, user))
+            input("Usuário excluído. Clique Enter para voltar.")
+        elif option == "2":
+            run_job(cascade.anonymize_user(self.context, user))
+            input("Usuário anonimizado. Clique Enter para voltar.")
+
+
+def run_job(job: cascade.DeletionJob):
+    job.run(lambda j: print(f"{j.deleted} registro(s) processado(s)..."))
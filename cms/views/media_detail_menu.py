@@ -1,4 +1,6 @@
-from cms.models import MediaFile, User
+from cms.models import MediaFile, MediaUsage, User
+from cms.services.media_usage import MediaDeletePolicy, check_replacement
+from cms.utils import select_enum
 from cms.views.menu import AbstractMenu, AppContext, MenuOptions
 
 
@@ -6,16 +8,19 @@ class MediaMenu(AbstractMenu):
     context: AppContext
     logged_user: User
     selected_media: MediaFile
+    version: int
 
     def __init__(self, context: AppContext, selected_media: MediaFile):
         self.context = context
         self.selected_media = selected_media
+        self.version = selected_media.version
 
     def show(self):
         if not self.selected_media:
             return
 
         options: list[MenuOptions] = [
+            {"message": "Ver onde é usada", "function": self._show_usages},
             {"message": "Deletar mídia", "function": self._delete_selected_media},
         ]
 
@@ -25,22 +30,91 @@ class MediaMenu(AbstractMenu):
             print(f"ID: {media.id}")
             print(f"Tipo: {media.media_type.name}")
             print(f"Caminho: {media.path}")
+            print(
+                f"Usada em {self.context.media_usage.get_usage_count(media)} bloco(s)"
+            )
             print(" ")
 
         MediaMenu.prompt_menu_option(options, display_title)
 
+    def _show_usages(self):
+        usages = self.context.media_usage.get_usages(self.selected_media)
+        if not usages:
+            print("A mídia não é usada em nenhum post.")
+        for usage in usages:
+            print(f"  {describe_usage(usage)}")
+        input("Clique Enter para voltar ao menu.")
+
     def _delete_selected_media(self):
-        confirm = (
-            input(
-                f"Tem certeza que deseja deletar a mídia '{self.selected_media.filename}'? (y/n): "
+        media = self.selected_media
+        usages = self.context.media_usage.get_usages(media)
+        policy = MediaDeletePolicy.RESTRICT
+        replacement = None
+
+        if usages:
+            print(f"A mídia '{media.filename}' é usada em {len(usages)} bloco(s):")
+            for usage in usages:
+                print(f"  {describe_usage(usage)}")
+            print(" ")
+
+            policy = select_enum(MediaDeletePolicy, "O que fazer com esses posts?")
+            if policy == MediaDeletePolicy.REPLACE:
+                replacement = self.__select_replacement()
+                if not replacement:
+                    return
+            elif policy != MediaDeletePolicy.DETACH:
+                print("Operação cancelada.")
+                input("Clique Enter para voltar ao menu.")
+                return
+        else:
+            confirm = (
+                input(
+                    f"Tem certeza que deseja deletar a mídia '{media.filename}'? (y/n): "
+                )
+                .strip()
+                .lower()
+            )
+            if confirm != "y":
+                print("Operação cancelada.")
+                input("Clique Enter para voltar ao menu.")
+                return
+
+        try:
+            rewritten = self.context.media_usage.delete_media(
+                media,
+                policy,
+                replacement,
+                expected_version=self.version,
+                author=self.logged_user,
             )
-            .strip()
-            .lower()
-        )
-        if confirm == "y":
-            self.context.media_repo.remove_media(self.selected_media.id)
-            print("Mídia deletada.")
+        except ValueError as e:
+            print(e)
             input("Clique Enter para voltar ao menu.")
-        else:
-            print("Operação cancelada.")
+            return
+
+        print("Mídia deletada.")
+        if rewritten:
+            print(f"{rewritten} conteúdo(s) de post atualizado(s).")
+        input("Clique Enter para voltar ao menu.")
+
+    def __select_replacement(self) -> MediaFile | None:
+        media_id = input("ID da mídia que ficará no lugar: ").strip()
+        try:
+            replacement = self.context.media_repo.get_media_by_id(int(media_id))
+        except (ValueError, KeyError):
+            replacement = None
+
+        try:
+            check_replacement(self.selected_media, replacement)
+        except ValueError as e:
+            print(e)
             input("Clique Enter para voltar ao menu.")
+            return None
+        return replacement
+
+
+def describe_usage(usage: MediaUsage) -> str:
+    return (
+        f"Post {usage.post.id} [{usage.language}] "
+        f"{usage.post.get_default_title()}, bloco {usage.block.order}"
+    )
@@ -1,5 +1,14 @@
 from pathlib import Path
-from cms.models import MediaFile, Site, SiteAction, SiteAnalyticsEntry, User
+
+from cms.models import (
+    Capability,
+    MediaFile,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    User,
+)
+from cms.repository import RouteConflictError
 from cms.utils import infer_media_type
 from cms.views.media_detail_menu import MediaMenu
 from cms.views.menu import AbstractMenu, AppContext, MenuOptions
@@ -17,7 +26,7 @@ class MediaLibraryMenu(AbstractMenu):
 
     def show(self):
         if not self.context.permission_repo.has_permission(
-            self.logged_user, self.selected_site
+            self.logged_user, self.selected_site, Capability.MANAGE_MEDIA
         ):
             return
 
@@ -77,16 +86,15 @@ class MediaLibraryMenu(AbstractMenu):
             )
 
             input("Clique Enter para voltar ao menu.")
+        except RouteConflictError as e:
+            print(e)
+            input("Clique Enter para voltar ao menu e tentar novamente.")
         except ValueError:
             print("Arquivo não suportado.")
             input("Clique Enter para voltar ao menu e tentar novamente.")
 
     def _select_media(self):
-        medias: list[MediaFile] = self.context.media_repo.get_site_medias(
-            self.selected_site
-        )
-
-        if not medias:
+        if not self.context.media_repo.has_site_medias(self.selected_site):
             print("Nenhuma mídia encontrada para este site.")
             input("Clique Enter para voltar ao menu.")
             return
@@ -95,7 +103,7 @@ class MediaLibraryMenu(AbstractMenu):
             MediaMenu(self.context, selected_media).show()
 
         MediaLibraryMenu.prompt_generic(
-            medias,
+            lambda: self.context.media_repo.iter_site_medias(self.selected_site),
             f"Mídias do site {self.selected_site.name}\n",
             execute_for_option,
             lambda m: m.filename,
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-import os
-from typing import Callable, TypeVar, TypedDict
+from collections.abc import Callable, Iterable, Sequence
+from itertools import islice
+from typing import TYPE_CHECKING, TypedDict, TypeVar
 
 from cms.repository import (
     AnalyticsRepository,
@@ -12,6 +13,22 @@ from cms.repository import (
     UserRepository,
 )
 from cms.services.languages import LanguageService
+from cms.utils import clear_screen
+
+# The services below are only imported when first used, to keep startup fast.
+if TYPE_CHECKING:
+    from cms.services.content_negotiation import ContentNegotiator
+    from cms.services.machine_translation import MachineTranslator
+    from cms.services.media_usage import MediaUsageService
+    from cms.services.moderation import CommentModerator
+    from cms.services.post_scheduler import PostScheduler
+    from cms.services.rate_limit import RateLimiter
+    from cms.services.revisions import RevisionStore
+    from cms.services.routing import UrlResolver
+    from cms.services.sessions import SessionStore
+    from cms.services.site_template import HomeFeedService
+    from cms.services.trending import TrendingScores
+    from cms.sharding import ShardRouter
 
 MenuOptions = TypedDict(
     "MenuOptions", {"message": str, "function": Callable[..., None]}
@@ -32,7 +49,7 @@ class AbstractMenu(ABC):
         cancel_option: str = "Voltar",
     ):
         while True:
-            os.system("clear")
+            clear_screen()
             display_title()
 
             for i, option in enumerate(options):
@@ -55,55 +72,121 @@ class AbstractMenu(ABC):
                 print("Opção inválida.\n")
                 continue
 
-            os.system("clear")
+            clear_screen()
             options[selected_option - 1]["function"]()
 
     @staticmethod
     def prompt_generic(
-        items: list[M],
+        items: Sequence[M] | Callable[[], Iterable[M]],
         title: str,
         callback: Callable[[M], None],
         option_text: Callable[[M], str],
+        page_size: int = 10,
     ):
+        # Only the current page is materialized: when items is a cursor factory
+        # (e.g. a repository iter_* method), a fresh cursor is opened on every
+        # redraw and consumed up to the end of the page.
+        page = 0
+        query = ""
+        notice = ""
+
         while True:
-            os.system("clear")
+            cursor: Iterable[M] = items() if callable(items) else items
+            if query:
+                cursor = (i for i in cursor if query in option_text(i).lower())
+
+            offset = page * page_size
+            page_items = list(islice(cursor, offset, offset + page_size + 1))
+            has_next_page = len(page_items) > page_size
+            page_items = page_items[:page_size]
+
+            if not page_items and page > 0:
+                page = 0
+                notice = "Página inexistente.\n"
+                continue
+
+            clear_screen()
 
             print(title)
-            for i, item in enumerate(items):
-                print(f"{i + 1}. {option_text(item)}")
+            if notice:
+                print(notice)
+                notice = ""
+            if query:
+                print(f"Filtro: '{query}'")
+            for i, item in enumerate(page_items):
+                print(f"{offset + i + 1}. {option_text(item)}")
 
+            print(" ")
+            print(f"Página {page + 1}")
+            if has_next_page:
+                print("n. Próxima página")
+            if page > 0:
+                print("p. Página anterior")
+            print("g <número>. Ir para a página")
+            print("/<texto>. Filtrar (apenas '/' remove o filtro)")
             print("0. Voltar")
             print(" ")
 
+            command = input("Digite o número do item ou um comando: ").strip()
+
+            if command == "n" and has_next_page:
+                page += 1
+                continue
+
+            if command == "p" and page > 0:
+                page -= 1
+                continue
+
+            if command.startswith("g"):
+                try:
+                    page = max(int(command[1:]) - 1, 0)
+                except ValueError:
+                    notice = "Página inválida.\n"
+                continue
+
+            if command.startswith("/"):
+                query = command[1:].strip().lower()
+                page = 0
+                continue
+
             try:
-                selected_option = int(
-                    input("Digite o número do site para selecioná-lo: ")
-                )
+                selected_option = int(command)
             except ValueError:
-                print("Opção inválida.\n")
+                notice = "Opção inválida.\n"
                 continue
 
             if selected_option == 0:
                 return
 
-            if selected_option < 0 or selected_option > len(items):
-                print("Opção inválida.\n")
+            if not offset < selected_option <= offset + len(page_items):
+                notice = "Opção inválida.\n"
                 continue
 
-            selected_item = items[selected_option - 1]
+            selected_item = page_items[selected_option - offset - 1]
             callback(selected_item)
 
 
 class AppContext:
-    def __init__(self):
-        self.__site_repo = SiteRepository()
-        self.__post_repo = PostRepository()
+    __shard_router: "ShardRouter | None"
+    __post_scheduler: "PostScheduler | None"
+    __machine_translator: "MachineTranslator | None"
+    __content_negotiator: "ContentNegotiator | None"
+    __home_feeds: "HomeFeedService | None"
+    __trending: "TrendingScores | None"
+    __revisions: "RevisionStore | None"
+    __moderator: "CommentModerator | None"
+    __rate_limiter: "RateLimiter | None"
+    __sessions: "SessionStore | None"
+    __url_resolver: "UrlResolver | None"
+    __media_usage: "MediaUsageService | None"
+
+    # With shards > 1, site data is partitioned across several repository
+    # shards and the repositories below are routers with the same API.
+    def __init__(self, shards: int = 1):
         self.__user_repo = UserRepository()
-        self.__comment_repo = CommentRepository()
-        self.__media_repo = MediaRepository()
-        self.__analytics_repo = AnalyticsRepository()
-        self.__permission_repo = PermissionRepository()
         self.__lang_service = LanguageService()
+        self.__build_site_repositories(shards)
+        self.__reset_services()
 
     @property
     def site_repo(self) -> SiteRepository:
@@ -133,14 +216,161 @@ class AppContext:
     def permission_repo(self) -> PermissionRepository:
         return self.__permission_repo
 
+    @property
+    def shard_router(self) -> "ShardRouter | None":
+        return self.__shard_router
+
     @property
     def lang_service(self) -> LanguageService:
         return self.__lang_service
 
+    @property
+    def post_scheduler(self) -> "PostScheduler":
+        if not self.__post_scheduler:
+            from cms.services.post_scheduler import PostScheduler
+
+            self.__post_scheduler = PostScheduler(
+                self.__post_repo, self.__analytics_repo
+            )
+        return self.__post_scheduler
+
+    @property
+    def machine_translator(self) -> "MachineTranslator":
+        if not self.__machine_translator:
+            from cms.services.machine_translation import (
+                LocalTranslationEngine,
+                MachineTranslator,
+            )
+
+            self.__machine_translator = MachineTranslator(LocalTranslationEngine())
+        return self.__machine_translator
+
+    @property
+    def content_negotiator(self) -> "ContentNegotiator":
+        if not self.__content_negotiator:
+            from cms.services.content_negotiation import ContentNegotiator
+
+            self.__content_negotiator = ContentNegotiator(self.__lang_service)
+        return self.__content_negotiator
+
+    @property
+    def home_feeds(self) -> "HomeFeedService":
+        if not self.__home_feeds:
+            from cms.services.site_template import HomeFeedService
+
+            self.__home_feeds = HomeFeedService(
+                self.__post_repo, self.__analytics_repo, self.trending
+            )
+            self.post_scheduler.subscribe(self.__home_feeds.on_post_published)
+        return self.__home_feeds
+
+    @property
+    def trending(self) -> "TrendingScores":
+        if not self.__trending:
+            from cms.services.trending import TrendingScores
+
+            self.__trending = TrendingScores(self.__analytics_repo)
+        return self.__trending
+
+    @property
+    def revisions(self) -> "RevisionStore":
+        if not self.__revisions:
+            from cms.services.revisions import RevisionStore
+
+            self.__revisions = RevisionStore()
+        return self.__revisions
+
+    @property
+    def moderator(self) -> "CommentModerator":
+        if not self.__moderator:
+            from cms.services.moderation import CommentModerator
+
+            self.__moderator = CommentModerator.load()
+        return self.__moderator
+
+    @property
+    def rate_limiter(self) -> "RateLimiter":
+        if not self.__rate_limiter:
+            from cms.services.rate_limit import RateLimiter
+
+            self.__rate_limiter = RateLimiter()
+        return self.__rate_limiter
+
+    @property
+    def sessions(self) -> "SessionStore":
+        if not self.__sessions:
+            from cms.services.sessions import SessionStore
+
+            self.__sessions = SessionStore()
+            self.__user_repo.watch(self.__sessions.on_user_mutation)
+        return self.__sessions
+
+    @property
+    def url_resolver(self) -> "UrlResolver":
+        if not self.__url_resolver:
+            from cms.services.routing import UrlResolver
+
+            self.__url_resolver = UrlResolver(
+                self.__site_repo, self.__post_repo, self.__media_repo
+            )
+        return self.__url_resolver
+
+    @property
+    def media_usage(self) -> "MediaUsageService":
+        if not self.__media_usage:
+            from cms.services.media_usage import MediaUsageService
+
+            self.__media_usage = MediaUsageService(
+                self.__post_repo, self.__media_repo, self.revisions
+            )
+        return self.__media_usage
+
     def reset_context(self):
-        self.__site_repo = SiteRepository()
-        self.__post_repo = PostRepository()
+        shards = len(self.__shard_router.shards) if self.__shard_router else 1
         self.__user_repo = UserRepository()
-        self.__comment_repo = CommentRepository()
-        self.__analytics_repo = AnalyticsRepository()
         self.__lang_service = LanguageService()
+        self.__build_site_repositories(shards)
+        self.__reset_services()
+
+    def __build_site_repositories(self, shards: int):
+        if shards <= 1:
+            self.__shard_router = None
+            self.__site_repo = SiteRepository()
+            self.__post_repo = PostRepository()
+            self.__comment_repo = CommentRepository()
+            self.__media_repo = MediaRepository()
+            self.__analytics_repo = AnalyticsRepository()
+            self.__permission_repo = PermissionRepository()
+            return
+
+        from cms.sharding import (
+            ShardedAnalyticsRepository,
+            ShardedCommentRepository,
+            ShardedMediaRepository,
+            ShardedPermissionRepository,
+            ShardedPostRepository,
+            ShardedSiteRepository,
+            ShardRouter,
+        )
+
+        router = ShardRouter(shards)
+        self.__shard_router = router
+        self.__site_repo = ShardedSiteRepository(router)
+        self.__post_repo = ShardedPostRepository(router)
+        self.__comment_repo = ShardedCommentRepository(router)
+        self.__media_repo = ShardedMediaRepository(router)
+        self.__analytics_repo = ShardedAnalyticsRepository(router)
+        self.__permission_repo = ShardedPermissionRepository(router)
+
+    def __reset_services(self):
+        self.__post_scheduler = None
+        self.__machine_translator = None
+        self.__content_negotiator = None
+        self.__home_feeds = None
+        self.__trending = None
+        self.__revisions = None
+        self.__moderator = None
+        self.__rate_limiter = None
+        self.__sessions = None
+        self.__url_resolver = None
+        self.__media_usage = None
@@ -0,0 +1,208 @@
+from dataclasses import replace
+
+from cms.models import (
+    CaroulselBlock,
+    ContentBlock,
+    Language,
+    MediaBlock,
+    Post,
+    TextBlock,
+    User,
+)
+from cms.repository import VersionConflictError
+from cms.services.revisions import (
+    BlockDelta,
+    BlockOperation,
+    PostEditor,
+    Revision,
+)
+from cms.views.menu import AbstractMenu, AppContext, MenuOptions
+
+
+def describe_block(block: ContentBlock) -> str:
+    if isinstance(block, TextBlock):
+        return f"Texto: {block.text}"
+    if isinstance(block, MediaBlock):
+        return f"Mídia: {block.media.filename} (alt: {block.alt})"
+    if isinstance(block, CaroulselBlock):
+        filenames = ", ".join(media.filename for media in block.medias)
+        return f"Carrossel: {filenames} (alt: {block.alt})"
+    return str(block)
+
+
+def describe_delta(delta: BlockDelta) -> str:
+    position = delta.index + 1
+    if delta.operation == BlockOperation.DELETE:
+        return f"- Bloco {position} removido"
+
+    block = describe_block(delta.block) if delta.block else ""
+    if delta.operation == BlockOperation.INSERT:
+        return f"+ Bloco {position} inserido: {block}"
+    return f"~ Bloco {position} alterado: {block}"
+
+
+class PostEditorMenu(AbstractMenu):
+    context: AppContext
+    logged_user: User
+    selected_post: Post
+    editor: PostEditor
+
+    def __init__(
+        self,
+        context: AppContext,
+        logged_user: User,
+        selected_post: Post,
+        language: Language,
+    ):
+        self.context = context
+        self.logged_user = logged_user
+        self.selected_post = selected_post
+        self.editor = PostEditor(
+            selected_post, language.code, context.post_repo, context.revisions
+        )
+
+    def show(self):
+        options: list[MenuOptions] = [
+            {"message": "Alterar título", "function": self._set_title},
+            {"message": "Editar bloco", "function": self._edit_block},
+            {"message": "Inserir bloco de texto", "function": self._insert_block},
+            {"message": "Remover bloco", "function": self._delete_block},
+            {"message": "Mover bloco", "function": self._move_block},
+            {"message": "Salvar alterações", "function": self._save},
+            {"message": "Descartar alterações", "function": self.editor.discard},
+            {"message": "Ver histórico de revisões", "function": self._show_history},
+        ]
+
+        def display_title():
+            print(f"Editando: {self.editor.title}")
+            print(" ")
+            for i, block in enumerate(self.editor.blocks):
+                print(f"  [{i + 1}] {describe_block(block)}")
+            print(" ")
+
+        PostEditorMenu.prompt_menu_option(options, display_title)
+
+    def _set_title(self):
+        title = input("Novo título: ").strip()
+        if title:
+            self.editor.set_title(title)
+
+    def _edit_block(self):
+        index = self.__prompt_block_index("Número do bloco a editar: ")
+        if index is None:
+            return
+
+        block = self.editor.blocks[index]
+        print(describe_block(block))
+        if isinstance(block, TextBlock):
+            text = input("Novo texto: ").strip()
+            self.editor.replace_block(index, replace(block, text=text))
+        elif isinstance(block, (MediaBlock, CaroulselBlock)):
+            alt = input("Novo texto alternativo (alt): ").strip()
+            self.editor.replace_block(index, replace(block, alt=alt))
+
+    def _insert_block(self):
+        index = self.__prompt_block_index(
+            "Inserir antes do bloco número (Enter para inserir no fim): ",
+            allow_end=True,
+        )
+        if index is None:
+            return
+
+        text = input("Texto do bloco: ").strip()
+        self.editor.insert_block(index, TextBlock(order=index + 1, text=text))
+
+    def _delete_block(self):
+        index = self.__prompt_block_index("Número do bloco a remover: ")
+        if index is not None:
+            self.editor.delete_block(index)
+
+    def _move_block(self):
+        index = self.__prompt_block_index("Número do bloco a mover: ")
+        if index is None:
+            return
+
+        new_index = self.__prompt_block_index("Nova posição: ")
+        if new_index is not None:
+            self.editor.move_block(index, new_index)
+
+    def _save(self):
+        try:
+            revision = self.editor.save(self.logged_user)
+        except VersionConflictError as e:
+            print(e)
+            input(
+                "Descarte as alterações para carregar a versão atual. "
+                "Clique Enter para voltar."
+            )
+            return
+
+        if not revision:
+            input("Nenhuma alteração para salvar. Clique Enter para voltar.")
+            return
+
+        input(f"Revisão {revision.number} salva. Clique Enter para voltar.")
+
+    def _show_history(self):
+        history = self.context.revisions.get_history(
+            self.selected_post, self.editor.lang
+        )
+
+        def option_text(revision: Revision) -> str:
+            changes = f"{len(revision.deltas)} bloco(s)"
+            if revision.title is not None and revision.number:
+                changes += ", título"
+            author = revision.author.username if revision.author else "externa"
+            return (
+                f"Revisão {revision.number} - {author}@"
+                f"{revision.created_at.strftime('%Y-%m-%d %H:%M:%S')} ({changes})"
+            )
+
+        def show_revision(revision: Revision):
+            content = history.get_revision(revision.number)
+            print(f"Revisão {revision.number}: {content.title}")
+            print(" ")
+            for block in content.body:
+                print(f"  {describe_block(block)}")
+
+            if revision.number:
+                print("\nAlterações em relação à revisão anterior:")
+                for delta in reversed(
+                    history.diff(revision.number - 1, revision.number)
+                ):
+                    print(f"  {describe_delta(delta)}")
+
+            print(" ")
+            confirm = input("Restaurar esta revisão? (y/n): ").strip().lower()
+            if confirm != "y":
+                return
+
+            try:
+                self.editor.restore(revision.number, self.logged_user)
+            except VersionConflictError as e:
+                input(f"{e} Clique Enter para voltar.")
+
+        AbstractMenu.prompt_generic(
+            lambda: reversed(history.revisions),
+            "Histórico de revisões:",
+            show_revision,
+            option_text,
+        )
+
+    def __prompt_block_index(self, prompt: str, allow_end: bool = False) -> int | None:
+        count = len(self.editor.blocks)
+        answer = input(prompt).strip()
+        if allow_end and not answer:
+            return count
+
+        try:
+            index = int(answer) - 1
+        except ValueError:
+            input("Número inválido. Clique Enter para voltar.")
+            return None
+
+        if not 0 <= index < count + (1 if allow_end else 0):
+            input("Bloco inexistente. Clique Enter para voltar.")
+            return None
+
+        return index
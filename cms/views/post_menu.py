@@ -1,10 +1,24 @@
-import os
-from cms.models import Comment, Post, PostAction, PostAnalyticsEntry, Site, User
+from cms.models import (
+    Capability,
+    Content,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    User,
+)
 from cms.services.post_translator import PostTranslator
+from cms.services.rate_limit import RateLimitExceededError
 from cms.services.seo_analyzier import display_seo_report
 from cms.services.social_media import SocialMedia, build_social_media_post
-from cms.utils import select_enum
+from cms.utils import clear_screen, select_enum
+from cms.views.comment_thread_menu import (
+    CommentThreadMenu,
+    add_comment,
+    display_moderation_result,
+)
 from cms.views.menu import AbstractMenu, AppContext, MenuOptions
+from cms.views.post_editor_menu import PostEditorMenu
 
 
 class PostMenu(AbstractMenu):
@@ -44,73 +58,78 @@ class PostMenu(AbstractMenu):
             },
         ]
 
-        if self.context.permission_repo.has_permission(
-            self.logged_user, self.selected_site
-        ):
-            options.extend(
-                [
-                    {
-                        "message": "Traduzir post",
-                        "function": self._translate_post,
-                    },
-                    {
-                        "message": "Ver estatísticas do post",
-                        "function": self._show_post_analytics,
-                    },
-                    {
-                        "message": "Ver relatório de análise de SEO",
-                        "function": self._show_seo_report,
-                    },
-                ]
-            )
+        manager_options: list[tuple[Capability, MenuOptions]] = [
+            (
+                Capability.EDIT_POST,
+                {"message": "Editar post", "function": self._edit_post},
+            ),
+            (
+                Capability.EDIT_POST,
+                {"message": "Traduzir post", "function": self._translate_post},
+            ),
+            (
+                Capability.EDIT_POST,
+                {
+                    "message": "Traduzir post automaticamente",
+                    "function": self._translate_post_automatically,
+                },
+            ),
+            (
+                Capability.VIEW_ANALYTICS,
+                {
+                    "message": "Ver estatísticas do post",
+                    "function": self._show_post_analytics,
+                },
+            ),
+            (
+                Capability.EDIT_POST,
+                {
+                    "message": "Ver relatório de análise de SEO",
+                    "function": self._show_seo_report,
+                },
+            ),
+        ]
+        capabilities = self.context.permission_repo.get_capabilities(
+            self.logged_user, self.selected_site, self.selected_post
+        )
+        options.extend(
+            option
+            for capability, option in manager_options
+            if capability in capabilities
+        )
 
         def display_title():
-            self.selected_post.display_post(self.selected_post_language)
+            self.selected_post.display_post(self._get_selected_content())
 
         PostMenu.prompt_menu_option(options, display_title)
 
     def _show_post_comments(self):
-        post_comments: list[Comment] = self.context.comment_repo.get_post_comments(
-            self.selected_post
-        )
-
-        for comment in post_comments:
-            print(comment.body)
-            print(f"{comment.commenter.username} @ {comment.created_at}")
-            print(" ")
-
-        print(" ")
-        input("Clique Enter para voltar ao Menu.")
+        CommentThreadMenu(self.context, self.logged_user, self.selected_post).show()
 
     def _comment_on_post(self):
         body = input("Digite seu comentário: ")
-
-        comment = Comment(
-            post=self.selected_post, commenter=self.logged_user, body=body
-        )
-        self.context.comment_repo.add_comment(comment)
-
-        self.context.analytics_repo.log(
-            PostAnalyticsEntry(
-                user=self.logged_user,
-                site=self.selected_site,
-                post=self.selected_post,
-                action=PostAction.COMMENT,
-                metadata={"comment_id": str(comment.id)},
+        try:
+            result = add_comment(
+                self.context, self.logged_user, self.selected_post, body
             )
-        )
+        except RateLimitExceededError as e:
+            print(e)
+        else:
+            display_moderation_result(result)
+        input("Clique Enter para voltar.")
 
+    # Any supported language can be chosen: if the post lacks it, the content
+    # negotiator picks the closest one through the fallback chains.
     def _change_post_language(self):
-        languages = self.selected_post.get_languages()
-        if len(languages) == 1:
-            os.system("clear")
-            input(
-                f"O Post só tem uma linguagem: {languages[0]}. Clique enter para voltar."
-            )
-            return
+        language = self.context.lang_service.select_language(
+            self.context.lang_service.supported_languages
+        )
+        if language:
+            self.selected_post_language = language
 
-        self.selected_post_language = self.context.lang_service.select_language(
-            languages
+    def _get_selected_content(self) -> Content:
+        return self.context.content_negotiator.resolve(
+            self.selected_post, [self.selected_post_language.code]
         )
 
     def _sharing_suggestion(self):
@@ -140,7 +159,7 @@ class PostMenu(AbstractMenu):
             )
             return
 
-        os.system("clear")
+        clear_screen()
 
         print(f"Post: {self.selected_post.get_default_title()}")
         print(f"Idioma: {language}")
@@ -151,22 +170,58 @@ class PostMenu(AbstractMenu):
         )
         social_post.display_sharing_suggestion()
 
+        self.context.analytics_repo.log(
+            PostAnalyticsEntry(
+                user=self.logged_user,
+                site=self.selected_site,
+                post=self.selected_post,
+                action=PostAction.SHARE,
+                platform=social_media,
+                language=language.code,
+            )
+        )
+
         input("\nRecomendação finalizada. Clique Enter para voltar.")
 
+    def _edit_post(self):
+        PostEditorMenu(
+            self.context,
+            self.logged_user,
+            self.selected_post,
+            self._get_selected_content().language,
+        ).show()
+
     def _translate_post(self):
-        pt = PostTranslator(self.selected_post)
+        pt = PostTranslator(
+            self.selected_post, self.context.lang_service, self.context.post_repo
+        )
         pt.translate()
 
+    def _translate_post_automatically(self):
+        pt = PostTranslator(
+            self.selected_post, self.context.lang_service, self.context.post_repo
+        )
+        pt.translate_automatically(self.context.machine_translator)
+
     def _show_post_analytics(self):
         views = self.context.analytics_repo.get_post_views(self.selected_post.id)
         shares = self.context.analytics_repo.get_post_shares(self.selected_post.id)
         comments = self.context.analytics_repo.get_post_comments(self.selected_post.id)
+        unique_users = self.context.analytics_repo.get_unique_users(
+            self.selected_site.id, self.selected_post.id
+        )
 
         self.selected_post.display_post_short()
 
         print(f"Visualizações: {views}")
+        print(f"Leitores únicos: {unique_users.get(PostAction.VIEW, 0)}")
         print(f"Comentários: {comments}")
         print(f"Compartilhamentos: {shares}")
+        by_platform = self.context.analytics_repo.get_post_platform_counts(
+            self.selected_post.id, PostAction.SHARE
+        )
+        for platform, count in by_platform.items():
+            print(f"  {platform.value}: {count}")
 
         print(" ")
         input("Clique Enter para voltar ao Menu.")
@@ -1,20 +1,27 @@
 from cms.models import (
-    Permission,
+    Capability,
+    Comment,
+    ModerationStatus,
     Post,
     PostAction,
     PostAnalyticsEntry,
     Site,
     SiteAction,
     SiteAnalyticsEntry,
+    SiteAnalyticsReport,
     SiteTemplateType,
     User,
 )
+from cms.repository import VersionConflictError
 from cms.services.post_builder import PostBuilder
-from cms.services.site_template import build_site_template
-from cms.utils import select_enum
+from cms.services.rate_limit import RateLimitedAction
+from cms.services.share_funnel import compute_share_funnels, funnel_sections
+from cms.utils import display_report, select_enum
+from cms.views.comment_thread_menu import set_comment_status
 from cms.views.media_library_menu import MediaLibraryMenu
 from cms.views.menu import AbstractMenu, AppContext, MenuOptions
 from cms.views.post_menu import PostMenu
+from cms.views.site_roles_menu import SiteRolesMenu
 
 
 class SiteMenu(AbstractMenu):
@@ -37,52 +44,80 @@ class SiteMenu(AbstractMenu):
             {"message": "Selecionar posts do site", "function": self._select_post},
         ]
 
-        if self.context.permission_repo.has_permission(
+        manager_options: list[tuple[Capability, MenuOptions]] = [
+            (
+                Capability.CREATE_POST,
+                {"message": "Criar post no site", "function": self._create_site_post},
+            ),
+            (
+                Capability.MANAGE_MEDIA,
+                {
+                    "message": "Biblioteca de Mídias",
+                    "function": self._media_library_menu,
+                },
+            ),
+            (
+                Capability.VIEW_ANALYTICS,
+                {
+                    "message": "Ver estatísticas do site",
+                    "function": self._show_site_analytics,
+                },
+            ),
+            (
+                Capability.VIEW_ANALYTICS,
+                {
+                    "message": "Ver funil de compartilhamento",
+                    "function": self._show_share_funnel,
+                },
+            ),
+            (
+                Capability.CONFIGURE_SITE,
+                {
+                    "message": "Mudar template do site",
+                    "function": self._configure_site_template,
+                },
+            ),
+            (
+                Capability.MODERATE_COMMENTS,
+                {
+                    "message": "Moderar comentários",
+                    "function": self._moderate_comments,
+                },
+            ),
+            (
+                Capability.MODERATE_COMMENTS,
+                {
+                    "message": "Remoderar comentários com as regras atuais",
+                    "function": self._remoderate_comments,
+                },
+            ),
+            (
+                Capability.MANAGE_ROLES,
+                {"message": "Gerenciar papéis", "function": self._manage_roles},
+            ),
+        ]
+        capabilities = self.context.permission_repo.get_capabilities(
             self.logged_user, self.selected_site
-        ):
-            options.extend(
-                [
-                    {
-                        "message": "Criar post no site",
-                        "function": self._create_site_post,
-                    },
-                    {
-                        "message": "Biblioteca de Mídias",
-                        "function": self._media_library_menu,
-                    },
-                    {
-                        "message": "Ver estatísticas do site",
-                        "function": self._show_site_analytics,
-                    },
-                    {
-                        "message": "Mudar template do site",
-                        "function": self._configure_site_template,
-                    },
-                ]
-            )
-
-            if self.logged_user.username == self.selected_site.owner.username:
-                options.extend(
-                    [
-                        {
-                            "message": "Adicionar Gerente",
-                            "function": self._add_manager,
-                        },
-                    ]
-                )
+        )
+        options.extend(
+            option
+            for capability, option in manager_options
+            if capability in capabilities
+        )
 
         def display_title():
-            template = build_site_template(
-                site=self.selected_site,
-                post_repo=self.context.post_repo,
-                analytics_repo=self.context.analytics_repo,
-            )
-            template.display()
+            self.context.post_scheduler.tick()
+            self.context.home_feeds.display(self.selected_site)
 
         SiteMenu.prompt_menu_option(options, display_title)
 
     def _create_site_post(self):
-        pb = PostBuilder(self.selected_site, self.logged_user, self.context.media_repo)
+        pb = PostBuilder(
+            self.selected_site,
+            self.logged_user,
+            self.context.media_repo,
+            self.context.lang_service,
+        )
         try:
             post = pb.build_post()
         except ValueError:
@@ -105,100 +140,117 @@ class SiteMenu(AbstractMenu):
             print(" ")
             input("Post criado. Clique Enter para voltar ao menu.")
 
-    def _add_manager(self):
-        print("Selecione um usuário para ser gerente da página:")
-        users = self.context.permission_repo.get_not_managers(
-            self.selected_site, self.context.user_repo
-        )
-        for i, user in enumerate(users):
-            print(f"{i + 1}. {user.username} ({user.email})")
-        print("0. Voltar")
-
-        selected_indexes = input(
-            "\nDigite os números separados por vírgula (ex: 1,3): "
-        ).split(",")
-
-        for idx in selected_indexes:
-            idx = idx.strip()
-
-            if not idx.isdigit():
-                continue
-
-            n = int(idx)
-
-            if n == 0:
-                return
-
-            if n < 0 or n > len(users):
-                print("Opção inválida.\n")
-                continue
-
-            if 1 <= n <= len(users):
-                user = users[n - 1]
-                print(f"Permissão de gerência dada ao usuário {user.username}.")
-                self.context.permission_repo.grant_permission(
-                    Permission(user=user, site=self.selected_site)
-                )
-
-        print(" ")
-        input("Clique Enter para voltar ao menu.")
+    def _manage_roles(self):
+        SiteRolesMenu(self.context, self.logged_user, self.selected_site).show()
 
     def _show_site_analytics(self):
         site = self.selected_site
         analytics_repo = self.context.analytics_repo
+        report = SiteAnalyticsReport(
+            analytics_repo.get_site_entries(site.id),
+            site,
+            unique_users=analytics_repo.get_unique_users(site.id),
+        )
 
-        accesses = analytics_repo.get_site_accesses(site.id)
-        post_creations = analytics_repo.get_site_post_creation_count(site.id)
-        media_uploads = analytics_repo.get_site_media_upload_count(site.id)
-
-        total_views = analytics_repo.get_site_total_post_views(site.id)
-        total_comments = analytics_repo.get_site_total_post_comments(site.id)
-        total_shares = analytics_repo.get_site_total_post_shares(site.id)
+        display_report(report.generate_metrics())
 
-        print("=== Estatísticas do Site ===")
-        print(f"Nome: {site.name}")
-        print(f"Acessos ao site: {accesses}")
-        print(f"Posts criados: {post_creations}")
-        print(f"Uploads de mídia: {media_uploads}")
         print(" ")
-        print("--- Interações com os Posts ---")
-        print(f"Visualizações totais: {total_views}")
-        print(f"Comentários totais: {total_comments}")
-        print(f"Compartilhamentos totais: {total_shares}")
+        input("Clique Enter para voltar ao Menu.")
+
+    def _show_share_funnel(self):
+        entries = self.context.analytics_repo.get_site_entries(self.selected_site.id)
+        display_report(funnel_sections(compute_share_funnels(entries)))
 
         print(" ")
         input("Clique Enter para voltar ao Menu.")
 
     def _configure_site_template(self):
+        version = self.selected_site.version
         new_template = select_enum(
             SiteTemplateType, "Escolha o layout de apresentação do site:"
         )
-        if new_template:
-            self.selected_site.template = new_template
-            print(f"Template atualizado para: {new_template.value}.", end=" ")
-        else:
+        if not new_template:
             print("Opção inválida.", end=" ")
+        else:
+            try:
+                self.context.site_repo.update_template(
+                    self.selected_site, new_template, expected_version=version
+                )
+                print(f"Template atualizado para: {new_template.value}.", end=" ")
+            except VersionConflictError as e:
+                print(e)
+                print(f"Template atual: {self.selected_site.template.value}.", end=" ")
 
         input("Clique enter para voltar ao menu.")
 
+    def _moderate_comments(self):
+        comment_repo = self.context.comment_repo
+
+        def review(comment: Comment):
+            print(f"Post: {comment.post.get_default_title()}")
+            print(f"{comment.commenter.username}: {comment.body}")
+            print(" ")
+            answer = input("Aprovar (a), rejeitar (r) ou voltar (Enter): ")
+            status = {"a": ModerationStatus.APPROVED, "r": ModerationStatus.REJECTED}
+            new_status = status.get(answer.strip().lower())
+            if not new_status:
+                return
+
+            set_comment_status(self.context, comment, new_status)
+
+        SiteMenu.prompt_generic(
+            lambda: comment_repo.get_held_comments(self.selected_site),
+            "Comentários aguardando moderação",
+            review,
+            lambda c: f"{c.commenter.username}@{c.post.get_default_title()}: {c.body}",
+        )
+
+    # After the banned terms change, runs them over every comment of the site:
+    # held comments may be released and published ones taken down.
+    def _remoderate_comments(self):
+        comment_repo = self.context.comment_repo
+        comments = comment_repo.get_held_comments(self.selected_site)
+        for post in self.context.post_repo.iter_site_posts(self.selected_site):
+            comments.extend(comment_repo.get_post_comments(post))
+
+        changes = self.context.moderator.remoderate(comments)
+        counts = dict.fromkeys(ModerationStatus, 0)
+        for comment, result in changes:
+            set_comment_status(self.context, comment, result.status)
+            counts[result.status] += 1
+
+        print(f"{len(comments)} comentários analisados, {len(changes)} alterados para:")
+        for status, total in counts.items():
+            print(f"  {status.value}: {total}")
+
+        print(" ")
+        input("Clique Enter para voltar ao Menu.")
+
     def _select_post(self):
-        posts: list[Post] = self.context.post_repo.get_site_posts(self.selected_site)
+        self.context.post_scheduler.tick()
 
         def execute_for_option(selected_post: Post):
-            self.context.analytics_repo.log(
-                PostAnalyticsEntry(
-                    user=self.logged_user,
-                    site=self.selected_site,
-                    post=selected_post,
-                    action=PostAction.VIEW,
+            # Reopening the same post right away is not a new view.
+            if self.context.rate_limiter.allow(
+                RateLimitedAction.VIEW,
+                self.logged_user.id,
+                self.selected_site.id,
+                selected_post.id,
+            ):
+                self.context.analytics_repo.log(
+                    PostAnalyticsEntry(
+                        user=self.logged_user,
+                        site=self.selected_site,
+                        post=selected_post,
+                        action=PostAction.VIEW,
+                    )
                 )
-            )
             PostMenu(
                 self.context, self.logged_user, self.selected_site, selected_post
             ).show()
 
         SiteMenu.prompt_generic(
-            posts,
+            lambda: self.context.post_repo.iter_site_posts(self.selected_site),
             "Posts do site",
             execute_for_option,
             lambda m: m.get_default_title(),
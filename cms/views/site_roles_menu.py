@@ -0,0 +1,162 @@
+from cms.models import Capability, Permission, Post, Site, SiteRole, User
+from cms.utils import select_enum
+from cms.views.menu import AbstractMenu, AppContext, MenuOptions
+
+
+def describe_permission(permission: Permission) -> str:
+    target = (
+        f" (post: {permission.post.get_default_title()})" if permission.post else ""
+    )
+    return f"{permission.user.username}: {permission.role.value}{target}"
+
+
+class SiteRolesMenu(AbstractMenu):
+    context: AppContext
+    logged_user: User
+    selected_site: Site
+
+    def __init__(self, context: AppContext, logged_user: User, selected_site: Site):
+        self.context = context
+        self.logged_user = logged_user
+        self.selected_site = selected_site
+
+    def show(self):
+        if not self.context.permission_repo.has_permission(
+            self.logged_user, self.selected_site, Capability.MANAGE_ROLES
+        ):
+            return
+
+        options: list[MenuOptions] = [
+            {"message": "Conceder papel no site", "function": self._grant_site_role},
+            {"message": "Conceder papel em um post", "function": self._grant_post_role},
+            {"message": "Alterar papel", "function": self._change_role},
+            {"message": "Revogar papel", "function": self._revoke_role},
+        ]
+
+        def display_title():
+            print(f"Papéis no site {self.selected_site.name}:")
+            for permission in self.context.permission_repo.get_site_permissions(
+                self.selected_site
+            ):
+                print(f"  {describe_permission(permission)}")
+            print(" ")
+
+        SiteRolesMenu.prompt_menu_option(options, display_title)
+
+    def _grant_site_role(self):
+        print("Selecione os usuários que receberão um papel no site:")
+        users = self.context.permission_repo.get_not_managers(
+            self.selected_site, self.context.user_repo
+        )
+        for i, user in enumerate(users):
+            print(f"{i + 1}. {user.username} ({user.email})")
+        print("0. Voltar")
+
+        selected_indexes = input(
+            "\nDigite os números separados por vírgula (ex: 1,3): "
+        ).split(",")
+
+        selected_users: list[User] = []
+        for idx in selected_indexes:
+            idx = idx.strip()
+
+            if not idx.isdigit():
+                continue
+
+            n = int(idx)
+
+            if n == 0:
+                return
+
+            if n > len(users):
+                print("Opção inválida.\n")
+                continue
+
+            selected_users.append(users[n - 1])
+
+        if not selected_users:
+            return
+
+        role = select_enum(SiteRole, "\nEscolha o papel:")
+        if not role:
+            return
+
+        for user in selected_users:
+            self.__grant(Permission(user=user, site=self.selected_site, role=role))
+
+        print(" ")
+        input("Clique Enter para voltar ao menu.")
+
+    def _grant_post_role(self):
+        def grant_on_post(post: Post):
+            username = input("Username do usuário: ").strip()
+            user = self.context.user_repo.get_user_by_username(username)
+            if not user:
+                input("Usuário não encontrado. Clique Enter para voltar.")
+                return
+
+            role = select_enum(SiteRole, "Escolha o papel neste post:")
+            if role:
+                self.__grant(
+                    Permission(user=user, site=self.selected_site, role=role, post=post)
+                )
+                input("Clique Enter para voltar.")
+
+        SiteRolesMenu.prompt_generic(
+            lambda: self.context.post_repo.iter_site_posts(self.selected_site),
+            "Escolha o post:",
+            grant_on_post,
+            lambda p: p.get_default_title(),
+        )
+
+    def _change_role(self):
+        def change(permission: Permission):
+            role = select_enum(SiteRole, f"Novo papel de {permission.user.username}:")
+            if role:
+                self.__grant(
+                    Permission(
+                        user=permission.user,
+                        site=permission.site,
+                        role=role,
+                        post=permission.post,
+                    )
+                )
+                input("Clique Enter para voltar.")
+
+        SiteRolesMenu.prompt_generic(
+            lambda: self.context.permission_repo.get_site_permissions(
+                self.selected_site
+            ),
+            "Escolha o papel a alterar:",
+            change,
+            describe_permission,
+        )
+
+    def _revoke_role(self):
+        def revoke(permission: Permission):
+            try:
+                self.context.permission_repo.revoke_permission(
+                    permission.user, permission.site, permission.post
+                )
+            except ValueError as e:
+                print(e)
+            else:
+                print(f"Papel revogado: {describe_permission(permission)}")
+            input("Clique Enter para voltar.")
+
+        SiteRolesMenu.prompt_generic(
+            lambda: self.context.permission_repo.get_site_permissions(
+                self.selected_site
+            ),
+            "Escolha o papel a revogar:",
+            revoke,
+            describe_permission,
+        )
+
+    def __grant(self, permission: Permission):
+        try:
+            self.context.permission_repo.grant_permission(permission)
+        except ValueError as e:
+            print(e)
+        else:
+            print(f"Papel concedido: {describe_permission(permission)}")
@@ -0,0 +1,299 @@
+import os
+import threading
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+from cms.models import Content, LanguageCode, Post
+from cms.repository import Mutation
+from cms.snapshot import (
+    MAGIC,
+    Record,
+    RecordType,
+    SnapshotRestorer,
+    comment_record,
+    content_fields,
+    decode_record,
+    deleted_media_records,
+    encode_record,
+    entry_record,
+    iter_mapped_records,
+    media_record,
+    permission_record,
+    post_records,
+    save_snapshot_file,
+    site_record,
+    user_record,
+)
+
+if TYPE_CHECKING:
+    from cms.views.menu import AppContext
+
+
+class FsyncPolicy(Enum):
+    # fsync after every mutation.
+    ALWAYS = 1
+    # Group commit: mutations are buffered and written with a single fsync once
+    # group_size of them are pending or group_interval seconds have passed.
+    GROUP = 2
+    # Write on group commits but let the OS decide when to hit the disk.
+    NEVER = 3
+
+
+# Directory layout, for generation N:
+#   checkpoint-N.snapshot  full state when generation N started (absent for N=0)
+#   wal-N.log              every mutation made after that checkpoint
+# A checkpoint writes generation N+1 and only then removes generation N, so a
+# crash at any point leaves one complete (checkpoint, log) pair to recover.
+class WriteAheadLog:
+    context: "AppContext"
+    recovered: bool
+    __directory: Path
+    __policy: FsyncPolicy
+    __group_size: int
+    __group_interval: float
+    __checkpoint_every: int
+    __generation: int
+    __file: BinaryIO
+    __buffer: bytearray
+    __pending: int
+    __records_since_checkpoint: int
+    __known_medias: set[int]
+    __lock: threading.RLock
+    __closed: threading.Event
+    __flusher: threading.Thread | None
+
+    def __init__(
+        self,
+        directory: Path,
+        policy: FsyncPolicy = FsyncPolicy.GROUP,
+        group_size: int = 64,
+        group_interval: float = 0.05,
+        checkpoint_every: int = 10_000,
+        shards: int = 1,
+    ):
+        self.__directory = directory
+        self.__policy = policy
+        self.__group_size = group_size
+        self.__group_interval = group_interval
+        self.__checkpoint_every = checkpoint_every
+        self.__buffer = bytearray()
+        self.__pending = 0
+        self.__lock = threading.RLock()
+        self.__closed = threading.Event()
+        self.__flusher = None
+
+        from cms.views.menu import AppContext
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self.context = AppContext(shards)
+        self.__recover()
+        self.__watch_repositories()
+
+        if policy != FsyncPolicy.ALWAYS:
+            self.__flusher = threading.Thread(target=self.__flush_loop, daemon=True)
+            self.__flusher.start()
+
+    def commit(self):
+        with self.__lock:
+            if not self.__buffer:
+                return
+
+            self.__file.write(self.__buffer)
+            self.__file.flush()
+            if self.__policy != FsyncPolicy.NEVER:
+                os.fsync(self.__file.fileno())
+
+            self.__buffer = bytearray()
+            self.__pending = 0
+
+    def checkpoint(self):
+        with self.__lock:
+            self.commit()
+
+            generation = self.__generation + 1
+            tmp_path = self.__checkpoint_path(generation).with_suffix(".tmp")
+            save_snapshot_file(self.context, tmp_path)
+            with open(tmp_path, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.__checkpoint_path(generation))
+
+            self.__file.close()
+            self.__open_log(generation)
+            self.__sync_directory()
+            self.__prune_generations()
+
+    def close(self):
+        self.__closed.set()
+        if self.__flusher:
+            self.__flusher.join()
+
+        with self.__lock:
+            self.commit()
+            self.__file.close()
+
+    def __recover(self):
+        generations = [
+            int(path.stem.split("-")[1])
+            for path in self.__directory.glob("checkpoint-*.snapshot")
+        ]
+        generation = max(generations, default=0)
+
+        restorer = SnapshotRestorer(self.context)
+        checkpoint = self.__checkpoint_path(generation)
+        if checkpoint.exists():
+            for record_type, fields in iter_mapped_records(checkpoint):
+                restorer.restore(record_type, fields)
+
+        log_path = self.__log_path(generation)
+        replayed = 0
+        valid_size = 0
+        if log_path.exists():
+            valid_size = len(MAGIC)
+            data = log_path.read_bytes()
+            if data[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"Log inválido: {log_path}")
+
+            while valid_size < len(data):
+                try:
+                    (record_type, fields), end = decode_record(data, valid_size)
+                except ValueError:
+                    # Torn or zeroed write from a crash: nothing after the
+                    # first damaged record can be trusted, so the rest of the
+                    # log is dropped.
+                    break
+                restorer.restore(record_type, fields)
+                valid_size = end
+                replayed += 1
+
+        self.recovered = checkpoint.exists() or log_path.exists()
+        self.__known_medias = set(restorer.medias)
+        self.__open_log(generation, valid_size)
+        self.__records_since_checkpoint = replayed
+        self.__prune_generations()
+
+    def __open_log(self, generation: int, valid_size: int = 0):
+        path = self.__log_path(generation)
+        if valid_size:
+            self.__file = open(path, "r+b")
+            self.__file.truncate(valid_size)
+            self.__file.seek(valid_size)
+        else:
+            self.__file = open(path, "wb")
+            self.__file.write(MAGIC)
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+        self.__generation = generation
+        self.__records_since_checkpoint = 0
+
+    # Files from older generations, left behind by a crash during a
+    # checkpoint, and unfinished checkpoints are no longer needed once the
+    # current generation is on disk.
+    def __prune_generations(self):
+        for pattern in ["checkpoint-*.snapshot", "checkpoint-*.tmp", "wal-*.log"]:
+            for path in self.__directory.glob(pattern):
+                generation = int(path.stem.split("-")[1])
+                if generation < self.__generation or path.suffix == ".tmp":
+                    path.unlink(missing_ok=True)
+
+    def __watch_repositories(self):
+        for repo in [
+            self.context.user_repo,
+            self.context.site_repo,
+            self.context.permission_repo,
+            self.context.media_repo,
+            self.context.post_repo,
+            self.context.comment_repo,
+            self.context.analytics_repo,
+        ]:
+            repo.watch(self.__on_mutation)
+
+    def __on_mutation(self, mutation: Mutation, payload: Any):
+        with self.__lock:
+            for record in self.__encode(mutation, payload):
+                self.__buffer += encode_record(*record)
+                self.__pending += 1
+                self.__records_since_checkpoint += 1
+
+            if (
+                self.__policy == FsyncPolicy.ALWAYS
+                or self.__pending >= self.__group_size
+            ):
+                self.commit()
+
+            if self.__records_since_checkpoint >= self.__checkpoint_every:
+                self.checkpoint()
+
+    def __encode(self, mutation: Mutation, payload: Any) -> list[Record]:
+        if mutation == Mutation.ADD_USER:
+            return [user_record(payload)]
+        if mutation == Mutation.DELETE_USER:
+            return [(RecordType.DELETE_USER, [payload.id])]
+        if mutation == Mutation.ADD_SITE:
+            return [site_record(payload)]
+        if mutation == Mutation.UPDATE_SITE_TEMPLATE:
+            return [(RecordType.SITE_TEMPLATE, [payload.id, payload.template.name])]
+        if mutation == Mutation.GRANT_PERMISSION:
+            return [permission_record(payload)]
+        if mutation == Mutation.REVOKE_PERMISSION:
+            user_id, site_id, _, post_id = permission_record(payload)[1]
+            return [(RecordType.REVOKE_PERMISSION, [user_id, site_id, post_id])]
+        if mutation == Mutation.ADD_MEDIA:
+            self.__known_medias.add(payload.id)
+            return [media_record(payload)]
+        if mutation == Mutation.REMOVE_MEDIA:
+            return [(RecordType.REMOVE_MEDIA, [payload.id])]
+        if mutation == Mutation.ADD_POST:
+            return post_records(payload, self.__known_medias)
+        if mutation == Mutation.ADD_CONTENT:
+            return self.__content_records(*payload)
+        if mutation == Mutation.ADD_COMMENT:
+            return [comment_record(payload)]
+        if mutation == Mutation.SET_COMMENT_STATUS:
+            return [(RecordType.COMMENT_STATUS, [payload.id, payload.status.name])]
+        if mutation == Mutation.LOG:
+            return [entry_record(payload)]
+        if mutation == Mutation.ANONYMIZE_USER:
+            return [(RecordType.ANONYMIZE_USER, [payload.id])]
+        if mutation == Mutation.DELETE_SITE:
+            return [(RecordType.DELETE_SITE, [payload.id])]
+        if mutation == Mutation.REVOKE_SITE_PERMISSIONS:
+            return [(RecordType.REVOKE_SITE_PERMISSIONS, [payload.id])]
+        if mutation == Mutation.DELETE_POST:
+            return [(RecordType.DELETE_POST, [payload.id])]
+        if mutation == Mutation.DELETE_COMMENTS:
+            return [(RecordType.DELETE_COMMENTS, [c.id for c in payload])]
+        if mutation == Mutation.DELETE_ENTRIES:
+            return [(RecordType.DELETE_ENTRIES, [e.id for e in payload])]
+
+        raise ValueError(f"Mutação não suportada: {mutation}")
+
+    # The whole content, not the editor's delta: revision histories are not
+    # persisted, so replaying the log only needs the latest content.
+    def __content_records(
+        self, post: Post, lang: LanguageCode, content: Content
+    ) -> list[Record]:
+        records = deleted_media_records(content, self.__known_medias)
+        records.append((RecordType.CONTENT, [post.id, *content_fields(lang, content)]))
+        return records
+
+    def __flush_loop(self):
+        while not self.__closed.wait(self.__group_interval):
+            self.commit()
+
+    def __sync_directory(self):
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+
+        fd = os.open(self.__directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def __checkpoint_path(self, generation: int) -> Path:
+        return self.__directory / f"checkpoint-{generation}.snapshot"
+
+    def __log_path(self, generation: int) -> Path:
+        return self.__directory / f"wal-{generation}.log"
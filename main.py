@@ -1,5 +1,12 @@
+import sys
+from pathlib import Path
+
 from cms.views import Menu
 
 if __name__ == "__main__":
-    menu = Menu()
+    # main.py [snapshot] or main.py --data-dir <dir>
+    if len(sys.argv) > 2 and sys.argv[1] == "--data-dir":
+        menu = Menu(data_dir=Path(sys.argv[2]))
+    else:
+        menu = Menu(Path(sys.argv[1]) if len(sys.argv) > 1 else None)
     menu.show()
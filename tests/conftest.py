@@ -0,0 +1,112 @@
+from pathlib import Path
+
+import pytest
+
+from cms.models import (
+    Content,
+    ContentBlock,
+    Language,
+    MediaFile,
+    MediaType,
+    Permission,
+    Post,
+    Site,
+    SiteRole,
+    User,
+    UserRole,
+)
+from cms.views.menu import AppContext
+
+PORTUGUESE = Language("Português", "pt-br")
+
+
+class FakeClock:
+    now: float
+
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def add_user(context: AppContext, username: str) -> User:
+    user = User(
+        username.title(),
+        "Lima",
+        f"{username}@cms.com",
+        username,
+        "Senha123",
+        UserRole.USER,
+    )
+    context.user_repo.add_user(user)
+    return user
+
+
+# Like creating a site in the menu: the owner also gets the OWNER role.
+def add_site(context: AppContext, owner: User, name: str) -> Site:
+    site = Site(owner=owner, name=name, description="")
+    context.site_repo.add_site(site)
+    context.permission_repo.grant_permission(
+        Permission(user=owner, site=site, role=SiteRole.OWNER)
+    )
+    return site
+
+
+def add_media(
+    context: AppContext, uploader: User, site: Site, filename: str = "foto.jpg"
+) -> MediaFile:
+    media = MediaFile(
+        uploader=uploader,
+        filename=filename,
+        path=Path("static/images") / filename,
+        media_type=MediaType.IMAGE,
+        site=site,
+        width="800",
+        height="600",
+        duration=None,
+    )
+    context.media_repo.add_midia(media)
+    return media
+
+
+def add_post(
+    context: AppContext,
+    poster: User,
+    site: Site,
+    *body: ContentBlock,
+    title: str = "Título",
+) -> Post:
+    post = Post(poster=poster, site=site)
+    post.add_content(
+        PORTUGUESE.code, Content(title=title, body=list(body), language=PORTUGUESE)
+    )
+    context.post_repo.add_post(post)
+    return post
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def context() -> AppContext:
+    return AppContext()
+
+
+@pytest.fixture
+def user(context: AppContext) -> User:
+    return add_user(context, "ana")
+
+
+@pytest.fixture
+def site(context: AppContext, user: User) -> Site:
+    return add_site(context, user, "Blog")
+
+
+@pytest.fixture
+def post(context: AppContext, user: User, site: Site) -> Post:
+    post = Post(poster=user, site=site)
+    context.post_repo.add_post(post)
+    return post
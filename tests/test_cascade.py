@@ -0,0 +1,198 @@
+import pytest
+from conftest import add_media, add_post, add_site, add_user
+
+from cms import cascade
+from cms.models import (
+    Comment,
+    MediaBlock,
+    Permission,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    SiteRole,
+    TextBlock,
+    User,
+)
+from cms.views.menu import AppContext
+
+
+class World:
+    context: AppContext
+    ana: User
+    bia: User
+    blog: Site
+    other: Site
+
+    # Ana owns "Blog", where Bia is an editor; Bia owns "Outro". Both post,
+    # upload, comment and reply on each other's sites.
+    def __init__(self, context: AppContext):
+        self.context = context
+        self.ana = add_user(context, "ana")
+        self.bia = add_user(context, "bia")
+        self.blog = add_site(context, self.ana, "Blog")
+        self.other = add_site(context, self.bia, "Outro")
+        context.permission_repo.grant_permission(
+            Permission(user=self.bia, site=self.blog, role=SiteRole.EDITOR)
+        )
+
+        for owner, guest, site in [
+            (self.ana, self.bia, self.blog),
+            (self.bia, self.ana, self.other),
+        ]:
+            for author in (owner, guest):
+                media = add_media(context, author, site, f"{author.username}.jpg")
+                for i in range(3):
+                    post = add_post(
+                        context,
+                        author,
+                        site,
+                        TextBlock(order=1, text=str(i)),
+                        MediaBlock(order=2, media=media, alt=""),
+                    )
+                    self.__discuss(post, owner, guest)
+
+    def __discuss(self, post: Post, owner: User, guest: User):
+        comments = self.context.comment_repo
+        first = Comment(post=post, commenter=guest, body="oi")
+        comments.add_comment(first)
+        comments.add_comment(
+            Comment(post=post, commenter=owner, body="olá", parent=first)
+        )
+        comments.add_comment(Comment(post=post, commenter=owner, body="nota"))
+        for user in (owner, guest):
+            self.context.analytics_repo.log(
+                PostAnalyticsEntry(
+                    user=user, site=post.site, post=post, action=PostAction.VIEW
+                )
+            )
+            self.context.analytics_repo.log(
+                SiteAnalyticsEntry(user=user, site=post.site, action=SiteAction.ACCESS)
+            )
+
+    def site_names(self) -> list[str]:
+        return sorted(site.name for site in self.context.site_repo.get_sites())
+
+    def posters(self, site: Site) -> set[str]:
+        return {
+            post.poster.username
+            for post in self.context.post_repo.iter_site_posts(site, True)
+        }
+
+
+@pytest.fixture
+def world(context: AppContext) -> World:
+    return World(context)
+
+
+def assert_site_is_gone(context: AppContext, site: Site):
+    assert site.id not in {s.id for s in context.site_repo.get_sites()}
+    assert list(context.post_repo.iter_site_posts(site, include_scheduled=True)) == []
+    assert list(context.media_repo.iter_site_medias(site)) == []
+    assert list(context.analytics_repo.iter_site_entries(site)) == []
+    assert context.permission_repo.get_site_permissions(site) == []
+    assert all(c.post.site.id != site.id for c in context.comment_repo.iter_comments())
+
+
+def test_delete_site_removes_what_is_on_it(world: World):
+    context = world.context
+    medias_before = len(list(context.media_repo.iter_medias()))
+
+    job = cascade.delete_site(context, world.blog, batch_size=4)
+    deleted = job.run()
+
+    assert job.done and deleted == job.deleted > 0
+    assert_site_is_gone(context, world.blog)
+    assert world.site_names() == ["Outro"]
+    assert world.posters(world.other) == {"ana", "bia"}
+    assert len(list(context.media_repo.iter_medias())) == medias_before - 2
+    assert context.permission_repo.get_role(world.bia, world.other) == SiteRole.OWNER
+
+
+def test_job_runs_in_batches(world: World):
+    sizes: list[int] = []
+
+    job = cascade.delete_site(world.context, world.blog, batch_size=3)
+    job.run(lambda job: sizes.append(job.deleted))
+
+    assert len(sizes) > 5
+    assert sizes == sorted(sizes)
+    assert sizes[-1] == job.deleted
+
+
+def test_new_job_resumes_a_stopped_one(world: World, context: AppContext):
+    stopped = cascade.delete_site(context, world.blog, batch_size=3)
+    for _ in range(4):
+        stopped.run_batch()
+    assert not stopped.done
+
+    resumed = cascade.delete_site(context, world.blog, batch_size=3)
+    resumed.run()
+
+    assert resumed.done
+    assert_site_is_gone(context, world.blog)
+    assert world.site_names() == ["Outro"]
+
+
+def test_delete_user_removes_their_sites_and_content(world: World):
+    context = world.context
+    bia = world.bia
+
+    cascade.delete_user(context, bia, batch_size=5).run()
+
+    assert context.user_repo.get_user_by_username("bia") is None
+    assert_site_is_gone(context, world.other)
+    assert world.site_names() == ["Blog"]
+    assert world.posters(world.blog) == {"ana"}
+    assert list(context.media_repo.iter_user_medias(bia)) == []
+    assert list(context.analytics_repo.iter_user_entries(bia)) == []
+    assert list(context.permission_repo.iter_user_permissions(bia)) == []
+    # Ana's replies to Bia's comments went with them.
+    comments = list(context.comment_repo.iter_comments())
+    assert comments and all(c.commenter.id == world.ana.id for c in comments)
+    assert all(c.parent is None for c in comments)
+    for post in context.post_repo.iter_posts():
+        assert context.comment_repo.get_comment_count(post) == len(
+            context.comment_repo.get_post_comments(post)
+        )
+
+
+def test_delete_user_detaches_their_medias_from_other_posts(
+    context: AppContext, user: User, site: Site
+):
+    guest = add_user(context, "bia")
+    media = add_media(context, guest, site)
+    post = add_post(
+        context,
+        user,
+        site,
+        TextBlock(order=1, text="a"),
+        MediaBlock(order=2, media=media, alt=""),
+    )
+
+    cascade.delete_user(context, guest).run()
+
+    body = post.get_contents()["pt-br"].body
+    assert [type(block) for block in body] == [TextBlock]
+    assert context.media_usage.get_usage_count(media) == 0
+
+
+def test_anonymize_keeps_content_and_own_sites(world: World):
+    context = world.context
+    bia = world.bia
+    posts = len(list(context.post_repo.iter_user_posts(bia)))
+    comments = len(list(context.comment_repo.iter_user_comments(bia)))
+
+    cascade.anonymize_user(context, bia).run()
+
+    assert bia.username == f"anonimo-{bia.id}" and bia.email == ""
+    assert context.user_repo.get_user_by_username("bia") is None
+    with pytest.raises(ValueError):
+        context.user_repo.validate_user(bia.username, "Senha123")
+    assert len(list(context.post_repo.iter_user_posts(bia))) == posts
+    assert len(list(context.comment_repo.iter_user_comments(bia))) == comments
+    assert world.site_names() == ["Blog", "Outro"]
+    assert context.permission_repo.get_role(bia, world.blog) is None
+    assert context.permission_repo.get_role(bia, world.other) == SiteRole.OWNER
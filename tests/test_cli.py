@@ -0,0 +1,190 @@
+import io
+import json
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pytest
+from conftest import add_media, add_site, add_user
+
+from cms.cli import BatchRunner, CommandError, parse_datetime, read_post_file
+from cms.models import Site, User
+from cms.views.menu import AppContext
+
+
+@pytest.fixture
+def runner(context: AppContext, user: User) -> BatchRunner:
+    return BatchRunner(context, user)
+
+
+def run_lines(runner: BatchRunner, *operations) -> tuple[list[dict], int]:
+    out = io.StringIO()
+    lines = [op if isinstance(op, str) else json.dumps(op) for op in operations]
+
+    errors = runner.run_stream(lines, out)
+
+    return [json.loads(line) for line in out.getvalue().splitlines()], errors
+
+
+def post_op(site: Site, title: str = "Olá", **fields) -> dict:
+    return {
+        "op": "create-post",
+        "site_id": site.id,
+        "title": title,
+        "blocks": [{"type": "text", "text": "texto"}],
+        **fields,
+    }
+
+
+def test_posts_are_stored_before_a_report(runner: BatchRunner, site: Site):
+    results, errors = run_lines(
+        runner, post_op(site), post_op(site), {"op": "report", "site_id": site.id}
+    )
+
+    assert errors == 0
+    assert [r["op"] for r in results] == [
+        "create-post",
+        "create-post",
+        "report",
+        "report",
+        "report",
+    ]
+    created = [r["id"] for r in results if r["op"] == "create-post"]
+    reported = [r["post_id"] for r in results if r["op"] == "report"]
+    assert reported == [None, *created]
+
+
+def test_delete_site_takes_pending_posts_along(
+    runner: BatchRunner, context: AppContext, site: Site
+):
+    results, errors = run_lines(
+        runner, post_op(site), {"op": "delete-site", "site_id": site.id}
+    )
+
+    assert errors == 0
+    assert [r["op"] for r in results] == ["create-post", "delete-site"]
+    assert list(context.post_repo.iter_posts()) == []
+    assert context.site_repo.get_sites() == []
+
+
+def test_delete_user_takes_pending_posts_along(
+    context: AppContext, user: User, site: Site
+):
+    guest = add_user(context, "bia")
+    guest_site = add_site(context, guest, "Outro")
+
+    results, errors = run_lines(
+        BatchRunner(context, guest),
+        post_op(guest_site),
+        {"op": "delete-user", "username": "bia"},
+    )
+
+    assert errors == 0
+    assert [r["op"] for r in results] == ["create-post", "delete-user"]
+    assert list(context.post_repo.iter_posts()) == []
+    assert context.site_repo.get_sites() == [site]
+
+
+def test_pending_posts_are_reported_before_a_failing_line(
+    runner: BatchRunner, context: AppContext, site: Site
+):
+    results, errors = run_lines(
+        runner, post_op(site), {"op": "delete-site", "site_id": 999}
+    )
+
+    assert errors == 1
+    assert [r["op"] for r in results] == ["create-post"]
+    assert len(list(context.post_repo.iter_posts())) == 1
+
+
+def test_run_stores_pending_posts_first(runner: BatchRunner, site: Site):
+    assert runner.run(post_op(site)) == []
+
+    results = runner.run({"op": "report", "site_id": site.id})
+
+    assert [r["op"] for r in results] == ["create-post", "report", "report"]
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "não é json",
+        "[1, 2]",
+        '{"op": "desconhecida"}',
+        '{"op": "create-site"}',
+        '{"op": "create-site", "name": true}',
+        '{"op": "report", "site_id": 999}',
+        '{"op": "log-view", "post_id": 1, "platform": "orkut"}',
+    ],
+)
+def test_bad_line_is_skipped(runner: BatchRunner, line: str):
+    results, errors = run_lines(runner, line, {"op": "create-site", "name": "Novo"})
+
+    assert errors == 1
+    assert [r["op"] for r in results] == ["create-site"]
+
+
+def test_media_must_belong_to_the_site(
+    runner: BatchRunner, context: AppContext, user: User, site: Site
+):
+    other = add_site(context, user, "Outro")
+    media = add_media(context, user, other)
+
+    with pytest.raises(CommandError, match="não pertence"):
+        runner.run(
+            {
+                "op": "create-post",
+                "site_id": site.id,
+                "title": "Olá",
+                "blocks": [{"type": "media", "media_id": media.id}],
+            }
+        )
+
+
+def test_user_without_role_cannot_post(context: AppContext, site: Site):
+    guest = add_user(context, "bia")
+
+    with pytest.raises(CommandError, match="Sem permissão"):
+        BatchRunner(context, guest).run(post_op(site))
+
+
+def test_scheduled_post_waits_for_its_time(
+    runner: BatchRunner, context: AppContext, site: Site
+):
+    run_lines(runner, post_op(site, scheduled_to="2999-01-01T00:00:00"))
+
+    assert context.post_repo.get_site_posts(site) == []
+    [post] = context.post_repo.iter_site_posts(site, include_scheduled=True)
+    assert post.scheduled_to == datetime(2999, 1, 1)
+
+
+def test_parse_datetime_converts_offsets_to_local_time():
+    moment = parse_datetime("2024-05-01T12:00:00-03:00")
+
+    utc = datetime(2024, 5, 1, 15, 0, tzinfo=UTC)
+    assert moment == utc.astimezone().replace(tzinfo=None)
+    assert parse_datetime("2024-05-01T12:00") == datetime(2024, 5, 1, 12, 0)
+
+
+def test_read_markdown_post(tmp_path: Path):
+    path = tmp_path / "post.md"
+    path.write_text(
+        "# Título\n\nPrimeiro parágrafo.\n\n![uma foto](media:3)\n\nFim.\n",
+        encoding="utf-8",
+    )
+
+    assert read_post_file(path) == {
+        "title": "Título",
+        "blocks": [
+            {"type": "text", "text": "Primeiro parágrafo."},
+            {"type": "media", "media_id": "3", "alt": "uma foto"},
+            {"type": "text", "text": "Fim."},
+        ],
+    }
+
+
+def test_read_json_post_must_be_an_object(tmp_path: Path):
+    path = tmp_path / "post.json"
+    path.write_text("[]", encoding="utf-8")
+
+    with pytest.raises(CommandError):
+        read_post_file(path)
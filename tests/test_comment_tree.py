@@ -0,0 +1,184 @@
+import random
+
+import pytest
+
+from cms.models import Comment, CommentSort, ModerationStatus, Post, User
+from cms.repository import CommentRepository
+from cms.views.menu import AppContext
+
+
+@pytest.fixture
+def repo(context: AppContext) -> CommentRepository:
+    return context.comment_repo
+
+
+def comment(
+    repo: CommentRepository,
+    post: Post,
+    user: User,
+    parent: Comment | None = None,
+    status: ModerationStatus = ModerationStatus.APPROVED,
+) -> Comment:
+    new = Comment(post=post, commenter=user, body="...", parent=parent, status=status)
+    repo.add_comment(new)
+    return new
+
+
+def ids(comments: list[Comment]) -> list[int]:
+    return [c.id for c in comments]
+
+
+def replies_below(comments: list[Comment], root: Comment) -> int:
+    return sum(1 for c in comments if root.id in c.path[:-1])
+
+
+# Checks the counters and orders of the tree against a count from scratch.
+def assert_consistent(repo: CommentRepository, post: Post):
+    comments = repo.get_post_comments(post)
+    threads = [c for c in comments if len(c.path) == 1]
+
+    assert repo.get_comment_count(post) == len(comments)
+    assert repo.get_thread_count(post) == len(threads)
+    for c in comments:
+        assert repo.get_reply_count(c) == replies_below(comments, c)
+        assert ids(repo.get_replies(c, limit=len(comments))) == sorted(
+            r.id for r in comments if r.parent and r.parent.id == c.id
+        )
+
+    newest = sorted(threads, key=lambda c: -c.id)
+    most_replied = sorted(threads, key=lambda c: (-replies_below(comments, c), -c.id))
+    limit = len(threads) + 1
+    assert ids(repo.get_threads(post, CommentSort.NEWEST, 0, limit)) == ids(newest)
+    assert ids(repo.get_threads(post, CommentSort.MOST_REPLIED, 0, limit)) == ids(
+        most_replied
+    )
+
+
+def test_paths_and_counts(repo: CommentRepository, post: Post, user: User):
+    root = comment(repo, post, user)
+    reply = comment(repo, post, user, root)
+    nested = comment(repo, post, user, reply)
+
+    assert nested.path == (root.id, reply.id, nested.id)
+    assert nested.depth == 2 and nested.thread_id == root.id
+    assert repo.get_reply_count(root) == 2
+    assert repo.get_direct_reply_count(root) == 1
+    assert_consistent(repo, post)
+
+
+def test_most_replied_ranking_breaks_ties_by_newest(
+    repo: CommentRepository, post: Post, user: User
+):
+    first, second, third = (comment(repo, post, user) for _ in range(3))
+    comment(repo, post, user, first)
+    comment(repo, post, user, comment(repo, post, user, third))
+
+    ranking = repo.get_threads(post, CommentSort.MOST_REPLIED)
+
+    assert ids(ranking) == [third.id, first.id, second.id]
+    assert ids(repo.get_threads(post, CommentSort.MOST_REPLIED, 1, 1)) == [first.id]
+    assert_consistent(repo, post)
+
+
+def test_newest_pages(repo: CommentRepository, post: Post, user: User):
+    threads = [comment(repo, post, user) for _ in range(5)]
+
+    pages = [
+        repo.get_threads(post, CommentSort.NEWEST, offset, 2) for offset in (0, 2, 4, 6)
+    ]
+
+    assert [ids(page) for page in pages] == [
+        [threads[4].id, threads[3].id],
+        [threads[2].id, threads[1].id],
+        [threads[0].id],
+        [],
+    ]
+
+
+def test_held_comments_stay_out_until_approved(
+    repo: CommentRepository, post: Post, user: User
+):
+    root = comment(repo, post, user)
+    held = comment(repo, post, user, root, ModerationStatus.HELD)
+    later = comment(repo, post, user, root)
+
+    assert repo.get_reply_count(root) == 1
+    assert not held.path
+
+    repo.set_comment_status(held, ModerationStatus.APPROVED)
+
+    assert held.path == (root.id, held.id)
+    assert ids(repo.get_replies(root)) == [held.id, later.id]
+    assert_consistent(repo, post)
+
+
+def test_rejected_after_approval_keeps_its_place(
+    repo: CommentRepository, post: Post, user: User
+):
+    root = comment(repo, post, user)
+    reply = comment(repo, post, user, root)
+    comment(repo, post, user, reply)
+
+    repo.set_comment_status(reply, ModerationStatus.REJECTED)
+
+    assert reply.path
+    assert repo.get_reply_count(root) == 2
+    assert_consistent(repo, post)
+
+
+def test_delete_removes_replies_below(repo: CommentRepository, post: Post, user: User):
+    root = comment(repo, post, user)
+    other = comment(repo, post, user)
+    reply = comment(repo, post, user, root)
+    nested = comment(repo, post, user, reply)
+    sibling = comment(repo, post, user, root)
+
+    deleted = repo.delete_comments([reply])
+
+    assert sorted(ids(deleted)) == sorted([reply.id, nested.id])
+    assert not reply.path and not nested.path
+    assert repo.get_reply_count(root) == 1
+    assert ids(repo.get_replies(root)) == [sibling.id]
+    assert_consistent(repo, post)
+
+    repo.delete_comments([root])
+
+    assert ids(repo.get_threads(post)) == [other.id]
+    assert_consistent(repo, post)
+
+
+def test_reply_must_belong_to_the_same_post(
+    context: AppContext, repo: CommentRepository, post: Post, user: User
+):
+    other_post = Post(poster=user, site=post.site)
+    context.post_repo.add_post(other_post)
+    root = comment(repo, post, user)
+
+    with pytest.raises(ValueError):
+        comment(repo, other_post, user, root)
+
+
+def test_random_operations_keep_counts(repo: CommentRepository, post: Post, user: User):
+    rng = random.Random(7)
+    alive: list[Comment] = []
+    held: list[Comment] = []
+
+    for _ in range(400):
+        roll = rng.random()
+        if roll < 0.15 and alive:
+            repo.delete_comments([rng.choice(alive)])
+            alive = repo.get_post_comments(post)
+            held = [c for c in repo.iter_post_comments(post) if not c.path]
+        elif roll < 0.25 and held:
+            # Approved late, so its id lands before the newer siblings.
+            approved = held.pop(rng.randrange(len(held)))
+            repo.set_comment_status(approved, ModerationStatus.APPROVED)
+            alive.append(approved)
+        else:
+            parent = rng.choice(alive) if alive and roll < 0.8 else None
+            status = ModerationStatus.HELD if roll > 0.9 else ModerationStatus.APPROVED
+            new = comment(repo, post, user, parent, status)
+            (held if new.status == ModerationStatus.HELD else alive).append(new)
+
+    assert held and alive
+    assert_consistent(repo, post)
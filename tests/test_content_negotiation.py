@@ -0,0 +1,108 @@
+import pytest
+
+from cms.models import Content, Post
+from cms.services.content_negotiation import ContentNegotiator, parse_accept_language
+from cms.services.languages import LanguageService
+from cms.views.menu import AppContext
+
+LANGUAGES = LanguageService()
+
+
+@pytest.fixture
+def negotiator() -> ContentNegotiator:
+    return ContentNegotiator(LANGUAGES)
+
+
+def translate(post: Post, *codes: str):
+    for code in codes:
+        language = LANGUAGES.get_language_by_code(code)
+        post.add_content(
+            code, Content(title=f"Título {code}", body=[], language=language)
+        )
+
+
+def resolved(content: Content) -> str:
+    return content.language.code
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("pt-BR,pt;q=0.9,en;q=0.8", ["pt-BR", "pt", "en"]),
+        ("en;q=0.5, ja", ["ja", "en"]),
+        ("es;q=0, zh", ["zh"]),
+        ("*, fr;q=0.7, de;q=x", ["fr"]),
+        ("a;q=0.5, b;q=0.5, c", ["c", "a", "b"]),
+        ("", []),
+    ],
+)
+def test_parse_accept_language(header: str, expected: list[str]):
+    assert parse_accept_language(header) == expected
+
+
+def test_pt_br_falls_back_to_pt_then_en_us(negotiator: ContentNegotiator, post: Post):
+    translate(post, "ja", "en-us", "pt")
+    assert resolved(negotiator.resolve(post, ["pt-br"])) == "pt"
+
+    translate(post, "es")
+    assert resolved(negotiator.resolve(post, ["pt-br"])) == "pt"
+
+
+def test_chain_ends_in_en_us(negotiator: ContentNegotiator, post: Post):
+    translate(post, "ja", "en-us", "es")
+
+    assert resolved(negotiator.resolve(post, ["pt-br"])) == "en-us"
+
+
+def test_a_direct_match_beats_an_earlier_fallback(
+    negotiator: ContentNegotiator, post: Post
+):
+    translate(post, "zh", "en-us", "ja")
+
+    assert resolved(negotiator.resolve(post, ["pt-br", "ja"])) == "ja"
+
+
+def test_unknown_and_regional_tags(negotiator: ContentNegotiator, post: Post):
+    translate(post, "pt-br", "en-us")
+
+    assert resolved(negotiator.resolve_header(post, "en-GB, pt;q=0.5")) == "en-us"
+    assert resolved(negotiator.resolve_header(post, "fr, pt-PT")) == "pt-br"
+
+
+def test_no_match_gives_the_default_content(negotiator: ContentNegotiator, post: Post):
+    translate(post, "zh")
+
+    assert resolved(negotiator.resolve_header(post, "es, fr")) == "zh"
+
+
+def test_table_is_rebuilt_after_new_content(negotiator: ContentNegotiator, post: Post):
+    translate(post, "en-us")
+    table = negotiator.get_resolution_table(post)
+    assert negotiator.get_resolution_table(post) is table
+    assert resolved(table["pt-br"]) == "en-us"
+
+    translate(post, "pt")
+
+    assert resolved(negotiator.get_resolution_table(post)["pt-br"]) == "pt"
+
+
+def test_table_only_lists_reachable_languages(
+    negotiator: ContentNegotiator, post: Post
+):
+    translate(post, "ja")
+
+    assert sorted(negotiator.get_resolution_table(post)) == ["ja", "zh"]
+
+
+def test_custom_chains(post: Post):
+    negotiator = ContentNegotiator(LANGUAGES, {"pt-br": ["es"]})
+    translate(post, "en-us", "es")
+
+    assert resolved(negotiator.resolve(post, ["pt-br"])) == "es"
+    assert resolved(negotiator.resolve(post, ["ja"])) == "en-us"
+
+
+def test_context_negotiator_serves_posts(context: AppContext, post: Post):
+    translate(post, "pt")
+
+    assert resolved(context.content_negotiator.resolve(post, ["pt-br"])) == "pt"
@@ -0,0 +1,93 @@
+import json
+from pathlib import Path
+
+import pytest
+from conftest import PORTUGUESE
+
+from cms.models import Content, Language, Post
+from cms.services.languages import (
+    LanguageRegistry,
+    LanguageService,
+    get_language_registry,
+)
+
+
+@pytest.fixture
+def registry() -> LanguageRegistry:
+    return LanguageRegistry(
+        [
+            Language("Português Brasileiro", "pt-br", ["ptbr", "BR "]),
+            Language("Inglês", "en-us", ["en"]),
+        ]
+    )
+
+
+@pytest.mark.parametrize("code", ["pt-br", "PT-BR", " pt-br ", "ptbr", "br"])
+def test_codes_and_aliases_are_normalized(registry: LanguageRegistry, code: str):
+    language = registry.get(code)
+
+    assert language and language.code == "pt-br"
+
+
+def test_unknown_code(registry: LanguageRegistry):
+    assert registry.get("fr") is None
+
+    with pytest.raises(ValueError):
+        LanguageService(registry).get_language_by_code("fr")
+
+
+def test_duplicated_code_is_rejected():
+    with pytest.raises(ValueError, match="PT"):
+        LanguageRegistry(
+            [
+                Language("Português", "pt"),
+                Language("Português Brasileiro", "pt-br", ["PT"]),
+            ]
+        )
+
+
+def test_same_alias_twice_in_one_language_is_fine():
+    registry = LanguageRegistry([Language("Inglês", "en-us", ["en-us", "en"])])
+
+    assert registry.languages == (Language("Inglês", "en-us"),)
+
+
+def test_registry_is_read_only(registry: LanguageRegistry):
+    with pytest.raises(AttributeError):
+        registry.languages.append(Language("Espanhol", "es"))  # type: ignore[attr-defined]
+
+
+def test_load_from_file(tmp_path: Path):
+    path = tmp_path / "languages.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"name": "Espanhol", "code": "es"},
+                {"name": "Japonês", "code": "ja", "aliases": ["jp"]},
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+    registry = LanguageRegistry.load(path)
+
+    assert [lang.code for lang in registry.languages] == ["es", "ja"]
+    assert registry.get("JP") == Language("Japonês", "ja")
+
+
+def test_shipped_registry_is_shared():
+    assert get_language_registry() is get_language_registry()
+    assert LanguageService().supported_languages == list(
+        get_language_registry().languages
+    )
+
+
+def test_missing_languages(registry: LanguageRegistry, post: Post):
+    service = LanguageService(registry)
+    assert service.get_missing_languages(post) == list(registry.languages)
+
+    post.add_content(
+        PORTUGUESE.code, Content(title="Olá", body=[], language=PORTUGUESE)
+    )
+
+    assert service.get_missing_languages(post) == [Language("Inglês", "en-us")]
@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+from conftest import PORTUGUESE, add_media
+
+from cms.models import (
+    CaroulselBlock,
+    Content,
+    Language,
+    MediaBlock,
+    MediaFile,
+    Post,
+    Site,
+    TextBlock,
+    User,
+)
+from cms.services.machine_translation import (
+    LocalTranslationEngine,
+    MachineTranslator,
+    TranslationEngine,
+    TranslationMemory,
+)
+from cms.views.menu import AppContext
+
+ENGLISH = Language("Inglês", "en-us")
+SPANISH = Language("Espanhol", "es")
+
+
+class CountingEngine(TranslationEngine):
+    batches: list[tuple[str, list[str]]]
+    lock: threading.Lock
+    local: LocalTranslationEngine
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+        self.local = LocalTranslationEngine()
+
+    def translate_batch(
+        self, texts: list[str], source: Language, target: Language
+    ) -> list[str]:
+        with self.lock:
+            self.batches.append((target.code, list(texts)))
+        return self.local.translate_batch(texts, source, target)
+
+    def texts(self) -> list[str]:
+        return [text for _, batch in self.batches for text in batch]
+
+
+@pytest.fixture
+def engine() -> CountingEngine:
+    return CountingEngine()
+
+
+@pytest.fixture
+def media(context: AppContext, user: User, site: Site) -> MediaFile:
+    return add_media(context, user, site)
+
+
+@pytest.fixture
+def post(context: AppContext, user: User, site: Site, media: MediaFile) -> Post:
+    post = Post(poster=user, site=site)
+    post.add_content(
+        PORTUGUESE.code,
+        Content(
+            title="Olá",
+            body=[
+                TextBlock(order=1, text="bom dia"),
+                MediaBlock(order=2, media=media, alt="foto"),
+                TextBlock(order=3, text="bom dia"),
+                CaroulselBlock(order=4, medias=[media], alt="galeria"),
+            ],
+            language=PORTUGUESE,
+        ),
+    )
+    context.post_repo.add_post(post)
+    return post
+
+
+def test_post_is_translated_block_by_block(
+    engine: CountingEngine, post: Post, media: MediaFile
+):
+    [english] = MachineTranslator(engine).translate_post(post, [ENGLISH])
+
+    assert english == Content(
+        title="[en-us] Olá",
+        body=[
+            TextBlock(order=1, text="[en-us] bom dia"),
+            MediaBlock(order=2, media=media, alt="[en-us] foto"),
+            TextBlock(order=3, text="[en-us] bom dia"),
+            CaroulselBlock(order=4, medias=[media], alt="[en-us] galeria"),
+        ],
+        language=ENGLISH,
+    )
+
+
+def test_repeated_texts_are_sent_once(engine: CountingEngine, post: Post):
+    MachineTranslator(engine).translate_post(post, [ENGLISH, SPANISH])
+
+    assert sorted(engine.texts()) == sorted(["Olá", "bom dia", "foto", "galeria"] * 2)
+
+
+def test_memory_skips_known_texts(engine: CountingEngine, post: Post):
+    translator = MachineTranslator(engine)
+    translator.translate_post(post, [ENGLISH])
+    engine.batches.clear()
+
+    [spanish, english] = translator.translate_post(post, [SPANISH, ENGLISH])
+
+    assert {code for code, _ in engine.batches} == {"es"}
+    assert english.title == "[en-us] Olá" and spanish.title == "[es] Olá"
+    assert len(translator.memory) == 8
+
+
+def test_shared_memory_is_used_by_another_translator(
+    engine: CountingEngine, post: Post
+):
+    memory = TranslationMemory()
+    memory.put("Olá", ENGLISH, "Hello")
+
+    [english] = MachineTranslator(engine, memory).translate_post(post, [ENGLISH])
+
+    assert english.title == "Hello"
+    assert "Olá" not in engine.texts()
+
+
+def test_texts_are_split_in_batches(engine: CountingEngine):
+    texts = [f"texto {i}" for i in range(10)]
+
+    translations = MachineTranslator(engine, batch_size=4).translate_texts(
+        texts, PORTUGUESE, [ENGLISH, SPANISH]
+    )
+
+    assert sorted(len(batch) for _, batch in engine.batches) == [2, 2, 4, 4, 4, 4]
+    assert translations["es"]["texto 7"] == "[es] texto 7"
+    assert list(translations["en-us"]) == texts
+
+
+def test_nothing_to_translate_makes_no_calls(engine: CountingEngine):
+    assert MachineTranslator(engine).translate_texts([], PORTUGUESE, [ENGLISH]) == {
+        "en-us": {}
+    }
+    assert engine.batches == []
+
+
+def test_empty_texts_stay_empty():
+    assert LocalTranslationEngine().translate_batch(["", "a"], PORTUGUESE, ENGLISH) == [
+        "",
+        "[en-us] a",
+    ]
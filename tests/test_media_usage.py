@@ -0,0 +1,181 @@
+import pytest
+from conftest import PORTUGUESE, add_media, add_post, add_site
+
+from cms.models import (
+    CaroulselBlock,
+    Content,
+    Language,
+    MediaBlock,
+    MediaFile,
+    Post,
+    Site,
+    TextBlock,
+    User,
+)
+from cms.repository import VersionConflictError
+from cms.services.media_usage import (
+    MediaDeletePolicy,
+    MediaInUseError,
+    swap_media,
+)
+from cms.services.revisions import PostEditor
+from cms.views.menu import AppContext
+
+ENGLISH = Language("English", "en-us")
+
+
+@pytest.fixture
+def media(context: AppContext, user: User, site: Site) -> MediaFile:
+    return add_media(context, user, site)
+
+
+@pytest.fixture
+def other(context: AppContext, user: User, site: Site) -> MediaFile:
+    return add_media(context, user, site, "outra.jpg")
+
+
+@pytest.fixture
+def used(context: AppContext, user: User, site: Site, media: MediaFile) -> Post:
+    return add_post(
+        context,
+        user,
+        site,
+        TextBlock(order=1, text="a"),
+        MediaBlock(order=2, media=media, alt=""),
+        TextBlock(order=3, text="b"),
+        MediaBlock(order=4, media=media, alt=""),
+    )
+
+
+def body(post: Post, lang: str = PORTUGUESE.code) -> list:
+    return post.get_contents()[lang].body
+
+
+def test_usages_follow_the_contents(
+    context: AppContext, user: User, media: MediaFile, used: Post
+):
+    usage = context.media_usage
+    assert usage.get_usage_count(media) == 2
+    assert {u.post.id for u in usage.get_usages(media)} == {used.id}
+
+    editor = PostEditor(used, PORTUGUESE.code, context.post_repo, context.revisions)
+    editor.delete_block(1)
+    editor.save(user)
+    assert usage.get_usage_count(media) == 1
+
+    context.post_repo.delete_post(used)
+    assert usage.get_usage_count(media) == 0
+
+
+def test_usages_count_every_language(context: AppContext, media: MediaFile, used: Post):
+    context.post_repo.add_content(
+        used,
+        ENGLISH.code,
+        Content(
+            title="Title",
+            body=[MediaBlock(order=1, media=media, alt="")],
+            language=ENGLISH,
+        ),
+    )
+
+    assert context.media_usage.get_usage_count(media) == 3
+    assert {u.language for u in context.media_usage.get_usages(media)} == {
+        PORTUGUESE.code,
+        ENGLISH.code,
+    }
+
+
+def test_restrict_keeps_a_media_in_use(
+    context: AppContext, media: MediaFile, used: Post
+):
+    with pytest.raises(MediaInUseError) as error:
+        context.media_usage.delete_media(media)
+
+    assert len(error.value.usages) == 2
+    assert context.media_repo.get_media_by_id(media.id) is media
+    assert len(body(used)) == 4
+
+
+def test_unused_media_is_deleted(context: AppContext, media: MediaFile):
+    assert context.media_usage.delete_media(media) == 0
+
+    with pytest.raises(KeyError):
+        context.media_repo.get_media_by_id(media.id)
+
+
+def test_detach_rewrites_the_posts_as_revisions(
+    context: AppContext, user: User, media: MediaFile, used: Post
+):
+    assert context.media_usage.delete_media(
+        media, MediaDeletePolicy.DETACH, author=user
+    )
+
+    assert [block.text for block in body(used)] == ["a", "b"]
+    assert [block.order for block in body(used)] == [1, 2]
+    assert context.media_usage.get_usage_count(media) == 0
+    revisions = context.revisions.get_history(used, PORTUGUESE.code).revisions
+    assert [r.author for r in revisions] == [user, user]
+
+
+def test_system_job_detaches_without_author(
+    context: AppContext, media: MediaFile, used: Post
+):
+    context.media_usage.delete_media(media, MediaDeletePolicy.DETACH)
+
+    history = context.revisions.get_history(used, PORTUGUESE.code)
+    assert history.revisions[-1].author is None
+    assert len(history.get_revision(0).body) == 4
+
+
+def test_replace_swaps_the_blocks(
+    context: AppContext, media: MediaFile, other: MediaFile, used: Post
+):
+    context.media_usage.delete_media(media, MediaDeletePolicy.REPLACE, other)
+
+    medias = [block.media for block in body(used) if isinstance(block, MediaBlock)]
+    assert medias == [other, other]
+    assert context.media_usage.get_usage_count(other) == 2
+
+
+@pytest.mark.parametrize("replacement", [None, "same", "other-site"])
+def test_replacement_must_be_another_media_of_the_site(
+    context: AppContext, user: User, media: MediaFile, used: Post, replacement
+):
+    if replacement == "same":
+        replacement = media
+    elif replacement == "other-site":
+        replacement = add_media(context, user, add_site(context, user, "Outro"))
+
+    with pytest.raises(ValueError):
+        context.media_usage.delete_media(media, MediaDeletePolicy.REPLACE, replacement)
+    assert len(body(used)) == 4
+
+
+def test_stale_media_version_changes_nothing(
+    context: AppContext, media: MediaFile, used: Post
+):
+    with pytest.raises(VersionConflictError):
+        context.media_usage.delete_media(
+            media, MediaDeletePolicy.DETACH, expected_version=media.version - 1
+        )
+
+    assert len(body(used)) == 4
+    assert context.media_repo.get_media_by_id(media.id) is media
+
+
+def test_carousel_keeps_one_copy_of_the_replacement(media: MediaFile, other: MediaFile):
+    block = CaroulselBlock(order=1, medias=[media, other, media], alt="")
+
+    assert swap_media(block, media, other) == CaroulselBlock(
+        order=1, medias=[other], alt=""
+    )
+    assert swap_media(block, media, None) == CaroulselBlock(
+        order=1, medias=[other], alt=""
+    )
+    assert block.medias == [media, other, media]
+
+
+def test_carousel_with_only_the_media_is_dropped(media: MediaFile):
+    block = CaroulselBlock(order=1, medias=[media], alt="")
+
+    assert swap_media(block, media, None) is None
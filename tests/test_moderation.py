@@ -0,0 +1,145 @@
+import pytest
+
+from cms.models import ModerationStatus
+from cms.services.moderation import (
+    CommentModerator,
+    TermDictionary,
+    TermMatcher,
+    moderate_rows,
+    normalize_cjk,
+    normalize_latin,
+)
+
+HELD = ModerationStatus.HELD
+REJECTED = ModerationStatus.REJECTED
+
+TERMS: TermDictionary = {
+    "*": {"hold": ["compre agora"]},
+    "pt-br": {"reject": ["idiota", "seu idiota"], "hold": ["burro"]},
+    "ja": {"reject": ["バカ"], "hold": ["ここをクリック"]},
+    "zh": {"reject": ["笨蛋"]},
+}
+
+
+def matcher(*terms: str) -> TermMatcher:
+    return TermMatcher((normalize_latin(term), (term, REJECTED)) for term in terms)
+
+
+def found_terms(terms: TermMatcher, text: str) -> list[str]:
+    return sorted(term for term, _ in terms.find(normalize_latin(text)))
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("", []),
+        ("nada aqui", []),
+        ("ele disse he", ["he"]),
+        ("ushers", ["he", "hers", "she", "ushers"]),
+        ("she hers", ["he", "he", "hers", "she"]),
+    ],
+)
+def test_finds_overlapping_and_nested_terms(text: str, expected: list[str]):
+    # The textbook example, with letters as tokens and a space between words.
+    terms = TermMatcher(
+        (list(term), (term, REJECTED))
+        for term in ["he", "she", "his", "hers", "ushers"]
+    )
+    tokens = [char for word in text.split() for char in (*word, " ")]
+
+    assert sorted(term for term, _ in terms.find(tokens)) == expected
+
+
+def test_matches_whole_words_only():
+    terms = matcher("idiota", "seu idiota")
+
+    assert found_terms(terms, "idiotas") == []
+    assert found_terms(terms, "que idiota") == ["idiota"]
+    assert found_terms(terms, "seu idiota!") == ["idiota", "seu idiota"]
+
+
+def test_spans_point_at_the_tokens():
+    terms = matcher("seu idiota")
+    tokens = normalize_latin("olha, seu idiota")
+
+    assert terms.find_spans(tokens) == [(("seu idiota", REJECTED), 1, 3)]
+
+
+def test_failure_links_restart_inside_a_partial_match():
+    terms = matcher("bom bom dia")
+
+    assert found_terms(terms, "bom bom bom dia") == ["bom bom dia"]
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["IDIOTA", "Idiiiiota", "1d10ta", "i.d.i.o.t.a", "I D I O T A", "ídíóta"],
+)
+def test_latin_folding(text: str):
+    assert normalize_latin(text) == ["idiota"]
+
+
+def test_cjk_folds_width_and_punctuation():
+    assert normalize_cjk("ﾊﾞｶ!") == normalize_cjk("バカ") == "バカ"
+
+
+@pytest.fixture
+def moderator() -> CommentModerator:
+    return CommentModerator(TERMS)
+
+
+@pytest.mark.parametrize(
+    ("body", "lang", "status"),
+    [
+        ("Ótimo post!", "pt-br", ModerationStatus.APPROVED),
+        ("Que 1d10ta", "pt-br", REJECTED),
+        ("Não seja burro", "pt-br", HELD),
+        ("Compre agora", "pt-br", HELD),
+        ("Compre agora", "ja", HELD),
+        ("お前はバカだ", "ja", REJECTED),
+        ("夏のバカンスは最高でした", "ja", HELD),
+        ("ここをクリック", "ja", HELD),
+        ("笨蛋", "zh", REJECTED),
+        ("你是笨蛋", "zh", HELD),
+        ("   ", "pt-br", REJECTED),
+    ],
+)
+def test_moderate(moderator: CommentModerator, body: str, lang: str, status):
+    assert moderator.moderate(body, lang).status == status
+
+
+def test_cjk_substring_match_is_explained(moderator: CommentModerator):
+    result = moderator.moderate("夏のバカンス", "ja")
+
+    assert result.reasons == ["Termo proibido dentro de palavra: 'バカ'"]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        "veja http://a.com http://b.com http://c.com",
+        "ESTE POST É MUITO RUIM MESMO",
+        "legaaaaaaaaal",
+    ],
+)
+def test_heuristics_hold(moderator: CommentModerator, body: str):
+    assert moderator.moderate(body, "pt-br").status == HELD
+
+
+def test_most_severe_outcome_wins(moderator: CommentModerator):
+    result = moderator.moderate("burro e idiota", "pt-br")
+
+    assert result.status == REJECTED
+    assert len(result.reasons) == 2
+
+
+def test_moderate_rows_returns_only_changes(moderator: CommentModerator):
+    rows = [
+        (1, "Ótimo post!", "pt-br", ModerationStatus.APPROVED),
+        (2, "Que idiota", "pt-br", ModerationStatus.APPROVED),
+        (3, "burro", "pt-br", HELD),
+    ]
+
+    changes = moderate_rows(rows, moderator)
+
+    assert [(comment_id, r.status) for comment_id, r in changes] == [(2, REJECTED)]
@@ -0,0 +1,164 @@
+import pytest
+from conftest import add_post, add_site, add_user
+
+from cms.models import (
+    ROLE_CAPABILITIES,
+    Capability,
+    Permission,
+    Post,
+    Site,
+    SiteRole,
+    User,
+    UserRole,
+)
+from cms.views.menu import AppContext
+
+
+@pytest.fixture
+def guest(context: AppContext) -> User:
+    return add_user(context, "bia")
+
+
+def grant(
+    context: AppContext,
+    user: User,
+    site: Site,
+    role: SiteRole,
+    post: Post | None = None,
+):
+    context.permission_repo.grant_permission(
+        Permission(user=user, site=site, role=role, post=post)
+    )
+
+
+@pytest.mark.parametrize("role", list(SiteRole))
+def test_role_capabilities(
+    context: AppContext, user: User, guest: User, site: Site, role: SiteRole
+):
+    if role == SiteRole.OWNER:
+        checked = user
+    else:
+        checked = guest
+        grant(context, guest, site, role)
+
+    repo = context.permission_repo
+    assert repo.get_capabilities(checked, site) == ROLE_CAPABILITIES[role]
+    for capability in Capability:
+        assert repo.has_permission(checked, site, capability) == (
+            capability in ROLE_CAPABILITIES[role]
+        )
+
+
+def test_combined_capabilities_need_every_bit(
+    context: AppContext, guest: User, site: Site
+):
+    grant(context, guest, site, SiteRole.MODERATOR)
+    repo = context.permission_repo
+
+    assert repo.has_permission(
+        guest, site, Capability.MODERATE_COMMENTS | Capability.VIEW_ANALYTICS
+    )
+    assert not repo.has_permission(
+        guest, site, Capability.MODERATE_COMMENTS | Capability.EDIT_POST
+    )
+
+
+def test_no_grant_means_no_capability(context: AppContext, guest: User, site: Site):
+    assert context.permission_repo.get_capabilities(guest, site) == Capability(0)
+    assert not context.permission_repo.has_permission(
+        guest, site, Capability.VIEW_ANALYTICS
+    )
+
+
+def test_admin_can_do_everything(context: AppContext, site: Site):
+    admin = add_user(context, "root")
+    admin.role = UserRole.ADMIN
+
+    everything = ROLE_CAPABILITIES[SiteRole.OWNER]
+    assert context.permission_repo.get_capabilities(admin, site) == everything
+
+
+def test_post_override_replaces_the_site_role(
+    context: AppContext, user: User, guest: User, site: Site
+):
+    post, other = add_post(context, user, site), add_post(context, user, site)
+    grant(context, guest, site, SiteRole.VIEWER)
+    grant(context, guest, site, SiteRole.EDITOR, post)
+    repo = context.permission_repo
+
+    assert repo.has_permission(guest, site, Capability.EDIT_POST, post)
+    assert not repo.has_permission(guest, site, Capability.EDIT_POST, other)
+    assert not repo.has_permission(guest, site, Capability.EDIT_POST)
+    assert repo.get_role(guest, site, post) == SiteRole.EDITOR
+
+
+def test_compiled_access_follows_grants_and_revokes(
+    context: AppContext, guest: User, site: Site
+):
+    repo = context.permission_repo
+    grant(context, guest, site, SiteRole.VIEWER)
+    assert not repo.has_permission(guest, site, Capability.CREATE_POST)
+
+    grant(context, guest, site, SiteRole.EDITOR)
+    assert repo.has_permission(guest, site, Capability.CREATE_POST)
+
+    repo.revoke_permission(guest, site)
+    assert repo.get_capabilities(guest, site) == Capability(0)
+
+
+def test_grants_are_per_site(context: AppContext, user: User, guest: User, site: Site):
+    other = add_site(context, user, "Outro")
+    grant(context, guest, site, SiteRole.EDITOR)
+
+    assert not context.permission_repo.has_permission(
+        guest, other, Capability.VIEW_ANALYTICS
+    )
+
+
+def test_owner_keeps_the_owner_role(context: AppContext, user: User, site: Site):
+    post = add_post(context, user, site)
+    repo = context.permission_repo
+
+    with pytest.raises(ValueError):
+        grant(context, user, site, SiteRole.EDITOR)
+    with pytest.raises(ValueError):
+        grant(context, user, site, SiteRole.VIEWER, post)
+    with pytest.raises(ValueError):
+        repo.revoke_permission(user, site)
+    assert repo.get_role(user, site) == SiteRole.OWNER
+
+
+def test_indexes_list_the_grants(
+    context: AppContext, user: User, guest: User, site: Site
+):
+    post = add_post(context, user, site)
+    grant(context, guest, site, SiteRole.VIEWER)
+    grant(context, guest, site, SiteRole.EDITOR, post)
+    repo = context.permission_repo
+
+    assert len(repo.get_site_permissions(site)) == 3
+    assert {p.role for p in repo.iter_user_permissions(guest)} == {
+        SiteRole.VIEWER,
+        SiteRole.EDITOR,
+    }
+    assert [p.user for p in repo.iter_post_permissions(post)] == [guest]
+    assert repo.get_not_managers(site, context.user_repo) == []
+
+    for permission in list(repo.iter_user_permissions(guest)):
+        repo.revoke_permission(guest, site, permission.post)
+    assert list(repo.iter_post_permissions(post)) == []
+    assert repo.get_not_managers(site, context.user_repo) == [guest]
+
+
+def test_revoke_site_permissions_drops_compiled_access(
+    context: AppContext, user: User, guest: User, site: Site
+):
+    grant(context, guest, site, SiteRole.EDITOR)
+    repo = context.permission_repo
+    assert repo.has_permission(guest, site, Capability.EDIT_POST)
+
+    repo.revoke_site_permissions(site)
+
+    assert repo.get_site_permissions(site) == []
+    assert not repo.has_permission(guest, site, Capability.EDIT_POST)
+    assert not repo.has_permission(user, site, Capability.EDIT_POST)
@@ -0,0 +1,138 @@
+import io
+from datetime import datetime, timedelta
+
+from conftest import PORTUGUESE, add_post, add_user
+
+from cms import cascade
+from cms.models import (
+    Content,
+    Permission,
+    Post,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    SiteAnalyticsReport,
+    SiteRole,
+    User,
+)
+from cms.services.post_scheduler import PostScheduler
+from cms.snapshot import restore_snapshot, write_snapshot
+from cms.views.menu import AppContext
+
+NOW = datetime(2999, 1, 1, 12, 0)
+
+
+def schedule(context: AppContext, user: User, site: Site, minutes: int) -> Post:
+    post = Post(poster=user, site=site, scheduled_to=NOW + timedelta(minutes=minutes))
+    post.add_content(
+        PORTUGUESE.code, Content(title="Agendado", body=[], language=PORTUGUESE)
+    )
+    context.post_repo.add_post(post)
+    return post
+
+
+def publish_entries(context: AppContext, site: Site) -> list[SiteAnalyticsEntry]:
+    return [
+        entry
+        for entry in context.analytics_repo.iter_site_entries(site)
+        if isinstance(entry, SiteAnalyticsEntry)
+        and entry.action == SiteAction.PUBLISH_POST
+    ]
+
+
+def test_tick_publishes_due_posts_in_order(context: AppContext, user: User, site: Site):
+    later = schedule(context, user, site, 30)
+    sooner = schedule(context, user, site, 10)
+    scheduler = context.post_scheduler
+
+    assert scheduler.tick(NOW) == []
+    assert scheduler.tick(NOW + timedelta(minutes=20)) == [sooner]
+    assert context.post_repo.get_next_publication() == later.scheduled_to
+    assert scheduler.tick(NOW + timedelta(hours=1)) == [later]
+    assert context.post_repo.get_next_publication() is None
+
+
+def test_publish_is_logged_as_a_system_action(
+    context: AppContext, user: User, site: Site
+):
+    post = schedule(context, user, site, 10)
+
+    context.post_scheduler.tick(NOW + timedelta(hours=1))
+
+    [entry] = publish_entries(context, site)
+    assert entry.user is None
+    assert entry.metadata == {"post_id": str(post.id)}
+    assert list(context.analytics_repo.iter_user_entries(user)) == []
+    assert entry.get_username() == "sistema"
+
+
+def test_system_entries_stay_out_of_unique_users(
+    context: AppContext, user: User, site: Site
+):
+    schedule(context, user, site, 10)
+    context.post_scheduler.tick(NOW + timedelta(hours=1))
+
+    report = SiteAnalyticsReport(
+        entries=list(context.analytics_repo.iter_site_entries(site)), site=site
+    )
+    assert report.get_action_counts() == {SiteAction.PUBLISH_POST: 1}
+    assert report.get_unique_users(SiteAction.PUBLISH_POST) == 0
+    assert context.analytics_repo.get_unique_users_sketches(site.id) == {}
+
+
+def test_listeners_hear_every_published_post(
+    context: AppContext, user: User, site: Site
+):
+    heard: list[Post] = []
+    scheduler = PostScheduler(context.post_repo, context.analytics_repo)
+    scheduler.subscribe(heard.append)
+    posts = [schedule(context, user, site, minutes) for minutes in (5, 10)]
+
+    scheduler.tick(NOW + timedelta(hours=1))
+
+    assert heard == posts
+
+
+def test_published_post_enters_the_home_feed(
+    context: AppContext, user: User, site: Site
+):
+    visible = add_post(context, user, site)
+    scheduled = schedule(context, user, site, 10)
+    assert [p.id for p in context.home_feeds.get_feed(site).posts] == [visible.id]
+
+    context.post_scheduler.tick(NOW + timedelta(hours=1))
+
+    assert {p.id for p in context.home_feeds.get_feed(site).posts} == {
+        visible.id,
+        scheduled.id,
+    }
+
+
+def test_system_entries_survive_the_poster(context: AppContext, user: User, site: Site):
+    guest = add_user(context, "bia")
+    context.permission_repo.grant_permission(
+        Permission(user=guest, site=site, role=SiteRole.EDITOR)
+    )
+    schedule(context, guest, site, 10)
+    context.post_scheduler.tick(NOW + timedelta(hours=1))
+
+    cascade.delete_user(context, guest).run()
+
+    [entry] = publish_entries(context, site)
+    assert entry.user is None
+
+
+def test_system_entries_round_trip_through_a_snapshot(
+    context: AppContext, user: User, site: Site
+):
+    schedule(context, user, site, 10)
+    context.post_scheduler.tick(NOW + timedelta(hours=1))
+    stream = io.BytesIO()
+    write_snapshot(context, stream)
+    stream.seek(0)
+
+    restored = AppContext()
+    restore_snapshot(restored, stream)
+
+    [entry] = publish_entries(restored, restored.site_repo.get_site_by_id(site.id))
+    assert entry.user is None
@@ -0,0 +1,157 @@
+import random
+
+import pytest
+from conftest import FakeClock
+
+from cms.services.rate_limit import (
+    RateLimit,
+    RateLimitedAction,
+    RateLimiter,
+    RateLimitExceededError,
+    SlidingWindow,
+    TokenBucket,
+)
+
+
+def test_token_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(5, 60)
+
+    assert [bucket.hit("k", 0) for _ in range(5)] == [0] * 5
+    assert bucket.hit("k", 0) == pytest.approx(12)
+    assert bucket.hit("k", 11.9) > 0
+    assert bucket.hit("k", 12) == 0
+    assert bucket.hit("k", 12) == pytest.approx(12)
+
+
+def test_token_bucket_never_exceeds_capacity():
+    bucket = TokenBucket(2, 10)
+    bucket.hit("k", 0)
+
+    assert bucket.hit("k", 1_000) == 0
+    assert bucket.hit("k", 1_000) == 0
+    assert bucket.hit("k", 1_000) > 0
+
+
+def test_sliding_window_limits_hits():
+    window = SlidingWindow(3, 10)
+
+    assert [window.hit("k", t) for t in (0, 1, 2)] == [0, 0, 0]
+    assert window.hit("k", 3) > 0
+
+
+def test_sliding_window_weighs_previous_window():
+    window = SlidingWindow(4, 10)
+    for _ in range(4):
+        window.hit("k", 9)
+
+    # At 15, half of the previous window still counts: 2 of its 4 hits, which
+    # leaves room for 2 more.
+    assert [window.hit("k", 15) for _ in range(2)] == [0, 0]
+    assert window.hit("k", 15) > 0
+    assert window.hit("k", 25) == 0
+
+
+def test_rejected_hits_are_not_counted():
+    window = SlidingWindow(1, 10)
+    window.hit("k", 0)
+    for t in range(1, 10):
+        window.hit("k", t)
+
+    assert window.hit("k", 20) == 0
+
+
+@pytest.mark.parametrize(
+    "limit",
+    [
+        lambda: TokenBucket(3, 30),
+        lambda: SlidingWindow(3, 30),
+        lambda: SlidingWindow(1, 7),
+    ],
+)
+def test_retry_after_is_exact(limit):
+    rng = random.Random(11)
+    rate_limit: RateLimit = limit()
+    now = 0.0
+
+    for _ in range(500):
+        now += rng.choice([0, 0.5, 3, 10, 31])
+        wait = rate_limit.hit("k", now)
+        if wait:
+            # Not a moment sooner, and right when promised.
+            assert rate_limit.hit("k", now + wait * 0.99) > 0
+            now += wait + 1e-6
+            assert rate_limit.hit("k", now) == 0
+
+
+def test_sliding_window_counts_at_most_limit_per_fixed_window():
+    window = SlidingWindow(5, 10)
+    rng = random.Random(3)
+    allowed: dict[int, int] = {}
+
+    for now in sorted(rng.uniform(0, 200) for _ in range(2_000)):
+        if window.hit("k", now) == 0:
+            allowed[int(now // 10)] = allowed.get(int(now // 10), 0) + 1
+
+    assert max(allowed.values()) <= 5
+
+
+def test_keys_are_independent():
+    window = SlidingWindow(1, 10)
+
+    assert window.hit("a", 0) == 0
+    assert window.hit("b", 0) == 0
+    assert window.hit("a", 1) > 0
+
+
+def test_idle_keys_expire_without_changing_decisions():
+    bucket = TokenBucket(1, 10)
+    bucket.hit("old", 0)
+
+    bucket.hit("new", 100)
+
+    assert len(bucket) == 1
+    assert bucket.hit("old", 100) == 0
+
+
+def test_max_keys_drops_least_recently_seen():
+    window = SlidingWindow(1, 100, max_keys=2)
+    window.hit("a", 0)
+    window.hit("b", 1)
+    window.hit("a", 2)
+
+    window.hit("c", 3)
+
+    assert len(window) == 2
+    # "a" was seen after "b", so "b" was dropped and starts over.
+    assert window.hit("a", 4) > 0
+    assert window.hit("b", 5) == 0
+
+
+def test_limiter_acquire_and_reset(clock: FakeClock):
+    limiter = RateLimiter({RateLimitedAction.LOGIN: SlidingWindow(2, 300)}, clock)
+
+    limiter.acquire(RateLimitedAction.LOGIN, "ana")
+    limiter.acquire(RateLimitedAction.LOGIN, "ana")
+    with pytest.raises(RateLimitExceededError) as error:
+        limiter.acquire(RateLimitedAction.LOGIN, "ana")
+    assert error.value.retry_after > 0
+    assert isinstance(error.value, ValueError)
+
+    limiter.reset(RateLimitedAction.LOGIN, "ana")
+    assert limiter.allow(RateLimitedAction.LOGIN, "ana")
+
+
+def test_limiter_without_limit_allows_everything(clock: FakeClock):
+    limiter = RateLimiter({}, clock)
+
+    assert all(limiter.allow(RateLimitedAction.VIEW, 1, 2, 3) for _ in range(100))
+
+
+def test_default_view_limit_counts_one_view_per_half_hour(clock: FakeClock):
+    limiter = RateLimiter(clock=clock)
+
+    assert limiter.allow(RateLimitedAction.VIEW, 1, 1, 0)
+    clock.now += 1_799
+    assert not limiter.allow(RateLimitedAction.VIEW, 1, 1, 0)
+    clock.now += 1_801
+    assert limiter.allow(RateLimitedAction.VIEW, 1, 1, 0)
@@ -0,0 +1,217 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from conftest import add_post, add_site, add_user
+
+from cms.models import (
+    Content,
+    ContentBlock,
+    Language,
+    Post,
+    Site,
+    TextBlock,
+    User,
+    UserRole,
+)
+from cms.repository import VersionConflictError
+from cms.services.revisions import (
+    KEYFRAME_INTERVAL,
+    BlockOperation,
+    PostEditor,
+    RevisionHistory,
+    apply_deltas,
+    diff_blocks,
+    renumber,
+)
+from cms.views.menu import AppContext
+from cms.wal import FsyncPolicy, WriteAheadLog
+
+PORTUGUESE = Language("Português", "pt-br")
+AUTHOR = User("Ana", "Lima", "ana@cms.com", "ana", "Senha123", UserRole.USER)
+CREATED_AT = datetime(2024, 1, 1)
+
+
+def text_blocks(*texts: str) -> list[ContentBlock]:
+    return [TextBlock(order=i, text=text) for i, text in enumerate(texts, start=1)]
+
+
+def texts(blocks: list[ContentBlock]) -> list[str]:
+    return [block.text for block in blocks if isinstance(block, TextBlock)]
+
+
+def content(title: str, *body: str) -> Content:
+    return Content(title=title, body=text_blocks(*body), language=PORTUGUESE)
+
+
+@pytest.mark.parametrize(
+    ("old", "new"),
+    [
+        ([], []),
+        ([], ["a", "b"]),
+        (["a", "b"], []),
+        (["a", "b", "c"], ["a", "c"]),
+        (["a", "c"], ["a", "b", "c"]),
+        (["a", "b", "c"], ["c", "b", "a"]),
+        (["a", "b", "c", "d"], ["x", "b", "y", "z", "d", "e"]),
+        (["a", "a", "b"], ["b", "a", "a", "a"]),
+    ],
+)
+def test_apply_deltas_rebuilds_new_blocks(old: list[str], new: list[str]):
+    blocks = text_blocks(*old)
+
+    apply_deltas(blocks, diff_blocks(blocks, text_blocks(*new)))
+
+    assert texts(blocks) == new
+
+
+def test_diff_ignores_block_order_field():
+    old = text_blocks("a", "b")
+    moved = [TextBlock(order=7, text="a"), TextBlock(order=9, text="b")]
+
+    assert diff_blocks(old, moved) == []
+
+
+def test_diff_of_insert_is_a_single_delta():
+    deltas = diff_blocks(text_blocks("a", "c"), text_blocks("a", "b", "c"))
+
+    assert [(d.operation, d.index) for d in deltas] == [(BlockOperation.INSERT, 1)]
+
+
+def test_renumber_only_copies_moved_blocks():
+    blocks = text_blocks("a", "b")
+
+    renumbered = renumber([*blocks, TextBlock(order=9, text="c")])
+
+    assert [block.order for block in renumbered] == [1, 2, 3]
+    assert renumbered[0] is blocks[0] and renumbered[1] is blocks[1]
+
+
+def test_commit_without_changes_is_skipped():
+    history = RevisionHistory(AUTHOR, content("Título", "a"), CREATED_AT)
+
+    assert history.commit(AUTHOR, content("Título", "a")) is None
+    assert len(history.revisions) == 1
+
+
+def test_every_revision_is_rebuilt_across_keyframes():
+    history = RevisionHistory(AUTHOR, content("v0", "0"), CREATED_AT)
+    expected = [("v0", ["0"])]
+
+    for i in range(1, 2 * KEYFRAME_INTERVAL + 3):
+        body = [str(n) for n in range(i + 1) if n % 3 != i % 3]
+        title = f"v{i}" if i % 2 else expected[-1][0]
+        history.commit(AUTHOR, content(title, *body))
+        expected.append((title, body))
+
+    revisions = history.revisions
+    assert [r.keyframe is not None for r in revisions] == [
+        r.number % KEYFRAME_INTERVAL == 0 for r in revisions
+    ]
+    for number, (title, body) in enumerate(expected):
+        rebuilt = history.get_revision(number)
+        assert (rebuilt.title, texts(rebuilt.body)) == (title, body)
+        assert [block.order for block in rebuilt.body] == list(range(1, len(body) + 1))
+
+
+def test_revision_only_stores_title_when_it_changes():
+    history = RevisionHistory(AUTHOR, content("Título", "a"), CREATED_AT)
+
+    same_title = history.commit(AUTHOR, content("Título", "b"))
+    new_title = history.commit(AUTHOR, content("Outro", "b"))
+
+    assert same_title and same_title.title is None
+    assert new_title and new_title.title == "Outro" and not new_title.deltas
+
+
+def test_missing_revision_is_rejected():
+    history = RevisionHistory(AUTHOR, content("Título"), CREATED_AT)
+
+    with pytest.raises(ValueError):
+        history.get_revision(1)
+    with pytest.raises(ValueError):
+        history.get_revision(-1)
+
+
+def test_diff_between_revisions():
+    history = RevisionHistory(AUTHOR, content("Título", "a", "b"), CREATED_AT)
+    history.commit(AUTHOR, content("Título", "a", "c"))
+
+    deltas = history.diff(0, 1)
+
+    assert [(d.operation, d.index) for d in deltas] == [(BlockOperation.REPLACE, 1)]
+
+
+@pytest.fixture
+def post(context: AppContext, user: User, site: Site) -> Post:
+    post = Post(poster=user, site=site)
+    post.add_content(PORTUGUESE.code, content("Título", "a", "b"))
+    context.post_repo.add_post(post)
+    return post
+
+
+def test_editor_saves_and_restores(context: AppContext, user: User, post: Post):
+    editor = PostEditor(post, PORTUGUESE.code, context.post_repo, context.revisions)
+
+    editor.delete_block(0)
+    editor.insert_block(1, TextBlock(order=0, text="c"))
+    saved = editor.save(user)
+
+    assert saved and saved.number == 1
+    assert texts(post.get_contents()["pt-br"].body) == ["b", "c"]
+
+    restored = editor.restore(0, user)
+
+    assert restored and restored.number == 2
+    assert texts(post.get_contents()["pt-br"].body) == ["a", "b"]
+    assert editor.save(user) is None
+
+
+def test_editor_refuses_stale_draft(context: AppContext, user: User, post: Post):
+    first = PostEditor(post, PORTUGUESE.code, context.post_repo, context.revisions)
+    second = PostEditor(post, PORTUGUESE.code, context.post_repo, context.revisions)
+
+    first.set_title("Primeiro")
+    first.save(user)
+    second.set_title("Segundo")
+
+    with pytest.raises(VersionConflictError):
+        second.save(user)
+    assert post.get_contents()["pt-br"].title == "Primeiro"
+
+
+def test_content_replaced_outside_editor_becomes_revision(
+    context: AppContext, post: Post
+):
+    context.revisions.get_history(post, PORTUGUESE.code)
+
+    context.post_repo.add_content(post, PORTUGUESE.code, content("Tradução", "x"))
+    history = context.revisions.get_history(post, PORTUGUESE.code)
+
+    latest = history.revisions[-1]
+    assert latest.author is None
+    assert texts(history.get_revision(0).body) == ["a", "b"]
+    assert texts(history.get_revision(1).body) == ["x"]
+
+
+def test_history_starts_over_after_recovery(tmp_path: Path):
+    wal = WriteAheadLog(tmp_path, FsyncPolicy.ALWAYS)
+    user = add_user(wal.context, "ana")
+    post = add_post(
+        wal.context, user, add_site(wal.context, user, "Blog"), *text_blocks("a")
+    )
+    editor = PostEditor(
+        post, PORTUGUESE.code, wal.context.post_repo, wal.context.revisions
+    )
+    for text in ("b", "c"):
+        editor.insert_block(len(editor.blocks), TextBlock(order=0, text=text))
+        editor.save(user)
+    wal.close()
+
+    wal = WriteAheadLog(tmp_path, FsyncPolicy.ALWAYS)
+    recovered = wal.context.post_repo.get_post_by_id(post.id)
+    history = wal.context.revisions.get_history(recovered, PORTUGUESE.code)
+    wal.close()
+
+    assert len(history.revisions) == 1
+    assert texts(history.get_revision(0).body) == ["a", "b", "c"]
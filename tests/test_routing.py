@@ -0,0 +1,145 @@
+import pytest
+from conftest import PORTUGUESE, add_media, add_post, add_site, add_user
+
+from cms.models import MediaFile, Post, Site, User
+from cms.repository import RouteConflictError
+from cms.services.routing import UrlResolver, match_host
+from cms.services.social_media import TwitterPost
+from cms.views.menu import AppContext
+
+
+@pytest.fixture
+def resolver(context: AppContext) -> UrlResolver:
+    return context.url_resolver
+
+
+@pytest.fixture
+def site(context: AppContext, user: User) -> Site:
+    return add_site(context, user, "Meu Blog")
+
+
+@pytest.mark.parametrize(
+    "host, expected",
+    [
+        ("www.cms.blog.com.br", "blog"),
+        ("www.cms.meu-blog.com.br", "meu-blog"),
+        ("www.cms..com.br", None),
+        ("cms.blog.com.br", None),
+        ("www.cms.blog.com", None),
+    ],
+)
+def test_match_host(host: str, expected: str | None):
+    assert match_host(host, "www.cms.{}.com.br") == expected
+
+
+def test_urls_built_by_the_models_resolve_back(
+    resolver: UrlResolver, context: AppContext, user: User, site: Site
+):
+    post = add_post(context, user, site)
+    media = add_media(context, user, site, "foto de capa.jpg")
+
+    assert resolver.resolve(site.get_url()) is site
+    assert resolver.resolve(site.get_url() + "/") is site
+    assert resolver.resolve(post.get_url()) is post
+    assert resolver.resolve(media.url) is media
+
+
+def test_share_links_resolve_to_the_post(
+    resolver: UrlResolver, context: AppContext, user: User, site: Site
+):
+    post = add_post(context, user, site)
+    twitter = TwitterPost(original_post=post, language=PORTUGUESE)
+
+    assert resolver.resolve(twitter.get_share_link()) is post
+
+
+def test_host_is_case_insensitive(resolver: UrlResolver, site: Site):
+    assert resolver.resolve("HTTPS://WWW.CMS.MEU-BLOG.COM.BR") is site
+
+
+def test_encoded_media_filename(
+    resolver: UrlResolver, context: AppContext, user: User, site: Site
+):
+    media = add_media(context, user, site, "capa nova.jpg")
+
+    assert (
+        resolver.resolve("https://www.cms-media.meu-blog.com.br/capa%20nova.jpg")
+        is media
+    )
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "",
+        "não é url",
+        "http://[::1",
+        "https://www.cms.outro.com.br",
+        "https://www.cms.meu-blog.com.br/sobre",
+        "https://www.cms.meu-blog.com.br/?post=abc",
+        "https://www.cms.meu-blog.com.br/?post=999",
+        "https://www.cms-media.meu-blog.com.br/",
+        "https://www.cms-media.meu-blog.com.br/nada.jpg",
+        "https://www.cms-media.outro.com.br/foto.jpg",
+    ],
+)
+def test_unknown_urls_resolve_to_nothing(
+    resolver: UrlResolver, context: AppContext, user: User, site: Site, url: str
+):
+    add_media(context, user, site)
+
+    assert resolver.resolve(url) is None
+
+
+def test_post_of_another_site_is_not_found(
+    resolver: UrlResolver, context: AppContext, user: User, site: Site
+):
+    other = add_site(context, user, "Outro")
+    post = add_post(context, user, other)
+
+    assert resolver.resolve(f"{site.get_url()}/?post={post.id}") is None
+
+
+def test_removed_resources_stop_resolving(
+    resolver: UrlResolver, context: AppContext, user: User, site: Site
+):
+    post: Post = add_post(context, user, site)
+    media: MediaFile = add_media(context, user, site)
+    url, media_url = post.get_url(), media.url
+
+    context.post_repo.delete_post(post)
+    context.media_repo.remove_media(media.id)
+
+    assert resolver.resolve(url) is None
+    assert resolver.resolve(media_url) is None
+
+
+def test_routes_must_be_unique(context: AppContext, user: User, site: Site):
+    add_media(context, user, site)
+
+    with pytest.raises(RouteConflictError):
+        add_site(context, user, "meu blog")
+    with pytest.raises(RouteConflictError):
+        add_media(context, user, site)
+    with pytest.raises(ValueError):
+        add_site(context, user, "Blog / Loja")
+
+
+def test_same_filename_on_another_site(
+    resolver: UrlResolver, context: AppContext, user: User, site: Site
+):
+    add_media(context, user, site)
+    other = add_media(context, user, add_site(context, user, "Outro"))
+
+    assert resolver.resolve(other.url) is other
+
+
+def test_sharded_context_resolves_the_same():
+    context = AppContext(shards=3)
+    owner = add_user(context, "ana")
+    sites = [add_site(context, owner, f"Site {i}") for i in range(6)]
+    posts = [add_post(context, owner, site) for site in sites]
+
+    for site, post in zip(sites, posts):
+        assert context.url_resolver.resolve(site.get_url()) is site
+        assert context.url_resolver.resolve(post.get_url()) is post
@@ -0,0 +1,172 @@
+from datetime import timedelta
+
+import pytest
+from conftest import FakeClock
+
+from cms.models import User, UserRole
+from cms.repository import Mutation
+from cms.services.sessions import (
+    SWEEP_BUDGET,
+    WHEEL_RESOLUTION,
+    InvalidSessionError,
+    SessionStore,
+)
+
+TTL = timedelta(hours=1)
+
+
+def make_user(user_id: int) -> User:
+    user = User(
+        "Ana", "Lima", "ana@cms.com", f"ana{user_id}", "Senha123", UserRole.USER
+    )
+    user.id = user_id
+    return user
+
+
+@pytest.fixture
+def store(clock: FakeClock) -> SessionStore:
+    return SessionStore(b"segredo", TTL, clock)
+
+
+def test_token_authenticates_user(store: SessionStore):
+    user = make_user(1)
+
+    token = store.create(user)
+
+    assert store.authenticate(token) is user
+
+
+@pytest.mark.parametrize(
+    "tamper",
+    [
+        lambda token: token + "0",
+        lambda token: token[:-1] + ("0" if token[-1] != "0" else "1"),
+        lambda token: "outro" + token,
+        lambda token: token.partition(".")[0],
+        lambda token: "",
+    ],
+)
+def test_tampered_token_is_rejected(store: SessionStore, tamper):
+    token = store.create(make_user(1))
+
+    with pytest.raises(InvalidSessionError):
+        store.authenticate(tamper(token))
+
+
+def test_token_from_another_secret_is_rejected(clock: FakeClock):
+    token = SessionStore(b"um", TTL, clock).create(make_user(1))
+
+    with pytest.raises(InvalidSessionError):
+        SessionStore(b"outro", TTL, clock).authenticate(token)
+
+
+def test_session_expires_exactly_at_ttl(store: SessionStore, clock: FakeClock):
+    token = store.create(make_user(1))
+
+    clock.now += TTL.total_seconds() - 1
+    store.authenticate(token)
+    clock.now += 1
+
+    with pytest.raises(InvalidSessionError):
+        store.authenticate(token)
+
+
+def test_expired_sessions_are_swept_by_later_logins(
+    store: SessionStore, clock: FakeClock
+):
+    user = make_user(1)
+    for _ in range(3):
+        store.create(user)
+
+    clock.now += TTL.total_seconds() + 2 * WHEEL_RESOLUTION
+    store.create(make_user(2))
+
+    assert len(store) == 1
+    assert store.get_user_sessions(user) == []
+
+
+def test_slot_is_only_swept_once_it_has_passed(store: SessionStore, clock: FakeClock):
+    store.create(make_user(1))
+
+    # Expired, but its slot is still the current one: rejected, not swept.
+    clock.now += TTL.total_seconds()
+    store.create(make_user(2))
+    assert len(store) == 2
+
+    clock.now += WHEEL_RESOLUTION
+    store.create(make_user(3))
+    assert len(store) == 2
+
+
+def test_login_sweeps_at_most_the_budget(store: SessionStore, clock: FakeClock):
+    user = make_user(1)
+    for _ in range(SWEEP_BUDGET + 10):
+        store.create(user)
+    clock.now += TTL.total_seconds() + 2 * WHEEL_RESOLUTION
+
+    store.create(make_user(2))
+    assert len(store) == 11
+
+    store.create(make_user(2))
+    assert len(store) == 2
+
+
+def test_sweep_after_long_idle(store: SessionStore, clock: FakeClock):
+    store.create(make_user(1))
+    clock.now += 1_000 * TTL.total_seconds()
+
+    store.create(make_user(2))
+
+    assert len(store) == 1
+
+
+def test_sessions_created_over_time_expire_in_order(
+    store: SessionStore, clock: FakeClock
+):
+    tokens = []
+    for _ in range(10):
+        tokens.append(store.create(make_user(1)))
+        clock.now += TTL.total_seconds() / 4
+
+    store.sweep()
+
+    assert len(store) == 4
+    for token in tokens[:6]:
+        with pytest.raises(InvalidSessionError):
+            store.authenticate(token)
+    for token in tokens[7:]:
+        store.authenticate(token)
+
+
+def test_logout_ends_only_that_session(store: SessionStore):
+    user = make_user(1)
+    first = store.create(user)
+    second = store.create(user)
+
+    store.logout(first)
+    store.logout("lixo.123")
+
+    with pytest.raises(InvalidSessionError):
+        store.authenticate(first)
+    assert store.authenticate(second) is user
+    assert len(store.get_user_sessions(user)) == 1
+
+
+def test_deleted_user_loses_every_session(store: SessionStore, clock: FakeClock):
+    user = make_user(1)
+    other = make_user(2)
+    tokens = [store.create(user) for _ in range(3)]
+    kept = store.create(other)
+
+    store.on_user_mutation(Mutation.DELETE_USER, user)
+
+    for token in tokens:
+        with pytest.raises(InvalidSessionError):
+            store.authenticate(token)
+    assert store.authenticate(kept) is other
+    assert store.revoke_user(user) == 0
+
+    # The wheel still lists the revoked sessions; sweeping them is harmless.
+    clock.now += TTL.total_seconds() + 2 * WHEEL_RESOLUTION
+    store.sweep()
+    assert len(store) == 0
@@ -0,0 +1,162 @@
+import pytest
+from conftest import add_media, add_post, add_site, add_user
+
+from cms.models import (
+    Comment,
+    MediaBlock,
+    ModerationStatus,
+    PostAction,
+    PostAnalyticsEntry,
+    SiteRole,
+    TextBlock,
+)
+from cms.sharding import ShardRing, ShardRouter
+from cms.views.menu import AppContext
+
+SITES = 12
+
+
+@pytest.fixture
+def sharded() -> AppContext:
+    context = AppContext(shards=2)
+    owner = add_user(context, "ana")
+    reader = add_user(context, "bia")
+
+    for i in range(SITES):
+        site = add_site(context, owner, f"Site {i}")
+        media = add_media(context, owner, site)
+        for j in range(2):
+            post = add_post(
+                context,
+                owner,
+                site,
+                TextBlock(order=1, text=str(j)),
+                MediaBlock(order=2, media=media, alt=""),
+            )
+            root = Comment(post=post, commenter=reader, body="oi")
+            context.comment_repo.add_comment(root)
+            context.comment_repo.add_comment(
+                Comment(post=post, commenter=owner, body="olá", parent=root)
+            )
+            context.comment_repo.add_comment(
+                Comment(
+                    post=post,
+                    commenter=reader,
+                    body="espera",
+                    status=ModerationStatus.HELD,
+                )
+            )
+            context.analytics_repo.log(
+                PostAnalyticsEntry(
+                    user=reader, site=site, post=post, action=PostAction.VIEW
+                )
+            )
+    return context
+
+
+def router(context: AppContext) -> ShardRouter:
+    assert context.shard_router
+    return context.shard_router
+
+
+def snapshot(context: AppContext) -> dict[int, tuple]:
+    state = {}
+    for site in context.site_repo.get_sites():
+        posts = sorted(
+            context.post_repo.iter_site_posts(site, True), key=lambda p: p.id
+        )
+        state[site.id] = (
+            [p.id for p in posts],
+            [m.id for m in context.media_repo.iter_site_medias(site)],
+            [[c.id for c in context.comment_repo.get_post_comments(p)] for p in posts],
+            [[c.id for c in context.comment_repo.iter_post_comments(p)] for p in posts],
+            [c.id for c in context.comment_repo.get_held_comments(site)],
+            sorted(e.id for e in context.analytics_repo.iter_site_entries(site)),
+            context.analytics_repo.get_site_post_counts(site.id, PostAction.VIEW),
+            [
+                (p.user.id, p.role)
+                for p in context.permission_repo.get_site_permissions(site)
+            ],
+        )
+    return state
+
+
+def test_ring_only_moves_sites_to_the_new_shard():
+    ring = ShardRing()
+    ring.add("a")
+    ring.add("b")
+    before = {site_id: ring.get_shard_name(site_id) for site_id in range(1_000)}
+
+    ring.add("c")
+
+    moved = [
+        site_id
+        for site_id, name in before.items()
+        if ring.get_shard_name(site_id) != name
+    ]
+    assert all(ring.get_shard_name(site_id) == "c" for site_id in moved)
+    assert 150 < len(moved) < 550
+
+
+def test_empty_ring_is_rejected():
+    with pytest.raises(ValueError):
+        ShardRing().get_shard_name(1)
+
+
+def test_rebalance_keeps_every_record(sharded: AppContext):
+    before = snapshot(sharded)
+
+    router(sharded).add_shard(background=False)
+
+    placements = router(sharded).get_placements()
+    assert sum(placements.values()) == SITES
+    assert placements["shard-2"] > 0
+    assert snapshot(sharded) == before
+
+
+def test_moved_site_leaves_nothing_behind(sharded: AppContext):
+    router(sharded).add_shard(background=False)
+
+    for shard in router(sharded).shards:
+        site_ids = {site.id for site in shard.site_repo.iter_sites()}
+        assert all(
+            router(sharded).get_site_shard(site_id) is shard for site_id in site_ids
+        )
+        assert {p.site.id for p in shard.post_repo.iter_posts()} <= site_ids
+        assert {c.post.site.id for c in shard.comment_repo.iter_comments()} <= site_ids
+        assert {m.site.id for m in shard.media_repo.iter_medias()} <= site_ids
+        assert {e.site.id for e in shard.analytics_repo.iter_entries()} <= site_ids
+        assert {p.site.id for p in shard.permission_repo.iter_permissions()} <= site_ids
+
+
+def test_moved_site_keeps_taking_writes(sharded: AppContext):
+    router(sharded).add_shard(background=False)
+    moved = [
+        site
+        for site in sharded.site_repo.get_sites()
+        if router(sharded).get_site_shard(site.id).name == "shard-2"
+    ]
+    site = moved[0]
+    owner = sharded.user_repo.get_user_by_username("ana")
+    [post, _] = sharded.post_repo.iter_site_posts(site)
+    [root, *_] = sharded.comment_repo.get_post_comments(post)
+
+    reply = Comment(post=post, commenter=owner, body="de novo", parent=root)
+    sharded.comment_repo.add_comment(reply)
+    new_post = add_post(sharded, owner, site)
+
+    assert sharded.comment_repo.get_reply_count(root) == 2
+    assert new_post.id > max(
+        p.id for p in sharded.post_repo.iter_posts() if p != new_post
+    )
+    assert sharded.permission_repo.get_role(owner, site) == SiteRole.OWNER
+
+
+def test_background_rebalance(sharded: AppContext):
+    before = snapshot(sharded)
+
+    router(sharded).add_shard()
+    router(sharded).wait_rebalance()
+
+    assert snapshot(sharded) == before
+    assert router(sharded).rebalance() == 0
@@ -0,0 +1,170 @@
+import pytest
+from conftest import PORTUGUESE, add_media, add_post
+
+from cms.models import (
+    MediaBlock,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    SiteTemplateType,
+    TextBlock,
+    User,
+)
+from cms.services.media_usage import MediaDeletePolicy
+from cms.services.revisions import PostEditor
+from cms.services.site_template import (
+    FocusOnMediaTemplate,
+    HomeFeedService,
+    LatestPostsTemplate,
+    TrendingTemplate,
+    build_site_template,
+)
+from cms.views.menu import AppContext
+
+
+def feed_ids(context: AppContext, site: Site) -> list[int]:
+    return [post.id for post in context.home_feeds.get_feed(site).posts]
+
+
+def view(context: AppContext, user: User, post: Post, times: int = 1):
+    for _ in range(times):
+        context.analytics_repo.log(
+            PostAnalyticsEntry(
+                user=user, site=post.site, post=post, action=PostAction.VIEW
+            )
+        )
+
+
+def set_template(context: AppContext, site: Site, template: SiteTemplateType):
+    context.site_repo.update_template(site, template)
+
+
+def test_templates_are_registered(context: AppContext, site: Site):
+    for template_type, template_cls in [
+        (SiteTemplateType.LATEST_POSTS, LatestPostsTemplate),
+        (SiteTemplateType.FOCUS_ON_MEDIA, FocusOnMediaTemplate),
+    ]:
+        site.template = template_type
+        template = build_site_template(
+            site, context.post_repo, context.analytics_repo, context.trending
+        )
+        assert type(template) is template_cls
+
+
+def test_feed_is_kept_until_an_event_it_needs(
+    context: AppContext, user: User, site: Site
+):
+    first = add_post(context, user, site, TextBlock(order=1, text="a"))
+    feed = context.home_feeds.get_feed(site)
+
+    view(context, user, first)
+    assert context.home_feeds.get_feed(site) is feed
+
+    set_template(context, site, SiteTemplateType.TOP_POSTS_FIRST)
+    top = context.home_feeds.get_feed(site)
+    assert top is not feed
+
+    view(context, user, first)
+    assert context.home_feeds.get_feed(site) is not top
+
+
+def test_top_posts_follow_views(context: AppContext, user: User, site: Site):
+    set_template(context, site, SiteTemplateType.TOP_POSTS_FIRST)
+    posts = [add_post(context, user, site) for _ in range(3)]
+
+    view(context, user, posts[2], times=3)
+    view(context, user, posts[0], times=2)
+
+    assert feed_ids(context, site) == [posts[2].id, posts[0].id, posts[1].id]
+
+
+def test_deleted_post_leaves_the_feed(context: AppContext, user: User, site: Site):
+    post = add_post(context, user, site)
+    assert feed_ids(context, site) == [post.id]
+
+    context.post_repo.delete_post(post)
+
+    assert feed_ids(context, site) == []
+
+
+@pytest.fixture
+def media_site(context: AppContext, site: Site) -> Site:
+    set_template(context, site, SiteTemplateType.FOCUS_ON_MEDIA)
+    return site
+
+
+def test_media_added_in_the_editor_enters_the_feed(
+    context: AppContext, user: User, media_site: Site
+):
+    post = add_post(context, user, media_site, TextBlock(order=1, text="a"))
+    media = add_media(context, user, media_site)
+    assert feed_ids(context, media_site) == []
+
+    editor = PostEditor(post, PORTUGUESE.code, context.post_repo, context.revisions)
+    editor.insert_block(1, MediaBlock(order=0, media=media, alt=""))
+    editor.save(user)
+
+    assert feed_ids(context, media_site) == [post.id]
+
+    editor.restore(0, user)
+
+    assert feed_ids(context, media_site) == []
+
+
+def test_deleted_media_leaves_the_feed(
+    context: AppContext, user: User, media_site: Site
+):
+    media = add_media(context, user, media_site)
+    post = add_post(
+        context,
+        user,
+        media_site,
+        TextBlock(order=1, text="a"),
+        MediaBlock(order=2, media=media, alt=""),
+    )
+    assert feed_ids(context, media_site) == [post.id]
+
+    context.media_usage.delete_media(media, MediaDeletePolicy.DETACH)
+
+    assert not context.post_repo.has_media_block(post, PORTUGUESE.code)
+    assert feed_ids(context, media_site) == []
+
+
+def test_trending_template_needs_the_shared_scores(context: AppContext, site: Site):
+    site.template = SiteTemplateType.TRENDING
+    template = build_site_template(site, context.post_repo, context.analytics_repo)
+
+    with pytest.raises(ValueError):
+        template.select_posts()
+
+    feeds = HomeFeedService(context.post_repo, context.analytics_repo, context.trending)
+    assert type(feeds.get_feed(site).template) is TrendingTemplate
+    assert feeds.get_feed(site).template.trending is context.trending
+
+
+def test_trending_feed_is_completed_with_latest_posts(
+    context: AppContext, user: User, site: Site
+):
+    set_template(context, site, SiteTemplateType.TRENDING)
+    posts = [add_post(context, user, site) for _ in range(4)]
+
+    view(context, user, posts[0], times=5)
+
+    assert feed_ids(context, site) == [posts[0].id, posts[3].id, posts[2].id]
+
+
+def test_post_counts_follow_logged_and_deleted_entries(
+    context: AppContext, user: User, site: Site
+):
+    first, second = add_post(context, user, site), add_post(context, user, site)
+    view(context, user, first, times=3)
+    view(context, user, second)
+
+    entries = list(context.analytics_repo.iter_post_entries(first))
+    context.analytics_repo.delete_entries(entries[:2])
+
+    assert context.analytics_repo.get_site_post_counts(site.id, PostAction.VIEW) == {
+        first.id: 1,
+        second.id: 1,
+    }
@@ -0,0 +1,217 @@
+import io
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from cms.models import (
+    Comment,
+    Content,
+    Language,
+    MediaBlock,
+    MediaFile,
+    MediaType,
+    ModerationStatus,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    SocialMedia,
+    TextBlock,
+    User,
+)
+from cms.snapshot import (
+    MAGIC,
+    RecordType,
+    decode_record,
+    encode_record,
+    iter_records,
+    load_snapshot_file,
+    restore_snapshot,
+    save_snapshot_file,
+    write_snapshot,
+)
+from cms.views.menu import AppContext
+
+PORTUGUESE = Language("Português", "pt-br")
+
+
+def round_trip(fields: list) -> list:
+    data = encode_record(RecordType.USER, fields)
+    (record_type, decoded), end = decode_record(data, 0)
+    assert (record_type, end) == (RecordType.USER, len(data))
+    return decoded
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        None,
+        True,
+        False,
+        0,
+        -1,
+        63,
+        -64,
+        2**70,
+        -(2**70),
+        1.5,
+        -0.0,
+        "",
+        "ação 日本語",
+        [],
+        [1, [2, ["três", None]]],
+        datetime(2024, 2, 29, 13, 45, 7, 123456),
+        datetime(1969, 12, 31, 23, 59, 59),
+        datetime(1900, 1, 1),
+        datetime(1970, 1, 1),
+    ],
+)
+def test_values_round_trip(value):
+    assert round_trip([value]) == [value]
+
+
+def test_aware_datetime_is_stored_as_local_time():
+    moment = datetime(2024, 5, 1, 12, 0, tzinfo=timezone(timedelta(hours=-3)))
+
+    assert round_trip([moment]) == [moment.astimezone().replace(tzinfo=None)]
+
+
+def test_tuples_decode_as_lists():
+    assert round_trip([(1, 2)]) == [[1, 2]]
+
+
+def test_unsupported_value_is_rejected():
+    with pytest.raises(ValueError):
+        encode_record(RecordType.USER, [object()])
+
+
+@pytest.fixture
+def filled(context: AppContext, user: User, site: Site) -> AppContext:
+    media = MediaFile(
+        uploader=user,
+        filename="foto.jpg",
+        path=Path("static/images/foto.jpg"),
+        media_type=MediaType.IMAGE,
+        site=site,
+        width="800",
+        height="600",
+        duration=None,
+    )
+    context.media_repo.add_midia(media)
+
+    post = Post(poster=user, site=site, created_at=datetime(1960, 6, 1))
+    post.add_content(
+        PORTUGUESE.code,
+        Content(
+            title="Olá",
+            body=[TextBlock(order=1, text="texto"), MediaBlock(2, media, "alt")],
+            language=PORTUGUESE,
+        ),
+    )
+    context.post_repo.add_post(post)
+
+    root = Comment(post=post, commenter=user, body="primeiro")
+    context.comment_repo.add_comment(root)
+    context.comment_repo.add_comment(
+        Comment(
+            post=post,
+            commenter=user,
+            body="resposta",
+            parent=root,
+            status=ModerationStatus.HELD,
+        )
+    )
+
+    context.analytics_repo.log(
+        SiteAnalyticsEntry(user=user, site=site, action=SiteAction.ACCESS)
+    )
+    context.analytics_repo.log(
+        PostAnalyticsEntry(
+            user=user,
+            site=site,
+            post=post,
+            action=PostAction.SHARE,
+            platform=SocialMedia.TWITTER,
+            language="pt-br",
+            metadata={"origem": "teste"},
+        )
+    )
+    return context
+
+
+def assert_same_state(restored: AppContext, original: AppContext):
+    assert restored.user_repo.get_users() == original.user_repo.get_users()
+    assert restored.site_repo.get_sites() == original.site_repo.get_sites()
+    assert list(restored.media_repo.iter_medias()) == list(
+        original.media_repo.iter_medias()
+    )
+
+    [post] = restored.post_repo.iter_posts()
+    [original_post] = original.post_repo.iter_posts()
+    assert post.created_at == original_post.created_at
+    assert post.get_contents() == original_post.get_contents()
+
+    comments = list(restored.comment_repo.iter_comments())
+    assert comments == list(original.comment_repo.iter_comments())
+    assert [c.status for c in comments] == [
+        ModerationStatus.APPROVED,
+        ModerationStatus.HELD,
+    ]
+    assert list(restored.analytics_repo.iter_entries()) == list(
+        original.analytics_repo.iter_entries()
+    )
+    assert list(restored.permission_repo.iter_permissions()) == list(
+        original.permission_repo.iter_permissions()
+    )
+
+
+def test_stream_round_trip(filled: AppContext):
+    stream = io.BytesIO()
+    write_snapshot(filled, stream)
+    stream.seek(0)
+
+    restored = AppContext()
+    restore_snapshot(restored, stream)
+
+    assert_same_state(restored, filled)
+
+
+def test_file_round_trip(filled: AppContext, tmp_path: Path):
+    path = tmp_path / "cms.snapshot"
+    save_snapshot_file(filled, path)
+
+    assert_same_state(load_snapshot_file(path), filled)
+
+
+def test_small_chunks_read_the_same_records(filled: AppContext):
+    stream = io.BytesIO()
+    write_snapshot(filled, stream)
+
+    stream.seek(0)
+    whole = list(iter_records(stream))
+    stream.seek(0)
+    chunked = list(iter_records(stream, chunk_size=3))
+
+    assert chunked == whole
+    assert len(whole) > 5
+
+
+def test_truncated_snapshot_is_rejected(filled: AppContext):
+    stream = io.BytesIO()
+    write_snapshot(filled, stream)
+    data = stream.getvalue()
+
+    with pytest.raises(ValueError):
+        list(iter_records(io.BytesIO(data[:-1])))
+
+
+def test_foreign_file_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_records(io.BytesIO(b"nada a ver")))
+
+
+def test_empty_snapshot_has_no_records():
+    assert list(iter_records(io.BytesIO(MAGIC))) == []
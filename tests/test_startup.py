@@ -0,0 +1,33 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+
+def run_python(code: str) -> str:
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+
+def test_menu_does_not_import_the_data_sources():
+    loaded = run_python(
+        "import sys, cms.views; "
+        "print(*sorted(m for m in sys.modules if m.startswith('cms.')))"
+    ).split()
+
+    assert "cms.views" in loaded
+    for module in ["cms.populate", "cms.snapshot", "cms.wal"]:
+        assert module not in loaded
+
+
+@pytest.mark.parametrize("module", ["cms.cascade", "cms.snapshot", "cms.wal"])
+def test_module_imports_on_its_own(module: str):
+    run_python(f"import {module}")
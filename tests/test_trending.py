@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+import pytest
+from conftest import add_post, add_site, add_user
+
+from cms import cascade
+from cms.models import Post, PostAction, PostAnalyticsEntry, Site, User
+from cms.services.trending import DEFAULT_HALF_LIFE, TrendingScores
+from cms.views.menu import AppContext
+
+NOW = datetime.now()
+
+
+def log(
+    context: AppContext,
+    user: User,
+    post: Post,
+    action: PostAction = PostAction.VIEW,
+    at: datetime = NOW,
+) -> PostAnalyticsEntry:
+    entry = PostAnalyticsEntry(
+        user=user, site=post.site, post=post, action=action, created_at=at
+    )
+    context.analytics_repo.log(entry)
+    return entry
+
+
+@pytest.fixture
+def trending(context: AppContext) -> TrendingScores:
+    return context.trending
+
+
+def test_actions_add_their_weight(
+    context: AppContext, trending: TrendingScores, user: User, post: Post
+):
+    log(context, user, post)
+    log(context, user, post, PostAction.COMMENT)
+    log(context, user, post, PostAction.SHARE)
+
+    assert trending.get_score(post.site, post.id, NOW) == pytest.approx(9.0)
+
+
+def test_score_halves_every_half_life(
+    context: AppContext, trending: TrendingScores, user: User, post: Post
+):
+    log(context, user, post, PostAction.SHARE)
+
+    later = NOW + DEFAULT_HALF_LIFE
+    assert trending.get_score(post.site, post.id, later) == pytest.approx(2.5)
+    assert trending.get_score(post.site, post.id, later + DEFAULT_HALF_LIFE) == (
+        pytest.approx(1.25)
+    )
+
+
+def test_recent_activity_beats_old_activity(
+    context: AppContext, trending: TrendingScores, user: User, site: Site
+):
+    old, new = add_post(context, user, site), add_post(context, user, site)
+    for _ in range(4):
+        log(context, user, old, at=NOW - 3 * DEFAULT_HALF_LIFE)
+    log(context, user, new)
+
+    assert [post_id for post_id, _ in trending.get_top_posts(site, 2, NOW)] == [
+        new.id,
+        old.id,
+    ]
+
+
+def test_scores_survive_a_rescale(context: AppContext, user: User, post: Post):
+    trending = TrendingScores(context.analytics_repo, half_life=timedelta(seconds=1))
+    log(context, user, post)
+
+    far = NOW + timedelta(seconds=800)
+    log(context, user, post, at=far)
+
+    assert trending.get_score(post.site, post.id, far) == pytest.approx(1.0)
+
+
+def test_existing_entries_are_loaded(context: AppContext, user: User, post: Post):
+    log(context, user, post, PostAction.COMMENT)
+
+    trending = TrendingScores(context.analytics_repo)
+
+    assert trending.get_score(post.site, post.id, NOW) == pytest.approx(3.0)
+
+
+def test_deleted_entries_are_taken_back(
+    context: AppContext, trending: TrendingScores, user: User, site: Site
+):
+    first, second = add_post(context, user, site), add_post(context, user, site)
+    share = log(context, user, first, PostAction.SHARE)
+    old = log(context, user, first, at=NOW - DEFAULT_HALF_LIFE)
+    log(context, user, second, PostAction.COMMENT)
+
+    context.analytics_repo.delete_entries([share])
+    assert trending.get_score(site, first.id, NOW) == pytest.approx(0.5)
+
+    context.analytics_repo.delete_entries([old, old])
+    assert trending.get_score(site, first.id, NOW) == 0.0
+    assert trending.get_top_posts(site, 5, NOW) == [(second.id, pytest.approx(3.0))]
+
+
+def test_deleted_user_no_longer_trends(
+    context: AppContext, trending: TrendingScores, user: User, site: Site
+):
+    post = add_post(context, user, site)
+    guest = add_user(context, "bia")
+    add_site(context, guest, "Outro")
+    for _ in range(10):
+        log(context, guest, post, PostAction.SHARE)
+    log(context, user, post)
+
+    cascade.delete_user(context, guest).run()
+
+    assert trending.get_score(site, post.id, NOW) == pytest.approx(1.0)
+
+
+def test_sharded_deletion_takes_back_once():
+    context = AppContext(shards=2)
+    owner = add_user(context, "ana")
+    post = add_post(context, owner, add_site(context, owner, "Blog"))
+    entry = log(context, owner, post, PostAction.SHARE)
+    log(context, owner, post)
+
+    context.analytics_repo.delete_entries([entry])
+    context.analytics_repo.delete_entries([entry])
+
+    assert context.trending.get_score(post.site, post.id, NOW) == pytest.approx(1.0)
+
+
+def test_forgotten_post_leaves_the_ranking(
+    context: AppContext, trending: TrendingScores, user: User, post: Post
+):
+    log(context, user, post)
+
+    trending.forget_post(post)
+
+    assert trending.get_top_posts(post.site, 5, NOW) == []
@@ -0,0 +1,168 @@
+from pathlib import Path
+
+import pytest
+
+from cms.models import Site, User, UserRole
+from cms.snapshot import MAGIC, RecordType, decode_record, encode_record
+from cms.views.menu import AppContext
+from cms.wal import FsyncPolicy, WriteAheadLog
+
+
+def open_log(directory: Path) -> WriteAheadLog:
+    return WriteAheadLog(directory, FsyncPolicy.ALWAYS, checkpoint_every=1_000)
+
+
+def add_site(context: AppContext, name: str) -> Site:
+    owner = context.user_repo.get_user_by_username("owner")
+    if not owner:
+        owner = User(
+            "Dona", "Silva", "dona@cms.com", "owner", "Senha123", UserRole.USER
+        )
+        context.user_repo.add_user(owner)
+
+    site = Site(owner=owner, name=name, description="")
+    context.site_repo.add_site(site)
+    return site
+
+
+def site_names(directory: Path) -> list[str]:
+    wal = open_log(directory)
+    try:
+        return [site.name for site in wal.context.site_repo.get_sites()]
+    finally:
+        wal.close()
+
+
+@pytest.fixture
+def data_dir(tmp_path: Path) -> Path:
+    wal = open_log(tmp_path)
+    add_site(wal.context, "Primeiro")
+    add_site(wal.context, "Segundo")
+    wal.close()
+    return tmp_path
+
+
+def test_replays_log(data_dir: Path):
+    assert site_names(data_dir) == ["Primeiro", "Segundo"]
+
+
+def test_new_log_is_not_recovered(tmp_path: Path):
+    wal = open_log(tmp_path)
+    assert not wal.recovered
+    wal.close()
+
+    wal = open_log(tmp_path)
+    assert wal.recovered
+    wal.close()
+
+
+def test_drops_torn_tail(data_dir: Path):
+    log = data_dir / "wal-0.log"
+    data = log.read_bytes()
+    log.write_bytes(data[:-3])
+
+    assert site_names(data_dir) == ["Primeiro"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 64])
+def test_drops_zeroed_tail(data_dir: Path, size: int):
+    log = data_dir / "wal-0.log"
+    valid_size = log.stat().st_size
+    with open(log, "ab") as f:
+        f.write(bytes(size))
+
+    assert site_names(data_dir) == ["Primeiro", "Segundo"]
+    assert log.stat().st_size == valid_size
+
+
+def test_drops_everything_after_damaged_record(data_dir: Path):
+    log = data_dir / "wal-0.log"
+    data = bytearray(log.read_bytes())
+    data[data.index(b"Primeiro")] ^= 0xFF
+    log.write_bytes(data)
+
+    assert site_names(data_dir) == []
+
+
+def test_appends_after_recovered_tail(data_dir: Path):
+    log = data_dir / "wal-0.log"
+    with open(log, "ab") as f:
+        f.write(b"\x00\x00")
+
+    wal = open_log(data_dir)
+    add_site(wal.context, "Terceiro")
+    wal.close()
+
+    assert site_names(data_dir) == ["Primeiro", "Segundo", "Terceiro"]
+
+
+def test_checkpoint_keeps_state(data_dir: Path):
+    wal = open_log(data_dir)
+    wal.checkpoint()
+    add_site(wal.context, "Terceiro")
+    wal.close()
+
+    assert not (data_dir / "wal-0.log").exists()
+    assert (data_dir / "checkpoint-1.snapshot").exists()
+    assert site_names(data_dir) == ["Primeiro", "Segundo", "Terceiro"]
+
+
+def test_repeated_checkpoints_keep_one_generation(data_dir: Path):
+    wal = open_log(data_dir)
+    for name in ["Terceiro", "Quarto"]:
+        add_site(wal.context, name)
+        wal.checkpoint()
+    wal.close()
+
+    assert sorted(path.name for path in data_dir.iterdir()) == [
+        "checkpoint-2.snapshot",
+        "wal-2.log",
+    ]
+
+
+def test_recovery_prunes_older_generations(data_dir: Path):
+    wal = open_log(data_dir)
+    wal.checkpoint()
+    wal.close()
+    # What a crash in the middle of checkpoints could leave behind.
+    (data_dir / "wal-0.log").write_bytes(MAGIC)
+    (data_dir / "checkpoint-0.snapshot").write_bytes(MAGIC)
+    (data_dir / "checkpoint-2.tmp").write_bytes(MAGIC[:3])
+
+    assert site_names(data_dir) == ["Primeiro", "Segundo"]
+    assert sorted(path.name for path in data_dir.iterdir()) == [
+        "checkpoint-1.snapshot",
+        "wal-1.log",
+    ]
+
+
+def test_rejects_foreign_file(tmp_path: Path):
+    (tmp_path / "wal-0.log").write_bytes(b"not a log")
+
+    with pytest.raises(ValueError):
+        open_log(tmp_path)
+
+
+def test_decode_record_round_trip():
+    data = MAGIC + encode_record(RecordType.DELETE_USER, [7])
+
+    record, end = decode_record(data, len(MAGIC))
+
+    assert record == (RecordType.DELETE_USER, [7])
+    assert end == len(data)
+
+
+@pytest.mark.parametrize(
+    "damage",
+    [
+        lambda record: record[:-1],
+        lambda record: bytes(len(record)),
+        lambda record: record[:1] + bytes([record[1] ^ 0x01]) + record[2:],
+        lambda record: record[:-4] + bytes(4),
+    ],
+)
+def test_decode_record_rejects_damage(damage):
+    record = bytes(encode_record(RecordType.DELETE_USER, [7]))
+
+    with pytest.raises(ValueError):
+        decode_record(damage(record), 0)